@@ -0,0 +1,709 @@
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import importlib
+import threading
+import subprocess
+from contextlib import contextmanager, redirect_stdout
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 允许从项目根导入
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from common.config import RunConfig  # noqa: E402
+
+# 发压工具自测基准：各引擎路径对本地 mock（common/mock_xblock.py、recharge/mock_node.py）逐级加压，
+# 找出发压端自身能持续的最大速率，并与 bench/baseline.json 比较，吞吐回退超过阈值时以非 0 退出
+
+DEFAULT_BASELINE = os.path.join(CURRENT_DIR, 'baseline.json')
+
+# 路径名 → (场景, 引擎/变体)
+PATHS = {
+    'address.thread': ('address', 'thread'),
+    'address.async': ('address', 'async'),
+    'withdraw.thread': ('withdraw', 'thread'),
+    'withdraw.async': ('withdraw', 'async'),
+    'recharge': ('recharge', 'sign'),
+    'recharge.presign': ('recharge', 'presign'),
+    'token': ('token', 'refresh'),
+}
+
+WITHDRAW_PAYLOAD = {
+    "walletId": 118,
+    "chainName": "BTT_TEST",
+    "fromAddress": "0x" + "11" * 20,
+    "toAddress": "0x" + "22" * 20,
+    "tokenAddress": "",
+    "amount": "7",
+}
+RECHARGE_TARGET = '0x1f6642e250E7e15865c54963ce65E8635C564EaE'
+
+
+# 导入耗时检查：脚本批量启动的短任务每次都要付这部分开销，入口模块不应导入链上/异步依赖
+IMPORT_TARGETS = ('main', 'recharge.address_stress', 'withdrawal.sendTx', 'recharge.recharge_stress')
+HEAVY_MODULES = ('web3', 'eth_account', 'aiohttp')
+
+_IMPORT_PROBE = '''
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({{"ms": ms, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def default_threshold() -> float:
+    """吞吐回退阈值（相对基线的比例），BENCH_REGRESSION_THRESHOLD 可覆盖，默认 0.15。"""
+    try:
+        return max(0.0, float(os.getenv('BENCH_REGRESSION_THRESHOLD', '0.15')))
+    except Exception:
+        return 0.15
+
+
+def default_import_budget_ms() -> float:
+    """入口模块导入耗时上限（毫秒），BENCH_IMPORT_BUDGET_MS 可覆盖，默认 500；0 表示不检查。"""
+    try:
+        return max(0.0, float(os.getenv('BENCH_IMPORT_BUDGET_MS', '500')))
+    except Exception:
+        return 500.0
+
+
+def default_require_baseline() -> bool:
+    """BENCH_REQUIRE_BASELINE=1 时基线缺失视为失败（CI 中避免因没有基线而静默通过）。"""
+    return os.getenv('BENCH_REQUIRE_BASELINE', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _proc_cpu_seconds(pid: int) -> Optional[float]:
+    """读取进程（含已回收子进程）的 CPU 时间，非 Linux 返回 None。"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        tick = os.sysconf('SC_CLK_TCK')
+        return sum(int(x) for x in fields[11:15]) / tick
+    except Exception:
+        return None
+
+
+def _proc_children(pid: int) -> List[int]:
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(x) for x in f.read().split()]
+    except Exception:
+        return []
+
+
+class StandIn:
+    """以子进程运行的本地替身（与发压进程隔离，避免争用同一个 GIL），退出时终止。"""
+
+    def __init__(self, name: str, argv: List[str]):
+        self.name = name
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.proc = subprocess.Popen([sys.executable] + argv + ['--port', str(self.port)],
+                                     cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        self._wait_ready()
+
+    def _wait_ready(self, timeout: float = 15.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                err = (self.proc.stderr.read() or b'').decode(errors='replace')[-500:] if self.proc.stderr else ''
+                raise RuntimeError(f'{self.name} 启动失败: {err}')
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=0.2):
+                    return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f'{self.name} 未在 {timeout}s 内就绪')
+
+    def cpu_seconds(self) -> Optional[float]:
+        """替身进程（含 --processes 派生的子进程）累计 CPU 时间。"""
+        total = _proc_cpu_seconds(self.proc.pid)
+        if total is None:
+            return None
+        for child in _proc_children(self.proc.pid):
+            total += _proc_cpu_seconds(child) or 0.0
+        return total
+
+    def close(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+def start_xblock(latency: Optional[str] = None, processes: int = 1) -> StandIn:
+    argv = [os.path.join('common', 'mock_xblock.py'), '--processes', str(processes), '--token-ttl', '3600']
+    if latency:
+        argv += ['--latency', latency]
+    return StandIn('mock_xblock', argv)
+
+
+def start_node(latency: Optional[str] = None) -> StandIn:
+    argv = [os.path.join('recharge', 'mock_node.py'), '--block-time', '1', '--balance-btt', '1000000000']
+    if latency:
+        argv += ['--latency', latency]
+    return StandIn('mock_node', argv)
+
+
+# recharge.sendTx 在导入时读取 BTT_RPC_URL、首次使用时建立客户端并一直复用，整个基准运行期间只能对接同一个 mock 节点
+_NODE: Optional[StandIn] = None
+
+
+def shared_node() -> StandIn:
+    global _NODE
+    if _NODE is None:
+        _NODE = start_node()
+    return _NODE
+
+
+def set_node_latency(node: StandIn, spec: str):
+    import requests
+    requests.post(node.url, json={"jsonrpc": "2.0", "id": 1, "method": "mock_setLatency", "params": [spec]}, timeout=5)
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return None
+
+
+class RssSampler:
+    """后台线程每 20ms 采样一次本进程 RSS，记录峰值。"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.base = _rss_bytes()
+        self.peak = self.base or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='rss-sampler', daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            rss = _rss_bytes()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def __enter__(self) -> 'RssSampler':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _cpu_now() -> float:
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+@contextmanager
+def _quiet(enabled: bool) -> Iterator[None]:
+    """屏蔽逐请求打印（仍会格式化并写出，只是不占终端），保持与真实运行相同的开销。"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        yield
+
+
+# 当前环境对应的运行配置快照，_env 进出时清掉，按新环境重新生成
+_CONFIG: Optional[RunConfig] = None
+
+
+def _config() -> RunConfig:
+    global _CONFIG
+    if _CONFIG is None:
+        _CONFIG = RunConfig.from_env()
+    return _CONFIG
+
+
+@contextmanager
+def _env(**values: Optional[str]) -> Iterator[None]:
+    """临时设置环境变量；进出时都清掉运行配置快照，让下次 _config() 按新环境重新生成。"""
+    global _CONFIG
+    old = {k: os.environ.get(k) for k in values}
+    for k, v in values.items():
+        if v is None:
+            os.environ.pop(k, None)
+        else:
+            os.environ[k] = v
+    _CONFIG = None
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        _CONFIG = None
+
+
+# ---- 各路径的单次运行：入参为调度阶段，返回调度结果 ----
+
+def _run_address(stages: List[Tuple[int, int]], engine: str) -> Dict[str, Any]:
+    from recharge.address_stress import run_address_stages
+    return run_address_stages(stages, engine=engine, on_tick=lambda *_: None, config=_config())[0]
+
+
+def _run_withdraw(stages: List[Tuple[int, int]], engine: str) -> Dict[str, Any]:
+    from withdrawal.sendTx import run_withdraw_stages
+    return run_withdraw_stages(stages, dict(WITHDRAW_PAYLOAD), engine=engine, on_tick=lambda *_: None, config=_config())[0]
+
+
+def _run_token(stages: List[Tuple[int, int]], _variant: str) -> Dict[str, Any]:
+    """刷新间隔传 0 让每次取 token 都走刷新路径，测的是刷新本身能支撑的速率。"""
+    from common.getToken import build_proxy_candidates, get_token_with_auto_refresh, get_verify_option
+    from common.scheduler import default_max_workers, run_open_loop
+    from common.transport import run_transport
+
+    cfg = _config()
+
+    def task(_seq: int) -> Tuple[str, Any]:
+        return 'ok', get_token_with_auto_refresh(0, config=cfg)
+
+    with run_transport(default_max_workers(stages), build_proxy_candidates(cfg)[0], get_verify_option(cfg),
+                       base_url=cfg.base_url):
+        return run_open_loop(stages, task, on_tick=lambda *_: None, scenario='token')
+
+
+def _run_recharge(stages: List[Tuple[int, int]], variant: str) -> Dict[str, Any]:
+    with _env(PRESIGN_LOOKAHEAD_SEC='2' if variant == 'presign' else '0', RECEIPT_TRACK='0'):
+        from recharge.recharge_stress import run_recharge_stages
+        from recharge.sendTx import get_account, get_w3
+        cfg = _config()
+        base_nonce = get_w3(cfg).eth.get_transaction_count(get_account().address, 'pending')
+        sched = run_recharge_stages(stages, RECHARGE_TARGET, 0.001, base_nonce=base_nonce,
+                                    write_log=False, on_tick=lambda *_: None, config=cfg)
+    sched.pop('records', None)
+    return sched
+
+
+RUNNERS: Dict[str, Callable[[List[Tuple[int, int]], str], Dict[str, Any]]] = {
+    'address': _run_address,
+    'withdraw': _run_withdraw,
+    'token': _run_token,
+    'recharge': _run_recharge,
+}
+
+
+def _check_available(scenario: str, variant: str) -> Optional[str]:
+    """返回跳过原因；依赖齐全时返回 None。"""
+    # 只探测能否导入，用 importlib 避免未使用导入的 lint 告警
+    try:
+        importlib.import_module('requests')
+    except Exception:
+        return '缺少 requests'
+    if variant == 'async':
+        try:
+            importlib.import_module('aiohttp')
+        except Exception:
+            return '缺少 aiohttp'
+    if scenario == 'recharge':
+        try:
+            importlib.import_module('web3')
+            importlib.import_module('eth_account')
+        except Exception:
+            return '缺少 web3 / eth_account'
+    return None
+
+
+class BenchConfig:
+    def __init__(self,
+                 start_rate: int = 50,
+                 growth: float = 1.5,
+                 max_rate: int = 20000,
+                 step_sec: int = 3,
+                 refine: int = 2,
+                 lag_p99_ms: float = 20.0,
+                 max_error_ratio: float = 0.01,
+                 inflight_rate: int = 500,
+                 inflight_latency_ms: int = 1000,
+                 mock_processes: int = 2,
+                 quiet: bool = True):
+        self.start_rate = max(1, start_rate)
+        self.growth = max(1.05, growth)
+        self.max_rate = max(self.start_rate, max_rate)
+        self.step_sec = max(1, step_sec)
+        self.refine = max(0, refine)
+        self.lag_p99_ms = lag_p99_ms
+        self.max_error_ratio = max_error_ratio
+        self.inflight_rate = max(0, inflight_rate)
+        self.inflight_latency_ms = max(1, inflight_latency_ms)
+        self.mock_processes = max(1, mock_processes)
+        self.quiet = quiet
+
+    def describe(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+def _stage_totals(sched: Dict[str, Any]) -> Tuple[int, int, int]:
+    success = failed = scheduled = 0
+    for stage in sched.get('stages', []):
+        for sec in stage.get('seconds', []):
+            success += sec.get('success', 0)
+            failed += sec.get('failed', 0)
+            scheduled += sec.get('scheduled', 0)
+    return success, failed, scheduled
+
+
+def measure_step(path: str, rate: int, cfg: BenchConfig, standins: List[StandIn]) -> Dict[str, Any]:
+    """按 rate 持续 step_sec 秒运行一次，判断是否“可持续”：发出滞后 p99 不超过预算且失败率不超过上限。"""
+    scenario, variant = PATHS[path]
+    cpu0 = _cpu_now()
+    mock0 = [s.cpu_seconds() for s in standins]
+    t0 = time.perf_counter()
+    with _quiet(cfg.quiet):
+        sched = RUNNERS[scenario]([(rate, cfg.step_sec)], variant)
+    wall = time.perf_counter() - t0
+    cpu = _cpu_now() - cpu0
+    success, failed, scheduled = _stage_totals(sched)
+    completed = success + failed
+    lag = sched.get('schedule', {}).get('start_lag_ms', {})
+    error_ratio = failed / completed if completed else 1.0
+    standin_cores = None
+    if all(m is not None for m in mock0):
+        used = sum((s.cpu_seconds() or 0.0) - (m or 0.0) for s, m in zip(standins, mock0))
+        standin_cores = round(used / wall, 3) if wall > 0 else None
+    reasons = []
+    if lag.get('p99', 0.0) > cfg.lag_p99_ms:
+        reasons.append(f"lag p99 {lag.get('p99')}ms > {cfg.lag_p99_ms}ms")
+    if error_ratio > cfg.max_error_ratio:
+        reasons.append(f'error ratio {error_ratio:.3f} > {cfg.max_error_ratio}')
+    if completed < scheduled:
+        reasons.append(f'completed {completed} < scheduled {scheduled}')
+    return {
+        "rate": rate,
+        "completed": completed,
+        "failed": failed,
+        "rps": round(completed / cfg.step_sec, 3),
+        "start_lag_ms": lag,
+        "cpu_ms_per_req": round(cpu * 1000.0 / completed, 4) if completed else None,
+        "standin_cpu_cores": standin_cores,
+        "max_in_flight": sched.get('schedule', {}).get('max_in_flight'),
+        "passed": not reasons,
+        "reason": '; '.join(reasons) or None,
+    }
+
+
+def find_max_sustained(path: str, cfg: BenchConfig, standins: List[StandIn]) -> Dict[str, Any]:
+    """按 growth 倍数逐级加压直到首次不可持续，再在最后通过/首次失败之间二分 refine 次。"""
+    steps: List[Dict[str, Any]] = []
+    best: Optional[Dict[str, Any]] = None
+    fail_rate: Optional[int] = None
+    rate = cfg.start_rate
+    while rate <= cfg.max_rate:
+        step = measure_step(path, rate, cfg, standins)
+        steps.append(step)
+        print(f"   {path} @ {rate} req/s → {'✅' if step['passed'] else '❌'} "
+              f"lag p99 {step['start_lag_ms'].get('p99')}ms, CPU {step['cpu_ms_per_req']}ms/req"
+              + (f" ({step['reason']})" if step['reason'] else ''))
+        if not step['passed']:
+            fail_rate = rate
+            break
+        best = step
+        rate = max(rate + 1, int(rate * cfg.growth))
+    # 起始速率就不可持续时向下折半，直到找到可持续的速率（最多 6 次）
+    rate = cfg.start_rate
+    for _ in range(6 if best is None else 0):
+        rate //= 2
+        if rate < 1:
+            break
+        step = measure_step(path, rate, cfg, standins)
+        steps.append(step)
+        print(f"   {path} @ {rate} req/s → {'✅' if step['passed'] else '❌'} lag p99 {step['start_lag_ms'].get('p99')}ms")
+        if step['passed']:
+            best = step
+            break
+        fail_rate = rate
+    lo = best['rate'] if best else 0
+    for _ in range(cfg.refine if fail_rate is not None else 0):
+        mid = (lo + fail_rate) // 2
+        if mid <= lo or mid >= fail_rate:
+            break
+        step = measure_step(path, mid, cfg, standins)
+        steps.append(step)
+        print(f"   {path} @ {mid} req/s → {'✅' if step['passed'] else '❌'} lag p99 {step['start_lag_ms'].get('p99')}ms")
+        if step['passed']:
+            best, lo = step, mid
+        else:
+            fail_rate = mid
+    standin_bound = bool(best and best.get('standin_cpu_cores') is not None
+                         and best['standin_cpu_cores'] >= 0.9 * (1 if standins[0].name == 'mock_node' else cfg.mock_processes))
+    return {
+        "max_rps": best['rps'] if best else 0.0,
+        "max_rate": best['rate'] if best else 0,
+        "first_unsustained_rate": fail_rate,
+        "jitter_ms": best['start_lag_ms'] if best else None,
+        "cpu_ms_per_req": best['cpu_ms_per_req'] if best else None,
+        "standin_cpu_cores": best['standin_cpu_cores'] if best else None,
+        # 替身进程 CPU 已接近满载：此时的上限可能来自 mock 而不是发压端
+        "standin_bound": standin_bound,
+        "steps": steps,
+    }
+
+
+def measure_inflight_rss(path: str, cfg: BenchConfig) -> Optional[Dict[str, Any]]:
+    """让替身固定慢 inflight_latency_ms 返回，以 inflight_rate 发压，在途请求数≈速率×时延，
+    以峰值 RSS 增量折算每 1000 个在途请求的内存（MB）。token 路径串行刷新，不测。"""
+    scenario, variant = PATHS[path]
+    if scenario == 'token' or cfg.inflight_rate <= 0 or _rss_bytes() is None:
+        return None
+    latency = f'fixed:{cfg.inflight_latency_ms}'
+    if scenario == 'recharge':
+        standin = shared_node()
+        set_node_latency(standin, latency)
+    else:
+        standin = start_xblock(latency, cfg.mock_processes)
+    try:
+        with _standin_env(scenario, standin):
+            duration = max(2, cfg.step_sec)
+            with RssSampler() as rss, _quiet(cfg.quiet):
+                sched = RUNNERS[scenario]([(cfg.inflight_rate, duration)], variant)
+    finally:
+        if scenario == 'recharge':
+            set_node_latency(standin, '')
+        else:
+            standin.close()
+    in_flight = sched.get('schedule', {}).get('max_in_flight') or 0
+    if in_flight <= 0 or rss.base is None:
+        return None
+    delta_mb = (rss.peak - rss.base) / (1024 * 1024)
+    return {
+        "max_in_flight": in_flight,
+        "rss_delta_mb": round(delta_mb, 3),
+        "rss_mb_per_1k_in_flight": round(delta_mb * 1000.0 / in_flight, 3),
+    }
+
+
+@contextmanager
+def _standin_env(scenario: str, standin: StandIn) -> Iterator[None]:
+    if scenario == 'recharge':
+        with _env(BTT_RPC_URL=standin.url, NO_PROXY='127.0.0.1,localhost',
+                  PRIVATE_KEY=os.getenv('BENCH_PRIVATE_KEY', '0x' + '42' * 32)):
+            yield
+    else:
+        with _env(XBLOCK_BASE_URL=standin.url, PROXY_DIRECT='1', NO_PROXY='127.0.0.1,localhost',
+                  METRICS_PORT='0', HTTP_TIMING='0'):
+            yield
+
+
+def bench_path(path: str, cfg: BenchConfig) -> Dict[str, Any]:
+    scenario, variant = PATHS[path]
+    skip = _check_available(scenario, variant)
+    if skip:
+        print(f'⏭️ {path}: 跳过（{skip}）')
+        return {"skipped": skip}
+    print(f'🏁 {path}')
+    standin = shared_node() if scenario == 'recharge' else start_xblock(processes=cfg.mock_processes)
+    try:
+        with _standin_env(scenario, standin):
+            result = find_max_sustained(path, cfg, [standin])
+    finally:
+        if scenario != 'recharge':
+            standin.close()
+    result['memory'] = measure_inflight_rss(path, cfg)
+    return result
+
+
+def measure_import_time(module: str, runs: int = 3) -> Dict[str, Any]:
+    """在全新解释器里导入 module，取 runs 次中的最小耗时，并记录被顺带导入的重依赖。
+
+    子进程清空 BTT_RPC_URL / PRIVATE_KEY，确认导入本身不依赖链上配置、也不连接节点。
+    """
+    env = {**os.environ, 'BTT_RPC_URL': '', 'PRIVATE_KEY': ''}
+    code = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+    samples: List[float] = []
+    heavy: List[str] = []
+    for _ in range(max(1, runs)):
+        proc = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT, env=env,
+                              capture_output=True, text=True, timeout=60)
+        if proc.returncode != 0:
+            return {"error": (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ['导入失败']}
+        out = json.loads(proc.stdout.strip().splitlines()[-1])
+        samples.append(out['ms'])
+        heavy = out['heavy']
+    return {"ms": round(min(samples), 1), "heavy_modules": heavy}
+
+
+def check_import_budget(imports: Dict[str, Any], budget_ms: float) -> List[str]:
+    """返回导入检查失败说明列表（空表示通过）。"""
+    failures = []
+    for module, r in imports.items():
+        if r.get('error'):
+            failures.append(f"{module}: 导入失败 {r['error']}")
+            continue
+        if r['heavy_modules']:
+            failures.append(f"{module}: 导入时加载了 {', '.join(r['heavy_modules'])}")
+        if budget_ms > 0 and r['ms'] > budget_ms:
+            failures.append(f"{module}: 导入耗时 {r['ms']} ms > 上限 {budget_ms} ms")
+    return failures
+
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Optional[Dict[str, Any]], threshold: float) -> List[str]:
+    """返回回退说明列表（空表示通过）。基线里没有或本次跳过的路径不参与比较。"""
+    if not baseline:
+        return []
+    regressions = []
+    for path, cur in results.items():
+        base = (baseline.get('paths') or {}).get(path)
+        if not base or cur.get('skipped') or base.get('skipped'):
+            continue
+        floor = float(base.get('max_rps') or 0.0) * (1.0 - threshold)
+        if cur.get('max_rps', 0.0) < floor:
+            regressions.append(f"{path}: {cur.get('max_rps')} req/s < 基线 {base.get('max_rps')} × (1 - {threshold})")
+    return regressions
+
+
+def host_info() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "machine": platform.machine(),
+    }
+
+
+def run_bench(paths: Sequence[str], cfg: BenchConfig, import_runs: int = 3) -> Dict[str, Any]:
+    global _NODE
+    imports = {m: measure_import_time(m, import_runs) for m in IMPORT_TARGETS} if import_runs > 0 else {}
+    try:
+        results = {path: bench_path(path, cfg) for path in paths}
+    finally:
+        if _NODE is not None:
+            _NODE.close()
+            _NODE = None
+    return {
+        "version": 1,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "host": host_info(),
+        "config": cfg.describe(),
+        "imports": imports,
+        "paths": results,
+    }
+
+
+def _load_json(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _print_summary(report: Dict[str, Any]):
+    if report.get('imports'):
+        print('\n📦 入口模块导入耗时（全新解释器，取最小值）')
+        for module, r in report['imports'].items():
+            if r.get('error'):
+                print(f'   {module:<26} 导入失败: {r["error"]}')
+                continue
+            heavy = f" | 加载了 {', '.join(r['heavy_modules'])}" if r['heavy_modules'] else ''
+            print(f"   {module:<26} {r['ms']:>8} ms{heavy}")
+    print('\n📋 自测结果（max_rps 为可持续的最大完成速率）')
+    for path, r in report['paths'].items():
+        if r.get('skipped'):
+            print(f'   {path:<18} 跳过: {r["skipped"]}')
+            continue
+        mem = r.get('memory') or {}
+        jitter = r.get('jitter_ms') or {}
+        print(f"   {path:<18} {r['max_rps']:>9} req/s | lag p50/p99 {jitter.get('p50')}/{jitter.get('p99')} ms"
+              f" | CPU {r['cpu_ms_per_req']} ms/req | RSS {mem.get('rss_mb_per_1k_in_flight', '-')} MB/1k 在途"
+              + (' | ⚠️ 替身已满载' if r.get('standin_bound') else ''))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='发压工具自测基准：对本地 mock 逐级加压，记录最大可持续速率并与基线比较')
+    parser.add_argument('--paths', default=','.join(PATHS), help=f'逗号分隔的路径（默认全部）：{",".join(PATHS)}')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件（默认 bench/baseline.json）')
+    parser.add_argument('--update-baseline', action='store_true', help='把本次结果写为新基线（不做回退检查）')
+    parser.add_argument('--require-baseline', action='store_true', default=default_require_baseline(),
+                        help='基线文件缺失时以非 0 退出（CI 用），默认 BENCH_REQUIRE_BASELINE=1 时开启')
+    parser.add_argument('--threshold', type=float, default=default_threshold(), help='吞吐回退阈值，默认 BENCH_REGRESSION_THRESHOLD 或 0.15')
+    parser.add_argument('--output', default=None, help='本次结果另存为 JSON 文件')
+    parser.add_argument('--start-rate', type=int, default=50, help='起始速率 req/s（默认 50）')
+    parser.add_argument('--growth', type=float, default=1.5, help='每级速率倍数（默认 1.5）')
+    parser.add_argument('--max-rate', type=int, default=20000, help='速率上限（默认 20000）')
+    parser.add_argument('--step-sec', type=int, default=3, help='每级持续秒数（默认 3）')
+    parser.add_argument('--refine', type=int, default=2, help='首次不可持续后的二分次数（默认 2）')
+    parser.add_argument('--lag-p99-ms', type=float, default=20.0, help='可持续判定：发出滞后 p99 上限（默认 20ms）')
+    parser.add_argument('--max-error-ratio', type=float, default=0.01, help='可持续判定：失败率上限（默认 0.01）')
+    parser.add_argument('--inflight-rate', type=int, default=500, help='内存测量时的速率（默认 500，0 表示不测）')
+    parser.add_argument('--inflight-latency-ms', type=int, default=1000, help='内存测量时替身的固定时延（默认 1000ms）')
+    parser.add_argument('--mock-processes', type=int, default=2, help='mock XBlock 进程数（默认 2）')
+    parser.add_argument('--import-budget-ms', type=float, default=default_import_budget_ms(),
+                        help='入口模块导入耗时上限，默认 BENCH_IMPORT_BUDGET_MS 或 500（0 表示只检查重依赖）')
+    parser.add_argument('--import-runs', type=int, default=3, help='每个入口模块的导入测量次数（默认 3，0 表示不测）')
+    parser.add_argument('--verbose', action='store_true', help='保留逐请求打印')
+    args = parser.parse_args()
+
+    paths = [p.strip() for p in args.paths.split(',') if p.strip()]
+    unknown = [p for p in paths if p not in PATHS]
+    if unknown:
+        print(f'[ERROR] 未知路径: {unknown}，可选: {list(PATHS)}')
+        sys.exit(2)
+
+    cfg = BenchConfig(args.start_rate, args.growth, args.max_rate, args.step_sec, args.refine,
+                      args.lag_p99_ms, args.max_error_ratio, args.inflight_rate, args.inflight_latency_ms,
+                      args.mock_processes, quiet=not args.verbose)
+    # 提币日志写到临时文件，不污染 log/send_txlog.json
+    import tempfile
+    with _env(SEND_TXLOG_PATH=os.path.join(tempfile.gettempdir(), 'xblock_selfbench_send_txlog.json')):
+        report = run_bench(paths, cfg, args.import_runs)
+    _print_summary(report)
+    # 导入检查与基线无关，超出上限或加载了重依赖时无论是否更新基线都以非 0 退出
+    import_failures = check_import_budget(report['imports'], args.import_budget_ms)
+    if import_failures:
+        print('❌ 导入耗时检查未通过：')
+        for r in import_failures:
+            print(f'   {r}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'🧾 结果已写入: {args.output}')
+
+    if args.update_baseline:
+        old = _load_json(args.baseline) or {}
+        merged = dict(report)
+        # 只更新本次跑过的路径，其余路径保留原基线
+        merged['paths'] = {**(old.get('paths') or {}), **report['paths']}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        print(f'📌 基线已更新: {args.baseline}')
+        sys.exit(1 if import_failures else 0)
+
+    baseline = _load_json(args.baseline)
+    if baseline is None:
+        if args.require_baseline:
+            print(f'[ERROR] 未找到基线 {args.baseline}（--require-baseline），请先在参考机器上用 --update-baseline 生成并提交')
+            sys.exit(1)
+        print(f'[WARN] 未找到基线 {args.baseline}，本次只记录结果（--update-baseline 可生成基线）')
+        sys.exit(1 if import_failures else 0)
+    regressions = compare_with_baseline(report['paths'], baseline, args.threshold)
+    if regressions:
+        print('❌ 吞吐回退超过阈值：')
+        for r in regressions:
+            print(f'   {r}')
+        sys.exit(1)
+    print(f'✅ 与基线相比无超过 {args.threshold:.0%} 的吞吐回退')
+    if import_failures:
+        sys.exit(1)
@@ -0,0 +1,95 @@
+import os
+import random
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    from common.histogram import LatencyHistogram
+except ModuleNotFoundError:
+    from histogram import LatencyHistogram  # type: ignore
+
+
+def default_sample_size() -> int:
+    """每类结果保留的样本数，RESULT_SAMPLE_SIZE 可覆盖，默认 20。"""
+    try:
+        return max(0, int(os.getenv('RESULT_SAMPLE_SIZE', '20')))
+    except Exception:
+        return 20
+
+
+class Reservoir:
+    """固定容量的蓄水池抽样（Algorithm R）：第 n 个元素以 k/n 的概率入选，任何时刻都是已见元素的均匀样本。"""
+
+    __slots__ = ('size', 'seen', 'items', '_rng')
+
+    def __init__(self, size: int, seed: Optional[int] = None):
+        self.size = max(0, int(size))
+        self.seen = 0
+        self.items: List[Any] = []
+        self._rng = random.Random(seed)
+
+    def slot(self) -> int:
+        """登记一个新元素，返回它应放入的位置；-1 表示未入选（调用方据此决定是否需要构造样本）。"""
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(None)
+            return len(self.items) - 1
+        j = self._rng.randrange(self.seen)
+        return j if j < self.size else -1
+
+
+class ResultAggregator:
+    """流式结果汇总：工作线程逐条推入轻量结果（成功与否、HTTP 状态、业务 code、耗时、响应体），
+    这里只累加计数与时延直方图，响应体只在被蓄水池抽中时才保留引用，因此内存占用与运行时长无关。"""
+
+    def __init__(self, sample_size: Optional[int] = None):
+        size = default_sample_size() if sample_size is None else sample_size
+        self.success = 0
+        self.failed = 0
+        self.by_status: Dict[str, int] = {}
+        self.by_code: Dict[str, int] = {}
+        self.latency = LatencyHistogram()
+        self.samples = Reservoir(size)
+        self.errors = Reservoir(size)
+        self._lock = threading.Lock()
+
+    def push(self, ok: bool,
+             status: Optional[int] = None,
+             code: Any = None,
+             latency: Optional[float] = None,
+             body: Any = None):
+        status_key = str(status) if status is not None else ('2xx' if ok else 'none')
+        code_key = str(code) if code is not None else '-'
+        with self._lock:
+            if ok:
+                self.success += 1
+            else:
+                self.failed += 1
+            self.by_status[status_key] = self.by_status.get(status_key, 0) + 1
+            self.by_code[code_key] = self.by_code.get(code_key, 0) + 1
+            if latency is not None:
+                self.latency.record(latency)
+            pool = self.samples if ok else self.errors
+            idx = pool.slot()
+            if idx >= 0:
+                pool.items[idx] = body
+
+    def sample_bodies(self) -> List[Any]:
+        with self._lock:
+            return list(self.samples.items)
+
+    def error_bodies(self) -> List[Any]:
+        with self._lock:
+            return list(self.errors.items)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "success": self.success,
+                "failed": self.failed,
+                "by_status": dict(self.by_status),
+                "by_code": dict(self.by_code),
+                "latency_ms": self.latency.summary(),
+                "samples": list(self.samples.items),
+                "errors": list(self.errors.items),
+            }
@@ -0,0 +1,347 @@
+import os
+import ssl
+import time
+import asyncio
+import importlib.util
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from common.getToken import normalize_proxies
+from common.proxy_manager import is_egress_error
+from common.scheduler import SecondBucket, requests_in_second, run_lag_summary, shard_count, tick_record
+from common.histogram import attach_latency, latency_recording, latency_slot, latency_views
+from common.metrics import live_run
+from common.config import RunConfig
+
+# 探测 aiohttp 支持（可选依赖：pip install aiohttp；SOCKS 代理另需 aiohttp-socks）
+# 这里只检查是否已安装，真正导入推迟到异步引擎启动时，线程引擎与充值场景不必承担 aiohttp 的导入耗时
+HAS_AIOHTTP = importlib.util.find_spec('aiohttp') is not None
+HAS_AIOHTTP_SOCKS = importlib.util.find_spec('aiohttp_socks') is not None
+
+ENGINE_THREAD = 'thread'
+ENGINE_ASYNC = 'async'
+
+
+def resolve_engine(engine: Optional[str] = None, config: Optional[RunConfig] = None) -> str:
+    """决定压测引擎：参数优先，其次运行配置的 engine（未给 config 时读环境变量 STRESS_ENGINE），默认 thread。
+    选择 async 但未安装 aiohttp 时回退到 thread。
+    """
+    fallback = config.engine if config is not None else os.getenv('STRESS_ENGINE')
+    name = (engine or fallback or ENGINE_THREAD).strip().lower()
+    if name == ENGINE_ASYNC:
+        if HAS_AIOHTTP:
+            return ENGINE_ASYNC
+        print('[WARN] 未安装 aiohttp，异步引擎不可用，回退到线程引擎（pip install aiohttp）')
+    return ENGINE_THREAD
+
+
+def default_max_in_flight() -> int:
+    """异步引擎的在途请求上限，可用 ASYNC_MAX_IN_FLIGHT 覆盖，默认 2000。"""
+    try:
+        return max(1, int(os.getenv('ASYNC_MAX_IN_FLIGHT', '2000')))
+    except Exception:
+        return 2000
+
+
+def build_ssl_option(verify_opt: object) -> Any:
+    """把 requests 风格的 verify（True/False/CA 路径）转换为 aiohttp 的 ssl 参数。"""
+    if verify_opt is False:
+        return False
+    if isinstance(verify_opt, str):
+        return ssl.create_default_context(cafile=verify_opt)
+    return ssl.create_default_context()
+
+
+class AsyncHttpClient:
+    """单事件循环内共享的 aiohttp 会话：复用代理/证书配置，并在后台滚动刷新 token。
+
+    token_fn 为同步函数（如 get_token_for_auth），只在线程池里调用，避免刷新时阻塞事件循环。
+    传入 proxy_manager（common.proxy_manager.ProxyManager）时每个请求由它选择出口，每个出口一个会话（独立连接池），
+    并把逐出口的状态码/错误/时延记回管理器；出口类错误只降级该代理，不重发请求。
+    传入 token_pool（common.getToken.TokenPool）时取代 token_fn：后台轮询池里每个账号的 token，
+    请求用 auth(vu) 分配账号，并把 account 传给 request_json，逐账号记录状态码；
+    收到 401 时标记该账号的 token 失效，并立刻唤醒后台轮询换用新 token，而不是等到下一个 token_poll_sec。
+    """
+
+    def __init__(self,
+                 proxies: Optional[Dict[str, str]],
+                 verify_opt: object,
+                 max_in_flight: int,
+                 timeout_s: float,
+                 token_fn: Optional[Callable[[], str]] = None,
+                 token_poll_sec: float = 1.0,
+                 proxy_manager: Any = None,
+                 token_pool: Any = None):
+        self.proxies = normalize_proxies(proxies or {})
+        self.verify_opt = verify_opt
+        self.max_in_flight = max_in_flight
+        self.timeout_s = timeout_s
+        self.token_fn = token_fn
+        self.token_poll_sec = token_poll_sec
+        self.proxy_manager = proxy_manager
+        self.token_pool = token_pool
+        self.token: Optional[str] = None
+        self.tokens: List[str] = []
+        self.session: Any = None
+        self.proxy_url: Optional[str] = None
+        self._egress: Dict[int, Tuple[Any, Optional[str]]] = {}
+        self._ssl_opt: Any = None
+        self._token_task: Optional[asyncio.Task] = None
+        self._token_wake: Optional[asyncio.Event] = None
+
+    def _build_connector(self, proxies: Dict[str, str]) -> Tuple[Any, Optional[str]]:
+        """返回 (connector, 请求时传给 aiohttp 的 proxy)；SOCKS 代理走 aiohttp-socks 的连接器。"""
+        import aiohttp  # type: ignore
+
+        if self._ssl_opt is None:
+            # 多个出口共用一个 SSL 上下文（加载 CA 较慢）
+            self._ssl_opt = build_ssl_option(self.verify_opt)
+        ssl_opt = self._ssl_opt
+        proxy = proxies.get('https') or proxies.get('http')
+        if proxy and proxy.startswith('socks5'):
+            if not HAS_AIOHTTP_SOCKS:
+                raise RuntimeError('异步引擎使用 SOCKS 代理需要安装 aiohttp-socks')
+            from aiohttp_socks import ProxyConnector  # type: ignore
+
+            # aiohttp-socks 不识别 socks5h，远端解析由 rdns=True 控制
+            return ProxyConnector.from_url(proxy.replace('socks5h://', 'socks5://'), rdns=True,
+                                           limit=self.max_in_flight, ssl=ssl_opt), None
+        return aiohttp.TCPConnector(limit=self.max_in_flight, ssl=ssl_opt), proxy
+
+    def _new_session(self, proxies: Dict[str, str]) -> Tuple[Any, Optional[str]]:
+        import aiohttp  # type: ignore
+
+        connector, proxy_url = self._build_connector(proxies)
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout_s)), proxy_url
+
+    def _egress_session(self, idx: int, proxies: Dict[str, str]) -> Tuple[Any, Optional[str]]:
+        # 出口的会话在首次用到时创建（分流/切换到新出口时）
+        entry = self._egress.get(idx)
+        if entry is None:
+            entry = self._egress[idx] = self._new_session(normalize_proxies(proxies))
+        return entry
+
+    async def _token_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._token_wake.wait(), self.token_poll_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._token_wake.clear()
+            try:
+                await self._load_tokens(loop)
+            except Exception as e:
+                print(f'[WARN] 后台刷新 token 失败: {e}')
+
+    async def _load_tokens(self, loop: asyncio.AbstractEventLoop):
+        if self.token_pool is not None:
+            pool = self.token_pool
+            self.tokens = await loop.run_in_executor(None, lambda: [pool.token(i) for i in range(len(pool))])
+            self.token = self.tokens[0]
+        else:
+            self.token = await loop.run_in_executor(None, self.token_fn)
+
+    def auth(self, vu: Optional[int] = None) -> Tuple[Optional[int], Optional[str]]:
+        """为一次请求分配账号，返回 (账号下标, token)；没有 token_pool 时为 (None, self.token)。"""
+        if self.token_pool is None:
+            return None, self.token
+        idx = self.token_pool.pick(vu)
+        return idx, self.tokens[idx]
+
+    async def __aenter__(self) -> 'AsyncHttpClient':
+        if self.token_fn is not None or self.token_pool is not None:
+            loop = asyncio.get_running_loop()
+            await self._load_tokens(loop)
+            self._token_wake = asyncio.Event()
+            self._token_task = asyncio.create_task(self._token_loop())
+        if self.proxy_manager is None:
+            self.session, self.proxy_url = self._new_session(self.proxies)
+        else:
+            # 预先为当前可用的出口建好会话（SSL 上下文加载较慢，不放到计时中的首个请求里）
+            for idx in self.proxy_manager.active_indices():
+                self._egress_session(idx, self.proxy_manager.candidates[idx])
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._token_task is not None:
+            self._token_task.cancel()
+        sessions = [self.session] if self.session is not None else []
+        sessions.extend(sess for sess, _ in self._egress.values())
+        for sess in sessions:
+            await sess.close()
+
+    async def _send(self, session: Any, proxy_url: Optional[str], method: str, url: str, tag: str,
+                    **kwargs) -> Tuple[str, dict, Optional[int], Optional[BaseException]]:
+        try:
+            async with session.request(method, url, proxy=proxy_url, allow_redirects=True, **kwargs) as resp:
+                if 200 <= resp.status < 300:
+                    try:
+                        data = await resp.json(content_type=None)
+                    except Exception:
+                        txt = (await resp.text())[:500]
+                        print(f"❌ [{tag}] 响应非 JSON: {txt}")
+                        return 'err', {"error": "non-json", "status": resp.status, "exc": "non-json"}, resp.status, None
+                    return 'ok', data, resp.status, None
+                print(f"❌ [{tag}] HTTP {resp.status}")
+                return 'err', {"error": f"HTTP {resp.status}", "status": resp.status}, resp.status, None
+        except Exception as e:
+            print(f"❌ [{tag}] 异常: {e!r}")
+            return 'err', {"error": str(e) or repr(e), "status": None, "exc": type(e).__name__}, None, e
+
+    async def request_json(self, method: str, url: str, tag: str, account: Optional[int] = None,
+                           **kwargs) -> Tuple[str, dict]:
+        """发起一次请求，返回与线程引擎一致的 ('ok', JSON) / ('err', {"error", "status", "exc"})。
+
+        account 为 auth() 分配的账号下标（请求头里用的是该账号的 token）。
+        """
+        pm = self.proxy_manager
+        token = self.tokens[account] if account is not None else self.token
+        if pm is None:
+            kind, data, status, exc = await self._send(self.session, self.proxy_url, method, url, tag, **kwargs)
+            self._account_result(account, token, status, exc)
+            return kind, data
+        idx, proxies = pm.select()
+        session, proxy_url = self._egress_session(idx, proxies)
+        pm.begin(idx)
+        t0 = time.perf_counter()
+        kind, data, status, exc = await self._send(session, proxy_url, method, url, tag, **kwargs)
+        pm.end(idx, time.perf_counter() - t0, status=status, error=exc is not None)
+        if exc is None:
+            pm.report_success(idx)
+        elif is_egress_error(exc):
+            pm.report_failure(idx, exc)
+        self._account_result(account, token, status, exc)
+        return kind, data
+
+    def _account_result(self, account: Optional[int], token: Optional[str], status: Optional[int],
+                        exc: Optional[BaseException]):
+        pool = self.token_pool
+        if pool is not None and account is not None:
+            pool.record(account, status=status, error=exc is not None)
+        if status == 401:
+            # 只做标记（不阻塞事件循环），新 token 由后台轮询在线程池里取回
+            if pool is not None:
+                pool.invalidate(token, account)
+            if self._token_wake is not None:
+                self._token_wake.set()
+
+
+async def _run_stages(stages: List[Tuple[float, int]],
+                      call: Callable[[AsyncHttpClient, int], Awaitable[Tuple[str, Any]]],
+                      client: AsyncHttpClient,
+                      on_result: Optional[Callable[[str, Any], None]],
+                      on_tick: Optional[Callable[[int, Dict[str, Any]], None]],
+                      start_at: Optional[float],
+                      shard: Optional[Tuple[int, int]],
+                      scenario: Optional[str] = None) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(client.max_in_flight)
+    stage_buckets: List[List[SecondBucket]] = []
+    in_flight = [0, 0]
+    pending: Set[asyncio.Task] = set()
+    clock = time.monotonic
+
+    async def run_one(seq: int, intended: float, bucket: SecondBucket, stage_idx: int):
+        async with sem:
+            lag = max(0.0, clock() - intended)
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+            bucket.issued += 1
+            bucket.lag_hist.record(lag)
+            try:
+                with latency_slot(stage_idx, bucket.sec_index):
+                    kind, payload = await call(client, seq)
+            except Exception as e:
+                kind, payload = 'err', {"error": str(e), "status": None}
+            in_flight[0] -= 1
+        if kind == 'ok':
+            bucket.success += 1
+        else:
+            bucket.failed += 1
+            if kind == 'bad':
+                bucket.rejected += 1
+        bucket.last_done = max(bucket.last_done, clock())
+        if on_result is not None:
+            try:
+                on_result(kind, payload)
+            except Exception as e:
+                print(f'[WARN] on_result 回调异常: {e}')
+
+    g = 0  # 全局序号（含其他分片）
+    issued = 0
+    scheduled_total = 0
+    with latency_recording() as recorder, live_run(scenario, ENGINE_ASYNC, stages, stage_buckets, in_flight, recorder, shard):
+        async with client:
+            if start_at is not None and start_at > time.time():
+                await asyncio.sleep(start_at - time.time())
+            t_stage = clock()
+            for stage_idx, (rate, duration) in enumerate(stages):
+                buckets: List[SecondBucket] = []
+                stage_buckets.append(buckets)
+                k = 0
+                for sec in range(duration):
+                    n = requests_in_second(rate, sec)
+                    mine = shard_count(g, g + n, shard)
+                    bucket = SecondBucket(sec + 1, t_stage + sec, mine)
+                    buckets.append(bucket)
+                    for _ in range(n):
+                        if shard is None or g % shard[1] == shard[0]:
+                            intended = t_stage + k / rate
+                            delay = intended - clock()
+                            if delay > 0:
+                                await asyncio.sleep(delay)
+                            t = asyncio.create_task(run_one(g, intended, bucket, stage_idx))
+                            pending.add(t)
+                            t.add_done_callback(pending.discard)
+                            issued += 1
+                        g += 1
+                        k += 1
+                    scheduled_total += mine
+                    # 本秒发完：各线程的逐秒时延直方图在下次记录时交给共享结构
+                    window = recorder.close_second()
+                    if on_tick is not None:
+                        on_tick(stage_idx, tick_record(bucket, window))
+                t_stage = t_stage + duration
+            if pending:
+                await asyncio.gather(*list(pending), return_exceptions=True)
+
+    result = {
+        "stages": [
+            {"rate": stages[i][0], "seconds": [b.to_dict() for b in buckets]}
+            for i, buckets in enumerate(stage_buckets)
+        ],
+        "schedule": {
+            "scheduled": scheduled_total,
+            "issued": issued,
+            "start_lag_ms": run_lag_summary(stage_buckets),
+            "max_in_flight": in_flight[1],
+            "max_workers": client.max_in_flight,
+            "engine": ENGINE_ASYNC,
+        },
+    }
+    attach_latency(result, latency_views(recorder))
+    return result
+
+
+def run_async_open_loop(stages: Sequence[Tuple[float, int]],
+                        call: Callable[[AsyncHttpClient, int], Awaitable[Tuple[str, Any]]],
+                        client: AsyncHttpClient,
+                        on_result: Optional[Callable[[str, Any], None]] = None,
+                        on_tick: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                        start_at: Optional[float] = None,
+                        shard: Optional[Tuple[int, int]] = None,
+                        scenario: Optional[str] = None) -> Dict[str, Any]:
+    """run_open_loop 的 asyncio 版本：单线程事件循环 + 有界信号量，返回结构与线程版一致。
+
+    Args:
+        stages: [(rate, duration_sec), ...]
+        call: 协程函数 call(client, seq) -> ('ok', payload) / ('err', payload)
+        client: AsyncHttpClient（在事件循环内打开/关闭）
+        start_at, shard, scenario: 同 run_open_loop
+    """
+    stages = [(float(r), int(d)) for r, d in stages]
+    for r, d in stages:
+        if r <= 0 or d <= 0:
+            raise ValueError('rate 和 duration_sec 必须为正数')
+    if not HAS_AIOHTTP:
+        raise RuntimeError('异步引擎需要安装 aiohttp')
+    return asyncio.run(_run_stages(stages, call, client, on_result, on_tick, start_at, shard, scenario))
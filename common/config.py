@@ -0,0 +1,309 @@
+import os
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# 运行配置快照：启动时从 key.env + 环境变量（以及命令行覆盖）解析一次，之后只读。
+# 请求路径上只读这个对象的属性，不再逐请求 load_dotenv / 读写 os.environ / 重新判定代理与证书。
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 探测 SOCKS 支持（决定代理候选里是否带上 SOCKS5h）
+try:
+    import socks  # type: ignore  # noqa: F401
+    HAS_SOCKS = True
+except Exception:
+    HAS_SOCKS = False
+
+
+def load_key_env(path: Optional[str] = None) -> Optional[str]:
+    """读取 key.env（默认项目根目录，其次当前目录），已存在的环境变量不会被覆盖；返回实际读取的文件。"""
+    try:
+        from dotenv import load_dotenv  # type: ignore
+    except Exception:
+        return None
+    for p in ([path] if path else [os.path.join(PROJECT_ROOT, 'key.env'), 'key.env']):
+        if p and os.path.exists(p):
+            load_dotenv(p)
+            return p
+    return None
+
+
+def _normalize_url(u: Optional[str]) -> Optional[str]:
+    if not u:
+        return None
+    u = u.strip()
+    if not u:
+        return None
+    if not (u.startswith('http://') or u.startswith('https://') or u.startswith('socks5://') or u.startswith('socks5h://')):
+        u = 'http://' + u
+    return u
+
+
+def _proxies_from_env() -> Optional[Dict[str, str]]:
+    """环境变量显式声明的代理：ALL_PROXY 优先，否则 HTTP_PROXY / HTTPS_PROXY；都为空返回 None。"""
+    http_env = _normalize_url(os.environ.get('HTTP_PROXY') or os.environ.get('http_proxy'))
+    https_env = _normalize_url(os.environ.get('HTTPS_PROXY') or os.environ.get('https_proxy'))
+    all_env = _normalize_url(os.environ.get('ALL_PROXY') or os.environ.get('all_proxy'))
+    if all_env:
+        return {'http': all_env, 'https': all_env}
+    proxies_env: Dict[str, str] = {}
+    if http_env:
+        proxies_env['http'] = http_env
+    if https_env:
+        proxies_env['https'] = https_env
+    return proxies_env or None
+
+
+def _proxy_candidates_from_env() -> List[Dict[str, str]]:
+    """代理候选：PROXY_DIRECT=1 时只直连；否则 HTTP(S)_PROXY/ALL_PROXY -> Clash 7890 -> SOCKS5h 7891（已安装 PySocks 时）。"""
+    if os.getenv('PROXY_DIRECT') == '1':
+        return [{}]
+    candidates: List[Dict[str, str]] = []
+    proxies_env = _proxies_from_env()
+    if proxies_env:
+        candidates.append(proxies_env)
+    candidates.append({'http': 'http://127.0.0.1:7890', 'https': 'http://127.0.0.1:7890'})
+    if HAS_SOCKS:
+        candidates.append({'http': 'socks5h://127.0.0.1:7891', 'https': 'socks5h://127.0.0.1:7891'})
+    return candidates
+
+
+def _verify_option_from_env() -> object:
+    """TLS 校验选项：存在的 CA 文件路径（PROXY_CA_BUNDLE/REQUESTS_CA_BUNDLE/SSL_CERT_FILE/CURL_CA_BUNDLE）>
+    DISABLE_TLS_VERIFY=1 时 False（仅调试用）> True。"""
+    for p in (os.getenv('PROXY_CA_BUNDLE'), os.getenv('REQUESTS_CA_BUNDLE'),
+              os.getenv('SSL_CERT_FILE'), os.getenv('CURL_CA_BUNDLE')):
+        if p and os.path.isfile(p):
+            print(f"[INFO] 使用证书文件进行 TLS 校验: {p}")
+            return p
+    if os.getenv('DISABLE_TLS_VERIFY') == '1':
+        print('[WARN] 已关闭 TLS 证书校验（仅用于调试，请尽快改回）')
+        try:
+            import urllib3  # type: ignore
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        except Exception:
+            pass
+        return False
+    return True
+
+
+def _int_env(name: str, default: Optional[int]) -> Optional[int]:
+    raw = os.getenv(name, '').strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except Exception:
+        return default
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _weights_env(name: str) -> Optional[List[float]]:
+    raw = os.getenv(name, '').strip()
+    if not raw:
+        return None
+    try:
+        return [float(w) for w in raw.split(',') if w.strip()]
+    except Exception:
+        print(f'[WARN] {name}={raw} 无法解析，忽略（格式如 3,1,1）')
+        return None
+
+
+_ACCOUNT_KEYS = ('username', 'password', 'client_id', 'client_secret', 'grant_type')
+
+
+def _accounts_from_file(name: str) -> Optional[List[Dict[str, str]]]:
+    """多账号凭据文件（路径取自环境变量 name）：JSON 数组 [{"username", "password", ...}]，
+    或每行 username,password[,client_id,client_secret,grant_type]（# 开头为注释）。未给出的字段沿用 API_*。"""
+    path = os.getenv(name, '').strip()
+    if not path:
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            text = fh.read()
+        if text.lstrip().startswith(('[', '{')):
+            raw = json.loads(text)
+            if isinstance(raw, dict):
+                raw = raw.get('accounts') or []
+            rows = [{k: str(a[k]) for k in _ACCOUNT_KEYS if a.get(k) not in (None, '')} for a in raw]
+        else:
+            rows = []
+            for line in text.splitlines():
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    rows.append({k: v.strip() for k, v in zip(_ACCOUNT_KEYS, line.split(',')) if v.strip()})
+        rows = [r for r in rows if r.get('username')]
+    except Exception as e:
+        print(f'[WARN] {name}={path} 读取失败，使用 API_USERNAME 单账号：{e}')
+        return None
+    if not rows:
+        print(f'[WARN] {name}={path} 中没有账号，使用 API_USERNAME 单账号')
+        return None
+    return rows
+
+
+class RunConfig:
+    """一次运行的只读配置。用 RunConfig.from_env() 构造，修改用 replace() 得到新对象。
+
+    字段：
+        base_url: XBLOCK_BASE_URL（空表示默认站点）
+        api_username / api_password / client_id / client_secret / grant_type: token 接口凭据（API_*）
+        jsessionid: JSESSIONID Cookie
+        token_refresh_interval: token 有效期兜底秒数（TOKEN_REFRESH_INTERVAL_SEC，默认 300；响应带 expires_in 时以其为准）
+        token_accounts: 多账号凭据（TOKEN_ACCOUNTS_FILE 指向的文件，见 _accounts_from_file；空表示只用 API_* 单账号）
+        token_assign: 请求分配账号的方式（TOKEN_ACCOUNT_ASSIGN：round_robin 轮询 / vu 按虚拟用户 ID，即全局请求序号取模）
+        token_refresh_ratio / token_refresh_jitter: 后台在有效期的多少比例处续期（TOKEN_REFRESH_RATIO，默认 0.8）
+            与随机提前量占有效期的比例（TOKEN_REFRESH_JITTER，默认 0.1），见 common.getToken.TokenRefresher
+        verify: requests 的 verify（True / False / CA 路径）
+        proxies: 环境变量显式声明的代理（HTTP(S)_PROXY / ALL_PROXY，未设置为 None），链上 JSON-RPC 直接使用，不参与候选探测
+        proxy_candidates: 代理候选元组（每项为 {'http', 'https'} 字典）
+        proxy_health_ttl: 代理探测结果缓存秒数（PROXY_HEALTH_TTL_SEC，默认 300，见 common.proxy_manager）
+        proxy_backoff_base / proxy_backoff_max: 出口失败的代理退避起始/上限秒数（PROXY_BACKOFF_BASE_SEC 5、PROXY_BACKOFF_MAX_SEC 300）
+        proxy_probe_timeout: 单个代理探测超时秒数（PROXY_PROBE_TIMEOUT，默认 5）
+        proxy_spread: 多出口分流模式（PROXY_SPREAD：single / round_robin / weighted / least_inflight，默认 single）
+        proxy_weights: weighted 模式下各候选的权重元组（PROXY_WEIGHTS，如 3,1,1；缺省为 1）
+        getaddr_timeout / sendtx_timeout: 地址 / 提币接口超时秒数（GETADDR_TIMEOUT 15、SENDTX_TIMEOUT 30）
+        addr_lock_time / addr_chain_name / addr_wallet_id: 地址接口默认查询参数（ADDR_*）
+        getaddr_max_workers: 批量取地址的线程数（GETADDR_MAX_WORKERS，默认 1）
+        wd_max_workers: 批量提币的线程数（WD_MAX_WORKERS，None 表示等于请求数）
+        business_validate / business_ok_codes: 是否按业务响应判定成功（BUSINESS_VALIDATE）与成功 code 集合（BUSINESS_OK_CODES）
+        engine: 地址/提币压测引擎（STRESS_ENGINE 或 --engine，None 表示 thread，见 common.async_engine.resolve_engine）
+        workers: 压测进程数（LOAD_WORKERS 或 --workers，None 表示 1）
+        agents: 分布式 agent 列表 host:port,host:port（LOAD_AGENTS 或 --agents，空表示不启用）
+        env_file: 实际读取的 key.env 路径
+    """
+
+    FIELDS: Tuple[str, ...] = (
+        'base_url', 'api_username', 'api_password', 'client_id', 'client_secret', 'grant_type',
+        'jsessionid', 'token_accounts', 'token_assign', 'token_refresh_interval', 'token_refresh_ratio', 'token_refresh_jitter', 'verify',
+        'proxies', 'proxy_candidates',
+        'proxy_health_ttl', 'proxy_backoff_base', 'proxy_backoff_max', 'proxy_probe_timeout',
+        'proxy_spread', 'proxy_weights',
+        'getaddr_timeout', 'sendtx_timeout', 'addr_lock_time', 'addr_chain_name', 'addr_wallet_id',
+        'getaddr_max_workers', 'wd_max_workers', 'business_validate', 'business_ok_codes',
+        'engine', 'workers', 'agents', 'env_file',
+    )
+    __slots__ = FIELDS
+
+    def __init__(self, **values: Any):
+        unknown = set(values) - set(self.FIELDS)
+        if unknown:
+            raise TypeError(f'RunConfig 不认识的字段: {sorted(unknown)}')
+        for name in self.FIELDS:
+            value = values.get(name)
+            if name == 'proxy_candidates':
+                value = tuple(dict(p) for p in (value or ({},)))
+            elif name == 'token_accounts':
+                value = tuple(dict(a) for a in value) if value else ()
+            elif name == 'proxies':
+                value = dict(value) if value else None
+            elif name == 'proxy_weights':
+                value = tuple(float(w) for w in value) if value else None
+            elif name == 'business_ok_codes':
+                value = frozenset(value or ('200',))
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError('RunConfig 为只读快照，请用 replace() 生成新配置')
+
+    def __repr__(self) -> str:
+        shown = {k: getattr(self, k) for k in self.FIELDS if k not in ('api_password', 'client_secret', 'jsessionid')}
+        shown['token_accounts'] = [a.get('username') for a in self.token_accounts]
+        return f'RunConfig({shown})'
+
+    @classmethod
+    def from_env(cls, env_file: Optional[str] = None, **overrides: Any) -> 'RunConfig':
+        """读取 key.env 与环境变量生成快照；overrides 为命令行等显式覆盖（字段名同上）。"""
+        loaded = load_key_env(env_file)
+        values: Dict[str, Any] = {
+            'base_url': (os.getenv('XBLOCK_BASE_URL') or '').strip().rstrip('/') or None,
+            'api_username': os.getenv('API_USERNAME', ''),
+            'api_password': os.getenv('API_PASSWORD', ''),
+            'client_id': os.getenv('API_CLIENT_ID', ''),
+            'client_secret': os.getenv('API_CLIENT_SECRET', ''),
+            'grant_type': os.getenv('API_GRANT_TYPE', ''),
+            'jsessionid': os.getenv('JSESSIONID') or None,
+            'token_accounts': _accounts_from_file('TOKEN_ACCOUNTS_FILE'),
+            'token_assign': (os.getenv('TOKEN_ACCOUNT_ASSIGN') or 'round_robin').strip().lower(),
+            'token_refresh_interval': _int_env('TOKEN_REFRESH_INTERVAL_SEC', 300),
+            'token_refresh_ratio': _float_env('TOKEN_REFRESH_RATIO', 0.8),
+            'token_refresh_jitter': _float_env('TOKEN_REFRESH_JITTER', 0.1),
+            'proxies': _proxies_from_env(),
+            'proxy_candidates': _proxy_candidates_from_env(),
+            'proxy_health_ttl': _float_env('PROXY_HEALTH_TTL_SEC', 300.0),
+            'proxy_backoff_base': _float_env('PROXY_BACKOFF_BASE_SEC', 5.0),
+            'proxy_backoff_max': _float_env('PROXY_BACKOFF_MAX_SEC', 300.0),
+            'proxy_probe_timeout': _float_env('PROXY_PROBE_TIMEOUT', 5.0),
+            'proxy_spread': (os.getenv('PROXY_SPREAD') or 'single').strip().lower(),
+            'proxy_weights': _weights_env('PROXY_WEIGHTS'),
+            'getaddr_timeout': _float_env('GETADDR_TIMEOUT', 15.0),
+            'sendtx_timeout': _float_env('SENDTX_TIMEOUT', 30.0),
+            'addr_lock_time': _int_env('ADDR_LOCK_TIME', 0),
+            'addr_chain_name': os.getenv('ADDR_CHAIN_NAME', 'BTT_TEST'),
+            'addr_wallet_id': _int_env('ADDR_WALLET_ID', 127),
+            'getaddr_max_workers': max(1, _int_env('GETADDR_MAX_WORKERS', 1) or 1),
+            'wd_max_workers': _int_env('WD_MAX_WORKERS', None),
+            'business_validate': os.getenv('BUSINESS_VALIDATE', '1') != '0',
+            'business_ok_codes': [c.strip() for c in os.getenv('BUSINESS_OK_CODES', '200').split(',') if c.strip()],
+            'engine': (os.getenv('STRESS_ENGINE') or '').strip().lower() or None,
+            'workers': _int_env('LOAD_WORKERS', None),
+            'agents': os.getenv('LOAD_AGENTS', '').strip(),
+            'env_file': loaded,
+        }
+        # verify 判定会打印所选模式，只在未显式覆盖时做一次
+        values['verify'] = overrides.pop('verify') if 'verify' in overrides else _verify_option_from_env()
+        values.update(overrides)
+        return cls(**values)
+
+    def __reduce__(self):
+        # 只读对象按字段重新构造，便于 pickle 给子进程
+        return (_restore_config, ({k: getattr(self, k) for k in self.FIELDS},))
+
+    def replace(self, **changes: Any) -> 'RunConfig':
+        values = {k: getattr(self, k) for k in self.FIELDS}
+        values.update(changes)
+        return RunConfig(**values)
+
+    def first_proxies(self) -> Dict[str, str]:
+        """首个代理候选（不逐请求遍历候选的场景使用，如开环压测与异步引擎）。"""
+        return dict(self.proxy_candidates[0]) if self.proxy_candidates else {}
+
+
+def _restore_config(values: Dict[str, Any]) -> RunConfig:
+    return RunConfig(**values)
+
+
+# 进程内当前生效的快照：main.py 启动时 set_config()，未设置时首次 get_config() 按环境生成
+_CURRENT: Optional[RunConfig] = None
+_CURRENT_LOCK = threading.Lock()
+
+
+def get_config() -> RunConfig:
+    """返回当前运行配置（首次调用时从 key.env / 环境变量生成并缓存）。"""
+    cfg = _CURRENT
+    if cfg is not None:
+        return cfg
+    return _init_config()
+
+
+def _init_config() -> RunConfig:
+    global _CURRENT
+    with _CURRENT_LOCK:
+        if _CURRENT is None:
+            _CURRENT = RunConfig.from_env()
+        return _CURRENT
+
+
+def set_config(cfg: Optional[RunConfig]) -> Optional[RunConfig]:
+    """安装新的运行配置并返回旧值；传 None 表示下次 get_config() 重新从环境生成。"""
+    global _CURRENT
+    with _CURRENT_LOCK:
+        old, _CURRENT = _CURRENT, cfg
+    return old
@@ -0,0 +1,373 @@
+import os
+import sys
+import json
+import hmac
+import time
+import socket
+import threading
+import socketserver
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 以脚本方式运行（python common/distributed.py agent ...）时保证能导入项目模块
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from common.multiproc import SCENARIOS, merge_shard_results, run_scenario_shard  # noqa: E402
+from common.scheduler import merge_second_records  # noqa: E402
+from common.config import RunConfig  # noqa: E402
+from common.histogram import LatencyHistogram  # noqa: E402
+
+# 协议：TCP 上逐行 JSON（每条消息一行）。
+#   controller -> agent: {"type": "hello", "token": <AGENT_TOKEN>}         agent -> {"type": "welcome"}（必须是第一条消息，否则断开）
+#   controller -> agent: {"type": "ping", "t": <controller 时间>}           agent -> {"type": "pong", "t": <agent 时间>}
+#   controller -> agent: {"type": "run", "scenario", "stages", "params", "start_at", "shard"}
+#   agent -> controller: {"type": "tick", "stage", "record"}（逐秒流式，record 含本秒计数、发出滞后与时延直方图 latency_hist） ... 最后 {"type": "result", "result"} 或 {"type": "error", "error"}
+
+DEFAULT_AGENT_PORT = 7070
+DEFAULT_AGENT_HOST = '127.0.0.1'
+HANDSHAKE_TIMEOUT_SEC = 10.0
+
+
+def agent_token() -> str:
+    """controller 与 agent 共享的口令（环境变量 AGENT_TOKEN，可写在 key.env）。"""
+    return (os.getenv('AGENT_TOKEN') or '').strip()
+
+
+def _same_address(a: Any, b: Any) -> bool:
+    return bool(a) and bool(b) and str(a).strip().lower() == str(b).strip().lower()
+
+
+def _same_amount(a: Any, b: Any) -> bool:
+    try:
+        return abs(float(a) - float(b)) < 1e-12
+    except (TypeError, ValueError):
+        return False
+
+
+def check_agent_params(scenario: str, params: Dict[str, Any]) -> Optional[str]:
+    """agent 侧校验 controller 下发的资金参数：收款地址与金额必须与本机配置一致，返回拒绝原因（None 表示通过）。
+
+    转账用的是本机 PRIVATE_KEY 与 XBlock 凭据，因此收款方与金额只认本机 key.env / 环境变量：
+    - recharge: target 必须等于 RECHARGE_TARGET_ADDRESS，amount_btt 必须等于 RECHARGE_AMOUNT_BTT（默认 0.007）；
+    - withdraw: payload.toAddress 必须等于 WD_TO_ADDRESS，payload.amount 必须等于 WD_AMOUNT（默认 7）。
+    """
+    if scenario == 'recharge':
+        local_target = os.getenv('RECHARGE_TARGET_ADDRESS', '').strip()
+        local_amount = os.getenv('RECHARGE_AMOUNT_BTT', '0.007')
+        if not local_target:
+            return '本机未设置 RECHARGE_TARGET_ADDRESS，拒绝执行充值任务'
+        if not _same_address(params.get('target'), local_target):
+            return f"充值收款地址 {params.get('target')} 与本机 RECHARGE_TARGET_ADDRESS 不一致"
+        if not _same_amount(params.get('amount_btt'), local_amount):
+            return f"充值金额 {params.get('amount_btt')} 与本机 RECHARGE_AMOUNT_BTT={local_amount} 不一致"
+    elif scenario == 'withdraw':
+        payload = params.get('payload') or {}
+        local_to = os.getenv('WD_TO_ADDRESS', '').strip()
+        local_amount = os.getenv('WD_AMOUNT', '7')
+        if not local_to:
+            return '本机未设置 WD_TO_ADDRESS，拒绝执行提币任务'
+        if not _same_address(payload.get('toAddress'), local_to):
+            return f"提币收款地址 {payload.get('toAddress')} 与本机 WD_TO_ADDRESS 不一致"
+        if not _same_amount(payload.get('amount'), local_amount):
+            return f"提币金额 {payload.get('amount')} 与本机 WD_AMOUNT={local_amount} 不一致"
+    return None
+
+
+def _send(wfile, msg: Dict[str, Any], lock: Optional[threading.Lock] = None):
+    line = (json.dumps(msg, ensure_ascii=False) + '\n').encode('utf-8')
+    if lock is None:
+        wfile.write(line)
+        wfile.flush()
+        return
+    with lock:
+        wfile.write(line)
+        wfile.flush()
+
+
+def _recv(rfile) -> Optional[Dict[str, Any]]:
+    line = rfile.readline()
+    if not line:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    """单个 controller 连接：先校验 AGENT_TOKEN，再应答对时请求，执行分片并把逐秒统计流式推回。"""
+
+    def _handshake(self, peer: str, write_lock: threading.Lock) -> bool:
+        # 未通过口令校验前不接受任何任务；握手设超时，避免空连接长期占用
+        self.request.settimeout(HANDSHAKE_TIMEOUT_SEC)
+        try:
+            msg = _recv(self.rfile)
+        except Exception:
+            msg = None
+        expected = self.server.token  # type: ignore[attr-defined]
+        token = str((msg or {}).get('token') or '')
+        if not msg or msg.get('type') != 'hello' or not hmac.compare_digest(token.encode(), expected.encode()):
+            print(f'[WARN] agent 拒绝未认证的连接（{peer}）')
+            try:
+                _send(self.wfile, {"type": "error", "error": '认证失败：AGENT_TOKEN 不匹配'}, write_lock)
+            except Exception:
+                pass
+            return False
+        self.request.settimeout(None)
+        _send(self.wfile, {"type": "welcome"}, write_lock)
+        return True
+
+    def handle(self):
+        peer = f'{self.client_address[0]}:{self.client_address[1]}'
+        write_lock = threading.Lock()
+        if not self._handshake(peer, write_lock):
+            return
+        while True:
+            try:
+                msg = _recv(self.rfile)
+            except Exception as e:
+                print(f'[WARN] agent 解析消息失败（{peer}）: {e}')
+                return
+            if msg is None:
+                return
+            kind = msg.get('type')
+            if kind == 'ping':
+                _send(self.wfile, {"type": "pong", "t": time.time()}, write_lock)
+            elif kind == 'run':
+                self._run(msg, peer, write_lock)
+            else:
+                _send(self.wfile, {"type": "error", "error": f'未知消息类型: {kind}'}, write_lock)
+
+    def _run(self, msg: Dict[str, Any], peer: str, write_lock: threading.Lock):
+        shard = tuple(msg['shard']) if msg.get('shard') else None
+        reason = check_agent_params(str(msg.get('scenario')), msg.get('params') or {})
+        if reason:
+            print(f'[WARN] agent 拒绝任务（{peer}）：{reason}')
+            _send(self.wfile, {"type": "error", "error": f'agent 拒绝任务：{reason}'}, write_lock)
+            return
+        print(f'🛰️ agent 收到任务（{peer}）：场景 {msg.get("scenario")}，分片 {shard}，'
+              f'起跑于 {time.strftime("%H:%M:%S", time.localtime(msg.get("start_at") or time.time()))}')
+
+        def on_tick(stage_idx: int, rec: Dict[str, Any]):
+            try:
+                _send(self.wfile, {"type": "tick", "stage": stage_idx, "record": rec}, write_lock)
+            except Exception:
+                pass
+
+        try:
+            result = run_scenario_shard(msg['scenario'], msg['stages'], msg.get('params') or {},
+                                        msg.get('start_at'), shard, on_tick=on_tick,
+                                        config=self.server.config)  # type: ignore[attr-defined]
+            _send(self.wfile, {"type": "result", "result": result}, write_lock)
+        except Exception as e:
+            _send(self.wfile, {"type": "error", "error": f'{type(e).__name__}: {e}'}, write_lock)
+
+
+class AgentServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host: str = DEFAULT_AGENT_HOST, port: int = DEFAULT_AGENT_PORT, token: Optional[str] = None,
+                 config: Optional[RunConfig] = None):
+        self.token = token if token is not None else agent_token()
+        # 分片按 agent 本机的运行配置执行（凭据、代理、站点地址不由 controller 下发）
+        self.config = config
+        if not self.token:
+            raise ValueError('agent 需要共享口令：请在 key.env 或环境变量中设置 AGENT_TOKEN（controller 端设置相同的值）')
+        super().__init__((host, port), _AgentHandler)
+
+
+def run_agent(host: str = DEFAULT_AGENT_HOST, port: int = DEFAULT_AGENT_PORT, token: Optional[str] = None,
+              config: Optional[RunConfig] = None):
+    """启动 agent（阻塞），等待 controller 下发任务。默认只监听本机，跨机器使用时显式指定 --host。"""
+    server = AgentServer(host, port, token, config)
+    print(f'🛰️ agent 已启动，监听 {host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def parse_agents(spec: str) -> List[Tuple[str, int]]:
+    """解析 'host1:port1,host2:port2'（端口缺省为 7070）。"""
+    out: List[Tuple[str, int]] = []
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(':') if ':' in item else (item, '', str(DEFAULT_AGENT_PORT))
+        out.append((host or item, int(port)))
+    return out
+
+
+class AgentConnection:
+    """controller 侧到单个 agent 的连接。"""
+
+    def __init__(self, host: str, port: int, timeout: float = 10.0, token: Optional[str] = None):
+        self.addr = f'{host}:{port}'
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.rfile = self.sock.makefile('rb')
+        self.wfile = self.sock.makefile('wb')
+        self.offset = 0.0   # agent 时钟 - controller 时钟（秒）
+        self.rtt = 0.0
+        try:
+            self._hello(token if token is not None else agent_token())
+        except Exception:
+            self.close()
+            raise
+        self.sock.settimeout(None)
+
+    def _hello(self, token: str):
+        if not token:
+            raise RuntimeError('未设置 AGENT_TOKEN，无法连接 agent（需与 agent 端一致）')
+        _send(self.wfile, {"type": "hello", "token": token})
+        reply = _recv(self.rfile)
+        if not reply or reply.get('type') != 'welcome':
+            raise RuntimeError(f"agent {self.addr} 认证失败: {(reply or {}).get('error') or '连接被关闭'}")
+
+    def sync_clock(self, rounds: int = 8) -> Tuple[float, float]:
+        """NTP 式对时：取往返时延最小的一次样本，offset = t_agent - (t_send + t_recv) / 2。"""
+        best: Optional[Tuple[float, float]] = None
+        for _ in range(max(1, rounds)):
+            t_send = time.time()
+            _send(self.wfile, {"type": "ping", "t": t_send})
+            reply = _recv(self.rfile)
+            t_recv = time.time()
+            if not reply or reply.get('type') != 'pong':
+                raise RuntimeError(f'agent {self.addr} 对时失败: {reply}')
+            rtt = t_recv - t_send
+            offset = float(reply['t']) - (t_send + t_recv) / 2.0
+            if best is None or rtt < best[1]:
+                best = (offset, rtt)
+        self.offset, self.rtt = best  # type: ignore[misc]
+        return self.offset, self.rtt
+
+    def close(self):
+        for f in (self.rfile, self.wfile, self.sock):
+            try:
+                f.close()
+            except Exception:
+                pass
+
+
+def default_start_delay() -> float:
+    """分布式统一起跑延迟（秒），DIST_START_DELAY_SEC 可覆盖，默认 10。"""
+    try:
+        return max(0.0, float(os.getenv('DIST_START_DELAY_SEC', '10')))
+    except Exception:
+        return 10.0
+
+
+def run_distributed(agents: Sequence[Tuple[str, int]],
+                    scenario: str,
+                    stages: Sequence[Tuple[float, int]],
+                    params: Dict[str, Any],
+                    start_delay: Optional[float] = None) -> Dict[str, Any]:
+    """把同一场景分片下发给多个 agent，对齐起跑时间，并合并逐秒统计。
+
+    与多进程模式相同，各 agent 按全局序号取模分片执行同一条调度，合计速率精确；
+    每个 agent 的起跑时间按对时得到的时钟偏差换算到 agent 本地时钟。
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError(f'未知场景: {scenario}（可选 {", ".join(SCENARIOS)}）')
+    if not agents:
+        raise ValueError('至少需要一个 agent')
+    stages = [(float(r), int(d)) for r, d in stages]
+    n = len(agents)
+
+    conns: List[AgentConnection] = []
+    try:
+        for host, port in agents:
+            conn = AgentConnection(host, port)
+            conns.append(conn)
+            offset, rtt = conn.sync_clock()
+            print(f'🔗 已连接 agent {conn.addr}：时钟偏差 {offset * 1000:.2f} ms，RTT {rtt * 1000:.2f} ms')
+
+        start_at = time.time() + (default_start_delay() if start_delay is None else start_delay)
+        print(f'🚦 分布式模式：{n} 个 agent，统一起跑于 {time.strftime("%H:%M:%S", time.localtime(start_at))}')
+
+        results: List[Optional[Dict[str, Any]]] = [None] * n
+        errors: List[str] = []
+        ticks: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+        ticks_lock = threading.Lock()
+
+        def drive(i: int, conn: AgentConnection):
+            _send(conn.wfile, {
+                "type": "run",
+                "scenario": scenario,
+                "stages": stages,
+                "params": params,
+                "start_at": start_at + conn.offset,
+                "shard": [i, n],
+            })
+            while True:
+                msg = _recv(conn.rfile)
+                if msg is None:
+                    errors.append(f'agent {conn.addr} 连接提前断开')
+                    return
+                kind = msg.get('type')
+                if kind == 'tick':
+                    key = (int(msg['stage']), int(msg['record']['sec_index']))
+                    with ticks_lock:
+                        recs = ticks.setdefault(key, [])
+                        recs.append(msg['record'])
+                        complete = len(recs) == n
+                    if complete:
+                        m = merge_second_records(recs)
+                        lat = ''.join(f"，{name} p99 {LatencyHistogram.from_dict(d).summary()['p99']} ms"
+                                      for name, d in sorted((m.get('latency_hist') or {}).items()))
+                        print(f"⏱️ [汇总] 阶段 {key[0] + 1} - 第 {key[1]} 秒 计划 {m['scheduled']}，已开始 {m['issued']}，"
+                              f"发出滞后 p99 {m['start_lag_ms']['p99']} ms{lat}")
+                elif kind == 'result':
+                    results[i] = msg['result']
+                    return
+                elif kind == 'error':
+                    errors.append(f"agent {conn.addr}: {msg.get('error')}")
+                    return
+
+        threads = [threading.Thread(target=drive, args=(i, c), daemon=True) for i, c in enumerate(conns)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        for c in conns:
+            c.close()
+
+    if errors:
+        raise RuntimeError('分布式压测失败：' + '；'.join(errors))
+    merged = merge_shard_results([r for r in results if r is not None])
+    merged['schedule']['agents'] = [
+        {"addr": c.addr, "clock_offset_ms": round(c.offset * 1000, 3), "rtt_ms": round(c.rtt * 1000, 3)}
+        for c in conns
+    ]
+    return merged
+
+
+def resolve_agents(agents: Optional[str] = None, config: Optional[RunConfig] = None) -> List[Tuple[str, int]]:
+    """agent 列表：参数优先，其次运行配置的 agents（未给 config 时读环境变量 LOAD_AGENTS，host:port,host:port），为空表示不启用分布式。"""
+    if agents is None:
+        agents = config.agents if config is not None else os.getenv('LOAD_AGENTS', '')
+    return parse_agents(agents or '')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='分布式压测 agent（controller 侧通过 main.py --agents 或 LOAD_AGENTS 使用）')
+    parser.add_argument('--host', default=DEFAULT_AGENT_HOST,
+                        help=f'监听地址，默认 {DEFAULT_AGENT_HOST}（仅本机）；供其他机器连接时指定内网地址或 0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_AGENT_PORT, help=f'监听端口，默认 {DEFAULT_AGENT_PORT}')
+    args = parser.parse_args()
+
+    try:
+        from dotenv import load_dotenv  # type: ignore
+        env_path = os.path.join(PROJECT_ROOT, 'key.env')
+        if os.path.exists(env_path):
+            load_dotenv(env_path)
+    except Exception:
+        pass
+
+    try:
+        run_agent(args.host, args.port, config=RunConfig.from_env())
+    except ValueError as e:
+        print(f'[ERROR] {e}')
+        sys.exit(2)
@@ -1,11 +1,26 @@
-import os
 import json
+import os
 import sys
-from typing import Dict, List, Optional, Tuple
+import random
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 import requests
 import time
 import threading
 
+try:
+    from common.config import RunConfig, get_config
+    from common.transport import current_session, xblock_url
+    from common.proxy_manager import get_proxy_manager
+    from common.histogram import record_latency, timed
+except ModuleNotFoundError:
+    # 以脚本方式运行 common/getToken.py 时
+    from config import RunConfig, get_config  # type: ignore
+    from transport import current_session, xblock_url  # type: ignore
+    from proxy_manager import get_proxy_manager  # type: ignore
+    from histogram import record_latency, timed  # type: ignore
+
 TOKEN_URL = 'https://xblock-test.charprotocol.com/api/security/oauth2/token'
 
 # 与你在 curl/浏览器一致的请求头（删掉了会干扰的 Accept-Encoding，其他保持相对保守）
@@ -27,21 +42,14 @@ BASE_HEADERS = {
 # 使用 multipart/form-data（等价 curl 的 -F），如需改为 x-www-form-urlencoded 将此置为 False
 USE_MULTIPART = True
 
-# 账户信息（可在 key.env 覆盖：API_USERNAME 等）
+# 账户信息默认值（key.env 中的 API_USERNAME 等优先，见 common.config.RunConfig）
 USERNAME = ''
 PASSWORD = ''
 CLIENT_ID = ''
 CLIENT_SECRET = ''
 GRANT_TYPE = ''
 
-# 探测 SOCKS 支持
-try:
-    import socks  # type: ignore
-    HAS_SOCKS = True
-except Exception:
-    HAS_SOCKS = False
-
-# 新增：token 缓存（按时间间隔自动刷新）
+# 新增：token 缓存（显式指定刷新间隔时使用；默认走 TokenRefresher 后台续期）
 _TOKEN_CACHE: Dict[str, Optional[str]] = {'value': None, 'ts': 0.0}
 _TOKEN_LOCK = threading.Lock()
 
@@ -68,151 +76,467 @@ def normalize_proxies(p: Dict[str, str]) -> Dict[str, str]:
     return out
 
 
-def build_proxy_candidates() -> List[Dict[str, str]]:
-    """构造代理候选列表：优先系统环境变量 -> Clash 常见端口 7890(HTTP)。若安装 PySocks 再尝试 SOCKS5h。"""
-    candidates: List[Dict[str, str]] = []
+def build_proxy_candidates(config: RunConfig) -> List[Dict[str, str]]:
+    """代理候选列表：优先系统环境变量 -> Clash 常见端口 7890(HTTP)。若安装 PySocks 再尝试 SOCKS5h。
 
-    # 1) 来自环境变量（去空格）
-    http_env = normalize_url(os.environ.get('HTTP_PROXY') or os.environ.get('http_proxy'))
-    https_env = normalize_url(os.environ.get('HTTPS_PROXY') or os.environ.get('https_proxy'))
-    all_env = normalize_url(os.environ.get('ALL_PROXY') or os.environ.get('all_proxy'))
-    if any([http_env, https_env, all_env]):
-        proxies_env: Dict[str, str] = {}
-        if all_env:
-            proxies_env = {'http': all_env, 'https': all_env}
-        else:
-            if http_env:
-                proxies_env['http'] = http_env
-            if https_env:
-                proxies_env['https'] = https_env
-        if proxies_env:
-            candidates.append(proxies_env)
-
-    # 2) Clash/Clash Verge 常见本地端口（HTTP 代理）
-    candidates.append({'http': 'http://127.0.0.1:7890', 'https': 'http://127.0.0.1:7890'})
-
-    # 3) SOCKS5h（仅当已安装 PySocks）
-    if HAS_SOCKS:
-        candidates.append({'http': 'socks5h://127.0.0.1:7891', 'https': 'socks5h://127.0.0.1:7891'})
-    else:
-        pass
-
-    return candidates
+    候选在运行配置快照生成时确定（见 common.config），这里返回其副本。
+    """
+    return [dict(p) for p in config.proxy_candidates]
 
 
-def build_payload() -> Tuple[Optional[Dict[str, tuple]], Optional[Dict[str, str]]]:
+def build_payload(config: Optional[RunConfig] = None) -> Tuple[Optional[Dict[str, tuple]], Optional[Dict[str, str]]]:
     """根据 USE_MULTIPART 选择 multipart/form-data 或 application/x-www-form-urlencoded 的负载。"""
+    cfg = config or get_config()
+    fields = {
+        'username': cfg.api_username or USERNAME,
+        'password': cfg.api_password or PASSWORD,
+        'client_id': cfg.client_id or CLIENT_ID,
+        'client_secret': cfg.client_secret or CLIENT_SECRET,
+        'grant_type': cfg.grant_type or GRANT_TYPE,
+    }
     if USE_MULTIPART:
-        files = {
-            'username': (None, USERNAME),
-            'password': (None, PASSWORD),
-            'client_id': (None, CLIENT_ID),
-            'client_secret': (None, CLIENT_SECRET),
-            'grant_type': (None, GRANT_TYPE),
-        }
-        return files, None
-    else:
-        data = {
-            'username': USERNAME,
-            'password': PASSWORD,
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'grant_type': GRANT_TYPE,
-        }
-        return None, data
-
-
-def get_verify_option() -> object:
+        return {k: (None, v) for k, v in fields.items()}, None
+    return None, fields
+
+
+def get_verify_option(config: RunConfig) -> object:
     """决定 requests 的 verify 参数：
     优先使用可用证书文件（REQUESTS_CA_BUNDLE/SSL_CERT_FILE/CURL_CA_BUNDLE/PROXY_CA_BUNDLE），
     若设置 DISABLE_TLS_VERIFY=1 则关闭校验（仅调试用）。
-    默认 True。
+    默认 True。结果在运行配置快照生成时确定一次。
     """
-    # 可由 key.env 提供自定义证书路径
-    custom_ca = os.getenv('PROXY_CA_BUNDLE')
-    env_cas = [
-        custom_ca,
-        os.getenv('REQUESTS_CA_BUNDLE'),
-        os.getenv('SSL_CERT_FILE'),
-        os.getenv('CURL_CA_BUNDLE'),
-    ]
-    for p in env_cas:
-        if p and os.path.isfile(p):
-            print(f"[INFO] 使用证书文件进行 TLS 校验: {p}")
-            return p
-    if os.getenv('DISABLE_TLS_VERIFY') == '1':
-        print('[WARN] 已关闭 TLS 证书校验（仅用于调试，请尽快改回）')
-        try:
-            import urllib3  # type: ignore
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        except Exception:
-            pass
-        return False
-    return True
+    return config.verify
 
 
-def try_fetch_token(session: requests.Session, proxies: Dict[str, str], verify_opt: object) -> requests.Response:
-    files, data = build_payload()
+def try_fetch_token(session: requests.Session, proxies: Dict[str, str], verify_opt: object,
+                    config: Optional[RunConfig] = None) -> requests.Response:
+    cfg = config or get_config()
+    files, data = build_payload(cfg)
     # 不强制 Content-Type，requests 会根据 files/data 正确设置
-    resp = session.post(
-        TOKEN_URL,
-        headers=BASE_HEADERS,
-        files=files,
-        data=data,
-        proxies=normalize_proxies(proxies),
-        timeout=30,
-        allow_redirects=True,
-        verify=verify_opt,
-    )
+    with timed('token'):
+        resp = session.post(
+            xblock_url(TOKEN_URL, cfg.base_url),
+            headers=BASE_HEADERS,
+            files=files,
+            data=data,
+            proxies=normalize_proxies(proxies),
+            timeout=30,
+            allow_redirects=True,
+            verify=verify_opt,
+        )
     return resp
 
 
+def fetch_token(config: Optional[RunConfig] = None) -> Tuple[str, Optional[float]]:
+    """请求一次 token，返回 (access_token, expires_in)；响应未带 expires_in 时后者为 None。抛出异常表示失败。
+
+    凭据、证书与代理候选都取自运行配置快照（默认 get_config()），不再每次读取 key.env。
+    出口代理由 common.proxy_manager 统一选择，不再逐个候选重试。
+    """
+    cfg = config or get_config()
+
+    # 压测运行中复用共享连接池，否则临时新建会话
+    session = current_session() or requests.Session()
+    verify_opt = cfg.verify
+
+    # 出口由代理管理器选择（启动时探测一次并缓存），出口失败时自动切换候选
+    resp = get_proxy_manager(cfg).call(lambda proxies: try_fetch_token(session, proxies, verify_opt, cfg))
+    if not resp.ok:
+        # 读取错误内容帮助定位
+        raise RuntimeError(f'获取 token 失败（HTTP {resp.status_code}）：{resp.text[:300]}')
+    data = resp.json()
+    inner = data.get('data') if isinstance(data.get('data'), dict) else {}
+    token = data.get('access_token') or data.get('token') or inner.get('access_token')
+    if not token:
+        raise RuntimeError('响应中未找到 access_token 字段')
+    expires_in = data.get('expires_in', inner.get('expires_in'))
+    try:
+        expires_in = float(expires_in) if expires_in is not None else None
+    except (TypeError, ValueError):
+        expires_in = None
+    return token, (expires_in if expires_in and expires_in > 0 else None)
+
+
 # 新增：供其他模块直接获取 token 的函数（无缓存，立即请求）
-def get_token() -> str:
+def get_token(config: Optional[RunConfig] = None) -> str:
     """获取 access_token 并返回字符串。抛出异常表示失败。"""
-    # 从 key.env 读取配置（如存在）
-    try:
-        from dotenv import load_dotenv  # type: ignore
-        if os.path.exists('key.env'):
-            load_dotenv('key.env')
-            global USERNAME, PASSWORD, CLIENT_ID, CLIENT_SECRET, GRANT_TYPE
-            USERNAME = os.getenv('API_USERNAME', USERNAME)
-            PASSWORD = os.getenv('API_PASSWORD', PASSWORD)
-            CLIENT_ID = os.getenv('API_CLIENT_ID', CLIENT_ID)
-            CLIENT_SECRET = os.getenv('API_CLIENT_SECRET', CLIENT_SECRET)
-            GRANT_TYPE = os.getenv('API_GRANT_TYPE', GRANT_TYPE)
-    except Exception:
-        pass
+    return fetch_token(config)[0]
 
-    session = requests.Session()
-    verify_opt = get_verify_option()
-    proxies_list = build_proxy_candidates()
 
-    last_error: Optional[Exception] = None
-    for proxies in proxies_list:
-        try:
-            resp = try_fetch_token(session, proxies, verify_opt)
-            if resp.ok:
-                data = resp.json()
-                token = data.get('access_token') or data.get('token') or data.get('data', {}).get('access_token')
-                if not token:
-                    raise RuntimeError('响应中未找到 access_token 字段')
-                return token
+class TokenRefresher:
+    """进程内共享的 token 后台续期器。
+
+    - 按响应的 expires_in（缺省取 token_refresh_interval）在有效期的 token_refresh_ratio 处续期，
+      再随机提前至多 token_refresh_jitter × 有效期，避免多进程/多机同一时刻集中换 token；
+    - 续期在后台守护线程中进行，新 token 就绪前请求路径继续使用旧 token；续期失败按退避重试；
+    - 请求收到 401 时调用 invalidate(旧 token)：并发的多个 401 只合并成一次强制刷新；
+    - 请求路径只有在没有可用 token（首次、已过期或已判定失效）时才会同步等待，
+      等待时长记为 token.stall 延迟（进入 latency_ms 与 /metrics）并计入 stats()。
+    """
+
+    RETRY_BASE_SEC = 1.0
+    RETRY_MAX_SEC = 30.0
+
+    def __init__(self, config: RunConfig):
+        self.config = config
+        self.ratio = min(max(float(config.token_refresh_ratio), 0.05), 1.0)
+        self.jitter = min(max(float(config.token_refresh_jitter), 0.0), self.ratio)
+        self.fallback_ttl = max(float(config.token_refresh_interval), 1.0)
+        self._value: Optional[str] = None
+        self._invalid: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._lifetime: Optional[float] = None
+        self._init_sync()
+        self.reset_stats()
+
+    def _init_sync(self):
+        """锁、唤醒事件与后台线程；fork 出的子进程里没有父进程的线程，按 pid 重新初始化。"""
+        self._pid = os.getpid()
+        self._fetch_lock = threading.Lock()
+        # 续期统计单独一把锁：请求路径（stall、invalidate）与后台线程并发累加，不能等在途的 token 请求
+        self._stats_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def reset_stats(self):
+        """清零续期统计（每轮运行开始时调用，统计只算本轮）。"""
+        with self._stats_lock:
+            self._stats: Dict[str, Any] = {
+                "refreshes": 0, "background": 0, "forced": 0, "sync": 0, "failures": 0,
+                "invalidations": 0, "stalls": 0, "stall_ms_total": 0.0, "stall_ms_max": 0.0,
+            }
+
+    def _usable(self, now: float) -> Optional[str]:
+        val = self._value
+        if val and val != self._invalid and now < self._expires_at:
+            return val
+        return None
+
+    def _fetch(self, kind: str) -> str:
+        """调用方需持有 _fetch_lock。请求新 token 并原子替换，同时排好下次续期时间。"""
+        token, expires_in = fetch_token(self.config)
+        lifetime = expires_in or self.fallback_ttl
+        now = time.time()
+        self._value = token
+        self._expires_at = now + lifetime
+        self._refresh_at = now + lifetime * self.ratio - random.uniform(0.0, lifetime * self.jitter)
+        self._lifetime = lifetime
+        with self._stats_lock:
+            self._stats['refreshes'] += 1
+            self._stats[kind] += 1
+        self._wake.set()  # 让后台线程按新的有效期重新排期
+        return token
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._fetch_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='token-refresher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        failures = 0
+        while True:
+            self._wake.clear()
+            now = time.time()
+            forced = self._value is not None and self._value == self._invalid
+            if self._value is None:
+                delay: Optional[float] = None  # 首次获取由请求路径完成
+            elif forced:
+                delay = 0.0
             else:
-                # 尝试读取错误内容帮助定位
-                _ = resp.text[:300]
-        except Exception as e:
-            last_error = e
-            continue
+                delay = self._refresh_at - now
+            if delay is None or delay > 0:
+                self._wake.wait(delay)
+                continue
+            try:
+                with self._fetch_lock:
+                    forced = self._value == self._invalid
+                    # 双重检查：请求路径可能已经刷新过
+                    if forced or time.time() >= self._refresh_at:
+                        self._fetch('forced' if forced else 'background')
+                failures = 0
+            except Exception as e:
+                failures += 1
+                with self._stats_lock:
+                    self._stats['failures'] += 1
+                backoff = min(self.RETRY_BASE_SEC * (2 ** min(failures - 1, 30)), self.RETRY_MAX_SEC)
+                print(f"[WARN] 后台刷新 token 失败（第 {failures} 次，{backoff:g}s 后重试，期间继续使用旧 token）：{e}")
+                self._wake.wait(backoff)
+
+    def token(self) -> str:
+        """返回当前可用的 token；只有没有可用 token 时才同步获取（合并并发请求，记为一次 stall）。"""
+        if self._pid != os.getpid():
+            self._init_sync()
+        self._ensure_thread()
+        val = self._usable(time.time())
+        if val:
+            return val
+        t0 = time.perf_counter()
+        with self._fetch_lock:
+            val = self._usable(time.time())
+            if not val:
+                val = self._fetch('forced' if self._value and self._value == self._invalid else 'sync')
+        dt = time.perf_counter() - t0
+        record_latency('token.stall', dt)
+        ms = dt * 1000.0
+        with self._stats_lock:
+            self._stats['stalls'] += 1
+            self._stats['stall_ms_total'] += ms
+            self._stats['stall_ms_max'] = max(self._stats['stall_ms_max'], ms)
+        return val
+
+    @property
+    def current(self) -> Optional[str]:
+        """当前缓存的 token（可能已过期或已失效，只用于比对）。"""
+        return self._value
+
+    def invalidate(self, bad_token: Optional[str]):
+        """标记 bad_token 失效并唤醒后台线程强制刷新（不阻塞；已换过或已标记的旧 token 忽略）。"""
+        with self._stats_lock:
+            # 检查与标记放在同一把锁里：同一个 token 的并发 401 只计一次失效
+            if not bad_token or bad_token != self._value or bad_token == self._invalid:
+                return
+            self._invalid = bad_token
+            self._stats['invalidations'] += 1
+        self._wake.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out = dict(self._stats)
+        out['stall_ms_total'] = round(out['stall_ms_total'], 3)
+        out['stall_ms_max'] = round(out['stall_ms_max'], 3)
+        out['lifetime_sec'] = self._lifetime
+        return out
+
+
+_REFRESH_COUNTERS = ('refreshes', 'background', 'forced', 'sync', 'failures', 'invalidations', 'stalls')
 
-    if last_error:
-        raise last_error
-    raise RuntimeError('获取 token 失败：代理尝试均未成功')
 
+def _merge_refresh_counters(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {k: sum(s.get(k, 0) for s in stats) for k in _REFRESH_COUNTERS}
+    merged['stall_ms_total'] = round(sum(s.get('stall_ms_total', 0.0) for s in stats), 3)
+    merged['stall_ms_max'] = max((s.get('stall_ms_max', 0.0) for s in stats), default=0.0)
+    return merged
 
-# 新增：带缓存与定时刷新（默认每 300s 可通过 TOKEN_REFRESH_INTERVAL_SEC 配置）
-def get_token_with_auto_refresh(refresh_interval_sec: Optional[int] = None) -> str:
-    interval = int(os.getenv('TOKEN_REFRESH_INTERVAL_SEC', str(refresh_interval_sec if refresh_interval_sec is not None else 300)))
+
+def merge_token_stats(stats: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """合并多个分片的 token 统计（次数与等待总时长求和，最大等待取最大值，逐账号计数按账号名相加）。"""
+    stats = [s for s in stats if s]
+    if not stats:
+        return None
+    merged = _merge_refresh_counters(stats)
+    merged['mode'] = stats[0].get('mode')
+    merged['accounts'] = stats[0].get('accounts')
+    merged['lifetime_sec'] = stats[0].get('lifetime_sec')
+    per_account: Dict[str, Dict[str, Any]] = {}
+    for s in stats:
+        for a in s.get('per_account') or []:
+            m = per_account.setdefault(a['account'], {"account": a['account'], "requests": 0, "errors": 0,
+                                                      "unauthorized": 0, "by_status": {}})
+            for k in ('requests', 'errors', 'unauthorized') + _REFRESH_COUNTERS:
+                m[k] = m.get(k, 0) + a.get(k, 0)
+            m['stall_ms_max'] = max(m.get('stall_ms_max', 0.0), a.get('stall_ms_max', 0.0))
+            for code, n in (a.get('by_status') or {}).items():
+                m['by_status'][code] = m['by_status'].get(code, 0) + n
+    if per_account:
+        merged['per_account'] = list(per_account.values())
+    return merged
+
+
+# 每组凭据对应一个续期器（进程内共享；配置没变时请求路径只比较一次对象身份）
+_REFRESHERS: Dict[Any, TokenRefresher] = {}
+_LAST: Tuple[Optional[RunConfig], Optional[TokenRefresher]] = (None, None)
+_REFRESHERS_LOCK = threading.Lock()
+
+
+def get_token_refresher(config: Optional[RunConfig] = None) -> TokenRefresher:
+    """返回运行配置（单个账号）对应的 token 续期器（后台线程在首次取 token 时启动）。"""
+    global _LAST
+    cfg = config or get_config()
+    last_cfg, last_tr = _LAST
+    if last_cfg is cfg and last_tr is not None:
+        return last_tr
+    key = (cfg.base_url, cfg.api_username, cfg.client_id, cfg.grant_type)
+    with _REFRESHERS_LOCK:
+        tr = _REFRESHERS.get(key)
+        if tr is None:
+            tr = TokenRefresher(cfg)
+            _REFRESHERS[key] = tr
+        _LAST = (cfg, tr)
+    return tr
+
+
+def _account_config(cfg: RunConfig, account: Dict[str, str]) -> RunConfig:
+    """单个账号的运行配置：凭据取自账号，未给出的字段沿用 API_*。"""
+    return cfg.replace(
+        api_username=account.get('username') or cfg.api_username,
+        api_password=account.get('password') or cfg.api_password,
+        client_id=account.get('client_id') or cfg.client_id,
+        client_secret=account.get('client_secret') or cfg.client_secret,
+        grant_type=account.get('grant_type') or cfg.grant_type,
+        token_accounts=(),
+    )
+
+
+class TokenPool:
+    """多账号 token 池：每个账号一个 TokenRefresher（各自缓存并在后台续期），请求按账号分摊。
+
+    - round_robin：进程内轮询；
+    - vu：按虚拟用户 ID（开环压测中为全局请求序号）取模，同一序号无论分到哪个进程/节点都用同一账号；
+    未配置 TOKEN_ACCOUNTS_FILE 时池里只有 API_* 一个账号，行为与单账号相同。
+    """
+
+    MODES = ('round_robin', 'vu')
+
+    def __init__(self, config: RunConfig):
+        self.config = config
+        mode = (config.token_assign or 'round_robin').lower()
+        if mode not in self.MODES:
+            print(f"[WARN] TOKEN_ACCOUNT_ASSIGN={mode} 无效（可选 {'/'.join(self.MODES)}），按 round_robin 处理")
+            mode = 'round_robin'
+        self.mode = mode
+        accounts = config.token_accounts or ({},)
+        self.configs = [_account_config(config, a) for a in accounts]
+        self.refreshers = [get_token_refresher(c) for c in self.configs]
+        self.labels = [c.api_username or f'#{i + 1}' for i, c in enumerate(self.configs)]
+        self._rr = itertools.count()
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def __len__(self) -> int:
+        return len(self.refreshers)
+
+    def pick(self, vu: Optional[int] = None) -> int:
+        n = len(self.refreshers)
+        if n == 1:
+            return 0
+        if self.mode == 'vu' and vu is not None:
+            return int(vu) % n
+        return next(self._rr) % n
+
+    def token(self, idx: int) -> str:
+        return self.refreshers[idx].token()
+
+    def acquire(self, vu: Optional[int] = None) -> Tuple[int, str]:
+        """为一次请求分配账号，返回 (账号下标, token)。"""
+        idx = self.pick(vu)
+        return idx, self.refreshers[idx].token()
+
+    def prefetch(self):
+        """压测开始前为所有账号各取一次 token（并发），避免首批请求逐个账号同步等待。"""
+        if len(self.refreshers) == 1:
+            self.refreshers[0].token()
+            return
+        with ThreadPoolExecutor(max_workers=min(16, len(self.refreshers))) as ex:
+            futures = [(label, ex.submit(r.token)) for label, r in zip(self.labels, self.refreshers)]
+        for label, fut in futures:
+            try:
+                fut.result()
+            except Exception as e:
+                raise RuntimeError(f'账号 {label} 获取 token 失败：{e}') from e
+        print(f'🔑 已为 {len(self.refreshers)} 个账号获取 token（分配方式 {self.mode}）')
+
+    def record(self, idx: int, status: Optional[int] = None, error: bool = False):
+        """记一次请求结果到账号 idx（状态码、传输错误）。"""
+        with self._stats_lock:
+            st = self._per_account[idx]
+            st['requests'] += 1
+            if error:
+                st['errors'] += 1
+            if status is not None:
+                st['by_status'][status] = st['by_status'].get(status, 0) + 1
+
+    def invalidate(self, bad_token: Optional[str], idx: Optional[int] = None):
+        """401 时调用：标记该 token 失效并触发所属账号的一次合并强制刷新（idx 未知时按 token 查找账号）。"""
+        if idx is None:
+            idx = next((i for i, r in enumerate(self.refreshers) if bad_token and r.current == bad_token), None)
+            if idx is None:
+                return
+        with self._stats_lock:
+            self._per_account[idx]['unauthorized'] += 1
+        self.refreshers[idx].invalidate(bad_token)
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._per_account = [{"requests": 0, "errors": 0, "unauthorized": 0, "by_status": {}}
+                                 for _ in self.refreshers]
+        for r in self.refreshers:
+            r.reset_stats()
+
+    def stats(self) -> Dict[str, Any]:
+        per_refresher = [r.stats() for r in self.refreshers]
+        out = _merge_refresh_counters(per_refresher)
+        out['mode'] = self.mode
+        out['accounts'] = len(self.refreshers)
+        out['lifetime_sec'] = per_refresher[0].get('lifetime_sec')
+        if len(self.refreshers) > 1:
+            with self._stats_lock:
+                out['per_account'] = [
+                    {"account": label, "requests": st['requests'], "errors": st['errors'],
+                     "unauthorized": st['unauthorized'], "by_status": dict(st['by_status']),
+                     **{k: rs.get(k, 0) for k in _REFRESH_COUNTERS + ('stall_ms_max',)}}
+                    for label, st, rs in zip(self.labels, self._per_account, per_refresher)
+                ]
+        return out
+
+
+_POOLS: Dict[Any, TokenPool] = {}
+_LAST_POOL: Tuple[Optional[RunConfig], Optional[TokenPool]] = (None, None)
+
+
+def get_token_pool(config: Optional[RunConfig] = None) -> TokenPool:
+    """返回运行配置对应的 token 池（进程内共享，账号与分配方式不变时复用）。"""
+    global _LAST_POOL
+    cfg = config or get_config()
+    last_cfg, last_pool = _LAST_POOL
+    if last_cfg is cfg and last_pool is not None:
+        return last_pool
+    key = (cfg.base_url, cfg.api_username, cfg.client_id, cfg.grant_type, cfg.token_assign,
+           tuple(tuple(sorted(a.items())) for a in cfg.token_accounts))
+    with _REFRESHERS_LOCK:
+        pool = _POOLS.get(key)
+    if pool is None:
+        # 建池时会通过 get_token_refresher 取锁，不能在持锁时构造
+        pool = TokenPool(cfg)
+        with _REFRESHERS_LOCK:
+            pool = _POOLS.setdefault(key, pool)
+    _LAST_POOL = (cfg, pool)
+    return pool
+
+
+def acquire_token(config: Optional[RunConfig] = None, vu: Optional[int] = None) -> Tuple[int, str]:
+    """从 token 池为一次请求分配账号，返回 (账号下标, token)；vu 为虚拟用户 ID（TOKEN_ACCOUNT_ASSIGN=vu 时生效）。"""
+    return get_token_pool(config).acquire(vu)
+
+
+def invalidate_token(bad_token: Optional[str], config: Optional[RunConfig] = None, account: Optional[int] = None):
+    """请求收到 401 时调用：标记该 token 失效，触发所属账号一次（合并的）强制刷新。"""
+    get_token_pool(config).invalidate(bad_token, account)
+
+
+def token_stats(config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """本轮 token 统计：各账号续期器的计数之和，多账号时附逐账号请求/401/状态码分布。"""
+    return get_token_pool(config).stats()
+
+
+def reset_token_stats(config: Optional[RunConfig] = None):
+    get_token_pool(config).reset_stats()
+
+
+def get_token_with_auto_refresh(refresh_interval_sec: Optional[int] = None, config: Optional[RunConfig] = None) -> str:
+    """返回可用 token（多账号时按 TOKEN_ACCOUNT_ASSIGN 轮询分配）。
+
+    refresh_interval_sec 为空时由 TokenRefresher 按 expires_in 在后台续期（请求路径通常不等待）；
+    显式传入时用第一个账号、沿用按固定间隔同步刷新的缓存（refresh_interval_sec=0 即每次都重新获取，自测用）。
+    """
+    cfg = config or get_config()
+    pool = get_token_pool(cfg)
+    if refresh_interval_sec is None:
+        return pool.acquire()[1]
+    interval = refresh_interval_sec
     now = time.time()
     val = _TOKEN_CACHE.get('value')
     ts = float(_TOKEN_CACHE.get('ts') or 0.0)
@@ -226,38 +550,27 @@ def get_token_with_auto_refresh(refresh_interval_sec: Optional[int] = None) -> s
         if val2 and (now2 - ts2) < interval:
             return val2
         # 重新获取并更新缓存
-        fresh = get_token()
+        fresh = get_token(pool.configs[0])
         _TOKEN_CACHE['value'] = fresh
         _TOKEN_CACHE['ts'] = time.time()
         return fresh
 
 
 def main():
-    # 可选：从 key.env 读取（若存在则覆盖上面的常量或提供 PROXY_CA_BUNDLE、DISABLE_TLS_VERIFY 等）
-    try:
-        from dotenv import load_dotenv  # type: ignore
-        if os.path.exists('key.env'):
-            load_dotenv('key.env')
-            global USERNAME, PASSWORD, CLIENT_ID, CLIENT_SECRET, GRANT_TYPE
-            USERNAME = os.getenv('API_USERNAME', USERNAME)
-            PASSWORD = os.getenv('API_PASSWORD', PASSWORD)
-            CLIENT_ID = os.getenv('API_CLIENT_ID', CLIENT_ID)
-            CLIENT_SECRET = os.getenv('API_CLIENT_SECRET', CLIENT_SECRET)
-            GRANT_TYPE = os.getenv('API_GRANT_TYPE', GRANT_TYPE)
-    except Exception:
-        pass
+    # 从 key.env 与环境变量生成本次运行的配置快照（凭据、PROXY_CA_BUNDLE、DISABLE_TLS_VERIFY 等）
+    cfg = RunConfig.from_env()
 
     session = requests.Session()
 
-    verify_opt = get_verify_option()
+    verify_opt = cfg.verify
     print(f"[INFO] TLS verify 模式: {verify_opt}")
 
-    proxies_list = build_proxy_candidates()
+    proxies_list = build_proxy_candidates(cfg)
     last_error = None
     for idx, proxies in enumerate(proxies_list, start=1):
         try:
             print(f"[INFO] 尝试使用代理 #{idx}: {proxies}")
-            resp = try_fetch_token(session, proxies, verify_opt)
+            resp = try_fetch_token(session, proxies, verify_opt, cfg)
             content_type = resp.headers.get('Content-Type', '')
             print(f"[INFO] HTTP {resp.status_code}, Content-Type: {content_type}")
 
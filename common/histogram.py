@@ -0,0 +1,330 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 对数-线性分桶（HDR 风格）：值以微秒计，< 128us 精确记录，其余每个 2 的幂区间再分 64 个子桶，
+# 相对误差 < 1.6%；桶数有上界（约 64 × 40），因此每个直方图占用的内存固定，合并只是按桶相加。
+_SUB_BITS = 7
+_LINEAR_MAX = 1 << _SUB_BITS
+
+
+def _bucket_index(us: int) -> int:
+    if us < _LINEAR_MAX:
+        return us
+    e = us.bit_length() - _SUB_BITS
+    return (e << _SUB_BITS) + (us >> e)
+
+
+def _bucket_upper(idx: int) -> int:
+    """桶内最大值（微秒），分位数按桶上界报告，偏保守。"""
+    if idx < _LINEAR_MAX:
+        return idx
+    e = idx >> _SUB_BITS
+    m = idx & (_LINEAR_MAX - 1)
+    return ((m + 1) << e) - 1
+
+
+class LatencyHistogram:
+    """可合并的固定内存时延直方图。"""
+
+    __slots__ = ('counts', 'total', 'sum_us', 'min_us', 'max_us')
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def record(self, seconds: float):
+        us = max(0, int(seconds * 1_000_000))
+        idx = _bucket_index(us)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.total += 1
+        self.sum_us += us
+        if self.min_us is None or us < self.min_us:
+            self.min_us = us
+        if us > self.max_us:
+            self.max_us = us
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        for idx, n in list(other.counts.items()):
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def percentile_us(self, pct: float) -> int:
+        if self.total == 0:
+            return 0
+        rank = max(1, int(-(-pct * self.total // 100)))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(_bucket_upper(idx), self.max_us)
+        return self.max_us
+
+    def cumulative_counts(self, bounds_us: List[int]) -> List[int]:
+        """各上界（微秒，升序）以内的累计样本数，按桶上界归入（供 Prometheus 直方图 le 桶使用）。"""
+        out = [0] * len(bounds_us)
+        for idx, n in list(self.counts.items()):
+            upper = _bucket_upper(idx)
+            for i, bound in enumerate(bounds_us):
+                if upper <= bound:
+                    out[i] += n
+        return out
+
+    def summary(self) -> Dict[str, float]:
+        """毫秒单位的汇总：count / mean / p50 / p90 / p99 / p999 / max。"""
+        if self.total == 0:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "p999": 0.0, "max": 0.0}
+        return {
+            "count": self.total,
+            "mean": round(self.sum_us / self.total / 1000.0, 3),
+            "p50": round(self.percentile_us(50) / 1000.0, 3),
+            "p90": round(self.percentile_us(90) / 1000.0, 3),
+            "p99": round(self.percentile_us(99) / 1000.0, 3),
+            "p999": round(self.percentile_us(99.9) / 1000.0, 3),
+            "max": round(self.max_us / 1000.0, 3),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """可 JSON 序列化的原始桶（跨进程/跨节点合并用）。"""
+        return {"c": {str(k): v for k, v in self.counts.items()}, "n": self.total, "s": self.sum_us,
+                "min": self.min_us, "max": self.max_us}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'LatencyHistogram':
+        h = cls()
+        h.counts = {int(k): int(v) for k, v in (d.get('c') or {}).items()}
+        h.total = int(d.get('n', 0))
+        h.sum_us = int(d.get('s', 0))
+        h.min_us = d.get('min')
+        h.max_us = int(d.get('max') or 0)
+        return h
+
+
+# 当前请求所属的 (阶段序号, 计划秒序号)，由调度器在执行任务前设置；未设置时只计入整轮统计
+_SLOT: contextvars.ContextVar[Optional[Tuple[int, int]]] = contextvars.ContextVar('latency_slot', default=None)
+
+
+def current_slot() -> Optional[Tuple[int, int]]:
+    """当前任务所属的 (阶段序号, 计划秒序号)；不在调度任务内时为 None。"""
+    return _SLOT.get()
+
+
+def _hist(per_name: Dict[str, LatencyHistogram], name: str) -> LatencyHistogram:
+    h = per_name.get(name)
+    if h is None:
+        h = per_name[name] = LatencyHistogram()
+    return h
+
+
+def _merge_into(dst: Dict[str, LatencyHistogram], src: Dict[str, LatencyHistogram]):
+    for name, h in list(src.items()):
+        _hist(dst, name).merge(h)
+
+
+class _ThreadStore:
+    """单个线程的直方图：按阶段滚动累计（None 为不在调度任务内的调用），
+    以及本代（上次 close_second 之后）按计划秒记下、尚未交给共享逐秒结构的部分。"""
+
+    __slots__ = ('stages', 'seconds', 'gen')
+
+    def __init__(self, gen: int):
+        self.stages: Dict[Optional[int], Dict[str, LatencyHistogram]] = {}
+        self.seconds: Dict[Tuple[int, int], Dict[str, LatencyHistogram]] = {}
+        self.gen = gen
+
+
+class LatencyRecorder:
+    """一次压测运行的时延记录器：每个线程写自己的直方图（热路径无全局锁），读取时再合并。
+
+    线程内只保留逐阶段的滚动直方图和当前这一秒的逐秒直方图；调度器每发完一个计划秒调用 close_second()，
+    各线程在下一次记录时把手上的逐秒直方图并入共享的逐秒结构（每个计划秒、每个名称一个直方图），
+    因此直方图个数不随线程数 × 秒数增长，snapshot()（实时指标每次抓取都会调用）只合并固定个数的直方图。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._stores: List[_ThreadStore] = []
+        self._seconds: Dict[Tuple[int, int], Dict[str, LatencyHistogram]] = {}
+        self._gen = 0
+        self._lock = threading.Lock()
+
+    def _store(self) -> _ThreadStore:
+        store = getattr(self._local, 'store', None)
+        if store is None:
+            with self._lock:
+                store = _ThreadStore(self._gen)
+                self._stores.append(store)
+            self._local.store = store
+        return store
+
+    def _fold(self, store: _ThreadStore):
+        """把本线程上一代的逐秒直方图并入共享结构（只由所属线程调用，每个计划秒至多一次）。"""
+        with self._lock:
+            batch, store.seconds = store.seconds, {}
+            store.gen = self._gen
+            for slot, per_name in batch.items():
+                _merge_into(self._seconds.setdefault(slot, {}), per_name)
+
+    def record(self, name: str, seconds: float):
+        store = self._store()
+        slot = _SLOT.get()
+        if slot is None:
+            _hist(store.stages.setdefault(None, {}), name).record(seconds)
+            return
+        if store.gen != self._gen:
+            self._fold(store)
+        _hist(store.stages.setdefault(slot[0], {}), name).record(seconds)
+        _hist(store.seconds.setdefault(slot, {}), name).record(seconds)
+
+    def close_second(self) -> Dict[str, LatencyHistogram]:
+        """调度器发完一个计划秒时调用：开始新的一代，返回上一代（约最近 1 秒）内完成的调用的直方图（逐秒流式上报用）。"""
+        window: Dict[str, LatencyHistogram] = {}
+        with self._lock:
+            for store in self._stores:
+                if store.gen == self._gen:
+                    for per_name in list(store.seconds.values()):
+                        _merge_into(window, per_name)
+            self._gen += 1
+        return window
+
+    def snapshot(self) -> Dict[Tuple[str, Optional[int]], LatencyHistogram]:
+        """按 (名称, 阶段序号) 合并各线程的滚动直方图；阶段序号 None 表示不在调度任务内的调用。"""
+        with self._lock:
+            stores = list(self._stores)
+        merged: Dict[Tuple[str, Optional[int]], LatencyHistogram] = {}
+        for store in stores:
+            for stage_idx, per_name in list(store.stages.items()):
+                for name, h in list(per_name.items()):
+                    merged.setdefault((name, stage_idx), LatencyHistogram()).merge(h)
+        return merged
+
+    def seconds_snapshot(self) -> Dict[Tuple[int, int], Dict[str, LatencyHistogram]]:
+        """逐计划秒的直方图：共享结构加上各线程尚未交出的部分（运行结束后调用）。"""
+        merged: Dict[Tuple[int, int], Dict[str, LatencyHistogram]] = {}
+        with self._lock:
+            for slot, per_name in self._seconds.items():
+                _merge_into(merged.setdefault(slot, {}), per_name)
+            for store in self._stores:
+                for slot, per_name in list(store.seconds.items()):
+                    _merge_into(merged.setdefault(slot, {}), per_name)
+        return merged
+
+
+_ACTIVE: Optional[LatencyRecorder] = None
+
+
+def record_latency(name: str, seconds: float):
+    """把一次调用耗时记入当前运行的记录器；没有运行中的记录器时直接忽略。"""
+    rec = _ACTIVE
+    if rec is not None:
+        rec.record(name, seconds)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """with timed('address'): ... —— 计时并记入当前运行（异常同样计时）。"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_latency(name, time.perf_counter() - t0)
+
+
+@contextmanager
+def latency_slot(stage_idx: int, sec_index: int) -> Iterator[None]:
+    token = _SLOT.set((stage_idx, sec_index))
+    try:
+        yield
+    finally:
+        _SLOT.reset(token)
+
+
+@contextmanager
+def latency_recording() -> Iterator[LatencyRecorder]:
+    """在 with 块内启用时延记录；嵌套时复用外层记录器。"""
+    global _ACTIVE
+    outer = _ACTIVE
+    if outer is not None:
+        yield outer
+        return
+    rec = LatencyRecorder()
+    _ACTIVE = rec
+    try:
+        yield rec
+    finally:
+        _ACTIVE = None
+
+
+def latency_views(rec: LatencyRecorder) -> Dict[str, Any]:
+    """按整轮 / 阶段 / 秒三个粒度整理原始直方图（可 JSON 序列化，供跨分片合并）。
+
+    Returns:
+        {"run": {name: hist}, "stages": {stage_idx: {name: hist}}, "seconds": {"stage:sec": {name: hist}}}
+    """
+    run: Dict[str, LatencyHistogram] = {}
+    stages: Dict[int, Dict[str, LatencyHistogram]] = {}
+    seconds: Dict[str, Dict[str, LatencyHistogram]] = {}
+    for (name, stage_idx), h in rec.snapshot().items():
+        run.setdefault(name, LatencyHistogram()).merge(h)
+        if stage_idx is not None:
+            stages.setdefault(stage_idx, {}).setdefault(name, LatencyHistogram()).merge(h)
+    for slot, per_name in rec.seconds_snapshot().items():
+        seconds[f'{slot[0]}:{slot[1]}'] = per_name
+    return {
+        "run": {n: h.to_dict() for n, h in run.items()},
+        "stages": {str(i): {n: h.to_dict() for n, h in d.items()} for i, d in stages.items()},
+        "seconds": {k: {n: h.to_dict() for n, h in d.items()} for k, d in seconds.items()},
+    }
+
+
+def merge_latency_views(views: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    out: Dict[str, Dict[str, Dict[str, LatencyHistogram]]] = {"run": {"": {}}, "stages": {}, "seconds": {}}
+    for v in views:
+        if not v:
+            continue
+        for n, d in v.get('run', {}).items():
+            out['run'][''].setdefault(n, LatencyHistogram()).merge(LatencyHistogram.from_dict(d))
+        for level in ('stages', 'seconds'):
+            for key, per_name in v.get(level, {}).items():
+                for n, d in per_name.items():
+                    out[level].setdefault(key, {}).setdefault(n, LatencyHistogram()).merge(LatencyHistogram.from_dict(d))
+    return {
+        "run": {n: h.to_dict() for n, h in out['run'][''].items()},
+        "stages": {k: {n: h.to_dict() for n, h in d.items()} for k, d in out['stages'].items()},
+        "seconds": {k: {n: h.to_dict() for n, h in d.items()} for k, d in out['seconds'].items()},
+    }
+
+
+def merge_hist_dicts(items: List[Optional[Dict[str, Any]]]) -> Dict[str, LatencyHistogram]:
+    """合并多份 {名称: to_dict()}（如各分片同一秒的 tick），返回 {名称: 直方图}。"""
+    out: Dict[str, LatencyHistogram] = {}
+    for per_name in items:
+        for n, d in (per_name or {}).items():
+            _hist(out, n).merge(LatencyHistogram.from_dict(d))
+    return out
+
+
+def _summaries(per_name: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    return {n: LatencyHistogram.from_dict(d).summary() for n, d in (per_name or {}).items()}
+
+
+def attach_latency(result: Dict[str, Any], views: Dict[str, Any]):
+    """把原始直方图换算为各粒度的分位数汇总，写入 run_open_loop 结构：
+    每秒记录与每个阶段加 "latency_ms"，schedule 加整轮 "latency_ms"；原始桶保存在 "latency_hist" 供再次合并。
+    """
+    result['latency_hist'] = views
+    for stage_idx, stage in enumerate(result.get('stages', [])):
+        stage['latency_ms'] = _summaries(views.get('stages', {}).get(str(stage_idx)))
+        for rec in stage.get('seconds', []):
+            rec['latency_ms'] = _summaries(views.get('seconds', {}).get(f"{stage_idx}:{rec['sec_index']}"))
+    result.setdefault('schedule', {})['latency_ms'] = _summaries(views.get('run'))
@@ -0,0 +1,268 @@
+import os
+import time
+import heapq
+import socket
+import threading
+import itertools
+import contextvars
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    from common.histogram import current_slot, record_latency
+except ModuleNotFoundError:
+    from histogram import current_slot, record_latency  # type: ignore
+
+# 分阶段耗时（秒）：
+#   dns / connect / proxy_connect / tls 只在新建连接时出现（keep-alive 复用时没有）；
+#   send 为写出请求，ttfb 为请求写完到响应头收齐，body 为响应头之后到 requests 返回（读响应体）。
+PHASES = ('dns', 'connect', 'proxy_connect', 'tls', 'send', 'ttfb', 'body')
+
+
+def http_timing_enabled() -> bool:
+    """HTTP_TIMING=1 时共享传输层按阶段计时（额外开销很小，但会多一层连接子类，默认关闭）。"""
+    return os.getenv('HTTP_TIMING', '0') == '1'
+
+
+def default_slowest_n() -> int:
+    """结果中保留的最慢请求样本数，HTTP_TIMING_SLOWEST 可覆盖，默认 20。"""
+    try:
+        return max(0, int(os.getenv('HTTP_TIMING_SLOWEST', '20')))
+    except Exception:
+        return 20
+
+
+class RequestTiming:
+    """单个请求（含重定向）的分阶段耗时累计。"""
+
+    __slots__ = ('method', 'url', 'phases', 'new_connections', 'headers_at')
+
+    def __init__(self, method: str, url: str):
+        self.method = method
+        self.url = url
+        self.phases: Dict[str, float] = {}
+        self.new_connections = 0
+        self.headers_at: Optional[float] = None
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + max(0.0, seconds)
+
+
+# 当前线程正在执行的请求；连接层的钩子据此把耗时记到对应请求上
+_CURRENT: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar('http_timing', default=None)
+
+
+class _TimedConnectionMixin:
+    """在 urllib3 连接的各步骤上计时：DNS 单独解析后再按 IP 建连，CONNECT 隧道与 TLS 握手分别计入。"""
+
+    def _new_conn(self):
+        timing = _CURRENT.get()
+        if timing is None:
+            return super()._new_conn()  # type: ignore[misc]
+        host = self._dns_host  # type: ignore[attr-defined]
+        t0 = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)  # type: ignore[attr-defined]
+        except OSError:
+            # 解析失败交给 urllib3 自己再解析一次，以便抛出原有的异常类型
+            return super()._new_conn()  # type: ignore[misc]
+        t1 = time.perf_counter()
+        timing.add('dns', t1 - t0)
+        # 按解析出的首个地址建连（_dns_host 只影响建连目标，TLS 的 SNI / 证书校验用的是后续恢复的主机名）
+        self._dns_host = infos[0][4][0]  # type: ignore[attr-defined]
+        try:
+            sock = super()._new_conn()  # type: ignore[misc]
+        finally:
+            self._dns_host = host  # type: ignore[attr-defined]
+        timing.add('connect', time.perf_counter() - t1)
+        return sock
+
+    def _tunnel(self):
+        timing = _CURRENT.get()
+        t0 = time.perf_counter()
+        try:
+            return super()._tunnel()  # type: ignore[misc]
+        finally:
+            if timing is not None:
+                timing.add('proxy_connect', time.perf_counter() - t0)
+
+    def connect(self):
+        timing = _CURRENT.get()
+        if timing is None:
+            return super().connect()  # type: ignore[misc]
+        before = sum(timing.phases.get(p, 0.0) for p in ('dns', 'connect', 'proxy_connect'))
+        t0 = time.perf_counter()
+        super().connect()  # type: ignore[misc]
+        elapsed = time.perf_counter() - t0
+        timing.new_connections += 1
+        if isinstance(self, HTTPSConnection):
+            # HTTPS 建连总耗时扣掉 DNS / TCP / CONNECT，剩下的就是 TLS 握手
+            after = sum(timing.phases.get(p, 0.0) for p in ('dns', 'connect', 'proxy_connect'))
+            timing.add('tls', elapsed - (after - before))
+
+    def request(self, *args, **kwargs):
+        timing = _CURRENT.get()
+        t0 = time.perf_counter()
+        try:
+            return super().request(*args, **kwargs)  # type: ignore[misc]
+        finally:
+            if timing is not None:
+                timing.add('send', time.perf_counter() - t0)
+
+    def getresponse(self, *args, **kwargs):
+        timing = _CURRENT.get()
+        t0 = time.perf_counter()
+        try:
+            return super().getresponse(*args, **kwargs)  # type: ignore[misc]
+        finally:
+            if timing is not None:
+                now = time.perf_counter()
+                timing.add('ttfb', now - t0)
+                timing.headers_at = now
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+_POOL_CLASSES = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+class TimingAdapter(HTTPAdapter):
+    """与 HTTPAdapter 相同，只是直连与经 HTTP 代理的连接池都换成计时连接。"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(_POOL_CLASSES)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if hasattr(manager, 'pool_classes_by_scheme') and not proxy.lower().startswith('socks'):
+            manager.pool_classes_by_scheme = dict(_POOL_CLASSES)
+        return manager
+
+
+class HttpTimingCollector:
+    """汇总分阶段耗时：每个阶段记入当前运行的时延直方图（名称 http.<阶段>，随每秒记录输出），
+    同时用小顶堆保留总耗时最长的 N 个请求及其分阶段明细。"""
+
+    def __init__(self, slowest_n: Optional[int] = None):
+        self.slowest_n = default_slowest_n() if slowest_n is None else max(0, int(slowest_n))
+        self._heap: List[Any] = []
+        self._tie = itertools.count()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def finish(self, timing: RequestTiming, total: float, end: float,
+               status: Optional[int], error: Optional[str], proxy: Optional[str]):
+        if timing.headers_at is not None:
+            timing.add('body', end - timing.headers_at)
+        for phase, sec in timing.phases.items():
+            record_latency(f'http.{phase}', sec)
+        record_latency('http.total', total)
+        with self._lock:
+            self.requests += 1
+            self.new_connections += timing.new_connections
+            if self.slowest_n <= 0 or (len(self._heap) >= self.slowest_n and total <= self._heap[0][0]):
+                return
+        slot = current_slot()
+        parts = urlsplit(timing.url)
+        sample = {
+            "total_ms": round(total * 1000, 3),
+            "method": timing.method,
+            "host": parts.netloc,
+            "path": parts.path,
+            "status": status,
+            "error": error,
+            "proxy": proxy,
+            "new_connections": timing.new_connections,
+            "phases_ms": {p: round(timing.phases[p] * 1000, 3) for p in PHASES if p in timing.phases},
+            "stage": slot[0] if slot else None,
+            "sec_index": slot[1] if slot else None,
+            "timestamp": round(time.time(), 3),
+        }
+        with self._lock:
+            item = (total, next(self._tie), sample)
+            if len(self._heap) < self.slowest_n:
+                heapq.heappush(self._heap, item)
+            elif total > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def reset(self):
+        with self._lock:
+            self._heap.clear()
+            self.requests = 0
+            self.new_connections = 0
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            slowest = [s for _, _, s in sorted(self._heap, key=lambda x: -x[0])]
+            return {"requests": self.requests, "new_connections": self.new_connections, "slowest": slowest}
+
+
+def _proxy_label(proxy: Optional[str]) -> Optional[str]:
+    """代理地址只保留 host:port（去掉 URL 里可能带的账号密码）。"""
+    if not proxy:
+        return None
+    parts = urlsplit(proxy if '://' in proxy else f'http://{proxy}')
+    return f'{parts.hostname}:{parts.port}' if parts.port else parts.hostname
+
+
+class TimedSession(requests.Session):
+    """每次请求在上下文里挂一个 RequestTiming，由计时连接填充各阶段，请求结束后交给收集器。"""
+
+    def __init__(self, collector: HttpTimingCollector):
+        super().__init__()
+        self.timing_collector = collector
+
+    def request(self, method, url, *args, **kwargs):
+        timing = RequestTiming(str(method).upper(), str(url))
+        token = _CURRENT.set(timing)
+        status: Optional[int] = None
+        error: Optional[str] = None
+        t0 = time.perf_counter()
+        try:
+            resp = super().request(method, url, *args, **kwargs)
+            status = resp.status_code
+            return resp
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            _CURRENT.reset(token)
+            proxies = kwargs.get('proxies') or self.proxies or {}
+            proxy = proxies.get(urlsplit(str(url)).scheme) if isinstance(proxies, dict) else None
+            self.timing_collector.finish(timing, end - t0, end, status, error, _proxy_label(proxy))
+
+
+def merge_timing_reports(reports: List[Optional[Dict[str, Any]]], slowest_n: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """合并多个分片的计时报告：计数求和，最慢样本取全局前 N。"""
+    reports = [r for r in reports if r]
+    if not reports:
+        return None
+    n = default_slowest_n() if slowest_n is None else slowest_n
+    slowest = sorted((s for r in reports for s in r.get('slowest', [])), key=lambda s: -s['total_ms'])[:n]
+    return {
+        "requests": sum(r.get('requests', 0) for r in reports),
+        "new_connections": sum(r.get('new_connections', 0) for r in reports),
+        "slowest": slowest,
+    }
@@ -0,0 +1,177 @@
+import os
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from common.histogram import LatencyHistogram, LatencyRecorder
+except ModuleNotFoundError:
+    from histogram import LatencyHistogram, LatencyRecorder  # type: ignore
+
+# Prometheus 直方图的 le 边界（秒）
+LATENCY_BUCKETS_SEC = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_BUCKETS_US = [int(b * 1_000_000) for b in LATENCY_BUCKETS_SEC]
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def metrics_port() -> int:
+    """METRICS_PORT 设为非 0 端口时在压测期间开放 /metrics；多进程模式下分片 i 使用 METRICS_PORT + i。"""
+    try:
+        return max(0, int(os.getenv('METRICS_PORT', '0')))
+    except Exception:
+        return 0
+
+
+class LiveRun:
+    """一次调度运行的实时视图：直接引用调度器自己的每秒统计、在途计数与时延记录器，抓取时现算，不给发压热路径加锁。"""
+
+    def __init__(self,
+                 scenario: str,
+                 engine: str,
+                 stages: Sequence[Tuple[float, int]],
+                 stage_buckets: List[List[Any]],
+                 in_flight: List[int],
+                 recorder: LatencyRecorder,
+                 shard: Optional[Tuple[int, int]] = None):
+        self.scenario = scenario
+        self.engine = engine
+        self.stages = list(stages)
+        self.stage_buckets = stage_buckets
+        self.in_flight = in_flight
+        self.recorder = recorder
+        self.shard = shard
+        self.finished = False
+
+    def _share(self) -> int:
+        return self.shard[1] if self.shard else 1
+
+    def render(self, openmetrics: bool = False) -> str:
+        labels = f'scenario="{self.scenario}",engine="{self.engine}"'
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            # Prometheus 文本格式里计数器的 TYPE 行带 _total 后缀，OpenMetrics 则不带
+            if kind == 'counter' and not openmetrics:
+                name += '_total'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        stage_rows = []
+        for stage_idx, buckets in enumerate(list(self.stage_buckets)):
+            buckets = list(buckets)
+            issued = sum(b.issued for b in buckets)
+            success = sum(b.success for b in buckets)
+            failed = sum(b.failed for b in buckets)
+            rejected = sum(b.rejected for b in buckets)
+            stage_rows.append((stage_idx, buckets, issued, success, failed, rejected))
+
+        family('xblock_requests_issued', 'counter', 'Requests started by the open-loop scheduler.')
+        for stage_idx, _, issued, _, _, _ in stage_rows:
+            lines.append(f'xblock_requests_issued_total{{{labels},stage="{stage_idx + 1}"}} {issued}')
+        family('xblock_requests', 'counter', 'Completed requests by outcome (rejected = HTTP 2xx failing business validation).')
+        for stage_idx, _, _, success, failed, rejected in stage_rows:
+            lines.append(f'xblock_requests_total{{{labels},stage="{stage_idx + 1}",outcome="success"}} {success}')
+            lines.append(f'xblock_requests_total{{{labels},stage="{stage_idx + 1}",outcome="rejected"}} {rejected}')
+            lines.append(f'xblock_requests_total{{{labels},stage="{stage_idx + 1}",outcome="failed"}} {failed - rejected}')
+
+        family('xblock_in_flight', 'gauge', 'Requests currently in flight.')
+        lines.append(f'xblock_in_flight{{{labels}}} {self.in_flight[0]}')
+        family('xblock_running', 'gauge', '1 while the run is in progress.')
+        lines.append(f'xblock_running{{{labels}}} {0 if self.finished else 1}')
+
+        if stage_rows and not self.finished:
+            stage_idx, buckets = stage_rows[-1][0], stage_rows[-1][1]
+            rate = self.stages[stage_idx][0] / self._share()
+            family('xblock_stage', 'gauge', 'Current stage number (1-based).')
+            lines.append(f'xblock_stage{{{labels}}} {stage_idx + 1}')
+            family('xblock_target_rate', 'gauge', 'Target arrival rate of the current stage for this process (req/s).')
+            lines.append(f'xblock_target_rate{{{labels},stage="{stage_idx + 1}"}} {rate:g}')
+            # 最近一个已发完的计划秒（最后一个桶还在发出中）；阶段第一秒内没有可用值
+            if len(buckets) >= 2:
+                family('xblock_achieved_rate', 'gauge', 'Requests started in the last completed scheduled second.')
+                lines.append(f'xblock_achieved_rate{{{labels},stage="{stage_idx + 1}"}} {buckets[-2].issued}')
+
+        per_key: Dict[Tuple[str, str], LatencyHistogram] = {}
+        for (name, stage_idx), h in self.recorder.snapshot().items():
+            stage = str(stage_idx + 1) if stage_idx is not None else ''
+            per_key.setdefault((name, stage), LatencyHistogram()).merge(h)
+        family('xblock_request_latency_seconds', 'histogram', 'Latency of timed calls by endpoint.')
+        for (name, stage), h in sorted(per_key.items()):
+            base = f'{labels},stage="{stage}",endpoint="{name}"'
+            for bound, count in zip(LATENCY_BUCKETS_SEC, h.cumulative_counts(_BUCKETS_US)):
+                lines.append(f'xblock_request_latency_seconds_bucket{{{base},le="{bound:g}"}} {count}')
+            lines.append(f'xblock_request_latency_seconds_bucket{{{base},le="+Inf"}} {h.total}')
+            lines.append(f'xblock_request_latency_seconds_sum{{{base}}} {h.sum_us / 1_000_000:.6f}')
+            lines.append(f'xblock_request_latency_seconds_count{{{base}}} {h.total}')
+
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+_RUN: Optional[LiveRun] = None
+_SERVER: Optional[ThreadingHTTPServer] = None
+_SERVER_LOCK = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in (self.headers.get('Accept') or '')
+        run = _RUN
+        body = (run.render(openmetrics) if run is not None else ('# EOF\n' if openmetrics else '')).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """在后台线程启动 /metrics（进程内只启动一次，之后的运行复用同一个端口）。"""
+    global _SERVER
+    with _SERVER_LOCK:
+        if _SERVER is not None:
+            return _SERVER
+        host = host or os.getenv('METRICS_HOST', '127.0.0.1')
+        try:
+            _SERVER = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            print(f'[WARN] 指标端口 {host}:{port} 启动失败: {e}')
+            return None
+        _SERVER.daemon_threads = True
+        threading.Thread(target=_SERVER.serve_forever, name='metrics-server', daemon=True).start()
+        print(f'📈 实时指标已开放：http://{host}:{port}/metrics')
+        return _SERVER
+
+
+@contextmanager
+def live_run(scenario: Optional[str],
+             engine: str,
+             stages: Sequence[Tuple[float, int]],
+             stage_buckets: List[List[Any]],
+             in_flight: List[int],
+             recorder: LatencyRecorder,
+             shard: Optional[Tuple[int, int]] = None) -> Iterator[Optional[LiveRun]]:
+    """调度器在运行期间登记实时视图；未配置 METRICS_PORT 时什么也不做。
+    运行结束后视图保留（xblock_running=0），直到下一次运行替换，便于抓取最终值。"""
+    global _RUN
+    port = metrics_port()
+    if port <= 0:
+        yield None
+        return
+    start_metrics_server(port + (shard[0] if shard else 0))
+    run = LiveRun(scenario or 'unknown', engine, stages, stage_buckets, in_flight, recorder, shard)
+    _RUN = run
+    try:
+        yield run
+    finally:
+        run.finished = True
@@ -0,0 +1,407 @@
+import os
+import sys
+import json
+import time
+import hmac
+import random
+import hashlib
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# 与真实站点一致的接口路径 → 端点名（端点名与 timed()/校验器使用的名字相同）
+ROUTES = {
+    ('POST', '/api/security/oauth2/token'): 'token',
+    ('GET', '/api/asset/member/wallet/deposit/address'): 'address',
+    ('POST', '/api/asset/member/wallet/send/tx'): 'withdraw',
+}
+ENDPOINTS = ('token', 'address', 'withdraw')
+
+DEFAULT_MOCK_PORT = 18080
+
+
+class LatencyModel:
+    """服务端处理耗时分布（毫秒），格式 `类型:参数`：
+
+    - fixed:20            固定 20ms
+    - uniform:10,50       10~50ms 均匀分布
+    - normal:30,5         均值 30、标准差 5（截断到 ≥0）
+    - lognormal:20,0.5    中位数 20、对数标准差 0.5（长尾）
+    - exp:20              均值 20 的指数分布
+    """
+
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal', 'exp')
+
+    def __init__(self, spec: str = 'fixed:0'):
+        kind, _, raw = spec.strip().partition(':')
+        kind = kind.strip().lower() or 'fixed'
+        if kind not in self.KINDS:
+            raise ValueError(f'未知的时延分布: {spec}')
+        params = [float(x) for x in raw.split(',') if x.strip()] if raw else []
+        need = 2 if kind in ('uniform', 'normal', 'lognormal') else 1
+        if len(params) < need:
+            if kind == 'fixed' and not params:
+                params = [0.0]
+            else:
+                raise ValueError(f'时延分布 {kind} 需要 {need} 个参数: {spec}')
+        self.kind = kind
+        self.params = params
+        self.spec = spec.strip()
+
+    def sample(self, rng: random.Random) -> float:
+        """返回一次采样（秒）。"""
+        p = self.params
+        if self.kind == 'fixed':
+            ms = p[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            ms = rng.gauss(p[0], p[1])
+        elif self.kind == 'lognormal':
+            ms = p[0] * rng.lognormvariate(0.0, p[1])
+        else:
+            ms = rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, ms) / 1000.0
+
+
+def parse_latency(spec: Optional[str]) -> Dict[str, LatencyModel]:
+    """解析时延配置：单个分布作用于全部端点，或 `token=fixed:50;address=lognormal:20,0.5` 按端点指定（`*` 为默认）。"""
+    models: Dict[str, LatencyModel] = {'*': LatencyModel()}
+    if not spec:
+        return models
+    for part in spec.split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        name, eq, rest = part.partition('=')
+        if eq and name.strip() in ENDPOINTS + ('*',):
+            models[name.strip()] = LatencyModel(rest)
+        else:
+            models['*'] = LatencyModel(part)
+    return models
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class MockConfig:
+    """mock 服务的故障注入参数，默认值来自 MOCK_* 环境变量（命令行参数可覆盖）。"""
+
+    def __init__(self,
+                 latency: Optional[str] = None,
+                 error_rate: float = 0.0,
+                 biz_error_rate: float = 0.0,
+                 rate_429: float = 0.0,
+                 rate_limit: float = 0.0,
+                 token_ttl: int = 300,
+                 seed: Optional[int] = None):
+        self.latency = parse_latency(latency)
+        self.error_rate = max(0.0, error_rate)
+        self.biz_error_rate = max(0.0, biz_error_rate)
+        self.rate_429 = max(0.0, rate_429)
+        self.rate_limit = max(0.0, rate_limit)
+        self.token_ttl = max(1, int(token_ttl))
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls) -> 'MockConfig':
+        return cls(
+            latency=os.getenv('MOCK_LATENCY'),
+            error_rate=_env_float('MOCK_ERROR_RATE', 0.0),
+            biz_error_rate=_env_float('MOCK_BIZ_ERROR_RATE', 0.0),
+            rate_429=_env_float('MOCK_429_RATE', 0.0),
+            rate_limit=_env_float('MOCK_RATE_LIMIT', 0.0),
+            token_ttl=int(_env_float('MOCK_TOKEN_TTL', 300)),
+        )
+
+    def latency_for(self, endpoint: str) -> LatencyModel:
+        return self.latency.get(endpoint) or self.latency['*']
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "latency": {k: v.spec or 'fixed:0' for k, v in self.latency.items()},
+            "error_rate": self.error_rate,
+            "biz_error_rate": self.biz_error_rate,
+            "rate_429": self.rate_429,
+            "rate_limit": self.rate_limit,
+            "token_ttl": self.token_ttl,
+        }
+
+
+class _TokenBucket:
+    """每个端点一个令牌桶，超过 rate（req/s）的请求返回 429。"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.ts = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+
+class MockXBlock:
+    """mock 的业务状态：签发/校验 token、分配地址与 assetSendId、按端点 × 状态计数。
+
+    token 为自校验格式（到期时间 + HMAC），多进程（SO_REUSEPORT）部署时任一进程签发的 token 其他进程都认；
+    地址与 assetSendId 按 shard 交错编号，多进程下同样全局唯一。
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, shard: Tuple[int, int] = (0, 1), secret: bytes = b'xblock-mock'):
+        self.config = config or MockConfig.from_env()
+        self.shard = shard
+        self.secret = secret
+        self.rng = random.Random(self.config.seed)
+        self.buckets = {name: _TokenBucket(self.config.rate_limit) for name in ENDPOINTS} if self.config.rate_limit > 0 else {}
+        self._seq = 0
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        return seq * self.shard[1] + self.shard[0]
+
+    def count(self, endpoint: str, status: int):
+        with self._lock:
+            key = (endpoint, status)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def issue_token(self) -> Dict[str, Any]:
+        expires_at = int((time.time() + self.config.token_ttl) * 1000)
+        nonce = self._next_id()
+        body = f'{expires_at}.{nonce}'
+        sig = hmac.new(self.secret, body.encode(), hashlib.sha256).hexdigest()[:32]
+        return {
+            "access_token": f'mock.{body}.{sig}',
+            "token_type": "bearer",
+            "refresh_token": f'mock-refresh.{nonce}',
+            "expires_in": self.config.token_ttl,
+            "scope": "server",
+        }
+
+    def check_token(self, authorization: Optional[str]) -> Optional[str]:
+        """返回 None 表示有效，否则返回 OAuth2 风格的错误描述。"""
+        if not authorization:
+            return 'Full authentication is required to access this resource'
+        scheme, _, token = authorization.strip().partition(' ')
+        if scheme.lower() != 'bearer' or not token.startswith('mock.'):
+            return f'Invalid access token: {token[:40]}'
+        try:
+            _, expires_at, nonce, sig = token.split('.')
+        except ValueError:
+            return f'Invalid access token: {token[:40]}'
+        expect = hmac.new(self.secret, f'{expires_at}.{nonce}'.encode(), hashlib.sha256).hexdigest()[:32]
+        if not hmac.compare_digest(sig, expect):
+            return f'Invalid access token: {token[:40]}'
+        if int(expires_at) < time.time() * 1000:
+            return f'Access token expired: {token[:40]}'
+        return None
+
+    def address(self, params: Dict[str, str]) -> Dict[str, Any]:
+        n = self._next_id()
+        return {
+            "address": '0x' + hashlib.sha256(f'addr-{n}'.encode()).hexdigest()[:40],
+            "chainName": params.get('chainName', 'BTT_TEST'),
+            "walletId": params.get('walletId'),
+            "lockTime": params.get('lockTime'),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            items = sorted(self._counts.items())
+        per_endpoint: Dict[str, Dict[str, int]] = {}
+        for (endpoint, status), n in items:
+            per_endpoint.setdefault(endpoint, {})[str(status)] = n
+        return {
+            "uptime_sec": round(time.time() - self.started, 3),
+            "shard": list(self.shard),
+            "requests": per_endpoint,
+            "total": sum(n for _, n in items),
+            "config": self.config.describe(),
+        }
+
+
+def _envelope(code: int, message: str, data: Any = None) -> Dict[str, Any]:
+    return {"code": code, "message": message, "timestamp": int(time.time() * 1000), "data": data}
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keep-alive，与真实站点一样可被客户端连接池复用
+    protocol_version = 'HTTP/1.1'
+    server_version = 'xblock-mock'
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length > 0 else b''
+
+    def _reply(self, endpoint: str, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        self.server.mock.count(endpoint, status)  # type: ignore[attr-defined]
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str):
+        mock: MockXBlock = self.server.mock  # type: ignore[attr-defined]
+        cfg = mock.config
+        parts = urlsplit(self.path)
+        raw = self._read_body()
+
+        if method == 'GET' and parts.path == '/__mock/stats':
+            self._reply('stats', 200, mock.stats())
+            return
+        if method == 'GET' and parts.path == '/':
+            # 站点根路径（连接预热用）
+            self._reply('root', 200, {"status": "ok"})
+            return
+        endpoint = ROUTES.get((method, parts.path))
+        if endpoint is None:
+            self._reply('unknown', 404, {"code": 404, "message": "Not Found", "path": parts.path})
+            return
+
+        delay = cfg.latency_for(endpoint).sample(mock.rng)
+        if delay > 0:
+            time.sleep(delay)
+
+        rng = mock.rng
+        bucket = mock.buckets.get(endpoint)
+        if (bucket is not None and not bucket.take()) or (cfg.rate_429 and rng.random() < cfg.rate_429):
+            self._reply(endpoint, 429, _envelope(429, 'Too Many Requests'), {'Retry-After': '1'})
+            return
+        if endpoint != 'token':
+            reason = mock.check_token(self.headers.get('authorization'))
+            if reason is not None:
+                self._reply(endpoint, 401, {"error": "invalid_token", "error_description": reason})
+                return
+        if cfg.error_rate and rng.random() < cfg.error_rate:
+            self._reply(endpoint, 500, _envelope(500, 'Internal Server Error'))
+            return
+        if cfg.biz_error_rate and rng.random() < cfg.biz_error_rate:
+            # HTTP 200 但业务失败（用于验证 goodput 统计）
+            self._reply(endpoint, 200, _envelope(500, '系统繁忙，请稍后重试'))
+            return
+
+        if endpoint == 'token':
+            self._reply(endpoint, 200, mock.issue_token())
+        elif endpoint == 'address':
+            params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            self._reply(endpoint, 200, _envelope(200, 'Success', mock.address(params)))
+        else:
+            try:
+                json.loads(raw or b'null')
+            except Exception:
+                self._reply(endpoint, 400, _envelope(400, 'JSON parse error'))
+                return
+            self._reply(endpoint, 200, _envelope(200, 'Success', {"assetSendId": mock._next_id()}))
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def log_message(self, *args):
+        pass
+
+
+class MockXBlockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, addr: Tuple[str, int], mock: MockXBlock, reuse_port: bool = False):
+        self.mock = mock
+        self.reuse_port = reuse_port
+        super().__init__(addr, _MockHandler)
+
+    def server_bind(self):
+        if self.reuse_port and hasattr(socket, 'SO_REUSEPORT'):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_mock_server(host: str = '127.0.0.1', port: int = 0, config: Optional[MockConfig] = None) -> MockXBlockServer:
+    """在后台线程启动 mock（port=0 取随机端口），返回的 server.url 可直接作为 XBLOCK_BASE_URL；用完调用 shutdown()。"""
+    server = MockXBlockServer((host, port), MockXBlock(config))
+    threading.Thread(target=server.serve_forever, name='mock-xblock', daemon=True).start()
+    return server
+
+
+def _serve_shard(host: str, port: int, config: MockConfig, shard: Tuple[int, int]):
+    server = MockXBlockServer((host, port), MockXBlock(config, shard), reuse_port=shard[1] > 1)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(host: str, port: int, config: MockConfig, processes: int = 1):
+    """前台运行 mock；processes > 1 时以 SO_REUSEPORT 起多个进程共享端口，避免 mock 先于被测工具成为瓶颈。"""
+    print(f'🧪 mock XBlock 已启动：http://{host}:{port} | 进程数: {processes}')
+    print(f'   配置: {json.dumps(config.describe(), ensure_ascii=False)}')
+    print(f'   使用: XBLOCK_BASE_URL=http://{host}:{port} PROXY_DIRECT=1 python main.py')
+    if processes <= 1:
+        _serve_shard(host, port, config, (0, 1))
+        return
+    import multiprocessing as mp
+    procs: List[Any] = []
+    for i in range(processes):
+        p = mp.Process(target=_serve_shard, args=(host, port, config, (i, processes)), daemon=True)
+        p.start()
+        procs.append(p)
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='本地 mock XBlock 服务（token / 充值地址 / 提币三个接口），用于离线压测发压工具本身')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址，默认 127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.getenv('MOCK_PORT', str(DEFAULT_MOCK_PORT))),
+                        help=f'监听端口，默认 MOCK_PORT 或 {DEFAULT_MOCK_PORT}')
+    parser.add_argument('--latency', default=os.getenv('MOCK_LATENCY'),
+                        help='时延分布，如 lognormal:20,0.5 或 token=fixed:50;address=uniform:5,15（默认 MOCK_LATENCY，不设则无延迟）')
+    parser.add_argument('--error-rate', type=float, default=_env_float('MOCK_ERROR_RATE', 0.0), help='HTTP 500 比例')
+    parser.add_argument('--biz-error-rate', type=float, default=_env_float('MOCK_BIZ_ERROR_RATE', 0.0), help='HTTP 200 但业务 code=500 的比例')
+    parser.add_argument('--rate-429', type=float, default=_env_float('MOCK_429_RATE', 0.0), help='随机返回 429 的比例')
+    parser.add_argument('--rate-limit', type=float, default=_env_float('MOCK_RATE_LIMIT', 0.0), help='每个端点每进程的限流 req/s，超出返回 429（0 不限流）')
+    parser.add_argument('--token-ttl', type=int, default=int(_env_float('MOCK_TOKEN_TTL', 300)), help='token 有效期（秒），过期后返回 401')
+    parser.add_argument('--processes', type=int, default=1, help='服务进程数（SO_REUSEPORT 共享端口）')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子（复现故障注入序列）')
+    args = parser.parse_args()
+
+    try:
+        cfg = MockConfig(args.latency, args.error_rate, args.biz_error_rate, args.rate_429, args.rate_limit, args.token_ttl, args.seed)
+    except ValueError as e:
+        print(f'[ERROR] {e}')
+        sys.exit(2)
+    serve(args.host, args.port, cfg, max(1, args.processes))
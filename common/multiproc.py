@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from common.scheduler import merge_schedule_results
+from common.transport import merge_transport_stats
+from common.proxy_manager import merge_proxy_stats
+from common.getToken import merge_token_stats
+from common.validation import merge_outcome_reports
+from common.config import RunConfig
+
+# 子进程以 spawn 方式启动时需要能导入项目根下的模块
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ('address', 'withdraw', 'recharge')
+
+
+def resolve_workers(workers: Optional[int] = None, config: Optional[RunConfig] = None) -> int:
+    """压测进程数：参数优先，其次运行配置的 workers（未给 config 时读环境变量 LOAD_WORKERS），默认 1（单进程）。"""
+    if workers is None and config is not None:
+        workers = config.workers
+    if workers is not None:
+        return max(1, int(workers))
+    if config is not None:
+        return 1
+    try:
+        return max(1, int(os.getenv('LOAD_WORKERS', '1')))
+    except Exception:
+        return 1
+
+
+def default_start_delay() -> float:
+    """协调方给出的统一起跑延迟（秒），需覆盖子进程导入与预热耗时，MP_START_DELAY_SEC 可覆盖，默认 5。"""
+    try:
+        return max(0.0, float(os.getenv('MP_START_DELAY_SEC', '5')))
+    except Exception:
+        return 5.0
+
+
+def run_scenario_shard(scenario: str,
+                       stages: Sequence[Tuple[float, int]],
+                       params: Dict[str, Any],
+                       start_at: Optional[float],
+                       shard: Optional[Tuple[int, int]],
+                       on_tick: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                       config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """在当前进程执行某个场景的一个分片，返回 run_open_loop 结构（附带 samples / records）。
+
+    多进程 worker 与分布式 agent 共用此入口；on_tick 为空时使用各场景默认的打印回调。
+    config 为运行配置：多进程时由协调方传入（子进程不再自行读取 key.env），agent 使用本机配置。
+    """
+    stages = [tuple(s) for s in stages]
+    if scenario == 'address':
+        from recharge.address_stress import run_address_stages
+        sched, samples = run_address_stages(
+            stages,
+            lock_time=params.get('lock_time'),
+            chain_name=params.get('chain_name'),
+            wallet_id=params.get('wallet_id'),
+            engine=params.get('engine'),
+            start_at=start_at,
+            shard=shard,
+            on_tick=on_tick,
+            config=config,
+        )
+        sched['samples'] = samples
+        return sched
+    if scenario == 'withdraw':
+        from withdrawal.sendTx import run_withdraw_stages
+        sched, samples = run_withdraw_stages(
+            stages,
+            params['payload'],
+            sample_cap=int(params.get('sample_cap', 20)),
+            engine=params.get('engine'),
+            start_at=start_at,
+            shard=shard,
+            on_tick=on_tick,
+            config=config,
+        )
+        sched['samples'] = samples
+        return sched
+    if scenario == 'recharge':
+        from recharge.recharge_stress import run_recharge_stages
+        # 日志由协调方统一写入，避免多个进程同时读改写 transfer_log.json
+        return run_recharge_stages(
+            stages,
+            params['target'],
+            float(params['amount_btt']),
+            base_nonce=params.get('base_nonce'),
+            start_at=start_at,
+            shard=shard,
+            write_log=False,
+            on_tick=on_tick,
+            config=config,
+        )
+    raise ValueError(f'未知场景: {scenario}（可选 {", ".join(SCENARIOS)}）')
+
+
+def _worker_entry(args: Tuple[str, List[Tuple[float, int]], Dict[str, Any], float, Tuple[int, int],
+                                Optional[RunConfig]]) -> Dict[str, Any]:
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    scenario, stages, params, start_at, shard, config = args
+    return run_scenario_shard(scenario, stages, params, start_at, shard, config=config)
+
+
+def merge_shard_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并各分片结果：逐秒统计按阶段对齐求和，样本与转账记录拼接。"""
+    merged = merge_schedule_results(results)
+    samples: List[Any] = []
+    for r in results:
+        samples.extend(r.get('samples') or [])
+    merged['samples'] = samples
+    if any('records' in r for r in results):
+        merged['records'] = {
+            "successful": [x for r in results for x in (r.get('records') or {}).get('successful', [])],
+            "failed": [x for r in results for x in (r.get('records') or {}).get('failed', [])],
+        }
+    if any(r.get('outcomes') for r in results):
+        merged['outcomes'] = merge_outcome_reports([r.get('outcomes') for r in results])
+    if any(r.get('transport') for r in results):
+        merged['transport'] = merge_transport_stats([r.get('transport') for r in results])
+    if any(r.get('proxy') for r in results):
+        merged['proxy'] = merge_proxy_stats([r.get('proxy') for r in results])
+    if any(r.get('token') for r in results):
+        merged['token'] = merge_token_stats([r.get('token') for r in results])
+    if any('senders' in r for r in results):
+        merged['senders'] = [x for r in results for x in (r.get('senders') or [])]
+    nonces = [r['schedule']['start_nonce'] for r in results if 'start_nonce' in r.get('schedule', {})]
+    if nonces:
+        merged['schedule']['start_nonce'] = min(nonces)
+        merged['schedule']['next_nonce'] = max(r['schedule']['next_nonce'] for r in results)
+    return merged
+
+
+def run_multiprocess(scenario: str,
+                     stages: Sequence[Tuple[float, int]],
+                     params: Dict[str, Any],
+                     workers: int,
+                     config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """启动 workers 个压测进程（各自独立的线程池/连接池）并合并结果。
+
+    协调方不按比例切分速率，而是把同一条全局开环调度按序号取模分给各进程（shard），
+    所以任意阶段、任意一秒内各进程发出的请求合计都恰好等于目标速率；
+    各进程在同一个墙上时间 start_at 起跑；config（运行配置快照）随任务 pickle 给各子进程。
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError(f'未知场景: {scenario}（可选 {", ".join(SCENARIOS)}）')
+    stages = [(float(r), int(d)) for r, d in stages]
+    start_at = time.time() + default_start_delay()
+    method = os.getenv('MP_START_METHOD') or None
+    mp_ctx = multiprocessing.get_context(method)
+    print(f'🧩 多进程模式：{workers} 个进程，统一起跑于 {time.strftime("%H:%M:%S", time.localtime(start_at))}')
+    jobs = [(scenario, stages, params, start_at, (i, workers), config) for i in range(workers)]
+    with mp_ctx.Pool(processes=workers) as pool:
+        results = pool.map(_worker_entry, jobs)
+    merged = merge_shard_results(results)
+    merged['schedule']['processes'] = workers
+    return merged
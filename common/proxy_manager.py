@@ -0,0 +1,429 @@
+import time
+import random
+import itertools
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+try:
+    from common.config import RunConfig, get_config
+    from common.transport import DEFAULT_PREWARM_URL, xblock_url
+    from common.histogram import record_latency
+except ModuleNotFoundError:
+    from config import RunConfig, get_config  # type: ignore
+    from transport import DEFAULT_PREWARM_URL, xblock_url  # type: ignore
+    from histogram import record_latency  # type: ignore
+
+# 代理出口管理：启动时探测一次（HEAD 站点根路径，不打业务接口、不计入压测负载），结果缓存 proxy_health_ttl 秒；
+# 请求路径上直接复用缓存的选择。出口类错误（连不上代理/目标、TLS 失败等）时把该代理按指数退避降级。
+#
+# 分流模式（PROXY_SPREAD）：
+#   single          只用第一个可用出口，失败时切到下一个候选（默认）
+#   round_robin     在所有可用出口间轮流
+#   weighted        按 PROXY_WEIGHTS 权重随机分配
+#   least_inflight  选当前在途请求最少的出口
+# 各出口的连接池相互独立（requests 按代理地址分池，异步引擎每个出口一个会话），
+# 逐出口的请求数、状态码、错误与时延（latency_ms 中的 proxy.<出口>）用来区分瓶颈在代理还是在 XBlock。
+
+SPREAD_SINGLE = 'single'
+SPREAD_MODES = (SPREAD_SINGLE, 'round_robin', 'weighted', 'least_inflight')
+
+# 异步引擎（aiohttp / aiohttp-socks）的出口类异常，按类名匹配以免在这里导入 aiohttp
+_ASYNC_EGRESS_ERRORS = frozenset({
+    'ClientConnectorError', 'ClientProxyConnectionError', 'ProxyConnectionError', 'ProxyError', 'ProxyTimeoutError',
+})
+
+
+def proxy_label(p: Dict[str, str]) -> str:
+    """代理的展示名（https 优先，其次 http，空字典为直连），去掉 URL 里可能带的账号密码。"""
+    url = p.get('https') or p.get('http')
+    if not url:
+        return 'direct'
+    parts = urlsplit(url if '://' in url else f'http://{url}')
+    host = f'{parts.hostname}:{parts.port}' if parts.port else (parts.hostname or '')
+    return f'{parts.scheme}://{host}'
+
+
+# urllib3 建连阶段的异常（请求尚未发出），按类名匹配（含 NameResolutionError 等子类）
+_CONNECT_PHASE_ERRORS = frozenset({'NewConnectionError', 'ConnectTimeoutError'})
+
+
+def _failed_before_send(exc: BaseException) -> bool:
+    """沿 requests -> urllib3 的包装链（args[0] / reason）查找建连阶段的异常。"""
+    cur: Optional[BaseException] = exc
+    for _ in range(6):
+        if cur is None:
+            return False
+        if any(c.__name__ in _CONNECT_PHASE_ERRORS for c in type(cur).__mro__):
+            return True
+        nxt = getattr(cur, 'reason', None)
+        if not isinstance(nxt, BaseException):
+            nxt = cur.args[0] if cur.args and isinstance(cur.args[0], BaseException) else None
+        cur = nxt
+    return False
+
+
+def is_egress_error(exc: BaseException) -> bool:
+    """是否为出口类错误：请求还没发出就失败（连不上代理、建连失败/超时、TLS 握手失败）。
+
+    只有这类错误会降级代理并换出口重试。连接中途断开（如 ProtocolError('Connection aborted',
+    RemoteDisconnected)）、读超时等请求体可能已送达服务端的错误不算，避免换代理重发造成重复提币。
+    """
+    if isinstance(exc, (requests.exceptions.ProxyError, requests.exceptions.SSLError,
+                        requests.exceptions.ConnectTimeout)):
+        return True
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return _failed_before_send(exc)
+    return any(c.__name__ in _ASYNC_EGRESS_ERRORS for c in type(exc).__mro__)
+
+
+class ProxyManager:
+    """一次运行内的代理出口选择：探测结果带 TTL 缓存，出口失败的候选按指数退避降级，可在多个出口间分流。"""
+
+    def __init__(self, candidates: Sequence[Dict[str, str]], verify_opt: object = True,
+                 probe_url: Optional[str] = None, ttl: float = 300.0,
+                 backoff_base: float = 5.0, backoff_max: float = 300.0, probe_timeout: float = 5.0,
+                 mode: str = SPREAD_SINGLE, weights: Optional[Sequence[float]] = None):
+        self.candidates: List[Dict[str, str]] = [dict(p) for p in candidates] or [{}]
+        self.labels = [proxy_label(p) for p in self.candidates]
+        self.verify_opt = verify_opt
+        self.probe_url = probe_url or DEFAULT_PREWARM_URL
+        self.ttl = max(0.0, float(ttl))
+        self.backoff_base = max(0.0, float(backoff_base))
+        self.backoff_max = max(self.backoff_base, float(backoff_max))
+        self.probe_timeout = float(probe_timeout)
+        if mode not in SPREAD_MODES:
+            print(f'[WARN] 未知的代理分流模式 {mode}，改用 {SPREAD_SINGLE}（可选 {", ".join(SPREAD_MODES)}）')
+            mode = SPREAD_SINGLE
+        self.mode = mode
+        w = list(weights or [])
+        self.weights = [max(0.0, float(w[i])) if i < len(w) else 1.0 for i in range(len(self.candidates))]
+        # healthy: None 表示未探测；down_until 为单调时钟，之前不会被选中
+        self._state: List[Dict[str, Any]] = [
+            {'healthy': None, 'failures': 0, 'down_until': 0.0, 'probe_ms': None,
+             'requests': 0, 'in_flight': 0, 'errors': 0, 'egress_errors': 0, 'by_status': {}}
+            for _ in self.candidates
+        ]
+        # _lock 保护选路与退避状态；_stats_lock 保护全部计数（可在持有 _lock 时获取，反之不行）
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._selected: Optional[int] = None
+        self._pool: List[int] = []  # 分流模式下参与分配的出口（探测可达的候选）
+        self._rr = itertools.count()
+        self._probed_at = 0.0
+        self.probes = 0
+        self.failovers = 0
+        self.demotions = 0
+
+    @classmethod
+    def from_config(cls, cfg: RunConfig) -> 'ProxyManager':
+        def _f(v: Optional[float], default: float) -> float:
+            return default if v is None else v
+        return cls(cfg.proxy_candidates, cfg.verify,
+                   probe_url=xblock_url(DEFAULT_PREWARM_URL, cfg.base_url),
+                   ttl=_f(cfg.proxy_health_ttl, 300.0),
+                   backoff_base=_f(cfg.proxy_backoff_base, 5.0),
+                   backoff_max=_f(cfg.proxy_backoff_max, 300.0),
+                   probe_timeout=_f(cfg.proxy_probe_timeout, 5.0),
+                   mode=cfg.proxy_spread or SPREAD_SINGLE,
+                   weights=cfg.proxy_weights)
+
+    @property
+    def spreading(self) -> bool:
+        return self.mode != SPREAD_SINGLE
+
+    def _probe_one(self, idx: int) -> bool:
+        p = self.candidates[idx]
+        st = self._state[idx]
+        sess = requests.Session()
+        sess.trust_env = False
+        t0 = time.perf_counter()
+        try:
+            # 只要拿到任意 HTTP 响应就说明出口可达（站点根路径可能不支持 HEAD）
+            resp = sess.head(self.probe_url, proxies=p, verify=self.verify_opt,
+                             timeout=self.probe_timeout, allow_redirects=False)
+            resp.close()
+            ok = True
+        except Exception as e:
+            print(f'[WARN] 代理 #{idx + 1} {self.labels[idx]} 探测失败: {e}')
+            ok = False
+        finally:
+            sess.close()
+        st['probe_ms'] = round((time.perf_counter() - t0) * 1000.0, 3)
+        st['healthy'] = ok
+        if ok:
+            st['failures'] = 0
+            st['down_until'] = 0.0
+        return ok
+
+    def _probe_locked(self):
+        """探测候选：single 模式按顺序选第一个可用的，分流模式探测全部；只有一个候选时无需探测。调用方持有锁。"""
+        with self._stats_lock:
+            self.probes += 1
+        healthy: List[int] = []
+        if len(self.candidates) == 1:
+            self._state[0]['healthy'] = True
+            healthy = [0]
+        else:
+            for idx in range(len(self.candidates)):
+                if self._probe_one(idx):
+                    healthy.append(idx)
+                    if not self.spreading:
+                        break
+        if not healthy:
+            # 都不可用时仍采用首个候选，让真实请求把错误详情带出来
+            healthy = [0]
+            print('[WARN] 未找到可用代理，将使用首个候选继续尝试')
+        chosen = healthy[0]
+        if self._selected is not None and chosen != self._selected and not self.spreading:
+            with self._stats_lock:
+                self.failovers += 1
+        if self.spreading:
+            if healthy != self._pool:
+                names = ', '.join(f'#{i + 1} {self.labels[i]}' for i in healthy)
+                print(f'[INFO] 代理分流（{self.mode}）: {names}')
+        elif self._selected != chosen:
+            print(f'[INFO] 使用代理 #{chosen + 1}: {self.labels[chosen]}')
+        self._pool = healthy
+        self._selected = chosen
+        self._probed_at = time.monotonic()
+
+    def _next_available(self, now: float, among: Optional[Sequence[int]] = None) -> int:
+        """不在退避期内的第一个候选；全部在退避期时取最早恢复的那个。"""
+        ids = list(among) if among else list(range(len(self._state)))
+        for idx in ids:
+            if self._state[idx]['down_until'] <= now:
+                return idx
+        return min(ids, key=lambda i: self._state[i]['down_until'])
+
+    def _ensure_probed(self, now: float):
+        """首次使用时同步探测；TTL 到期后在后台线程重新探测，请求继续用旧结果，不阻塞（也不阻塞异步引擎的事件循环）。"""
+        if self._selected is None:
+            with self._lock:
+                if self._selected is None:
+                    self._probe_locked()
+        elif now - self._probed_at >= self.ttl and self._lock.acquire(blocking=False):
+            threading.Thread(target=self._reprobe, name='proxy-reprobe', daemon=True).start()
+
+    def _reprobe(self):
+        # 锁由触发探测的线程获取，这里探测完成后释放
+        try:
+            if time.monotonic() - self._probed_at >= self.ttl:
+                self._probe_locked()
+        finally:
+            self._lock.release()
+
+    def _pick_spread(self, now: float) -> int:
+        avail = [i for i in self._pool if self._state[i]['down_until'] <= now]
+        if not avail:
+            return self._next_available(now, self._pool)
+        if len(avail) == 1:
+            return avail[0]
+        if self.mode == 'least_inflight':
+            # 从轮转位置开始比较，在途数相同时不总是落到第一个出口
+            start = next(self._rr) % len(avail)
+            return min(avail[start:] + avail[:start], key=lambda i: self._state[i]['in_flight'])
+        if self.mode == 'weighted':
+            weights = [self.weights[i] for i in avail]
+            if sum(weights) > 0:
+                return random.choices(avail, weights=weights)[0]
+        return avail[next(self._rr) % len(avail)]
+
+    def select(self) -> Tuple[int, Dict[str, str]]:
+        """返回本次请求使用的出口 (候选下标, proxies)。命中缓存时无锁直接返回。"""
+        now = time.monotonic()
+        self._ensure_probed(now)
+        if self.spreading:
+            idx = self._pick_spread(now)
+            return idx, self.candidates[idx]
+        idx = self._selected
+        if self._state[idx]['down_until'] <= now:  # type: ignore[index]
+            return idx, self.candidates[idx]  # type: ignore[index]
+        with self._lock:
+            # 选中的出口在退避期内：切到下一个可用候选
+            idx = self._selected
+            if self._state[idx]['down_until'] > now:  # type: ignore[index]
+                nxt = self._next_available(now)
+                if nxt != idx:
+                    with self._stats_lock:
+                        self.failovers += 1
+                    print(f'[WARN] 代理切换: #{idx + 1} -> #{nxt + 1} {self.labels[nxt]}')  # type: ignore[operator]
+                    self._selected = idx = nxt
+            return idx, self.candidates[idx]  # type: ignore[index]
+
+    def active_indices(self) -> List[int]:
+        """当前参与分配的出口下标（single 模式只有选中的一个）。"""
+        self._ensure_probed(time.monotonic())
+        return list(self._pool) if self.spreading else [self._selected or 0]
+
+    def active_proxies(self) -> List[Dict[str, str]]:
+        """当前参与分配的出口，用于预热各出口的连接池。"""
+        return [dict(self.candidates[i]) for i in self.active_indices()]
+
+    def report_failure(self, idx: int, exc: Optional[BaseException] = None):
+        """记录一次出口失败：连续失败 n 次的候选退避 base * 2^(n-1) 秒（不超过上限）。"""
+        with self._lock:
+            st = self._state[idx]
+            now = time.monotonic()
+            was_up = st['down_until'] <= now
+            st['failures'] += 1
+            failures = st['failures']
+            st['healthy'] = False
+            backoff = min(self.backoff_max, self.backoff_base * (2 ** min(failures - 1, 30)))
+            if now + backoff > st['down_until']:
+                st['down_until'] = now + backoff
+            with self._stats_lock:
+                st['egress_errors'] += 1
+                self.demotions += 1
+                if self.spreading and was_up and len(self._pool) > 1:
+                    # 分流模式下该出口暂时移出分配，其余出口承接它的流量
+                    self.failovers += 1
+        if failures == 1 or failures % 100 == 0:
+            print(f'[WARN] 代理 #{idx + 1} {self.labels[idx]} 出口失败（连续 {failures} 次），'
+                  f'退避 {backoff:g}s: {exc}')
+
+    def report_success(self, idx: int):
+        st = self._state[idx]
+        if st['failures'] or st['healthy'] is not True:
+            with self._lock:
+                st['failures'] = 0
+                st['healthy'] = True
+
+    def begin(self, idx: int):
+        """请求经出口 idx 发出（在途 +1）。与 end() 成对调用。"""
+        st = self._state[idx]
+        with self._stats_lock:
+            st['requests'] += 1
+            st['in_flight'] += 1
+
+    def end(self, idx: int, seconds: float, status: Optional[int] = None, error: bool = False):
+        """请求结束：记录状态码或异常；分流模式下耗时记入 latency_ms 的 proxy.<出口>。"""
+        st = self._state[idx]
+        with self._stats_lock:
+            st['in_flight'] -= 1
+            if error:
+                st['errors'] += 1
+            elif status is not None:
+                key = str(status)
+                st['by_status'][key] = st['by_status'].get(key, 0) + 1
+        if self.spreading:
+            record_latency(f'proxy.{self.labels[idx]}', seconds)
+
+    def reset_stats(self):
+        """清零逐出口的请求计数与切换/降级次数（每轮压测开始时调用；探测结果与退避状态保留）。"""
+        with self._stats_lock:
+            for st in self._state:
+                st['requests'] = 0
+                st['errors'] = 0
+                st['egress_errors'] = 0
+                st['by_status'] = {}
+            self.failovers = 0
+            self.demotions = 0
+
+    def call(self, fn: Callable[[Dict[str, str]], Any]) -> Any:
+        """用选中的出口执行 fn(proxies)；出口类错误时降级该代理并换一个出口重试（最多候选数次），其它异常原样抛出。"""
+        last_error: Optional[BaseException] = None
+        for _ in range(len(self.candidates)):
+            idx, proxies = self.select()
+            self.begin(idx)
+            t0 = time.perf_counter()
+            try:
+                result = fn(proxies)
+            except Exception as e:
+                self.end(idx, time.perf_counter() - t0, error=True)
+                if not is_egress_error(e):
+                    raise
+                self.report_failure(idx, e)
+                last_error = e
+                continue
+            self.end(idx, time.perf_counter() - t0, status=getattr(result, 'status_code', None))
+            self.report_success(idx)
+            return result
+        assert last_error is not None
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        idx = self._selected
+        with self._stats_lock:
+            candidates = [
+                {
+                    "proxy": self.labels[i],
+                    "healthy": st['healthy'],
+                    "failures": st['failures'],
+                    "backoff_remaining_sec": round(max(0.0, st['down_until'] - now), 3),
+                    "probe_ms": st['probe_ms'],
+                    "weight": self.weights[i],
+                    "requests": st['requests'],
+                    "in_flight": st['in_flight'],
+                    "errors": st['errors'],
+                    "egress_errors": st['egress_errors'],
+                    "by_status": dict(st['by_status']),
+                }
+                for i, st in enumerate(self._state)
+            ]
+            probes, failovers, demotions = self.probes, self.failovers, self.demotions
+        return {
+            "mode": self.mode,
+            "selected": self.labels[idx] if idx is not None else None,
+            "selected_index": idx,
+            "active": [self.labels[i] for i in self._pool] if self.spreading else None,
+            "probes": probes,
+            "failovers": failovers,
+            "demotions": demotions,
+            "candidates": candidates,
+        }
+
+
+def merge_proxy_stats(stats: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """合并多个分片的代理统计（次数求和，各分片选中的出口去重列出，逐出口计数按出口名相加）。"""
+    stats = [s for s in stats if s]
+    if not stats:
+        return None
+    selected: List[str] = []
+    for s in stats:
+        if s.get('selected') and s['selected'] not in selected:
+            selected.append(s['selected'])
+    per_proxy: Dict[str, Dict[str, Any]] = {}
+    for s in stats:
+        for c in s.get('candidates') or []:
+            m = per_proxy.setdefault(c['proxy'], {"proxy": c['proxy'], "requests": 0, "errors": 0,
+                                                  "egress_errors": 0, "by_status": {}})
+            for k in ('requests', 'errors', 'egress_errors'):
+                m[k] += c.get(k, 0)
+            for code, n in (c.get('by_status') or {}).items():
+                m['by_status'][code] = m['by_status'].get(code, 0) + n
+    return {
+        "mode": stats[0].get('mode'),
+        "selected": selected[0] if len(selected) == 1 else selected,
+        "probes": sum(s.get('probes', 0) for s in stats),
+        "failovers": sum(s.get('failovers', 0) for s in stats),
+        "demotions": sum(s.get('demotions', 0) for s in stats),
+        "candidates": list(per_proxy.values()),
+    }
+
+
+# 每个运行配置对应一个管理器（进程内共享；配置没变时请求路径只比较一次对象身份）
+_MANAGERS: Dict[Any, ProxyManager] = {}
+_LAST: Tuple[Optional[RunConfig], Optional[ProxyManager]] = (None, None)
+_MANAGERS_LOCK = threading.Lock()
+
+
+def get_proxy_manager(config: Optional[RunConfig] = None) -> ProxyManager:
+    """返回运行配置对应的代理管理器（首次调用时创建，探测在首次 select() 时进行）。"""
+    global _LAST
+    cfg = config or get_config()
+    last_cfg, last_pm = _LAST
+    if last_cfg is cfg and last_pm is not None:
+        return last_pm
+    key = (tuple(tuple(sorted(p.items())) for p in cfg.proxy_candidates), repr(cfg.verify), cfg.base_url,
+           cfg.proxy_spread, cfg.proxy_weights)
+    with _MANAGERS_LOCK:
+        pm = _MANAGERS.get(key)
+        if pm is None:
+            pm = ProxyManager.from_config(cfg)
+            _MANAGERS[key] = pm
+        _LAST = (cfg, pm)
+    return pm
@@ -0,0 +1,332 @@
+import os
+import time
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from common.histogram import (LatencyHistogram, attach_latency, latency_recording, latency_slot, latency_views,
+                              merge_hist_dicts, merge_latency_views)
+from common.metrics import live_run
+
+# 任务函数：入参为全局发出序号（从 0 开始，跨阶段连续），返回 ('ok', payload) 或 ('err', payload)；
+# 'bad' 表示 HTTP 成功但业务校验失败（见 common.validation），按失败计并单独计入 rejected
+TaskFn = Callable[[int], Tuple[str, Any]]
+
+
+def _percentile(sorted_vals: List[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(math.ceil(pct / 100.0 * len(sorted_vals))) - 1))
+    return sorted_vals[k]
+
+
+def summarize_lag_ms(lags: List[float]) -> Dict[str, float]:
+    """把发出滞后（秒）列表汇总为毫秒单位的统计。"""
+    vals = sorted(lags)
+    if not vals:
+        return {"mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "mean": round(sum(vals) / len(vals) * 1000.0, 3),
+        "p50": round(_percentile(vals, 50) * 1000.0, 3),
+        "p99": round(_percentile(vals, 99) * 1000.0, 3),
+        "max": round(vals[-1] * 1000.0, 3),
+    }
+
+
+def lag_summary_ms(hist: LatencyHistogram) -> Dict[str, float]:
+    """把发出滞后直方图汇总为毫秒单位的统计（字段同 summarize_lag_ms）。"""
+    s = hist.summary()
+    return {"mean": s['mean'], "p50": s['p50'], "p99": s['p99'], "max": s['max']}
+
+
+def run_lag_summary(stage_buckets: List[List['SecondBucket']]) -> Dict[str, float]:
+    """整轮发出滞后：合并各计划秒的直方图（不再逐请求保存滞后值，内存与运行时长无关）。"""
+    total = LatencyHistogram()
+    for buckets in stage_buckets:
+        for b in buckets:
+            with b.lock:
+                total.merge(b.lag_hist)
+    return lag_summary_ms(total)
+
+
+class SecondBucket:
+    """单个计划秒的统计：计划/实际发出数、成功/失败数（其中业务校验失败数）、发出滞后直方图、最后完成时间。"""
+
+    __slots__ = ('sec_index', 'intended_start', 'scheduled', 'issued', 'success', 'failed', 'rejected', 'lag_hist', 'last_done', 'lock')
+
+    def __init__(self, sec_index: int, intended_start: float, scheduled: int):
+        self.sec_index = sec_index
+        self.intended_start = intended_start
+        self.scheduled = scheduled
+        self.issued = 0
+        self.success = 0
+        self.failed = 0
+        self.rejected = 0
+        self.lag_hist = LatencyHistogram()
+        self.last_done = intended_start
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "sec_index": self.sec_index,
+                "success": self.success,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                # 从本秒计划起点到本秒最后一个请求完成的耗时（与旧版语义一致）
+                "elapsed_sec": round(max(0.0, self.last_done - self.intended_start), 3),
+                "scheduled": self.scheduled,
+                "issued": self.issued,
+                "start_lag_ms": lag_summary_ms(self.lag_hist),
+            }
+
+
+def requests_in_second(rate: float, sec: int) -> int:
+    """在恒定到达率 rate 下，第 sec 秒（从 0 开始）内计划发出的请求数。"""
+    return int(math.ceil((sec + 1) * rate - 1e-9)) - int(math.ceil(sec * rate - 1e-9))
+
+
+def total_requests(stages: Sequence[Tuple[float, int]]) -> int:
+    """完整调度（所有分片合计）的请求总数。"""
+    return sum(int(math.ceil(float(r) * int(d) - 1e-9)) for r, d in stages)
+
+
+def shard_count(lo: int, hi: int, shard: Optional[Tuple[int, int]]) -> int:
+    """全局序号区间 [lo, hi) 中属于分片 shard=(index, count) 的请求数（g % count == index）。"""
+    if shard is None:
+        return hi - lo
+    idx, cnt = shard
+    return (hi - idx + cnt - 1) // cnt - (lo - idx + cnt - 1) // cnt
+
+
+def wait_until(start_at: Optional[float], sleep: Callable[[float], None] = time.sleep):
+    """等待到墙上时间 start_at（epoch 秒），用于多个进程/节点对齐起跑。"""
+    if start_at is None:
+        return
+    delay = start_at - time.time()
+    if delay > 0:
+        sleep(delay)
+
+
+def default_max_workers(stages: Sequence[Tuple[float, int]]) -> int:
+    """开环模式下的线程上限：可用 OPEN_LOOP_MAX_WORKERS 覆盖，默认取峰值速率的 2 倍（至少 8）。"""
+    env_raw = os.getenv('OPEN_LOOP_MAX_WORKERS', '').strip()
+    if env_raw:
+        try:
+            return max(1, int(env_raw))
+        except Exception:
+            pass
+    peak = max((r for r, _ in stages), default=1)
+    return max(8, int(math.ceil(peak * 2)))
+
+
+def run_open_loop(stages: Sequence[Tuple[float, int]],
+                  task: TaskFn,
+                  max_workers: Optional[int] = None,
+                  on_result: Optional[Callable[[str, Any], None]] = None,
+                  on_tick: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                  start_at: Optional[float] = None,
+                  shard: Optional[Tuple[int, int]] = None,
+                  scenario: Optional[str] = None,
+                  clock: Callable[[], float] = time.monotonic,
+                  sleep: Callable[[float], None] = time.sleep) -> Dict[str, Any]:
+    """开环恒定到达率调度：按单调时钟把请求均匀铺在每一秒内，不等待在途请求完成。
+
+    与旧版“每秒一次性突发 qps 个请求、等最慢的返回后再 sleep 补齐”的闭环方式不同，
+    这里第 k 个请求的计划发出时间固定为 stage_t0 + k / rate，服务端变慢不会降低发出速率
+    （避免 coordinated omission）。若发出线程本身落后，会立即补发并在 start_lag_ms 中体现。
+
+    Args:
+        stages: [(rate, duration_sec), ...]，阶段之间无缝衔接，不等待上一阶段排空
+        task: 任务函数，入参为全局序号，返回 ('ok', payload) / ('bad', payload) / ('err', payload)
+        max_workers: 工作线程上限；默认见 default_max_workers
+        on_result: 每个请求完成后回调 (kind, payload)，在工作线程中执行
+        on_tick: 每个计划秒的请求全部发出后回调 (stage_index, 本秒统计快照，见 tick_record)，在调度线程中执行
+        start_at: 墙上时间（epoch 秒）起跑点，多进程/多节点时用于对齐；None 表示立即开始
+        shard: (index, count)，只发出全局序号 g % count == index 的请求（计划时间不变），
+            多个分片合起来恰好是完整的调度，因此总速率在阶段切换时也保持精确
+        scenario: 场景名（address/withdraw/recharge），用作实时指标（METRICS_PORT）的 scenario 标签
+
+    Returns:
+        {
+          "stages": [{"rate": r, "seconds": [per-second dict, ...], "latency_ms": {...}}, ...],
+          "schedule": {"scheduled", "issued", "start_lag_ms", "max_in_flight", "max_workers", "latency_ms"},
+          "latency_hist": 原始直方图（跨分片合并用）
+        }
+        latency_ms 为任务内各被计时调用（见 common.histogram.timed）按名称的 p50/p90/p99/p999/max/mean。
+    """
+    stages = [(float(r), int(d)) for r, d in stages]
+    for r, d in stages:
+        if r <= 0 or d <= 0:
+            raise ValueError('rate 和 duration_sec 必须为正数')
+
+    if max_workers is not None:
+        workers = max_workers
+    elif shard is not None:
+        workers = default_max_workers([(r / shard[1], d) for r, d in stages])
+    else:
+        workers = default_max_workers(stages)
+    stage_buckets: List[List[SecondBucket]] = []
+    in_flight = [0, 0]  # [当前在途, 峰值在途]
+    in_flight_lock = threading.Lock()
+
+    def run_one(seq: int, intended: float, bucket: SecondBucket, stage_idx: int):
+        started = clock()
+        lag = max(0.0, started - intended)
+        with in_flight_lock:
+            in_flight[0] += 1
+            if in_flight[0] > in_flight[1]:
+                in_flight[1] = in_flight[0]
+        with bucket.lock:
+            bucket.issued += 1
+            bucket.lag_hist.record(lag)
+        try:
+            with latency_slot(stage_idx, bucket.sec_index):
+                kind, payload = task(seq)
+        except Exception as e:
+            kind, payload = 'err', {"error": str(e), "status": None}
+        done = clock()
+        with in_flight_lock:
+            in_flight[0] -= 1
+        with bucket.lock:
+            if kind == 'ok':
+                bucket.success += 1
+            else:
+                bucket.failed += 1
+                if kind == 'bad':
+                    bucket.rejected += 1
+            if done > bucket.last_done:
+                bucket.last_done = done
+        if on_result is not None:
+            try:
+                on_result(kind, payload)
+            except Exception as e:
+                print(f'[WARN] on_result 回调异常: {e}')
+
+    g = 0  # 全局序号（含其他分片）
+    issued = 0
+    scheduled_total = 0
+    with latency_recording() as recorder, \
+            live_run(scenario, 'thread', stages, stage_buckets, in_flight, recorder, shard), \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        wait_until(start_at, sleep)
+        t_stage = clock()
+        for stage_idx, (rate, duration) in enumerate(stages):
+            buckets: List[SecondBucket] = []
+            stage_buckets.append(buckets)
+            k = 0
+            for sec in range(duration):
+                n = requests_in_second(rate, sec)
+                mine = shard_count(g, g + n, shard)
+                bucket = SecondBucket(sec + 1, t_stage + sec, mine)
+                buckets.append(bucket)
+                for _ in range(n):
+                    if shard is None or g % shard[1] == shard[0]:
+                        intended = t_stage + k / rate
+                        now = clock()
+                        if intended > now:
+                            sleep(intended - now)
+                        executor.submit(run_one, g, intended, bucket, stage_idx)
+                        issued += 1
+                    g += 1
+                    k += 1
+                scheduled_total += mine
+                # 本秒发完：各线程的逐秒时延直方图在下次记录时交给共享结构
+                window = recorder.close_second()
+                if on_tick is not None:
+                    on_tick(stage_idx, tick_record(bucket, window))
+            # 下一阶段紧接本阶段的计划终点开始（而非实际时间），保证总速率不漂移
+            t_stage = t_stage + duration
+
+    lag_summary = run_lag_summary(stage_buckets)
+    result = {
+        "stages": [
+            {"rate": stages[i][0], "seconds": [b.to_dict() for b in buckets]}
+            for i, buckets in enumerate(stage_buckets)
+        ],
+        "schedule": {
+            "scheduled": scheduled_total,
+            "issued": issued,
+            "start_lag_ms": lag_summary,
+            "max_in_flight": in_flight[1],
+            "max_workers": workers,
+            "engine": "thread",
+        },
+    }
+    attach_latency(result, latency_views(recorder))
+    return result
+
+
+def tick_record(bucket: SecondBucket, window: Dict[str, LatencyHistogram]) -> Dict[str, Any]:
+    """on_tick 的本秒快照：计数与发出滞后，外加约最近 1 秒内完成的调用的时延直方图 "latency_hist"（{名称: to_dict()}，供分布式汇总合并）。"""
+    rec = bucket.to_dict()
+    rec['latency_hist'] = {n: h.to_dict() for n, h in window.items()}
+    return rec
+
+
+def print_tick(label: str) -> Callable[[int, Dict[str, Any]], None]:
+    """构造一个打印本秒发出情况的 on_tick 回调（供各 run_* 复用）。"""
+    def _tick(stage_idx: int, rec: Dict[str, Any]):
+        lag = rec.get('start_lag_ms', {})
+        print(f"⏱️ {label} 阶段 {stage_idx + 1} - 第 {rec['sec_index']} 秒 已按计划发出 {rec['scheduled']} 个请求"
+              f"（已开始 {rec['issued']}，发出滞后 p99 {lag.get('p99', 0.0)} ms）")
+    return _tick
+
+
+def merge_lag_summaries(items: List[Tuple[int, Dict[str, float]]]) -> Dict[str, float]:
+    """合并多个 (样本数, 滞后汇总)：均值按样本数加权，分位数与最大值取各方最大（保守估计）。"""
+    total = sum(n for n, _ in items)
+    if total == 0:
+        return {"mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "mean": round(sum(n * d.get('mean', 0.0) for n, d in items) / total, 3),
+        "p50": max(d.get('p50', 0.0) for n, d in items if n),
+        "p99": max(d.get('p99', 0.0) for n, d in items if n),
+        "max": max(d.get('max', 0.0) for n, d in items if n),
+    }
+
+
+def merge_second_records(recs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并多个分片在同一计划秒的统计；带 "latency_hist" 的 tick 记录按名称合并直方图。"""
+    merged: Dict[str, Any] = {
+        "sec_index": recs[0]['sec_index'],
+        "success": sum(r['success'] for r in recs),
+        "failed": sum(r['failed'] for r in recs),
+        "rejected": sum(r.get('rejected', 0) for r in recs),
+        "elapsed_sec": max(r['elapsed_sec'] for r in recs),
+        "scheduled": sum(r['scheduled'] for r in recs),
+        "issued": sum(r['issued'] for r in recs),
+        "start_lag_ms": merge_lag_summaries([(r['issued'], r['start_lag_ms']) for r in recs]),
+    }
+    if any('latency_hist' in r for r in recs):
+        merged['latency_hist'] = {n: h.to_dict() for n, h in merge_hist_dicts([r.get('latency_hist') for r in recs]).items()}
+    return merged
+
+
+def merge_schedule_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """把多个分片（进程/节点）的 run_open_loop 结果按阶段、按秒对齐合并为同一结构。"""
+    if not results:
+        return {"stages": [], "schedule": {}}
+    stages = []
+    for stage_idx, stage in enumerate(results[0]['stages']):
+        seconds = [
+            merge_second_records([r['stages'][stage_idx]['seconds'][i] for r in results])
+            for i in range(len(stage['seconds']))
+        ]
+        stages.append({"rate": stage['rate'], "seconds": seconds})
+    scheds = [r['schedule'] for r in results]
+    merged: Dict[str, Any] = {
+        "stages": stages,
+        "schedule": {
+            "scheduled": sum(x['scheduled'] for x in scheds),
+            "issued": sum(x['issued'] for x in scheds),
+            "start_lag_ms": merge_lag_summaries([(x['issued'], x['start_lag_ms']) for x in scheds]),
+            "max_in_flight": sum(x['max_in_flight'] for x in scheds),
+            "max_workers": sum(x['max_workers'] for x in scheds),
+            "engine": scheds[0].get('engine'),
+            "shards": len(results),
+        },
+    }
+    attach_latency(merged, merge_latency_views([r.get('latency_hist') for r in results]))
+    return merged
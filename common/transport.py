@@ -0,0 +1,194 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from common.http_timing import HttpTimingCollector, TimedSession, TimingAdapter, http_timing_enabled, merge_timing_reports
+except ModuleNotFoundError:
+    from http_timing import HttpTimingCollector, TimedSession, TimingAdapter, http_timing_enabled, merge_timing_reports  # type: ignore
+
+# 压测目标站点；XBLOCK_BASE_URL 可改指其他部署或本地 mock（见 common/mock_xblock.py）
+DEFAULT_BASE_URL = 'https://xblock-test.charprotocol.com'
+
+# 预热请求打到站点根路径（静态资源，不计入业务接口压力）
+DEFAULT_PREWARM_URL = DEFAULT_BASE_URL + '/'
+
+
+
+def xblock_url(url: str, base: Optional[str] = None) -> str:
+    """base 为运行配置的 base_url（XBLOCK_BASE_URL，如 http://127.0.0.1:18080）：非空时把默认站点前缀替换为该地址，其余 URL 原样返回。"""
+    if not base or not url.startswith(DEFAULT_BASE_URL):
+        return url
+    return base.rstrip('/') + url[len(DEFAULT_BASE_URL):]
+
+
+# 当前压测运行共享的传输层（同一时刻只有一个）
+_ACTIVE: Optional['RunTransport'] = None
+_ACTIVE_LOCK = threading.Lock()
+
+
+class RunTransport:
+    """一次压测运行内共享的 requests 会话：连接池按目标并发预先定容，并在正式计时前预热。
+
+    token、地址、提币三个接口都走同一个会话，keep-alive 连接在整个运行期间复用，
+    避免每个请求都重新做 TCP + TLS 握手（以及经 HTTP 代理时的 CONNECT）。
+    timing=True（默认取 HTTP_TIMING）时换用计时会话，按 DNS / 建连 / CONNECT / TLS / 发送 / 首字节 / 响应体分阶段计时。
+    proxies 可以是多个出口的列表（代理分流，见 common.proxy_manager）：requests 按代理地址各建一个连接池，
+    每个池上限都是 pool_size，预热连接数在各出口间平分。
+    """
+
+    def __init__(self, pool_size: int, proxies: Union[Dict[str, str], Sequence[Dict[str, str]], None] = None,
+                 verify_opt: object = True, timing: Optional[bool] = None):
+        self.pool_size = max(1, int(pool_size))
+        if isinstance(proxies, dict) or not proxies:
+            self.egresses: List[Dict[str, str]] = [dict(proxies or {})]
+        else:
+            self.egresses = [dict(p) for p in proxies]
+        self.proxies = self.egresses[0]
+        self.verify_opt = verify_opt
+        self.timing: Optional[HttpTimingCollector] = None
+        if http_timing_enabled() if timing is None else timing:
+            self.timing = HttpTimingCollector()
+            self.session = TimedSession(self.timing)
+            adapter_cls = TimingAdapter
+        else:
+            self.session = requests.Session()
+            adapter_cls = HTTPAdapter
+        # pool_connections 是按 (代理, 主机) 区分的池个数，这里主机/代理组合很少；pool_maxsize 才是单池连接上限
+        adapter = adapter_cls(pool_connections=8, pool_maxsize=self.pool_size, pool_block=False, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # 代理与证书已由运行配置快照确定并显式传入；关闭 trust_env，免得 requests 每个请求都扫描环境变量
+        # （*_proxy / NO_PROXY / REQUESTS_CA_BUNDLE）并查找 .netrc
+        self.session.trust_env = False
+        self.prewarmed = 0
+        self.prewarm_sec = 0.0
+
+    def prewarm(self, url: str = DEFAULT_PREWARM_URL, count: Optional[int] = None, timeout: float = 10.0) -> int:
+        """并发建立 count 条 keep-alive 连接放回连接池，返回成功建立的条数。
+
+        每个预热请求以 stream=True 发出并在屏障处互相等待，确保它们各自占用一条独立连接，
+        之后再读完响应体把连接归还到池中。
+        """
+        n = max(0, min(self.pool_size, count if count is not None else self.pool_size))
+        if n == 0:
+            return 0
+        barrier = threading.Barrier(n)
+        t0 = time.time()
+
+        def warm_one(i: int) -> bool:
+            resp = None
+            try:
+                resp = self.session.head(url, proxies=self.egresses[i % len(self.egresses)], verify=self.verify_opt,
+                                         timeout=timeout, allow_redirects=False, stream=True)
+                ok = True
+            except Exception:
+                ok = False
+            try:
+                barrier.wait(timeout=timeout)
+            except threading.BrokenBarrierError:
+                pass
+            if resp is not None:
+                try:
+                    _ = resp.content  # 读完后连接自动归还连接池
+                except Exception:
+                    pass
+            return ok
+
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            results = list(executor.map(warm_one, range(n)))
+        self.prewarmed = sum(1 for r in results if r)
+        self.prewarm_sec = round(time.time() - t0, 3)
+        if self.timing is not None:
+            # 预热请求不计入分阶段统计
+            self.timing.reset()
+        print(f'🔥 连接池预热完成：{self.prewarmed}/{n} 条连接，耗时 {self.prewarm_sec}s')
+        return self.prewarmed
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "pool_size": self.pool_size,
+            "prewarmed": self.prewarmed,
+            "prewarm_sec": self.prewarm_sec,
+        }
+        if self.timing is not None:
+            out['timing'] = self.timing.report()
+        return out
+
+    def close(self):
+        try:
+            self.session.close()
+        except Exception:
+            pass
+
+
+def current_session() -> Optional[requests.Session]:
+    """返回当前运行共享的会话；没有运行中的传输层时返回 None（调用方自行新建 Session）。"""
+    t = _ACTIVE
+    return t.session if t is not None else None
+
+
+def current_transport() -> Optional[RunTransport]:
+    return _ACTIVE
+
+
+def merge_transport_stats(stats: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """合并多个分片的传输层统计（连接数求和，预热耗时取最大，分阶段计时合并最慢样本）。"""
+    stats = [s for s in stats if s]
+    if not stats:
+        return None
+    out: Dict[str, Any] = {
+        "pool_size": sum(s.get('pool_size', 0) for s in stats),
+        "prewarmed": sum(s.get('prewarmed', 0) for s in stats),
+        "prewarm_sec": max(s.get('prewarm_sec', 0.0) for s in stats),
+    }
+    timing = merge_timing_reports([s.get('timing') for s in stats])
+    if timing is not None:
+        out['timing'] = timing
+    return out
+
+
+def default_prewarm_count(pool_size: int) -> int:
+    """预热连接数：TRANSPORT_PREWARM 可覆盖（0 表示不预热），默认 min(pool_size, 256)。"""
+    raw = os.getenv('TRANSPORT_PREWARM', '').strip()
+    if raw:
+        try:
+            return max(0, int(raw))
+        except Exception:
+            pass
+    return min(pool_size, 256)
+
+
+@contextmanager
+def run_transport(pool_size: int,
+                  proxies: Union[Dict[str, str], Sequence[Dict[str, str]], None] = None,
+                  verify_opt: object = True,
+                  prewarm_url: Optional[str] = DEFAULT_PREWARM_URL,
+                  base_url: Optional[str] = None) -> Iterator[RunTransport]:
+    """在 with 块内启用共享传输层（退出时关闭连接池）。嵌套调用时复用外层已存在的传输层。
+
+    base_url 为运行配置的站点地址，预热请求按它改写目标。
+    """
+    global _ACTIVE
+    with _ACTIVE_LOCK:
+        outer = _ACTIVE
+        if outer is None:
+            transport = RunTransport(pool_size, proxies, verify_opt)
+            _ACTIVE = transport
+    if outer is not None:
+        yield outer
+        return
+    try:
+        if prewarm_url:
+            transport.prewarm(xblock_url(prewarm_url, base_url), default_prewarm_count(transport.pool_size))
+        yield transport
+    finally:
+        with _ACTIVE_LOCK:
+            _ACTIVE = None
+        transport.close()
@@ -0,0 +1,176 @@
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from common.config import RunConfig
+except ModuleNotFoundError:
+    from config import RunConfig  # type: ignore
+
+# 校验器：入参为 2xx 响应 JSON，返回 None 表示业务成功，否则返回失败原因（如 "code=500"）
+Validator = Callable[[Any], Optional[str]]
+
+# 各接口的校验器工厂：入参为本轮运行配置，每次运行新建一个实例，便于做“本轮内唯一”之类的有状态校验
+_FACTORIES: Dict[str, Callable[[RunConfig], Validator]] = {}
+
+
+def validation_enabled(config: RunConfig) -> bool:
+    """BUSINESS_VALIDATE=0 时退回旧口径（HTTP 2xx 即成功），默认按业务响应判定。"""
+    return config.business_validate
+
+
+def ok_codes(config: RunConfig) -> frozenset:
+    """视为业务成功的 code 集合，BUSINESS_OK_CODES 逗号分隔，默认 200（快照生成时解析一次，每个请求只读）。"""
+    return config.business_ok_codes
+
+
+def register_validator(endpoint: str, factory: Callable[[RunConfig], Validator]):
+    """为接口注册校验器工厂 factory(config)；同名注册会覆盖（可在外部脚本里替换默认规则）。"""
+    _FACTORIES[endpoint] = factory
+
+
+def get_validator(endpoint: str, config: RunConfig) -> Optional[Validator]:
+    factory = _FACTORIES.get(endpoint)
+    return factory(config) if factory is not None else None
+
+
+def envelope_check(codes: Iterable[str]) -> Validator:
+    """XBlock 统一响应信封：{"code": 200, "message": ..., "data": ...}，code 不在 codes（BUSINESS_OK_CODES）中即失败。"""
+    accepted = frozenset(str(c) for c in codes)
+
+    def _check(data: Any) -> Optional[str]:
+        if not isinstance(data, dict):
+            return 'not-envelope'
+        code = data.get('code')
+        if code is None:
+            return 'no-code'
+        if str(code) not in accepted:
+            return f'code={code}'
+        return None
+    return _check
+
+
+def chain(*validators: Validator) -> Validator:
+    """依次执行多个校验器，返回第一个失败原因。"""
+    def _run(data: Any) -> Optional[str]:
+        for v in validators:
+            reason = v(data)
+            if reason is not None:
+                return reason
+        return None
+    return _run
+
+
+def unique_field(extract: Callable[[Any], Any], name: str) -> Validator:
+    """要求 extract(data) 存在且在本轮内不重复（线程安全）。"""
+    seen = set()
+    lock = threading.Lock()
+
+    def _check(data: Any) -> Optional[str]:
+        value = extract(data)
+        if value is None:
+            return f'no-{name}'
+        with lock:
+            if value in seen:
+                return f'duplicate-{name}'
+            seen.add(value)
+        return None
+    return _check
+
+
+class ResponseClassifier:
+    """按接口校验器把结果分为三类，并按 HTTP 状态 × 业务 code × 错误类型计数：
+
+    - 'ok'：HTTP 2xx 且通过业务校验（计入 goodput）；
+    - 'bad'：HTTP 2xx 但业务校验失败（计入原始吞吐、不计入 goodput，调度器按失败统计）；
+    - 'err'：HTTP 非 2xx、非 JSON 或异常。
+
+    config 为本轮运行配置，决定是否做业务校验（BUSINESS_VALIDATE）及成功 code 集合。
+    """
+
+    def __init__(self, endpoint: str, config: RunConfig, validator: Optional[Validator] = None):
+        self.endpoint = endpoint
+        if validator is None and validation_enabled(config):
+            validator = get_validator(endpoint, config)
+        self.validator = validator
+        self._counts: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def classify(self, kind: str, payload: Any) -> Tuple[str, Any]:
+        if kind == 'ok':
+            status = '2xx'
+            code = payload.get('code') if isinstance(payload, dict) else None
+            reason = self.validator(payload) if self.validator is not None else None
+            if reason is not None:
+                kind = 'bad'
+            error_type = reason or '-'
+        else:
+            p = payload if isinstance(payload, dict) else {}
+            status = str(p.get('status')) if p.get('status') is not None else '-'
+            code = None
+            error_type = p.get('exc') or ('http' if p.get('status') is not None else 'error')
+        key = (status, str(code) if code is not None else '-', error_type)
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+        return kind, payload
+
+    def wrap(self, task: Callable[..., Tuple[str, Any]]) -> Callable[..., Tuple[str, Any]]:
+        """包装同步任务函数，返回值经 classify 处理。"""
+        def _task(*args, **kwargs):
+            return self.classify(*task(*args, **kwargs))
+        return _task
+
+    def wrap_async(self, call: Callable[..., Any]) -> Callable[..., Any]:
+        """包装协程任务函数（异步引擎用）。"""
+        async def _call(*args, **kwargs):
+            return self.classify(*(await call(*args, **kwargs)))
+        return _call
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            items = list(self._counts.items())
+        return _outcome_report(self.endpoint, self.validator is not None, items)
+
+
+def _outcome_report(endpoint: str, validated: bool, items: List[Tuple[Tuple[str, str, str], int]]) -> Dict[str, Any]:
+    buckets = [{"status": s, "code": c, "error_type": e, "count": n}
+               for (s, c, e), n in sorted(items, key=lambda x: -x[1])]
+    return {
+        "endpoint": endpoint,
+        "validated": validated,
+        "rejected": sum(b['count'] for b in buckets if b['status'] == '2xx' and b['error_type'] != '-'),
+        "buckets": buckets,
+    }
+
+
+def merge_outcome_reports(reports: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """合并多个分片的分类计数。"""
+    reports = [r for r in reports if r]
+    if not reports:
+        return None
+    counts: Dict[Tuple[str, str, str], int] = {}
+    for r in reports:
+        for b in r.get('buckets', []):
+            key = (b['status'], b['code'], b['error_type'])
+            counts[key] = counts.get(key, 0) + int(b['count'])
+    return _outcome_report(reports[0].get('endpoint', ''), any(r.get('validated') for r in reports), list(counts.items()))
+
+
+def goodput_summary(seconds: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """由逐秒记录计算原始吞吐与 goodput（按计划秒数平均，单位 req/s）。
+
+    completed 为全部完成的请求，http_ok 为 HTTP 2xx（含业务失败），good 为通过业务校验的请求。
+    """
+    n = max(1, len(seconds))
+    good = sum(r.get('success', 0) for r in seconds)
+    rejected = sum(r.get('rejected', 0) for r in seconds)
+    completed = good + sum(r.get('failed', 0) for r in seconds)
+    return {
+        "completed": completed,
+        "http_ok": good + rejected,
+        "good": good,
+        "rejected": rejected,
+        "throughput_rps": round(completed / n, 3),
+        "http_ok_rps": round((good + rejected) / n, 3),
+        "goodput_rps": round(good / n, 3),
+        "goodput_ratio": round(good / completed, 4) if completed else 0.0,
+    }
@@ -20,11 +20,20 @@ from recharge.address_stress import (
     run_address_stress_staircase,
 )  # type: ignore
 
+from recharge.sendTx import get_w3  # type: ignore
+from common.config import RunConfig, set_config  # type: ignore
+
 # 新增：导入提币发送接口
 from withdrawal.sendTx import send_tx_json  # type: ignore
 
 
-def do_recharge_stress():
+def do_recharge_stress(config: RunConfig):
+    # 链上客户端延迟到选择充值压测时才初始化，配置缺失或连不上节点时直接返回
+    try:
+        get_w3(config)
+    except RuntimeError as e:
+        print(f'[ERROR] {e}')
+        return
     amount_btt = float(os.getenv('RECHARGE_AMOUNT_BTT', '0.007'))
 
     print('请选择压测模式:')
@@ -64,6 +73,7 @@ def do_recharge_stress():
             lock_time=int(lock_time) if lock_time else None,
             chain_name=chain_name,
             wallet_id=int(wallet_id) if wallet_id else None,
+            config=config,
         )
         print('\n📊 充值压测结果（固定模式）:')
         print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -109,12 +119,13 @@ def do_recharge_stress():
             lock_time=int(lock_time) if lock_time else None,
             chain_name=chain_name,
             wallet_id=int(wallet_id) if wallet_id else None,
+            config=config,
         )
         print('\n📊 充值压测结果（阶梯模式）:')
         print(json.dumps(result, ensure_ascii=False, indent=2))
 
 
-def do_address_stress():
+def do_address_stress(config: RunConfig):
     print('📮 地址获取压测（独立）')
     print('请选择压测模式:')
     print('1) 固定并发 + 持续秒数')
@@ -152,6 +163,7 @@ def do_address_stress():
             lock_time=int(lock_time) if lock_time else None,
             chain_name=chain_name,
             wallet_id=int(wallet_id) if wallet_id else None,
+            config=config,
         )
         print('\n📊 地址获取压测结果（固定模式）:')
         print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -191,13 +203,14 @@ def do_address_stress():
             lock_time=int(lock_time) if lock_time else None,
             chain_name=chain_name,
             wallet_id=int(wallet_id) if wallet_id else None,
+            config=config,
         )
         print('\n📊 地址获取压测结果（阶梯模式）:')
         print(json.dumps(result, ensure_ascii=False, indent=2))
 
 
 # 新增：提币单次发送流程（从控制台输入参数）
-def do_withdrawal_flow():
+def do_withdrawal_flow(config: RunConfig):
     print('💸 提币发送压测')
     # 读取默认值（来自环境变量，便于脚本化）
     def_env = {
@@ -276,7 +289,7 @@ def do_withdrawal_flow():
 
             # 延迟导入，避免循环依赖
             from withdrawal.sendTx import run_withdraw_stress_fixed  # type: ignore
-            result = run_withdraw_stress_fixed(qps=qps, duration_sec=duration_sec, payload=payload)
+            result = run_withdraw_stress_fixed(qps=qps, duration_sec=duration_sec, payload=payload, config=config)
             print('\n📊 提币压测结果（固定模式）:')
             print(json.dumps(result, ensure_ascii=False, indent=2))
         else:
@@ -314,13 +327,14 @@ def do_withdrawal_flow():
                 end_concurrency=end_conc,
                 step_duration_sec=step_duration,
                 payload=payload,
+                config=config,
             )
             print('\n📊 提币压测结果（阶梯模式）:')
             print(json.dumps(result, ensure_ascii=False, indent=2))
     except Exception as e:
         print(f'[ERROR] 提币压测执行失败: {e}')
 
-        result = send_tx_json(payload)
+        result = send_tx_json(payload, config)
         print('\n✅ 提币接口返回:')
         print(json.dumps(result, ensure_ascii=False, indent=2))
     except Exception as e:
@@ -328,6 +342,35 @@ def do_withdrawal_flow():
 
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='XBlock 接口压力测试工具')
+    parser.add_argument('--engine', choices=['thread', 'async'], default=None,
+                        help='地址/提币压测引擎：thread（线程池，默认）或 async（aiohttp 单事件循环）；也可用 STRESS_ENGINE 设置')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='压测进程数（默认 1）；>1 时各进程分片执行同一调度，合计速率不变；也可用 LOAD_WORKERS 设置')
+    parser.add_argument('--agents', default=None,
+                        help='分布式模式：agent 列表 host:port,host:port（agent 用 python common/distributed.py 启动）；也可用 LOAD_AGENTS 设置')
+    parser.add_argument('--proxy-spread', choices=['single', 'round_robin', 'weighted', 'least_inflight'], default=None,
+                        help='多出口分流：single（只用首个可用代理，默认）或在所有可用代理间 round_robin / weighted / least_inflight；也可用 PROXY_SPREAD 设置')
+    parser.add_argument('--env-file', default=None,
+                        help='配置文件路径（默认项目根目录的 key.env），启动时读取一次生成运行配置快照')
+    args = parser.parse_args()
+
+    # 运行配置快照：key.env / 环境变量只在这里解析一次，命令行参数直接作为快照字段覆盖（不回写环境变量），
+    # 之后显式传给各压测入口，各请求只读该快照；同时安装为进程内默认值，供未传 config 的直接调用使用
+    overrides = {}
+    if args.engine:
+        overrides['engine'] = args.engine
+    if args.workers is not None:
+        overrides['workers'] = args.workers
+    if args.agents is not None:
+        overrides['agents'] = args.agents.strip()
+    if args.proxy_spread:
+        overrides['proxy_spread'] = args.proxy_spread
+    config = RunConfig.from_env(args.env_file, **overrides)
+    set_config(config)
+
     print('请选择要执行的操作:')
     print('1) 充值完整流程压测')
     print('2) 提币完整流程压测')
@@ -336,12 +379,12 @@ def main():
     choice = input('输入序号后回车: ').strip()
 
     if choice == '1':
-        do_recharge_stress()
+        do_recharge_stress(config)
     elif choice == '2':
         # 集成提币发送流程
-        do_withdrawal_flow()
+        do_withdrawal_flow(config)
     elif choice == '3':
-        do_address_stress()
+        do_address_stress(config)
     else:
         print('已退出。')
 
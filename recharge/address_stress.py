@@ -1,8 +1,6 @@
 import os
 import sys
-import json
-import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # 允许从项目根导入
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -14,7 +12,20 @@ if PROJECT_ROOT not in sys.path:
 from recharge.getAddress import (
     get_recharge_address_json,
     batch_get_recharge_address_json,
+    prepare_address_context,
+    address_one_call,
+    address_one_call_async,
 )
+from common.scheduler import default_max_workers, run_open_loop, print_tick
+from common.aggregator import ResultAggregator
+from common.validation import ResponseClassifier, chain, envelope_check, goodput_summary, register_validator
+from common.config import RunConfig, get_config
+from common.transport import run_transport
+from common.proxy_manager import get_proxy_manager
+from common.getToken import reset_token_stats, token_stats
+from common.multiproc import resolve_workers, run_multiprocess
+from common.distributed import resolve_agents, run_distributed
+from common.async_engine import ENGINE_ASYNC, AsyncHttpClient, default_max_in_flight, resolve_engine, run_async_open_loop
 
 
 def extract_addresses_from_json(resp_json: Dict[str, Any]) -> List[str]:
@@ -65,11 +76,20 @@ def extract_addresses_from_json(resp_json: Dict[str, Any]) -> List[str]:
     return uniq
 
 
+def _check_address(resp_json: Any) -> Optional[str]:
+    return None if extract_addresses_from_json(resp_json) else 'no-address'
+
+
+# 地址业务成功：code 为成功码，且 data 中能解析出 0x 地址
+register_validator('address', lambda config: chain(envelope_check(config.business_ok_codes), _check_address))
+
+
 def fetch_single_address(lock_time: Optional[int] = None,
                          chain_name: Optional[str] = None,
-                         wallet_id: Optional[int] = None) -> List[str]:
+                         wallet_id: Optional[int] = None,
+                         config: Optional[RunConfig] = None) -> List[str]:
     """获取一次充值地址，解析后返回地址列表（可能 0/1/N 个）。"""
-    resp = get_recharge_address_json(lock_time=lock_time, chain_name=chain_name, wallet_id=wallet_id)
+    resp = get_recharge_address_json(lock_time=lock_time, chain_name=chain_name, wallet_id=wallet_id, config=config)
     return extract_addresses_from_json(resp)
 
 
@@ -77,13 +97,15 @@ def run_address_stress(total: int,
                        max_workers: Optional[int] = None,
                        lock_time: Optional[int] = None,
                        chain_name: Optional[str] = None,
-                       wallet_id: Optional[int] = None) -> Dict[str, Any]:
+                       wallet_id: Optional[int] = None,
+                       config: Optional[RunConfig] = None) -> Dict[str, Any]:
     """并发批量获取充值地址的压测函数（单次批量）。
 
     Args:
         total: 本轮并发请求总量（同参数重复请求 total 次）
-        max_workers: 线程池并发度；若不传则使用环境变量 GETADDR_MAX_WORKERS 或默认 1
+        max_workers: 线程池并发度；若不传则使用运行配置的 GETADDR_MAX_WORKERS 或默认 1
         lock_time, chain_name, wallet_id: 透传给地址接口
+        config: 运行配置快照，默认 get_config()
 
     Returns:
         一个结果字典：{
@@ -91,78 +113,180 @@ def run_address_stress(total: int,
           "failed": int,
           "sample_addresses": List[str],
           "errors": List[dict],
+          "by_status": {HTTP 状态: 次数},
+          "by_code": {业务 code: 次数},
+          "latency_ms": {count, mean, p50, p90, p99, p999, max},
+          "outcomes": HTTP 状态 × 业务 code × 错误类型 计数（见 common.validation），
+          "proxy": 代理出口选择与切换次数（见 common.proxy_manager），
+          "token": token 续期、401 强制刷新与请求路径等待（stall）统计，多账号时附逐账号请求分布（见 common.getToken.TokenPool），
         }
+        success 为通过业务校验的请求数（BUSINESS_VALIDATE=0 时为 HTTP 2xx 数）。
     """
-    if max_workers is not None:
-        os.environ['GETADDR_MAX_WORKERS'] = str(max_workers)
-
-    success_list, fail_list = batch_get_recharge_address_json(
+    # 结果流式汇总（计数 + 直方图 + 蓄水池样本），不保留每条完整响应
+    cfg = config or get_config()
+    agg = ResultAggregator()
+    classifier = ResponseClassifier('address', cfg)
+    get_proxy_manager(cfg).reset_stats()
+    reset_token_stats(cfg)
+    batch_get_recharge_address_json(
         total=total,
         lock_time=str(lock_time) if lock_time is not None else None,
         chain_name=chain_name,
         wallet_id=str(wallet_id) if wallet_id is not None else None,
+        aggregator=agg,
+        classifier=classifier,
+        max_workers=max_workers,
+        config=cfg,
     )
+    report = agg.report()
 
-    # 从部分成功样本解析地址
+    # 从抽样的成功响应解析地址
     sample_addresses: List[str] = []
-    for item in success_list[:10]:  # 仅取前 10 条做样本
+    for item in report['samples'][:10]:
         sample_addresses.extend(extract_addresses_from_json(item))
     # 去重
     seen = set()
     sample_addresses = [a for a in sample_addresses if not (a in seen or seen.add(a))]
 
     result = {
-        "success": len(success_list),
-        "failed": len(fail_list),
+        "success": report['success'],
+        "failed": report['failed'],
         "sample_addresses": sample_addresses,
-        "errors": fail_list[:10],  # 返回前 10 个错误样本
+        "errors": report['errors'][:10],  # 抽样的错误样本
+        "by_status": report['by_status'],
+        "by_code": report['by_code'],
+        "latency_ms": report['latency_ms'],
+        "outcomes": classifier.report(),
+        "proxy": get_proxy_manager(cfg).stats(),
+        "token": token_stats(cfg),
     }
     return result
 
 
+def run_address_stages(stages: List[Tuple[int, int]],
+                       lock_time: Optional[int] = None,
+                       chain_name: Optional[str] = None,
+                       wallet_id: Optional[int] = None,
+                       engine: Optional[str] = None,
+                       start_at: Optional[float] = None,
+                       shard: Optional[Tuple[int, int]] = None,
+                       on_tick: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                       config: Optional[RunConfig] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """以开环调度器执行地址压测（线程或 asyncio 引擎），返回 (调度结果, 样本地址)。
+
+    start_at/shard/on_tick 供多进程/多节点模式使用，含义同 common.scheduler.run_open_loop；
+    config 为本轮运行配置（默认 get_config()），经上下文传给每个请求与业务校验。
+    """
+    ctx = prepare_address_context(
+        lock_time=str(lock_time) if lock_time is not None else None,
+        chain_name=chain_name,
+        wallet_id=str(wallet_id) if wallet_id is not None else None,
+        config=config,
+    )
+
+    # 代理与 token 统计只算本轮（管理器/续期器在进程内跨轮复用）
+    ctx['proxy_manager'].reset_stats()
+    reset_token_stats(ctx['config'])
+    sample_items: List[Dict[str, Any]] = []
+
+    def on_result(kind: str, payload: Any):
+        # list.append 在 CPython 下线程安全；仅保留少量样本
+        if kind == 'ok' and len(sample_items) < 50:
+            sample_items.append(payload)
+
+    cfg = ctx['config']
+    classifier = ResponseClassifier('address', cfg)
+    if resolve_engine(engine, cfg) == ENGINE_ASYNC:
+        client = AsyncHttpClient(ctx['proxies'], ctx['verify_opt'], default_max_in_flight(),
+                                 cfg.getaddr_timeout, token_pool=ctx['token_pool'],
+                                 proxy_manager=ctx['proxy_manager'])
+        sched = run_async_open_loop(
+            stages,
+            classifier.wrap_async(lambda cli, seq: address_one_call_async(cli, ctx, seq + 1)),
+            client,
+            on_result=on_result,
+            on_tick=on_tick or print_tick('地址'),
+            start_at=start_at,
+            shard=shard,
+            scenario='address',
+        )
+    else:
+        # 连接池按线程上限定容并预热，token/地址请求在整个运行期复用 keep-alive 连接
+        with run_transport(default_max_workers(stages), ctx['proxy_manager'].active_proxies(), ctx['verify_opt'],
+                           base_url=cfg.base_url) as transport:
+            sched = run_open_loop(
+                stages,
+                classifier.wrap(lambda seq: address_one_call(ctx, seq + 1)),
+                on_result=on_result,
+                on_tick=on_tick or print_tick('地址'),
+                start_at=start_at,
+                shard=shard,
+                scenario='address',
+            )
+        sched['transport'] = transport.stats()
+    sched['outcomes'] = classifier.report()
+    sched['proxy'] = ctx['proxy_manager'].stats()
+    sched['token'] = token_stats(cfg)
+
+    sample_addresses: List[str] = []
+    for item in sample_items:
+        sample_addresses.extend(extract_addresses_from_json(item))
+    # 去重样本
+    seen = set()
+    sample_addresses = [a for a in sample_addresses if not (a in seen or seen.add(a))]
+    return sched, sample_addresses
+
+
+def _run_address_stages_any(stages: List[Tuple[int, int]],
+                            lock_time: Optional[int],
+                            chain_name: Optional[str],
+                            wallet_id: Optional[int],
+                            engine: Optional[str],
+                            workers: Optional[int],
+                            config: RunConfig) -> Tuple[Dict[str, Any], List[str]]:
+    """按 config.agents / 进程数选择分布式、多进程或单进程执行。"""
+    params = {'lock_time': lock_time, 'chain_name': chain_name, 'wallet_id': wallet_id, 'engine': engine}
+    agents = resolve_agents(config=config)
+    procs = resolve_workers(workers, config)
+    if agents:
+        merged = run_distributed(agents, 'address', stages, params)
+    elif procs > 1:
+        merged = run_multiprocess('address', stages, params, procs, config)
+    else:
+        return run_address_stages(stages, lock_time, chain_name, wallet_id, engine, config=config)
+    seen = set()
+    samples = [a for a in merged.pop('samples', []) if not (a in seen or seen.add(a))]
+    return merged, samples
+
+
 def run_address_stress_fixed(qps: int,
                              duration_sec: int,
                              lock_time: Optional[int] = None,
                              chain_name: Optional[str] = None,
-                             wallet_id: Optional[int] = None) -> Dict[str, Any]:
-    """固定并发(近似固定QPS)的地址获取压测，按秒循环执行。
-
-    每秒会以并发度=qps 发送 qps 个请求，如果耗时不足 1s，会补齐睡眠至 1s。
-    返回逐秒统计、总成功/失败以及样本地址。
+                             wallet_id: Optional[int] = None,
+                             engine: Optional[str] = None,
+                             workers: Optional[int] = None,
+                             config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """固定 QPS 的地址获取压测（开环恒定到达率）。
+
+    请求按单调时钟均匀分布在每秒内发出，不等待慢请求返回，实际发出速率不受服务端延迟影响。
+    engine 取 thread/async（默认取 config.engine），async 使用单事件循环 + 有界信号量；
+    workers > 1（或 config.workers > 1）时由多个进程分片发出，合计速率不变；config 为运行配置（默认 get_config()）。
+    返回逐秒统计（含计划/实际发出数与发出滞后）、总成功/失败以及样本地址。
     """
     if qps <= 0 or duration_sec <= 0:
         raise ValueError('qps 和 duration_sec 必须为正整数')
 
-    total_success = 0
-    total_failed = 0
-    per_sec: List[Dict[str, Any]] = []
-    sample_addresses: List[str] = []
-
-    for sec in range(duration_sec):
-        print(f'\n⏱️ 第 {sec+1}/{duration_sec} 秒 - 目标并发 {qps}')
-        os.environ['GETADDR_MAX_WORKERS'] = str(qps)
-        t0 = time.time()
-        success_list, fail_list = batch_get_recharge_address_json(
-            total=qps,
-            lock_time=str(lock_time) if lock_time is not None else None,
-            chain_name=chain_name,
-            wallet_id=str(wallet_id) if wallet_id is not None else None,
-        )
-        dt = time.time() - t0
-        s_cnt = len(success_list)
-        f_cnt = len(fail_list)
-        total_success += s_cnt
-        total_failed += f_cnt
-        for item in success_list[:5]:
-            sample_addresses.extend(extract_addresses_from_json(item))
-        print(f'📊 本秒完成 成功 {s_cnt} / 失败 {f_cnt}，耗时 {dt:.2f}s')
-        per_sec.append({"sec_index": sec + 1, "success": s_cnt, "failed": f_cnt, "elapsed_sec": round(dt, 3)})
-        if dt < 1.0:
-            time.sleep(1.0 - dt)
-
-    # 去重样本
-    seen = set()
-    sample_addresses = [a for a in sample_addresses if not (a in seen or seen.add(a))]
+    print(f'🚀 地址压测开始（开环）：QPS={qps}，持续 {duration_sec} 秒')
+    sched, sample_addresses = _run_address_stages_any([(qps, duration_sec)], lock_time, chain_name, wallet_id, engine, workers,
+                                                       config or get_config())
+    per_sec = sched['stages'][0]['seconds']
+    total_success = sum(r['success'] for r in per_sec)
+    total_failed = sum(r['failed'] for r in per_sec)
+    for r in per_sec:
+        print(f"📊 第 {r['sec_index']} 秒 成功 {r['success']} / 失败 {r['failed']}，耗时 {r['elapsed_sec']:.2f}s")
+    goodput = goodput_summary(per_sec)
+    print(f"🎯 吞吐 {goodput['throughput_rps']} req/s，goodput {goodput['goodput_rps']} req/s（业务校验失败 {goodput['rejected']}）")
 
     return {
         "mode": "fixed",
@@ -170,7 +294,13 @@ def run_address_stress_fixed(qps: int,
         "duration_sec": duration_sec,
         "total_success": total_success,
         "total_failed": total_failed,
+        "goodput": goodput,
+        "outcomes": sched.get('outcomes'),
         "per_sec": per_sec,
+        "schedule": sched['schedule'],
+        "transport": sched.get('transport'),
+        "proxy": sched.get('proxy'),
+        "token": sched.get('token'),
         "sample_addresses": sample_addresses[:20],  # 返回最多 20 个样本
     }
 
@@ -180,10 +310,13 @@ def run_address_stress_staircase(start_concurrency: int,
                                  step_duration_sec: int,
                                  lock_time: Optional[int] = None,
                                  chain_name: Optional[str] = None,
-                                 wallet_id: Optional[int] = None) -> Dict[str, Any]:
-    """阶梯并发的地址获取压测：从 start_concurrency 到 end_concurrency，每阶段持续 step_duration_sec 秒。
+                                 wallet_id: Optional[int] = None,
+                                 engine: Optional[str] = None,
+                                 workers: Optional[int] = None,
+                                 config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """阶梯 QPS 的地址获取压测：从 start_concurrency 到 end_concurrency，每阶段持续 step_duration_sec 秒。
 
-    每个阶段的每一秒，会以并发度=当前阶段并发，发送同等数量的请求，并在不足 1s 时补齐等待。
+    各阶段在同一条开环时间轴上无缝衔接（阶段切换不等待上一阶段的在途请求）；config 为运行配置（默认 get_config()）。
     返回逐阶段/逐秒统计、总成功/失败以及样本地址。
     """
     if start_concurrency <= 0 or end_concurrency <= 0 or step_duration_sec <= 0:
@@ -191,40 +324,24 @@ def run_address_stress_staircase(start_concurrency: int,
 
     conc_list = list(range(start_concurrency, end_concurrency + 1)) if end_concurrency >= start_concurrency else list(range(start_concurrency, end_concurrency - 1, -1))
 
+    print(f'🚀 地址阶梯压测开始（开环）：{start_concurrency} -> {end_concurrency} QPS，每阶段 {step_duration_sec} 秒')
+    sched, sample_addresses = _run_address_stages_any([(c, step_duration_sec) for c in conc_list], lock_time, chain_name, wallet_id,
+                                                       engine, workers, config or get_config())
+
     total_success = 0
     total_failed = 0
     per_stage: List[Dict[str, Any]] = []
-    sample_addresses: List[str] = []
-
-    for conc in conc_list:
-        print(f'\n🚩 阶段开始：目标并发 {conc}')
-        stage_rec = {"concurrency": conc, "seconds": []}
-        os.environ['GETADDR_MAX_WORKERS'] = str(conc)
-        for sec in range(step_duration_sec):
-            print(f'⏱️ 阶段 {conc} 并发 - 第 {sec+1}/{step_duration_sec} 秒')
-            t0 = time.time()
-            success_list, fail_list = batch_get_recharge_address_json(
-                total=conc,
-                lock_time=str(lock_time) if lock_time is not None else None,
-                chain_name=chain_name,
-                wallet_id=str(wallet_id) if wallet_id is not None else None,
-            )
-            dt = time.time() - t0
-            s_cnt = len(success_list)
-            f_cnt = len(fail_list)
-            total_success += s_cnt
-            total_failed += f_cnt
-            for item in success_list[:5]:
-                sample_addresses.extend(extract_addresses_from_json(item))
-            print(f'📊 本秒完成 成功 {s_cnt} / 失败 {f_cnt}，耗时 {dt:.2f}s')
-            stage_rec["seconds"].append({"sec_index": sec + 1, "success": s_cnt, "failed": f_cnt, "elapsed_sec": round(dt, 3)})
-            if dt < 1.0:
-                time.sleep(1.0 - dt)
-        per_stage.append(stage_rec)
-
-    # 去重样本
-    seen = set()
-    sample_addresses = [a for a in sample_addresses if not (a in seen or seen.add(a))]
+    for conc, stage in zip(conc_list, sched['stages']):
+        seconds = stage['seconds']
+        s_cnt = sum(r['success'] for r in seconds)
+        f_cnt = sum(r['failed'] for r in seconds)
+        total_success += s_cnt
+        total_failed += f_cnt
+        print(f'📊 阶段 {conc} QPS 完成 成功 {s_cnt} / 失败 {f_cnt}')
+        per_stage.append({"concurrency": conc, "seconds": seconds, "latency_ms": stage.get('latency_ms'),
+                          "goodput": goodput_summary(seconds)})
+    goodput = goodput_summary([r for stage in sched['stages'] for r in stage['seconds']])
+    print(f"🎯 吞吐 {goodput['throughput_rps']} req/s，goodput {goodput['goodput_rps']} req/s（业务校验失败 {goodput['rejected']}）")
 
     return {
         "mode": "staircase",
@@ -233,6 +350,12 @@ def run_address_stress_staircase(start_concurrency: int,
         "step_duration_sec": step_duration_sec,
         "total_success": total_success,
         "total_failed": total_failed,
+        "goodput": goodput,
+        "outcomes": sched.get('outcomes'),
         "per_stage": per_stage,
+        "schedule": sched['schedule'],
+        "transport": sched.get('transport'),
+        "proxy": sched.get('proxy'),
+        "token": sched.get('token'),
         "sample_addresses": sample_addresses[:20],
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,267 @@
+import os
+import sys
+import time
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+# 允许从项目根导入
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from common.scheduler import summarize_lag_ms  # noqa: E402
+from common.transport import current_session, xblock_url  # noqa: E402
+from common.proxy_manager import get_proxy_manager  # noqa: E402
+from common.getToken import get_token_pool  # noqa: E402
+from recharge.getAddress import BASE_HEADERS, normalize_proxies  # noqa: E402
+
+# 充值记录接口（分页，按时间倒序）；路径与分页参数名可通过环境变量覆盖
+DEPOSIT_RECORD_URL = 'https://xblock-test.charprotocol.com/api/asset/member/wallet/deposit/record'
+
+# 记录里可能承载交易哈希 / 状态的字段名（按顺序尝试）
+_HASH_FIELDS = ('txHash', 'txId', 'hash', 'transactionHash', 'tx_hash')
+_STATUS_FIELDS = ('status', 'state', 'depositStatus')
+
+
+def watch_enabled() -> bool:
+    """DEPOSIT_WATCH=1 时在充值压测期间启用入账跟踪。"""
+    return os.getenv('DEPOSIT_WATCH', '0') == '1'
+
+
+def _extract_records(data: Any) -> List[Dict[str, Any]]:
+    """从常见的分页响应结构中取出记录列表：data.records / data.list / data.rows / data 本身。"""
+    cur = data
+    for _ in range(3):
+        if isinstance(cur, list):
+            return [r for r in cur if isinstance(r, dict)]
+        if not isinstance(cur, dict):
+            return []
+        for key in ('records', 'list', 'rows', 'items'):
+            if isinstance(cur.get(key), list):
+                return [r for r in cur[key] if isinstance(r, dict)]
+        cur = cur.get('data')
+    return []
+
+
+def _first(rec: Dict[str, Any], fields: Tuple[str, ...]) -> Any:
+    for f in fields:
+        if rec.get(f) not in (None, ''):
+            return rec[f]
+    return None
+
+
+class DepositWatcher:
+    """轮询 XBlock 充值记录接口，把记录按交易哈希与我们发出的转账对上，统计发现/入账时延与每秒积压。
+
+    - 发现（detected）：首次在充值记录中看到该交易哈希；
+    - 入账（credited）：记录状态进入 DEPOSIT_CREDITED_STATUS 中的任一值。
+    每轮只拉取最新的若干页（DEPOSIT_PAGE_SIZE × DEPOSIT_MAX_PAGES），一旦某页没有任何新记录或状态变化
+    就停止翻页，避免跟踪本身给接口带来明显压力。
+    请求与压测流量共用运行中的连接池（common.transport）、代理管理器与 token 池；
+    积压由独立的采样线程按 1 秒节拍记录，与轮询间隔无关。
+    未匹配上的记录也会缓存，供事后补登记（多进程/分布式模式下由协调方在合并后统一登记）的转账匹配。
+    """
+
+    def __init__(self, ctx: Dict[str, Any],
+                 poll_interval: Optional[float] = None,
+                 page_size: Optional[int] = None,
+                 max_pages: Optional[int] = None):
+        self.ctx = ctx
+        self.config = ctx['config']
+        self.url = os.getenv('DEPOSIT_RECORD_URL') or xblock_url(DEPOSIT_RECORD_URL, self.config.base_url)
+        self.page_param = os.getenv('DEPOSIT_PAGE_PARAM', 'pageNum')
+        self.size_param = os.getenv('DEPOSIT_SIZE_PARAM', 'pageSize')
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv('DEPOSIT_POLL_SEC', '2'))
+        self.page_size = page_size if page_size is not None else int(os.getenv('DEPOSIT_PAGE_SIZE', '100'))
+        self.max_pages = max_pages if max_pages is not None else int(os.getenv('DEPOSIT_MAX_PAGES', '5'))
+        self.credited_status = {s.strip().upper() for s in os.getenv('DEPOSIT_CREDITED_STATUS', 'SUCCESS,CREDITED,COMPLETED,CONFIRMED,2').split(',') if s.strip()}
+        # 没有运行中的共享传输层时（压测开始前/结束后的等待阶段）才用自己的会话
+        self._fallback_session: Optional[requests.Session] = None
+        self.polls = 0
+        self.poll_errors = 0
+        self._sent: Dict[str, Dict[str, Any]] = {}
+        self._seen: Dict[str, Dict[str, Any]] = {}    # 哈希 -> {"detected_at", "credited_at", "status"}
+        # _sent 中已发现 / 已入账的个数，在状态首次变化时累加，采样与 drain 不再遍历 _sent
+        self._detected = 0
+        self._credited = 0
+        self._backlog: Dict[int, Dict[str, int]] = {}
+        self._t0 = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sampler: Optional[threading.Thread] = None
+
+    # ---- 输入 ----
+    def add(self, tx_hash: Optional[str], sent_at: Optional[float] = None):
+        if not tx_hash:
+            return
+        h = tx_hash.lower()
+        with self._lock:
+            if h in self._sent:
+                return
+            self._sent[h] = {"sent_at": sent_at or time.time()}
+            # 事后补登记的转账可能已经出现在充值记录里
+            seen = self._seen.get(h)
+            if seen is not None:
+                self._detected += 1
+                if seen['credited_at']:
+                    self._credited += 1
+
+    def add_records(self, records: Iterable[Dict[str, Any]]):
+        for r in records:
+            self.add(r.get('tx_hash'), r.get('timestamp'))
+
+    # ---- 轮询 ----
+    def _session(self) -> requests.Session:
+        sess = current_session()
+        if sess is not None:
+            return sess
+        if self._fallback_session is None:
+            self._fallback_session = requests.Session()
+        return self._fallback_session
+
+    def _fetch_page(self, page: int) -> List[Dict[str, Any]]:
+        headers = dict(BASE_HEADERS)
+        cfg = self.config
+        pool = self.ctx.get('token_pool') or get_token_pool(cfg)
+        acct, token = pool.acquire()
+        headers['authorization'] = f'bearer {token}'
+        jsessionid = cfg.jsessionid
+        if jsessionid:
+            headers['Cookie'] = f'JSESSIONID={jsessionid}'
+        params = {
+            self.page_param: str(page),
+            self.size_param: str(self.page_size),
+            'walletId': str(self.ctx.get('wallet_id', '')),
+            'chainName': str(self.ctx.get('chain_name', '')),
+        }
+        sess = self._session()
+        pm = self.ctx.get('proxy_manager') or get_proxy_manager(cfg)
+        resp = pm.call(lambda proxies: sess.get(self.url, headers=headers, params=params,
+                                                proxies=normalize_proxies(proxies),
+                                                verify=self.ctx.get('verify_opt', cfg.verify),
+                                                timeout=cfg.getaddr_timeout))
+        if resp.status_code == 401:
+            pool.invalidate(token, acct)
+        resp.raise_for_status()
+        return _extract_records(resp.json())
+
+    def poll_once(self):
+        now = time.time()
+        for page in range(1, self.max_pages + 1):
+            records = self._fetch_page(page)
+            fresh = 0
+            with self._lock:
+                for rec in records:
+                    h = _first(rec, _HASH_FIELDS)
+                    if not h:
+                        continue
+                    h = str(h).lower()
+                    status = str(_first(rec, _STATUS_FIELDS) or '').upper()
+                    ours = h in self._sent
+                    seen = self._seen.get(h)
+                    if seen is None:
+                        seen = self._seen[h] = {"detected_at": now, "credited_at": None, "status": status}
+                        fresh += 1
+                        if ours:
+                            self._detected += 1
+                    seen['status'] = status
+                    if seen['credited_at'] is None and status in self.credited_status:
+                        seen['credited_at'] = now
+                        fresh += 1
+                        if ours:
+                            self._credited += 1
+            # 本页没有任何新信息（全是已知终态记录）或已到末页，就不再往后翻
+            if fresh == 0 or len(records) < self.page_size:
+                break
+        self.polls += 1
+
+    def _sample_backlog(self, now: float):
+        with self._lock:
+            sent, detected, credited = len(self._sent), self._detected, self._credited
+            self._backlog[int(now - self._t0)] = {
+                "sent": sent,
+                "detected": detected,
+                "credited": credited,
+                "awaiting_detection": sent - detected,
+                "awaiting_credit": sent - credited,
+            }
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.poll_errors += 1
+                print(f'[WARN] 充值记录轮询失败: {e}')
+            self._stop.wait(self.poll_interval)
+
+    def _sample_loop(self):
+        # 按启动时刻对齐的 1 秒节拍采样，轮询慢或间隔大时每秒积压也不缺点
+        tick = 0
+        while True:
+            self._sample_backlog(time.time())
+            tick += 1
+            if self._stop.wait(max(0.0, self._t0 + tick - time.time())):
+                return
+
+    def start(self) -> 'DepositWatcher':
+        self._t0 = time.time()
+        self._thread = threading.Thread(target=self._loop, name='deposit-watcher', daemon=True)
+        self._thread.start()
+        self._sampler = threading.Thread(target=self._sample_loop, name='deposit-backlog', daemon=True)
+        self._sampler.start()
+        print(f'🏦 入账跟踪已启动：每 {self.poll_interval}s 拉取最多 {self.max_pages} 页 × {self.page_size} 条充值记录，积压每 1s 采样一次')
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 30)
+            self._thread = None
+        if self._sampler is not None:
+            self._sampler.join(timeout=5)
+            self._sampler = None
+        # 停止时补一个终点样本，保证最后一秒的积压被记录
+        self._sample_backlog(time.time())
+
+    def drain(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """等待已发送的转账全部入账（最多 timeout 秒，默认 DEPOSIT_WAIT_SEC=180），停止轮询并返回报告。"""
+        deadline = time.time() + (timeout if timeout is not None else float(os.getenv('DEPOSIT_WAIT_SEC', '180')))
+        while time.time() < deadline:
+            with self._lock:
+                done = self._credited >= len(self._sent)
+            if done:
+                break
+            time.sleep(self.poll_interval)
+        self.stop()
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            detect: List[float] = []
+            credit: List[float] = []
+            for h, s in self._sent.items():
+                seen = self._seen.get(h)
+                if seen is None:
+                    continue
+                detect.append(max(0.0, seen['detected_at'] - s['sent_at']))
+                if seen['credited_at']:
+                    credit.append(max(0.0, seen['credited_at'] - s['sent_at']))
+            backlog = [{"sec_index": k, **v} for k, v in sorted(self._backlog.items())]
+            total = len(self._sent)
+        return {
+            "sent": total,
+            "detected": len(detect),
+            "credited": len(credit),
+            "undetected": total - len(detect),
+            "detect_latency_ms": summarize_lag_ms(detect),
+            "credit_latency_ms": summarize_lag_ms(credit),
+            "backlog": backlog,
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "poll_interval_sec": self.poll_interval,
+        }
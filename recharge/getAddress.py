@@ -1,19 +1,26 @@
 import os
 import sys
 import json
+import time
 from typing import Dict, List, Optional, Tuple
 import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 确保从子目录运行时也能导入到项目根下的 common.getToken
 try:
-    from common.getToken import get_token_with_auto_refresh
+    from common.getToken import get_token_pool, get_token_with_auto_refresh, invalidate_token
 except ModuleNotFoundError:
     CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
     PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
     if PROJECT_ROOT not in sys.path:
         sys.path.insert(0, PROJECT_ROOT)
-    from common.getToken import get_token_with_auto_refresh
+    from common.getToken import get_token_pool, get_token_with_auto_refresh, invalidate_token
+from common.config import RunConfig, get_config
+from common.transport import current_session, xblock_url
+from common.proxy_manager import get_proxy_manager, proxy_label
+from common.histogram import timed
+from common.aggregator import ResultAggregator
+from common.validation import ResponseClassifier
 
 # 复用与 token 获取一致的 UA/头部风格
 BASE_HEADERS = {
@@ -33,13 +40,6 @@ BASE_HEADERS = {
 
 ADDRESS_URL = 'https://xblock-test.charprotocol.com/api/asset/member/wallet/deposit/address'
 
-# 探测 SOCKS 支持
-try:
-    import socks  # type: ignore
-    HAS_SOCKS = True
-except Exception:
-    HAS_SOCKS = False
-
 
 def normalize_url(u: Optional[str]) -> Optional[str]:
     if not u:
@@ -62,78 +62,31 @@ def normalize_proxies(p: Dict[str, str]) -> Dict[str, str]:
     return out
 
 
-def build_proxy_candidates() -> List[Dict[str, str]]:
-    candidates: List[Dict[str, str]] = []
-
-    http_env = normalize_url(os.environ.get('HTTP_PROXY') or os.environ.get('http_proxy'))
-    https_env = normalize_url(os.environ.get('HTTPS_PROXY') or os.environ.get('https_proxy'))
-    all_env = normalize_url(os.environ.get('ALL_PROXY') or os.environ.get('all_proxy'))
-    if any([http_env, https_env, all_env]):
-        proxies_env: Dict[str, str] = {}
-        if all_env:
-            proxies_env = {'http': all_env, 'https': all_env}
-        else:
-            if http_env:
-                proxies_env['http'] = http_env
-            if https_env:
-                proxies_env['https'] = https_env
-        if proxies_env:
-            candidates.append(proxies_env)
-
-    candidates.append({'http': 'http://127.0.0.1:7890', 'https': 'http://127.0.0.1:7890'})
+def build_proxy_candidates(config: RunConfig) -> List[Dict[str, str]]:
+    """代理候选列表（运行配置快照中确定，见 common.config），返回副本。"""
+    return [dict(p) for p in config.proxy_candidates]
 
-    if HAS_SOCKS:
-        candidates.append({'http': 'socks5h://127.0.0.1:7891', 'https': 'socks5h://127.0.0.1:7891'})
-    else:
-        pass
-
-    return candidates
-
-
-def get_verify_option() -> object:
-    custom_ca = os.getenv('PROXY_CA_BUNDLE')
-    env_cas = [
-        custom_ca,
-        os.getenv('REQUESTS_CA_BUNDLE'),
-        os.getenv('SSL_CERT_FILE'),
-        os.getenv('CURL_CA_BUNDLE'),
-    ]
-    for p in env_cas:
-        if p and os.path.isfile(p):
-            print(f"[INFO] 使用证书文件进行 TLS 校验: {p}")
-            return p
-    if os.getenv('DISABLE_TLS_VERIFY') == '1':
-        print('[WARN] 已关闭 TLS 证书校验（仅用于调试，请尽快改回）')
-        try:
-            import urllib3  # type: ignore
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        except Exception:
-            pass
-        return False
-    return True
 
+def get_verify_option(config: RunConfig) -> object:
+    """TLS 校验选项（运行配置快照中确定一次，见 common.config）。"""
+    return config.verify
 
-def get_token_for_auth() -> str:
-    # 允许通过环境变量 TOKEN_REFRESH_INTERVAL_SEC 控制刷新间隔（秒），默认 300
-    interval_env = os.getenv('TOKEN_REFRESH_INTERVAL_SEC')
-    try:
-        interval = int(interval_env) if interval_env is not None else None
-    except Exception:
-        interval = None
 
-    token = get_token_with_auto_refresh(interval)
+def get_token_for_auth(config: Optional[RunConfig] = None) -> str:
+    # 由 common.getToken.TokenRefresher 按 expires_in 在后台续期，请求路径通常直接拿到缓存的 token
+    token = get_token_with_auto_refresh(config=config)
     if not token:
         raise RuntimeError('get_token_with_auto_refresh() 返回空 token')
     return token
 
 
-def fetch_deposit_address(session: requests.Session, proxies: Dict[str, str], verify_opt: object, token: str,
-                          lock_time: int, chain_name: str, wallet_id: int) -> requests.Response:
+def build_address_request(token: str, lock_time: int, chain_name: str, wallet_id: int,
+                          jsessionid: Optional[str] = None) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """构造地址接口的请求头与查询参数（线程/异步两种引擎共用）。jsessionid 取自运行配置，为空时不带 Cookie。"""
     headers = dict(BASE_HEADERS)
     # 注意：应用户要求使用小写 authorization 且 scheme 使用小写 bearer
     headers['authorization'] = f'bearer {token}'
 
-    jsessionid = os.getenv('JSESSIONID')
     if jsessionid:
         headers['Cookie'] = f'JSESSIONID={jsessionid}'
 
@@ -142,140 +95,174 @@ def fetch_deposit_address(session: requests.Session, proxies: Dict[str, str], ve
         'chainName': chain_name,
         'walletId': str(wallet_id),
     }
+    return headers, params
 
-    timeout_s = float(os.getenv('GETADDR_TIMEOUT', '15'))
-
-    resp = session.get(
-        ADDRESS_URL,
-        headers=headers,
-        params=params,
-        proxies=normalize_proxies(proxies),
-        timeout=timeout_s,
-        allow_redirects=True,
-        verify=verify_opt,
-    )
+
+def fetch_deposit_address(session: requests.Session, proxies: Dict[str, str], verify_opt: object, token: str,
+                          lock_time: int, chain_name: str, wallet_id: int,
+                          config: Optional[RunConfig] = None) -> requests.Response:
+    cfg = config or get_config()
+    headers, params = build_address_request(token, lock_time, chain_name, wallet_id, cfg.jsessionid)
+
+    with timed('address'):
+        resp = session.get(
+            xblock_url(ADDRESS_URL, cfg.base_url),
+            headers=headers,
+            params=params,
+            proxies=normalize_proxies(proxies),
+            timeout=cfg.getaddr_timeout,
+            allow_redirects=True,
+            verify=verify_opt,
+        )
     return resp
 
 
+def _query_params(cfg: RunConfig, lock_time, chain_name, wallet_id) -> Tuple[int, str, int]:
+    """本次调用的查询参数：显式传入优先，否则取运行配置的 ADDR_* 默认值（不写回环境变量）。"""
+    return (int(lock_time) if lock_time is not None else cfg.addr_lock_time,
+            str(chain_name) if chain_name is not None else cfg.addr_chain_name,
+            int(wallet_id) if wallet_id is not None else cfg.addr_wallet_id)
+
+
 def get_recharge_address_json(lock_time: Optional[str] = None,
                               chain_name: Optional[str] = None,
-                              wallet_id: Optional[str] = None) -> dict:
+                              wallet_id: Optional[str] = None,
+                              config: Optional[RunConfig] = None) -> dict:
     """以与脚本相同的代理/证书/认证机制调用地址接口，返回 JSON 数据。
-    可通过参数临时覆盖环境变量（若为 None 则使用环境变量或默认值）。
+    参数只作用于本次调用（为 None 时取运行配置中的默认值）。
     失败则抛出异常。
     """
-    # 覆盖查询参数（通过环境变量传递给 fetch_address）
-    if lock_time is not None:
-        os.environ['ADDR_LOCK_TIME'] = str(lock_time)
-    if chain_name is not None:
-        os.environ['ADDR_CHAIN_NAME'] = str(chain_name)
-    if wallet_id is not None:
-        os.environ['ADDR_WALLET_ID'] = str(wallet_id)
-
-    # 从环境变量获取查询参数的最终值
-    lock_time_val = int(os.getenv('ADDR_LOCK_TIME', '0'))
-    chain_name_val = os.getenv('ADDR_CHAIN_NAME', 'BTT_TEST')
-    wallet_id_val = int(os.getenv('ADDR_WALLET_ID', '127'))
-
-    # 确保从 key.env 读取到可能需要的变量
-    try:
-        from dotenv import load_dotenv  # type: ignore
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        env_path = os.path.join(base_dir, 'key.env')
-        if os.path.exists(env_path):
-            load_dotenv(env_path)
-        elif os.path.exists('key.env'):
-            load_dotenv('key.env')
-    except Exception:
-        pass
+    cfg = config or get_config()
+    lock_time_val, chain_name_val, wallet_id_val = _query_params(cfg, lock_time, chain_name, wallet_id)
 
     # 使用更严格的 token 获取封装（带自动刷新）
-    token = get_token_for_auth()
-    session = requests.Session()
-    verify_opt = get_verify_option()
-    proxies_list = build_proxy_candidates()
+    token = get_token_for_auth(cfg)
+    session = current_session() or requests.Session()
+
+    # 出口由代理管理器选择（启动时探测一次并缓存），只在出口失败时切换候选
+    resp = get_proxy_manager(cfg).call(
+        lambda proxies: fetch_deposit_address(session, proxies, cfg.verify, token, lock_time_val, chain_name_val, wallet_id_val, cfg))
+    if resp.ok:
+        return resp.json()
+    if resp.status_code == 401:
+        invalidate_token(token, cfg)
+    err = RuntimeError(f'获取充值地址 JSON 失败（HTTP {resp.status_code}）：{resp.text[:300]}')
+    err.status = resp.status_code  # type: ignore[attr-defined]
+    raise err
+
+
+def prepare_address_context(lock_time: Optional[str] = None,
+                            chain_name: Optional[str] = None,
+                            wallet_id: Optional[str] = None,
+                            config: Optional[RunConfig] = None) -> Dict:
+    """解析查询参数并选定代理出口，返回供 address_one_call 复用的上下文
+    （含运行配置 'config'、代理管理器 'proxy_manager' 与 token 池 'token_pool'）。
+
+    一次压测只需调用一次；开环调度器与 batch_get_recharge_address_json 都基于它发请求。
+    代理探测由 common.proxy_manager 在首次选择时做一次（HEAD 站点根路径）并缓存，不再用真实地址请求逐个试探。
+    """
+    cfg = config or get_config()
+    lock_time_val, chain_name_val, wallet_id_val = _query_params(cfg, lock_time, chain_name, wallet_id)
 
-    last_error: Optional[Exception] = None
-    for proxies in proxies_list:
-        try:
-            # 这里调用已定义的 fetch_deposit_address，而不是不存在的 fetch_address
-            resp = fetch_deposit_address(session, proxies, verify_opt, token, lock_time_val, chain_name_val, wallet_id_val)
-            if resp.ok:
-                return resp.json()
-            else:
-                _ = resp.text[:800]
-        except Exception as e:
-            last_error = e
-            continue
-    if last_error:
-        raise last_error
-    raise RuntimeError('获取充值地址 JSON 失败：所有代理候选均尝试失败')
+    # 先为每个账号取一次 token，避免首批请求集中等待刷新（之后由后台线程在过期前续期）
+    pool = get_token_pool(cfg)
+    pool.prefetch()
+
+    pm = get_proxy_manager(cfg)
+    idx, selected_proxies = pm.select()
+    if pm.spreading:
+        print(f"🚦 代理分流（{pm.mode}）: {', '.join(proxy_label(p) for p in pm.active_proxies())}")
+    else:
+        print(f"🚦 代理出口: #{idx + 1} {proxy_label(selected_proxies)}")
+
+    return {
+        'lock_time': lock_time_val,
+        'chain_name': chain_name_val,
+        'wallet_id': wallet_id_val,
+        'verify_opt': cfg.verify,
+        'proxies': dict(selected_proxies),
+        'proxy_manager': pm,
+        'token_pool': pool,
+        'config': cfg,
+    }
+
+
+def address_one_call(ctx: Dict, idx: int, total: Optional[int] = None) -> Tuple[str, dict]:
+    """按上下文发起一次地址请求，返回 ('ok', 响应 JSON) 或 ('err', {"error", "status", "exc"})。"""
+    tag = f"{idx}/{total}" if total else str(idx)
+    # 压测运行中复用共享连接池（见 common.transport），否则退化为一次性会话
+    sess = current_session() or requests.Session()
+    cfg = ctx['config']
+    pool = ctx.get('token_pool') or get_token_pool(cfg)
+    acct = None
+    try:
+        # 每次调用时按序号分配账号并取其 token（后台按 expires_in 续期，这里只读缓存），确保长压期间 token 自动滚动
+        acct, cur_token = pool.acquire(idx)
+        pm = ctx.get('proxy_manager') or get_proxy_manager(cfg)
+        resp = pm.call(lambda proxies: fetch_deposit_address(sess, proxies, ctx['verify_opt'], cur_token,
+                                                             ctx['lock_time'], ctx['chain_name'], ctx['wallet_id'], cfg))
+        pool.record(acct, status=resp.status_code)
+        if resp.ok:
+            try:
+                data = resp.json()
+            except Exception:
+                txt = resp.text[:500]
+                print(f"❌ [{tag}] 响应非 JSON: {txt}")
+                return ('err', {"error": "non-json", "status": resp.status_code, "exc": "non-json"})
+            print(f"✅ [{tag}] 成功")
+            return ('ok', data)
+        else:
+            if resp.status_code == 401:
+                # token 被服务端判定失效：触发一次合并的强制刷新，后续请求换用新 token
+                pool.invalidate(cur_token, acct)
+            print(f"❌ [{tag}] HTTP {resp.status_code}")
+            return ('err', {"error": f"HTTP {resp.status_code}", "status": resp.status_code})
+    except Exception as e:
+        if acct is not None:
+            pool.record(acct, error=True)
+        print(f"❌ [{tag}] 异常: {e}")
+        return ('err', {"error": str(e), "status": None, "exc": type(e).__name__})
+
+
+async def address_one_call_async(client, ctx: Dict, idx: int) -> Tuple[str, dict]:
+    """address_one_call 的异步版本，client 为 common.async_engine.AsyncHttpClient。"""
+    cfg = ctx['config']
+    acct, token = client.auth(idx)
+    headers, params = build_address_request(token, ctx['lock_time'], ctx['chain_name'], ctx['wallet_id'], cfg.jsessionid)
+    with timed('address'):
+        kind, data = await client.request_json('GET', xblock_url(ADDRESS_URL, cfg.base_url), str(idx), account=acct,
+                                               headers=headers, params=params)
+    if kind == 'ok':
+        print(f"✅ [{idx}] 成功")
+    return kind, data
 
 
 def batch_get_recharge_address_json(total: int,
                                     lock_time: Optional[str] = None,
                                     chain_name: Optional[str] = None,
-                                    wallet_id: Optional[str] = None) -> Tuple[List[dict], List[dict]]:
+                                    wallet_id: Optional[str] = None,
+                                    aggregator: Optional[ResultAggregator] = None,
+                                    classifier: Optional[ResponseClassifier] = None,
+                                    max_workers: Optional[int] = None,
+                                    config: Optional[RunConfig] = None) -> Tuple[List[dict], List[dict]]:
     """并发批量获取充值地址 JSON，用于高并发压测。
 
     Args:
         total: 并发请求总数（同样的参数会被请求 total 次）
         lock_time, chain_name, wallet_id: 同 get_recharge_address_json，可临时覆盖。
+        aggregator: 传入时由工作线程把结果（状态、业务 code、耗时、响应体）直接推入该汇总器，
+            不再保留完整响应列表，返回的两个列表为空；大批量/长时间运行时用它保持内存恒定。
+        classifier: 传入时按业务校验判定成功（见 common.validation），2xx 但校验失败的响应归入失败。
+        max_workers: 线程池并发度，默认取运行配置的 getaddr_max_workers（GETADDR_MAX_WORKERS，默认 1）。
+        config: 运行配置快照，默认 get_config()。
 
     Returns:
         (success_list, fail_list)，其中 success_list 每项为响应 JSON，fail_list 每项包含 {"error": str, "status": int | None}
     """
-    # 参数覆盖与解析
-    if lock_time is not None:
-        os.environ['ADDR_LOCK_TIME'] = str(lock_time)
-    if chain_name is not None:
-        os.environ['ADDR_CHAIN_NAME'] = str(chain_name)
-    if wallet_id is not None:
-        os.environ['ADDR_WALLET_ID'] = str(wallet_id)
-
-    lock_time_val = int(os.getenv('ADDR_LOCK_TIME', '0'))
-    chain_name_val = os.getenv('ADDR_CHAIN_NAME', 'BTT_TEST')
-    wallet_id_val = int(os.getenv('ADDR_WALLET_ID', '127'))
-
-    # 环境与鉴权
-    try:
-        from dotenv import load_dotenv  # type: ignore
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        env_path = os.path.join(base_dir, 'key.env')
-        if os.path.exists(env_path):
-            load_dotenv(env_path)
-        elif os.path.exists('key.env'):
-            load_dotenv('key.env')
-    except Exception:
-        pass
-
-    # 先获取一次 token 供探测阶段使用（实际并发时每次调用都会从缓存/刷新获取）
-    token_probe = get_token_for_auth()
-    verify_opt = get_verify_option()
-    proxies_list = build_proxy_candidates()
-
-    # 先探测可用代理，优先使用第一个可成功响应的代理
-    print("🚦 代理可用性探测中...")
-    selected_proxies = None
-    for idx, p in enumerate(proxies_list, start=1):
-        try:
-            s = requests.Session()
-            r = fetch_deposit_address(s, p, verify_opt, token_probe, lock_time_val, chain_name_val, wallet_id_val)
-            if r.ok:
-                selected_proxies = p
-                print(f"[INFO] 使用代理 #{idx}: {p}")
-                break
-            else:
-                print(f"[WARN] 代理 #{idx} 响应 {r.status_code}")
-        except Exception as e:
-            print(f"[WARN] 代理 #{idx} 失败: {e}")
-            continue
-    if selected_proxies is None:
-        # 都不可用时仍然采用第一个候选以便返回错误详情
-        selected_proxies = proxies_list[0] if proxies_list else {}
-        print("[WARN] 未找到可用代理，将使用首个候选继续尝试")
+    ctx = prepare_address_context(lock_time, chain_name, wallet_id, config)
 
-    max_workers = int(os.getenv('GETADDR_MAX_WORKERS', '1'))
+    if max_workers is None:
+        max_workers = ctx['config'].getaddr_max_workers
     max_workers = max(1, min(max_workers, total))
 
     print(f"🚀 并发获取充值地址开始 | 请求数: {total} | 并发度: {max_workers}")
@@ -283,30 +270,26 @@ def batch_get_recharge_address_json(total: int,
     success_list: List[dict] = []
     fail_list: List[dict] = []
 
-    def one_call(idx: int):
-        sess = requests.Session()
-        try:
-            # 每次调用时获取 token（走自动刷新缓存，不会频繁请求），确保长压期间 token 自动滚动
-            cur_token = get_token_for_auth()
-            resp = fetch_deposit_address(sess, selected_proxies, verify_opt, cur_token, lock_time_val, chain_name_val, wallet_id_val)
-            if resp.ok:
-                try:
-                    data = resp.json()
-                except Exception:
-                    txt = resp.text[:500]
-                    print(f"❌ [{idx}/{total}] 响应非 JSON: {txt}")
-                    return ('err', {"error": "non-json", "status": resp.status_code})
-                print(f"✅ [{idx}/{total}] 成功")
-                return ('ok', data)
-            else:
-                print(f"❌ [{idx}/{total}] HTTP {resp.status_code}")
-                return ('err', {"error": f"HTTP {resp.status_code}", "status": resp.status_code})
-        except Exception as e:
-            print(f"❌ [{idx}/{total}] 异常: {e}")
-            return ('err', {"error": str(e), "status": None})
+    def call_one(idx: int) -> Tuple[str, dict]:
+        kind, payload = address_one_call(ctx, idx, total)
+        return classifier.classify(kind, payload) if classifier is not None else (kind, payload)
+
+    if aggregator is not None:
+        def push_one(idx: int):
+            t0 = time.perf_counter()
+            kind, payload = call_one(idx)
+            p = payload if isinstance(payload, dict) else {}
+            aggregator.push(kind == 'ok', status=p.get('status'), code=p.get('code'),
+                            latency=time.perf_counter() - t0, body=payload)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for fut in as_completed([executor.submit(push_one, i + 1) for i in range(total)]):
+                fut.result()
+        print(f"📊 批量结束：成功 {aggregator.success} / 失败 {aggregator.failed}")
+        return success_list, fail_list
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(one_call, i + 1) for i in range(total)]
+        futures = [executor.submit(call_one, i + 1) for i in range(total)]
         for fut in as_completed(futures):
             kind, payload = fut.result()
             if kind == 'ok':
@@ -319,39 +302,34 @@ def batch_get_recharge_address_json(total: int,
 
 
 def main():
-    # 读取 key.env（用于参数和证书、代理设置）
-    try:
-        from dotenv import load_dotenv  # type: ignore
-        if os.path.exists('key.env'):
-            load_dotenv('key.env')
-    except Exception:
-        pass
+    # 本次运行的配置快照（读取 key.env，用于参数和证书、代理设置）
+    cfg = RunConfig.from_env()
 
     # 查询参数（如未设置则使用你示例中的默认值）
-    lock_time = int(os.getenv('ADDR_LOCK_TIME', '0'))
-    chain_name = os.getenv('ADDR_CHAIN_NAME', 'BTT_TEST')
-    wallet_id = int(os.getenv('ADDR_WALLET_ID', '127'))
+    lock_time = cfg.addr_lock_time
+    chain_name = cfg.addr_chain_name
+    wallet_id = cfg.addr_wallet_id
 
     # 获取 token（带自动刷新）
-    token = get_token_for_auth()
+    token = get_token_for_auth(cfg)
     print('[INFO] 已获取 token（前 30 字符预览）:', token[:30] + '...')
 
     session = requests.Session()
-    verify_opt = get_verify_option()
+    verify_opt = cfg.verify
     print(f"[INFO] TLS verify 模式: {verify_opt}")
 
     # 支持命令行环境触发批量并发演示：设置 GETADDR_DEMO_BATCH > 0
     demo_batch = int(os.getenv('GETADDR_DEMO_BATCH', '0'))
     if demo_batch > 0:
-        batch_get_recharge_address_json(demo_batch, lock_time, chain_name, wallet_id)
+        batch_get_recharge_address_json(demo_batch, lock_time, chain_name, wallet_id, config=cfg)
         return
 
-    proxies_list = build_proxy_candidates()
+    proxies_list = build_proxy_candidates(cfg)
     last_error = None
     for idx, proxies in enumerate(proxies_list, start=1):
         try:
             print(f"[INFO] 尝试使用代理 #{idx}: {proxies}")
-            resp = fetch_deposit_address(session, proxies, verify_opt, token, lock_time, chain_name, wallet_id)
+            resp = fetch_deposit_address(session, proxies, verify_opt, token, lock_time, chain_name, wallet_id, cfg)
             content_type = resp.headers.get('Content-Type', '')
             print(f"[INFO] HTTP {resp.status_code}, Content-Type: {content_type}")
             if resp.ok:
@@ -0,0 +1,525 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import rlp  # type: ignore
+from eth_account import Account  # type: ignore
+from eth_utils import keccak, to_checksum_address  # type: ignore
+
+# 允许从项目根导入
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from common.mock_xblock import LatencyModel  # noqa: E402
+
+# 本地 EVM JSON-RPC 节点替身：只实现发压工具与回执跟踪用到的方法，交易真实验签并按发送方维护 nonce，
+# 按固定间隔出块，供离线压测 recharge/sendTx.py 的签名与发送吞吐（BTT_RPC_URL 指向它即可）
+
+DEFAULT_NODE_PORT = 18545
+DEFAULT_CHAIN_ID = 1029
+INTRINSIC_GAS = 21000
+WEI_PER_ETHER = 10 ** 18
+
+
+class RpcError(Exception):
+    def __init__(self, message: str, code: int = -32000):
+        super().__init__(message)
+        self.code = code
+
+
+def _int(b: bytes) -> int:
+    return int.from_bytes(b, 'big') if b else 0
+
+
+def _hex(n: int) -> str:
+    return hex(n)
+
+
+def _hash_hex(b: bytes) -> str:
+    return '0x' + b.hex()
+
+
+def _parse_block_tag(tag: Any, head: int) -> int:
+    if tag in (None, 'latest', 'pending', 'safe', 'finalized'):
+        return head
+    if tag == 'earliest':
+        return 0
+    return int(tag, 16) if isinstance(tag, str) else int(tag)
+
+
+def decode_raw_transaction(raw: bytes) -> Dict[str, Any]:
+    """解析已签名的原始交易（legacy / EIP-2930 / EIP-1559），并通过签名恢复发送方。解析或验签失败抛 RpcError。"""
+    try:
+        if raw and raw[0] in (1, 2):
+            fields = rlp.decode(raw[1:])
+            tx_type = raw[0]
+            if tx_type == 1:
+                chain_id, nonce, gas_price, gas, to, value, data = fields[:7]
+                max_fee = _int(gas_price)
+            else:
+                chain_id, nonce, _prio, max_fee_b, gas, to, value, data = fields[:8]
+                max_fee = _int(max_fee_b)
+            chain_id_val: Optional[int] = _int(chain_id)
+        else:
+            fields = rlp.decode(raw)
+            tx_type = 0
+            nonce, gas_price, gas, to, value, data, v = fields[:7]
+            max_fee = _int(gas_price)
+            v_val = _int(v)
+            chain_id_val = (v_val - 35) // 2 if v_val >= 35 else None
+    except Exception as e:
+        raise RpcError(f'rlp: failed to decode transaction: {e}')
+    try:
+        sender = Account.recover_transaction(raw)
+    except Exception as e:
+        raise RpcError(f'invalid sender: {e}')
+    return {
+        "type": tx_type,
+        "chain_id": chain_id_val,
+        "nonce": _int(nonce),
+        "gas_price": max_fee,
+        "gas": _int(gas),
+        "to": to_checksum_address(to) if to else None,
+        "value": _int(value),
+        "input": data,
+        "from": to_checksum_address(sender),
+        "hash": _hash_hex(keccak(raw)),
+    }
+
+
+class MockChain:
+    """链状态：余额、已确认 nonce、交易池（按发送方 × nonce）、区块与回执。所有读写持同一把锁。
+
+    交易池行为仿照 geth：nonce 低于已确认值拒绝（nonce too low），同 nonce 需加价 10% 才能替换，
+    超前的 nonce 进入队列，等前面的空洞补齐后才会被打包。
+    """
+
+    def __init__(self,
+                 chain_id: int = DEFAULT_CHAIN_ID,
+                 block_time: float = 2.0,
+                 block_gas_limit: int = 30_000_000,
+                 gas_price: int = 50 * 10 ** 9,
+                 default_balance: int = 10_000 * WEI_PER_ETHER):
+        self.chain_id = chain_id
+        self.block_time = max(0.0, block_time)
+        self.block_gas_limit = block_gas_limit
+        self.gas_price = gas_price
+        self.default_balance = default_balance
+        self.balances: Dict[str, int] = {}
+        self.nonces: Dict[str, int] = {}
+        self.pool: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self.txs: Dict[str, Dict[str, Any]] = {}
+        self.receipts: Dict[str, Dict[str, Any]] = {}
+        self.blocks: List[Dict[str, Any]] = []
+        self.counters: Dict[str, int] = {"accepted": 0, "rejected": 0, "replaced": 0, "mined": 0}
+        self.rejects: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._append_block([])
+
+    # ---- 状态读取 ----
+
+    def head(self) -> int:
+        return len(self.blocks) - 1
+
+    def balance(self, addr: str) -> int:
+        return self.balances.get(addr.lower(), self.default_balance)
+
+    def nonce(self, addr: str, pending: bool = False) -> int:
+        key = addr.lower()
+        n = self.nonces.get(key, 0)
+        if pending:
+            queued = self.pool.get(key, {})
+            while n in queued:
+                n += 1
+        return n
+
+    # ---- 交易池 ----
+
+    def _reject(self, reason: str):
+        self.counters['rejected'] += 1
+        self.rejects[reason] = self.rejects.get(reason, 0) + 1
+        raise RpcError(reason)
+
+    def submit(self, raw_hex: str) -> str:
+        try:
+            raw = bytes.fromhex(raw_hex[2:] if raw_hex.startswith('0x') else raw_hex)
+        except Exception:
+            raise RpcError('invalid raw transaction hex', -32602)
+        tx = decode_raw_transaction(raw)
+        with self._lock:
+            if tx['chain_id'] is not None and tx['chain_id'] != self.chain_id:
+                self._reject('invalid chain id for signer')
+            if tx['gas'] < INTRINSIC_GAS:
+                self._reject('intrinsic gas too low')
+            if tx['gas'] > self.block_gas_limit:
+                self._reject('exceeds block gas limit')
+            if tx['gas_price'] < self.gas_price:
+                self._reject('transaction underpriced')
+            sender = tx['from'].lower()
+            if tx['nonce'] < self.nonces.get(sender, 0):
+                self._reject('nonce too low')
+            if tx['hash'] in self.txs:
+                self._reject('already known')
+            cost = tx['value'] + tx['gas'] * tx['gas_price']
+            if self.balance(sender) < cost:
+                self._reject('insufficient funds for gas * price + value')
+            queued = self.pool.setdefault(sender, {})
+            old = queued.get(tx['nonce'])
+            if old is not None:
+                if tx['gas_price'] * 10 < old['gas_price'] * 11:
+                    self._reject('replacement transaction underpriced')
+                self.txs.pop(old['hash'], None)
+                self.counters['replaced'] += 1
+            tx['submitted_at'] = time.time()
+            queued[tx['nonce']] = tx
+            self.txs[tx['hash']] = tx
+            self.counters['accepted'] += 1
+            if self.block_time == 0:
+                self._mine_locked()
+        return tx['hash']
+
+    # ---- 出块 ----
+
+    def _append_block(self, txs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        number = len(self.blocks)
+        parent = self.blocks[-1]['hash'] if self.blocks else '0x' + '00' * 32
+        block = {
+            "number": number,
+            "hash": _hash_hex(keccak(f'{parent}:{number}:{len(txs)}:{time.time()}'.encode())),
+            "parentHash": parent,
+            "timestamp": int(time.time()),
+            "gasUsed": sum(tx['gas_used'] for tx in txs),
+            "transactions": [tx['hash'] for tx in txs],
+        }
+        self.blocks.append(block)
+        return block
+
+    def _mine_locked(self) -> Dict[str, Any]:
+        gas_left = self.block_gas_limit
+        picked: List[Dict[str, Any]] = []
+        # 各发送方按 nonce 连续的交易轮流入块，直到达到区块 gas 上限
+        progress = True
+        while progress and gas_left >= INTRINSIC_GAS:
+            progress = False
+            for sender in list(self.pool.keys()):
+                queued = self.pool[sender]
+                n = self.nonces.get(sender, 0)
+                tx = queued.get(n)
+                if tx is None or tx['gas'] > gas_left:
+                    continue
+                gas_used = INTRINSIC_GAS + 16 * len(tx['input'])
+                gas_used = min(gas_used, tx['gas'])
+                cost = tx['value'] + gas_used * tx['gas_price']
+                del queued[n]
+                self.nonces[sender] = n + 1
+                if self.balance(sender) < cost:
+                    # 出块时余额已不足（同一发送方前面的交易花掉了）：丢弃
+                    self.txs.pop(tx['hash'], None)
+                    continue
+                self.balances[sender] = self.balance(sender) - cost
+                if tx['to']:
+                    to = tx['to'].lower()
+                    self.balances[to] = self.balance(to) + tx['value']
+                tx['gas_used'] = gas_used
+                gas_left -= gas_used
+                picked.append(tx)
+                progress = True
+                if gas_left < INTRINSIC_GAS:
+                    break
+            for sender in [s for s, q in self.pool.items() if not q]:
+                del self.pool[sender]
+        block = self._append_block(picked)
+        cumulative = 0
+        for i, tx in enumerate(picked):
+            cumulative += tx['gas_used']
+            tx['block_number'] = block['number']
+            tx['index'] = i
+            self.receipts[tx['hash']] = {
+                "transactionHash": tx['hash'],
+                "transactionIndex": _hex(i),
+                "blockHash": block['hash'],
+                "blockNumber": _hex(block['number']),
+                "from": tx['from'],
+                "to": tx['to'],
+                "cumulativeGasUsed": _hex(cumulative),
+                "gasUsed": _hex(tx['gas_used']),
+                "effectiveGasPrice": _hex(tx['gas_price']),
+                "contractAddress": None,
+                "logs": [],
+                "logsBloom": '0x' + '00' * 256,
+                "status": '0x1',
+                "type": _hex(tx['type']),
+            }
+        self.counters['mined'] += len(picked)
+        return block
+
+    def mine(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._mine_locked()
+
+    def _miner_loop(self):
+        next_at = time.monotonic() + self.block_time
+        while not self._stop.wait(max(0.0, next_at - time.monotonic())):
+            self.mine()
+            next_at += self.block_time
+
+    def start(self) -> 'MockChain':
+        if self.block_time > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._miner_loop, name='mock-node-miner', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    # ---- 序列化 ----
+
+    def tx_json(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+        mined = 'block_number' in tx
+        block = self.blocks[tx['block_number']] if mined else None
+        return {
+            "hash": tx['hash'],
+            "from": tx['from'],
+            "to": tx['to'],
+            "nonce": _hex(tx['nonce']),
+            "gas": _hex(tx['gas']),
+            "gasPrice": _hex(tx['gas_price']),
+            "value": _hex(tx['value']),
+            "input": '0x' + tx['input'].hex(),
+            "type": _hex(tx['type']),
+            "chainId": _hex(tx['chain_id']) if tx['chain_id'] is not None else None,
+            "blockNumber": _hex(tx['block_number']) if mined else None,
+            "blockHash": block['hash'] if block else None,
+            "transactionIndex": _hex(tx['index']) if mined else None,
+        }
+
+    def block_json(self, number: int, full: bool) -> Optional[Dict[str, Any]]:
+        if number < 0 or number >= len(self.blocks):
+            return None
+        b = self.blocks[number]
+        txs = [self.tx_json(self.txs[h]) if full else h for h in b['transactions'] if h in self.txs]
+        return {
+            "number": _hex(b['number']),
+            "hash": b['hash'],
+            "parentHash": b['parentHash'],
+            "timestamp": _hex(b['timestamp']),
+            "gasLimit": _hex(self.block_gas_limit),
+            "gasUsed": _hex(b['gasUsed']),
+            "baseFeePerGas": _hex(0),
+            "miner": '0x' + '00' * 20,
+            "difficulty": '0x0',
+            "extraData": '0x',
+            "size": _hex(0),
+            "transactions": txs,
+            "uncles": [],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "chain_id": self.chain_id,
+                "head": self.head(),
+                "block_time": self.block_time,
+                "pending": sum(len(q) for q in self.pool.values()),
+                "senders": len(self.pool),
+                "counters": dict(self.counters),
+                "rejects": dict(self.rejects),
+            }
+
+
+class MockNode:
+    """JSON-RPC 分发：单个请求或批量数组，方法名 → 处理函数。"""
+
+    def __init__(self, chain: MockChain, latency: Optional[LatencyModel] = None):
+        self.chain = chain
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.methods = {
+            'web3_clientVersion': lambda p: 'xblock-mock-node/1.0',
+            'net_version': lambda p: str(chain.chain_id),
+            'net_listening': lambda p: True,
+            'eth_chainId': lambda p: _hex(chain.chain_id),
+            'eth_syncing': lambda p: False,
+            'eth_blockNumber': lambda p: _hex(chain.head()),
+            'eth_gasPrice': lambda p: _hex(chain.gas_price),
+            'eth_maxPriorityFeePerGas': lambda p: _hex(0),
+            'eth_getBalance': self._get_balance,
+            'eth_getTransactionCount': self._get_transaction_count,
+            'eth_estimateGas': self._estimate_gas,
+            'eth_sendRawTransaction': lambda p: chain.submit(p[0]),
+            'eth_getTransactionReceipt': self._get_receipt,
+            'eth_getTransactionByHash': self._get_transaction,
+            'eth_getBlockByNumber': self._get_block,
+            # 调试方法（仿 anvil/hardhat）：立即出块、运行中调整处理时延
+            'evm_mine': lambda p: _hex(chain.mine()['number']),
+            'mock_setLatency': self._set_latency,
+        }
+
+    def _set_latency(self, p: List[Any]) -> bool:
+        spec = p[0] if p else None
+        self.latency = LatencyModel(spec) if spec else None
+        return True
+
+    def _get_balance(self, p: List[Any]) -> str:
+        with self.chain._lock:
+            return _hex(self.chain.balance(p[0]))
+
+    def _get_transaction_count(self, p: List[Any]) -> str:
+        with self.chain._lock:
+            return _hex(self.chain.nonce(p[0], pending=len(p) > 1 and p[1] == 'pending'))
+
+    def _estimate_gas(self, p: List[Any]) -> str:
+        data = (p[0] or {}).get('data') or (p[0] or {}).get('input') or '0x'
+        return _hex(INTRINSIC_GAS + 16 * max(0, (len(data) - 2) // 2))
+
+    def _get_receipt(self, p: List[Any]) -> Optional[Dict[str, Any]]:
+        with self.chain._lock:
+            return self.chain.receipts.get(str(p[0]).lower())
+
+    def _get_transaction(self, p: List[Any]) -> Optional[Dict[str, Any]]:
+        with self.chain._lock:
+            tx = self.chain.txs.get(str(p[0]).lower())
+            return self.chain.tx_json(tx) if tx else None
+
+    def _get_block(self, p: List[Any]) -> Optional[Dict[str, Any]]:
+        with self.chain._lock:
+            number = _parse_block_tag(p[0] if p else 'latest', self.chain.head())
+            return self.chain.block_json(number, bool(p[1]) if len(p) > 1 else False)
+
+    def handle_one(self, req: Any) -> Dict[str, Any]:
+        if not isinstance(req, dict) or 'method' not in req:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "invalid request"}}
+        rid = req.get('id')
+        method = req['method']
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        fn = self.methods.get(method)
+        if fn is None:
+            return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32601, "message": f"the method {method} does not exist/is not available"}}
+        try:
+            return {"jsonrpc": "2.0", "id": rid, "result": fn(req.get('params') or [])}
+        except RpcError as e:
+            return {"jsonrpc": "2.0", "id": rid, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32602, "message": f'invalid params: {e}'}}
+
+    def handle(self, body: bytes) -> Any:
+        try:
+            req = json.loads(body)
+        except Exception:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "parse error"}}
+        if isinstance(req, list):
+            if not req:
+                return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "empty batch"}}
+            return [self.handle_one(r) for r in req]
+        return self.handle_one(req)
+
+    def stats(self) -> Dict[str, Any]:
+        out = self.chain.stats()
+        with self._lock:
+            out['calls'] = dict(self.calls)
+        return out
+
+
+class _NodeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'xblock-mock-node'
+
+    def _send(self, status: int, payload: Any):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        node: MockNode = self.server.node  # type: ignore[attr-defined]
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length > 0 else b''
+        if node.latency is not None:
+            delay = node.latency.sample(self.server.rng)  # type: ignore[attr-defined]
+            if delay > 0:
+                time.sleep(delay)
+        self._send(200, node.handle(body))
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] == '/__mock/stats':
+            self._send(200, self.server.node.stats())  # type: ignore[attr-defined]
+        else:
+            self._send(404, {"error": "not found"})
+
+    def log_message(self, *args):
+        pass
+
+
+class MockNodeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, addr: Tuple[str, int], node: MockNode):
+        import random
+        self.node = node
+        self.rng = random.Random()
+        super().__init__(addr, _NodeHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def shutdown(self):
+        self.node.chain.stop()
+        super().shutdown()
+
+
+def start_mock_node(host: str = '127.0.0.1', port: int = 0, chain: Optional[MockChain] = None,
+                    latency: Optional[str] = None) -> MockNodeServer:
+    """在后台线程启动 mock 节点（port=0 取随机端口），server.url 可直接作为 BTT_RPC_URL；用完调用 shutdown()。"""
+    chain = (chain or MockChain()).start()
+    server = MockNodeServer((host, port), MockNode(chain, LatencyModel(latency) if latency else None))
+    threading.Thread(target=server.serve_forever, name='mock-node', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='本地 mock EVM JSON-RPC 节点（验签、按发送方维护 nonce、定时出块、批量请求与回执）')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址，默认 127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_NODE_PORT, help=f'监听端口，默认 {DEFAULT_NODE_PORT}')
+    parser.add_argument('--chain-id', type=int, default=DEFAULT_CHAIN_ID, help=f'链 ID，默认 {DEFAULT_CHAIN_ID}（BTTC Donau）')
+    parser.add_argument('--block-time', type=float, default=2.0, help='出块间隔（秒），0 表示每收到一笔交易立即出块')
+    parser.add_argument('--block-gas-limit', type=int, default=30_000_000, help='区块 gas 上限（决定每块最多打包笔数）')
+    parser.add_argument('--gas-price-gwei', type=float, default=50.0, help='eth_gasPrice 返回值，也是最低接受价格')
+    parser.add_argument('--balance-btt', type=float, default=10_000.0, help='未出现过的地址的初始余额（BTT）')
+    parser.add_argument('--latency', default=None, help='每个 HTTP 请求的处理时延分布，格式同 mock_xblock，如 uniform:1,5')
+    args = parser.parse_args()
+
+    chain = MockChain(
+        chain_id=args.chain_id,
+        block_time=args.block_time,
+        block_gas_limit=args.block_gas_limit,
+        gas_price=int(args.gas_price_gwei * 10 ** 9),
+        default_balance=int(args.balance_btt * WEI_PER_ETHER),
+    )
+    try:
+        server = MockNodeServer((args.host, args.port), MockNode(chain.start(), LatencyModel(args.latency) if args.latency else None))
+    except ValueError as e:
+        print(f'[ERROR] {e}')
+        sys.exit(2)
+    print(f'⛓️ mock 节点已启动：http://{args.host}:{args.port} | chainId={args.chain_id} | 出块间隔 {args.block_time}s')
+    print(f'   使用: BTT_RPC_URL=http://{args.host}:{args.port} python recharge/sendTx.py --recipient 0x... --count 100')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
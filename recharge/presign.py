@@ -0,0 +1,164 @@
+import os
+import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 预签名任务条目：(全局序号, 私钥, 发送地址, nonce)
+PlanItem = Tuple[int, str, str, int]
+
+
+def _sign_chunk(job: Tuple[Dict[str, Any], List[PlanItem]]) -> List[Tuple[int, bytes, str]]:
+    """在子进程里批量签名，返回 [(序号, 原始交易字节, tx_hash)]。
+
+    只依赖 eth_account，不经过 recharge.sendTx 的 Web3 客户端（子进程里无需连接节点）。
+    """
+    from eth_account import Account  # type: ignore
+
+    base_tx, items = job
+    out: List[Tuple[int, bytes, str]] = []
+    for seq, key, from_addr, nonce in items:
+        signed = Account.sign_transaction({**base_tx, 'from': from_addr, 'nonce': nonce}, key)
+        out.append((seq, bytes(signed.raw_transaction), '0x' + bytes(signed.hash).hex()))
+    return out
+
+
+def default_lookahead_sec() -> float:
+    """预签名提前量（秒），PRESIGN_LOOKAHEAD_SEC 配置，默认 0 表示不启用预签名。"""
+    try:
+        return max(0.0, float(os.getenv('PRESIGN_LOOKAHEAD_SEC', '0')))
+    except Exception:
+        return 0.0
+
+
+def default_presign_processes() -> int:
+    """签名进程数，PRESIGN_PROCESSES 可覆盖，默认 CPU 核数。"""
+    try:
+        return max(1, int(os.getenv('PRESIGN_PROCESSES', '0')) or (os.cpu_count() or 1))
+    except Exception:
+        return os.cpu_count() or 1
+
+
+class PresignPipeline:
+    """提前签名流水线：用进程池把调度中接下来 K 秒的交易先签好，发送阶段只需推送字节。
+
+    计划共 total 条，按发出顺序排列（序号递增），item_at(i) 即时给出第 i 条的私钥、发送地址与 nonce，
+    只在提交签名时生成，内存只随提前量窗口增长而不随整轮请求数增长；gas / gasPrice 在整轮内固定。
+    后台线程保持“已提交签名数 - 已取用数 <= lookahead”，签名结果按序号放入就绪表；
+    get() 在 wait_sec 内拿不到结果时返回 None，由调用方现场签名（计入 misses）。
+    """
+
+    def __init__(self,
+                 total: int,
+                 item_at: Callable[[int], PlanItem],
+                 base_tx: Dict[str, Any],
+                 lookahead: int,
+                 processes: Optional[int] = None,
+                 chunk_size: int = 64,
+                 wait_sec: float = 0.05):
+        self.total = max(0, int(total))
+        self.item_at = item_at
+        self.base_tx = dict(base_tx)
+        self.lookahead = max(1, int(lookahead))
+        self.processes = processes or default_presign_processes()
+        self.chunk_size = max(1, min(int(chunk_size), self.lookahead))
+        self.wait_sec = wait_sec
+        self._ready: Dict[int, Tuple[bytes, str]] = {}
+        self._taken: set = set()
+        self._submitted = 0
+        self._consumed = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._feeder: Optional[threading.Thread] = None
+        self.presigned = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _on_done(self, fut):
+        try:
+            rows = fut.result()
+        except Exception as e:
+            print(f'[WARN] 预签名批次失败，相关交易将现场签名: {e}')
+            with self._cond:
+                self.errors += 1
+                self._cond.notify_all()
+            return
+        with self._cond:
+            for seq, raw, tx_hash in rows:
+                if seq not in self._taken:
+                    self._ready[seq] = (raw, tx_hash)
+            self.presigned += len(rows)
+            self._cond.notify_all()
+
+    def _feed(self):
+        total = self.total
+        while True:
+            with self._cond:
+                while not self._closed and self._submitted - self._consumed >= self.lookahead:
+                    self._cond.wait()
+                if self._closed or self._submitted >= total:
+                    return
+                lo = self._submitted
+                hi = min(total, lo + self.chunk_size)
+                self._submitted = hi
+            chunk = [self.item_at(i) for i in range(lo, hi)]
+            fut = self._executor.submit(_sign_chunk, (self.base_tx, chunk))  # type: ignore[union-attr]
+            fut.add_done_callback(self._on_done)
+
+    def start(self) -> 'PresignPipeline':
+        method = os.getenv('MP_START_METHOD') or None
+        self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context(method))
+        self._feeder = threading.Thread(target=self._feed, name='presign-feeder', daemon=True)
+        self._feeder.start()
+        print(f'✍️ 预签名已启动：{self.processes} 个签名进程，提前量 {self.lookahead} 笔，共 {self.total} 笔')
+        return self
+
+    def warmup(self, timeout: float = 30.0) -> int:
+        """等待首个提前量窗口签好（在正式计时前调用），返回就绪条数。"""
+        want = min(self.lookahead, self.total)
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._ready) >= want or self.errors > 0, timeout=timeout)
+            return len(self._ready)
+
+    def get(self, seq: int) -> Optional[Tuple[bytes, str]]:
+        """取出序号 seq 的已签名交易；未就绪则返回 None（调用方现场签名）。"""
+        with self._cond:
+            self._consumed += 1
+            item = self._ready.pop(seq, None)
+            if item is None and self.wait_sec > 0:
+                self._cond.wait_for(lambda: seq in self._ready, timeout=self.wait_sec)
+                item = self._ready.pop(seq, None)
+            if item is None:
+                self._taken.add(seq)
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._cond.notify_all()
+            return item
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "processes": self.processes,
+                "lookahead": self.lookahead,
+                "presigned": self.presigned,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def lookahead_items(stages: Sequence[Tuple[float, int]], lookahead_sec: float, shard_total: int = 1) -> int:
+    """把提前量秒数换算为本分片的交易笔数（按峰值速率计）。"""
+    peak = max((float(r) for r, _ in stages), default=1.0)
+    return max(1, math.ceil(peak * lookahead_sec / max(1, shard_total)))
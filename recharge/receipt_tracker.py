@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+# 允许从项目根导入
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from common.scheduler import summarize_lag_ms  # noqa: E402
+from recharge.transfer_log import iter_transfer_records, load_legacy_view  # noqa: E402
+
+# 只依赖 requests 直接发 JSON-RPC，不需要 web3 / eth_account，可单独对已有转账日志统计，也可直接对接本地 mock 节点
+
+MODE_RECEIPT = 'receipt'
+MODE_BLOCK = 'block'
+
+
+class RpcClient:
+    """最小 JSON-RPC 客户端：单次调用与批量调用（节点不支持批量时自动退化为逐个调用）。"""
+
+    def __init__(self, url: str, request_kwargs: Optional[Dict[str, Any]] = None):
+        self.url = url
+        self.request_kwargs = dict(request_kwargs or {})
+        self.request_kwargs.setdefault('timeout', 30)
+        self.session = requests.Session()
+        self.batch_supported = True
+        self._id = 0
+        self._lock = threading.Lock()
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._id += 1
+            return self._id
+
+    def call(self, method: str, params: List[Any]) -> Any:
+        resp = self.session.post(self.url, json={"jsonrpc": "2.0", "id": self._next_id(), "method": method, "params": params},
+                                 **self.request_kwargs)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get('error'):
+            raise RuntimeError(f"{method} 失败: {data['error']}")
+        return data.get('result')
+
+    def batch(self, calls: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """批量调用，返回与 calls 等长的结果列表（单项出错时该项为 None）。"""
+        if not calls:
+            return []
+        if self.batch_supported:
+            payload = [{"jsonrpc": "2.0", "id": i, "method": m, "params": p} for i, (m, p) in enumerate(calls)]
+            try:
+                resp = self.session.post(self.url, json=payload, **self.request_kwargs)
+                data = resp.json() if resp.ok else None
+            except Exception:
+                data = None
+            if isinstance(data, list):
+                out: List[Any] = [None] * len(calls)
+                for item in data:
+                    idx = item.get('id')
+                    if isinstance(idx, int) and 0 <= idx < len(calls) and not item.get('error'):
+                        out[idx] = item.get('result')
+                return out
+            self.batch_supported = False
+            print('[WARN] 节点不支持 JSON-RPC 批量调用，回执查询退化为逐个调用')
+        out = []
+        for m, p in calls:
+            try:
+                out.append(self.call(m, p))
+            except Exception:
+                out.append(None)
+        return out
+
+
+class ReceiptTracker:
+    """后台跟踪已提交交易的上链情况：提交→打包时延、每个区块的打包笔数/TPS、丢弃与被替换交易。
+
+    两种模式：
+    - receipt（默认）：每轮先查区块高度，出了新块才把未确认交易的 eth_getTransactionReceipt 合成一个 JSON-RPC 批量请求；
+    - block：逐块 eth_getBlockByNumber(full=True) 扫描新区块，匹配我们发出的交易哈希 / 发送地址。
+    提交时间取发送成功时的本地墙上时间；打包时间取首次观察到回执的时间（observed），同时给出按区块时间戳计算的值（block_ts）。
+    """
+
+    def __init__(self,
+                 rpc_url: str,
+                 request_kwargs: Optional[Dict[str, Any]] = None,
+                 mode: Optional[str] = None,
+                 poll_interval: Optional[float] = None,
+                 batch_size: Optional[int] = None,
+                 drop_after_sec: Optional[float] = None):
+        self.rpc = RpcClient(rpc_url, request_kwargs)
+        self.mode = (mode or os.getenv('RECEIPT_TRACK_MODE') or MODE_RECEIPT).strip().lower()
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv('RECEIPT_POLL_SEC', '1'))
+        self.batch_size = max(1, batch_size if batch_size is not None else int(os.getenv('RECEIPT_BATCH_SIZE', '2000')))
+        self.drop_after_sec = drop_after_sec if drop_after_sec is not None else float(os.getenv('RECEIPT_DROP_AFTER_SEC', '120'))
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._done: Dict[str, Dict[str, Any]] = {}
+        self._senders: set = set()
+        self._blocks: Dict[int, Dict[str, Any]] = {}   # 区块号 -> {"timestamp", "tx_count", "ours"}
+        self._last_block: Optional[int] = None
+        self._receipt_head: Optional[int] = None      # receipt 模式下已完整查过一轮回执的区块高度
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- 输入 ----
+    def add(self, tx_hash: str, submitted_at: Optional[float] = None, sender: Optional[str] = None, nonce: Optional[int] = None):
+        if not tx_hash:
+            return
+        h = tx_hash.lower()
+        with self._lock:
+            if h in self._done or h in self._pending:
+                return
+            self._pending[h] = {"tx_hash": h, "submitted_at": submitted_at or time.time(), "from": sender, "nonce": nonce}
+            if sender:
+                self._senders.add(sender.lower())
+
+    def add_records(self, records: Iterable[Dict[str, Any]]):
+        """接收转账日志 / batch_transfer_btt 的成功记录（tx_hash、timestamp、from、nonce）。"""
+        for r in records:
+            self.add(r.get('tx_hash'), r.get('submitted_at') or r.get('timestamp'), r.get('from'), r.get('nonce'))
+
+    # ---- 后台轮询 ----
+    def start(self) -> 'ReceiptTracker':
+        if self.mode == MODE_BLOCK:
+            try:
+                self._last_block = int(self.rpc.call('eth_blockNumber', []), 16) - 1
+            except Exception as e:
+                print(f'[WARN] 读取当前区块失败: {e}')
+        self._thread = threading.Thread(target=self._loop, name='receipt-tracker', daemon=True)
+        self._thread.start()
+        print(f'⛓️ 回执跟踪已启动（模式 {self.mode}，每 {self.poll_interval}s 轮询）')
+        return self
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f'[WARN] 回执轮询失败: {e}')
+            self._stop.wait(self.poll_interval)
+
+    def _block_header(self, number: int) -> Dict[str, Any]:
+        blk = self._blocks.get(number)
+        if blk is None:
+            raw = self.rpc.call('eth_getBlockByNumber', [hex(number), False]) or {}
+            blk = {"timestamp": int(raw.get('timestamp', '0x0'), 16), "tx_count": len(raw.get('transactions') or []), "ours": 0}
+            self._blocks[number] = blk
+        return blk
+
+    def _confirm(self, h: str, block_number: int, status: Optional[int], seen_at: float):
+        with self._lock:
+            rec = self._pending.pop(h, None)
+        if rec is None:
+            return
+        blk = self._block_header(block_number)
+        blk['ours'] += 1
+        rec.update({
+            "state": "mined" if status != 0 else "reverted",
+            "block_number": block_number,
+            "status": status,
+            "observed_latency_sec": max(0.0, seen_at - rec['submitted_at']),
+            "block_latency_sec": max(0.0, blk['timestamp'] - rec['submitted_at']),
+        })
+        with self._lock:
+            self._done[h] = rec
+
+    def poll_once(self):
+        if self.mode == MODE_BLOCK:
+            self._scan_blocks()
+        else:
+            self._poll_receipts()
+
+    def _poll_receipts(self):
+        """每轮一个批量请求：区块高度没变时跳过（上轮查过的交易不可能新上链，之后提交的也进不了已有区块），
+        否则按提交先后取最多 batch_size 笔未确认交易合成一个批量 eth_getTransactionReceipt；
+        本轮没查完的留到下一轮（即使高度未变也继续查）。"""
+        with self._lock:
+            if not self._pending:
+                return
+            hashes = list(self._pending.keys())
+        try:
+            head: Optional[int] = int(self.rpc.call('eth_blockNumber', []), 16)
+        except Exception:
+            head = None   # 读不到高度时不跳过，照常查询
+        if head is not None and head == self._receipt_head:
+            return
+        chunk = hashes[:self.batch_size]
+        receipts = self.rpc.batch([('eth_getTransactionReceipt', [h]) for h in chunk])
+        seen_at = time.time()
+        for h, rcpt in zip(chunk, receipts):
+            if rcpt and rcpt.get('blockNumber'):
+                status = rcpt.get('status')
+                self._confirm(h, int(rcpt['blockNumber'], 16), int(status, 16) if status is not None else None, seen_at)
+        self._receipt_head = head if len(chunk) == len(hashes) else None
+
+    def _scan_blocks(self):
+        head = int(self.rpc.call('eth_blockNumber', []), 16)
+        start = (self._last_block + 1) if self._last_block is not None else head
+        for number in range(start, head + 1):
+            blk = self.rpc.call('eth_getBlockByNumber', [hex(number), True]) or {}
+            seen_at = time.time()
+            txs = blk.get('transactions') or []
+            self._blocks.setdefault(number, {"timestamp": int(blk.get('timestamp', '0x0'), 16), "tx_count": len(txs), "ours": 0})
+            for tx in txs:
+                h = (tx.get('hash') or '').lower() if isinstance(tx, dict) else str(tx).lower()
+                with self._lock:
+                    known = h in self._pending
+                    ours = known or (isinstance(tx, dict) and (tx.get('from') or '').lower() in self._senders)
+                if known:
+                    # 区块扫描拿不到执行状态，记为 None
+                    self._confirm(h, number, None, seen_at)
+                elif ours:
+                    self._blocks[number]['ours'] += 1
+            self._last_block = number
+
+    # ---- 收尾 ----
+    def drain(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """等待未确认交易上链（最多 timeout 秒，默认 RECEIPT_DROP_AFTER_SEC），停止后台线程并返回报告。"""
+        deadline = time.time() + (self.drop_after_sec if timeout is None else timeout)
+        while time.time() < deadline:
+            with self._lock:
+                if not self._pending:
+                    break
+            if self._thread is None:
+                self.poll_once()
+            time.sleep(self.poll_interval)
+        self.stop()
+        self._classify_unconfirmed()
+        return self.report()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 30)
+            self._thread = None
+
+    def _classify_unconfirmed(self):
+        """仍未确认的交易：节点查不到 -> dropped；同账户该 nonce 已被其他交易占用 -> replaced；否则 pending。"""
+        with self._lock:
+            left = list(self._pending.values())
+            self._pending.clear()
+        if not left:
+            return
+        txs = self.rpc.batch([('eth_getTransactionByHash', [r['tx_hash']]) for r in left])
+        counts: Dict[str, Optional[int]] = {}
+        for r in left:
+            s = r.get('from')
+            if s and s.lower() not in counts:
+                try:
+                    counts[s.lower()] = int(self.rpc.call('eth_getTransactionCount', [s, 'latest']), 16)
+                except Exception:
+                    counts[s.lower()] = None
+        for r, tx in zip(left, txs):
+            mined_nonce = counts.get((r.get('from') or '').lower())
+            if r.get('nonce') is not None and mined_nonce is not None and mined_nonce > int(r['nonce']):
+                r['state'] = 'replaced'
+            elif tx is None:
+                r['state'] = 'dropped'
+            else:
+                r['state'] = 'pending'
+            with self._lock:
+                self._done[r['tx_hash']] = r
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            done = list(self._done.values())
+            pending = len(self._pending)
+            blocks = {n: dict(b) for n, b in self._blocks.items() if b['ours'] > 0}
+        mined = [r for r in done if r.get('state') in ('mined', 'reverted')]
+        per_block: List[Dict[str, Any]] = []
+        prev_ts: Optional[int] = None
+        for n in sorted(blocks):
+            b = blocks[n]
+            interval = (b['timestamp'] - prev_ts) if prev_ts is not None else None
+            per_block.append({
+                "block_number": n,
+                "timestamp": b['timestamp'],
+                "our_txs": b['ours'],
+                "block_txs": b['tx_count'],
+                "mined_tps": round(b['ours'] / interval, 3) if interval else None,
+            })
+            prev_ts = b['timestamp']
+        span = (per_block[-1]['timestamp'] - per_block[0]['timestamp']) if len(per_block) > 1 else 0
+        return {
+            "mode": self.mode,
+            "tracked": len(done) + pending,
+            "mined": sum(1 for r in done if r.get('state') == 'mined'),
+            "reverted": sum(1 for r in done if r.get('state') == 'reverted'),
+            "dropped": sum(1 for r in done if r.get('state') == 'dropped'),
+            "replaced": sum(1 for r in done if r.get('state') == 'replaced'),
+            "pending": pending + sum(1 for r in done if r.get('state') == 'pending'),
+            "inclusion_latency_ms": summarize_lag_ms([r['observed_latency_sec'] for r in mined]),
+            "block_latency_ms": summarize_lag_ms([r['block_latency_sec'] for r in mined]),
+            "mined_tps": round(len(mined) / span, 3) if span > 0 else None,
+            "per_block": per_block,
+        }
+
+
+def receipt_tracking_enabled() -> bool:
+    """RECEIPT_TRACK=1 时在充值压测期间启用回执跟踪。"""
+    return os.getenv('RECEIPT_TRACK', '0') == '1'
+
+
+def load_transfer_log(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """读取成功转账记录：path 为空时取分段日志 + 旧版 transfer_log.json，为目录时只读该分段目录，否则按旧版 JSON 读取。"""
+    if not path:
+        return load_legacy_view()['successful']
+    if os.path.isdir(path):
+        return [rec for kind, rec in iter_transfer_records(path) if kind == 'ok']
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return list(data.get('successful') or [])
+
+
+if __name__ == '__main__':
+    import argparse
+
+    try:
+        from dotenv import load_dotenv  # type: ignore
+        load_dotenv(os.path.join(PROJECT_ROOT, 'key.env'))
+    except Exception:
+        pass
+
+    parser = argparse.ArgumentParser(description='读取转账日志中的成功交易，统计上链时延与打包 TPS。')
+    parser.add_argument('--log', default=None, help='分段日志目录或旧版 JSON 文件（默认 log/transfer_log/ + log/transfer_log.json）')
+    parser.add_argument('--rpc', default=os.getenv('BTT_RPC_URL'), help='JSON-RPC 地址，默认 BTT_RPC_URL')
+    parser.add_argument('--mode', choices=[MODE_RECEIPT, MODE_BLOCK], default=MODE_RECEIPT)
+    parser.add_argument('--timeout', type=float, default=None, help='最长等待秒数（默认 RECEIPT_DROP_AFTER_SEC）')
+    args = parser.parse_args()
+    if not args.rpc:
+        raise SystemExit('未提供 --rpc，且未设置 BTT_RPC_URL')
+
+    tracker = ReceiptTracker(args.rpc, mode=args.mode)
+    tracker.add_records(load_transfer_log(args.log))
+    if args.mode == MODE_BLOCK:
+        tracker.start()
+    print(json.dumps(tracker.drain(args.timeout), ensure_ascii=False, indent=2))
@@ -1,8 +1,7 @@
 import os
 import sys
 import time
-import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # 允许从项目根导入
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,43 +9,33 @@ PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-from recharge.sendTx import batch_transfer_btt  # type: ignore
-from recharge.getAddress import get_recharge_address_json  # type: ignore
+from recharge.sendTx import (  # type: ignore
+    BTT_RPC_URL, PRIVATE_KEY, RPC_REQUEST_KWARGS, build_and_send_transfer, get_account, get_next_nonce, get_w3,
+    prepare_transfer_context, presign_base_tx, send_presigned_transfer,
+)
+from recharge.getAddress import get_recharge_address_json, prepare_address_context  # type: ignore
+from common.config import RunConfig, get_config  # type: ignore
 from recharge.address_stress import extract_addresses_from_json  # type: ignore
+from recharge.wallet_pool import fund_sender_pool, load_sender_pool  # type: ignore
+from recharge.presign import PresignPipeline, default_lookahead_sec, lookahead_items  # type: ignore
+from recharge.receipt_tracker import ReceiptTracker, receipt_tracking_enabled  # type: ignore
+from recharge.deposit_watcher import DepositWatcher, watch_enabled  # type: ignore
+from recharge.transfer_log import SEGMENT_DIR, append_transfer_log, get_writer, log_transfer  # type: ignore
+from common.scheduler import run_open_loop, print_tick, total_requests  # type: ignore
+from common.multiproc import resolve_workers, run_multiprocess  # type: ignore
+from common.distributed import resolve_agents, run_distributed  # type: ignore
 
-LOG_DIR = os.path.join(PROJECT_ROOT, 'log')
-LOG_PATH = os.path.join(LOG_DIR, 'transfer_log.json')
-
-
-def ensure_log_file():
-    if not os.path.exists(LOG_DIR):
-        os.makedirs(LOG_DIR)
-    if not os.path.exists(LOG_PATH):
-        with open(LOG_PATH, 'w', encoding='utf-8') as f:
-            json.dump({"successful": [], "failed": []}, f, ensure_ascii=False, indent=2)
-
-
-def append_transfer_log(successful: List[Dict[str, Any]], failed: List[Dict[str, Any]]):
-    ensure_log_file()
-    try:
-        with open(LOG_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception:
-        data = {"successful": [], "failed": []}
-    data.setdefault('successful', [])
-    data.setdefault('failed', [])
-    data['successful'].extend(successful)
-    data['failed'].extend(failed)
-    with open(LOG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# 转账日志为分段追加写的 JSONL（见 recharge/transfer_log.py）
+LOG_PATH = SEGMENT_DIR
 
 
 def _resolve_target_address(lock_time: Optional[int] = None,
                             chain_name: Optional[str] = None,
-                            wallet_id: Optional[int] = None) -> Optional[str]:
+                            wallet_id: Optional[int] = None,
+                            config: Optional[RunConfig] = None) -> Optional[str]:
     """解析目标充值地址。优先从接口获取，否则使用环境变量 RECHARGE_TARGET_ADDRESS。"""
     try:
-        resp = get_recharge_address_json(lock_time=lock_time, chain_name=chain_name, wallet_id=wallet_id)
+        resp = get_recharge_address_json(lock_time=lock_time, chain_name=chain_name, wallet_id=wallet_id, config=config)
         addrs = extract_addresses_from_json(resp)
         if addrs:
             return addrs[0]
@@ -56,47 +45,294 @@ def _resolve_target_address(lock_time: Optional[int] = None,
     return fallback.strip() if fallback else None
 
 
+class _PresignPlan:
+    """按确定的调度顺序为本分片的每个全局序号即时计算 (发送账户, nonce)，不预先展开整轮计划。
+
+    单账户：nonce = base_nonce + 全局序号；账户池：本分片第 j 笔由第 j % N 个账户发送，
+    nonce 为该账户预留区间的第 j // N 个（预留后不再做失败回收）。构造时只按笔数预留各账户的 nonce 区间，
+    具体条目由预签名流水线在提前量窗口内逐批生成。
+    """
+
+    def __init__(self,
+                 stages: List[Tuple[int, int]],
+                 shard: Optional[Tuple[int, int]],
+                 pool: Any,
+                 base_nonce: Optional[int]):
+        self.shard_idx, self.shard_cnt = shard if shard is not None else (0, 1)
+        self.count = len(range(self.shard_idx, total_requests(stages), self.shard_cnt))
+        self.pool = pool
+        self.base_nonce = base_nonce
+        self.starts: List[int] = []
+        if pool is not None:
+            n = len(pool.accounts)
+            self.starts = [a.nonces.reserve((self.count - i + n - 1) // n) for i, a in enumerate(pool.accounts)]
+
+    def seq_at(self, j: int) -> int:
+        """本分片第 j 笔对应的全局序号。"""
+        return j * self.shard_cnt + self.shard_idx
+
+    def assign(self, seq: int) -> Tuple[Any, int]:
+        """全局序号 seq 的 (发送账户, nonce)；单账户时发送账户为 None。"""
+        if self.pool is None:
+            return None, self.base_nonce + seq
+        j = (seq - self.shard_idx) // self.shard_cnt
+        n = len(self.pool.accounts)
+        return self.pool.accounts[j % n], self.starts[j % n] + j // n
+
+
+def run_recharge_stages(stages: List[Tuple[int, int]],
+                        target: str,
+                        amt: float,
+                        base_nonce: Optional[int] = None,
+                        start_at: Optional[float] = None,
+                        shard: Optional[Tuple[int, int]] = None,
+                        write_log: bool = True,
+                        on_tick: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                        on_sent: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """以开环调度器执行充值转账：nonce 从 base_nonce（默认当前链上 nonce）起按全局序号预分配，跨阶段连续。
+
+    多进程/多节点模式下由协调方统一给出 base_nonce，各分片按全局序号取 nonce，互不重叠也不留空洞；
+    write_log=True 时每笔结果即时交给转账日志写线程；write_log=False 时不落盘，
+    而是把记录放在返回值的 "records" 中交给协调方统一写日志。
+
+    配置了发送账户池（SENDER_KEYSTORE / SENDER_MNEMONIC）时改为多账户轮询发送，各账户独立维护 nonce，
+    分片模式下按账户序号取模划分账户归属，此时忽略 base_nonce，返回值附带各账户统计 "senders"。
+
+    PRESIGN_LOOKAHEAD_SEC > 0 时启用预签名：签名进程池提前 K 秒把交易签好，发送线程只推送原始交易，
+    返回值 schedule.presign 给出命中/现场签名次数。
+
+    RECEIPT_TRACK=1 且为单进程运行（write_log=True）时，发送期间后台跟踪回执，结果附带 "confirmations"。
+    on_sent 在每笔发送成功时以成功记录回调（供入账跟踪等实时登记）。
+    config 决定连接链节点时的 TLS 校验与代理（config.verify / config.proxies），默认取全局配置。
+    """
+    get_w3(config or get_config())
+    pool = load_sender_pool()
+    if pool is not None:
+        pool = pool.for_shard(shard)
+        pool.init_nonces()
+    else:
+        if base_nonce is None:
+            base_nonce = get_next_nonce()
+        print(f'[DEBUG] 起始 nonce: {base_nonce}')
+    ctx = prepare_transfer_context(amt)
+    main_address = get_account().address
+
+    successful: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+
+    tracker = ReceiptTracker(BTT_RPC_URL, RPC_REQUEST_KWARGS).start() if write_log and receipt_tracking_enabled() else None
+
+    def on_result(kind: str, payload: Any):
+        if write_log:
+            # 只入队，由写线程追加到分段日志，不占用调度线程
+            log_transfer(kind, payload)
+        else:
+            (successful if kind == 'ok' else failed).append(payload)
+        if tracker is not None and kind == 'ok':
+            tracker.add(payload.get('tx_hash'), time.time(), payload.get('from'), payload.get('nonce'))
+        if on_sent is not None and kind == 'ok':
+            on_sent(payload)
+
+    presigner: Optional[PresignPipeline] = None
+    plan: Optional[_PresignPlan] = None
+    lookahead_sec = default_lookahead_sec()
+    if lookahead_sec > 0:
+        plan = _PresignPlan(stages, shard, pool, base_nonce)
+        base_tx = presign_base_tx(ctx, target)
+
+        def plan_item(j: int) -> Tuple[int, str, str, int]:
+            seq = plan.seq_at(j)  # type: ignore[union-attr]
+            acct, nonce = plan.assign(seq)  # type: ignore[union-attr]
+            return (seq, acct.key if acct is not None else PRIVATE_KEY,
+                    acct.address if acct is not None else main_address, nonce)
+
+        presigner = PresignPipeline(plan.count, plan_item, base_tx,
+                                    lookahead_items(stages, lookahead_sec, shard[1] if shard else 1)).start()
+        presigner.warmup()
+
+    def send_presigned(seq: int) -> Tuple[str, Any]:
+        sender, nonce = plan.assign(seq)  # type: ignore[union-attr]
+        item = presigner.get(seq)  # type: ignore[union-attr]
+        if item is None:
+            kind, payload = build_and_send_transfer(ctx, target, nonce, seq + 1, sender=sender)
+        else:
+            kind, payload = send_presigned_transfer(ctx, base_tx, item[0], item[1],
+                                                    sender.address if sender is not None else main_address,
+                                                    nonce, seq + 1)
+        if sender is not None:
+            sender.record(kind, nonce, payload)
+        return kind, payload
+
+    def send_one(seq: int) -> Tuple[str, Any]:
+        if pool is None:
+            return build_and_send_transfer(ctx, target, base_nonce + seq, seq + 1)
+        sender = pool.next_account()
+        nonce = sender.allocate()
+        kind, payload = build_and_send_transfer(ctx, target, nonce, seq + 1, sender=sender)
+        sender.record(kind, nonce, payload)
+        return kind, payload
+
+    try:
+        sched = run_open_loop(
+            stages,
+            send_presigned if presigner is not None else send_one,
+            on_result=on_result,
+            on_tick=on_tick or print_tick('充值'),
+            start_at=start_at,
+            shard=shard,
+            scenario='recharge',
+        )
+    finally:
+        if presigner is not None:
+            presigner.close()
+    if presigner is not None:
+        sched['schedule']['presign'] = presigner.stats()
+    if tracker is not None:
+        sched['confirmations'] = tracker.drain()
+    if write_log:
+        get_writer().flush()
+    else:
+        sched['records'] = {"successful": successful, "failed": failed}
+    if pool is not None:
+        # 预签名按固定计划分配 nonce，回收的 nonce 不会被复用，汇报前统一回填
+        pool.fill_gaps(ctx)
+        sched['senders'] = pool.report()
+        return sched
+    sched['schedule']['start_nonce'] = base_nonce
+    # 按完整调度（含其他分片）推算下一个可用 nonce
+    sched['schedule']['next_nonce'] = base_nonce + total_requests(stages)
+    return sched
+
+
+def _fund_senders_if_needed():
+    """配置了 SENDER_TOPUP_BTT 时，在压测开始前用主账户把发送账户池中余额不足的账户一次性补足。"""
+    raw = os.getenv('SENDER_TOPUP_BTT', '').strip()
+    if not raw:
+        return
+    pool = load_sender_pool()
+    if pool is None:
+        print('[WARN] 设置了 SENDER_TOPUP_BTT 但未配置发送账户池，跳过资金分发')
+        return
+    fund_sender_pool(pool, float(raw))
+
+
+def _print_senders(senders: Optional[List[Dict[str, Any]]]):
+    for rec in senders or []:
+        print(f"👛 {rec['address']} 成功 {rec['success']} / 失败 {rec['failed']}，"
+              f"nonce {rec.get('start_nonce')} -> {rec.get('next_nonce')}，去向不明 {rec.get('unknown_outcomes', 0)}，"
+              f"未回填空洞 {rec.get('pending_gaps')}")
+
+
+def _print_confirmations(conf: Optional[Dict[str, Any]]):
+    if not conf:
+        return
+    lat = conf['inclusion_latency_ms']
+    print(f"⛓️ 上链 {conf['mined']} / 回滚 {conf['reverted']} / 丢弃 {conf['dropped']} / 被替换 {conf['replaced']} / 未确认 {conf['pending']}，"
+          f"提交→打包 p50 {lat['p50']} ms、p99 {lat['p99']} ms，打包 TPS {conf['mined_tps']}")
+
+
+def _print_deposits(dep: Optional[Dict[str, Any]]):
+    if not dep:
+        return
+    print(f"🏦 入账：发现 {dep['detected']} / 入账 {dep['credited']} / 未发现 {dep['undetected']}（共 {dep['sent']}），"
+          f"发现时延 p50 {dep['detect_latency_ms']['p50']} ms，入账时延 p50 {dep['credit_latency_ms']['p50']} ms、"
+          f"p99 {dep['credit_latency_ms']['p99']} ms")
+
+
+def _start_deposit_watcher(lock_time: Optional[int], chain_name: Optional[str],
+                           wallet_id: Optional[int], config: RunConfig) -> Optional[DepositWatcher]:
+    if not watch_enabled():
+        return None
+    try:
+        return DepositWatcher(prepare_address_context(lock_time, chain_name, wallet_id, config)).start()
+    except Exception as e:
+        print(f'[WARN] 入账跟踪启动失败，本轮不统计入账时延: {e}')
+        return None
+
+
+def _run_recharge_stages_any(stages: List[Tuple[int, int]], target: str, amt: float,
+                             workers: Optional[int],
+                             lock_time: Optional[int],
+                             chain_name: Optional[str],
+                             wallet_id: Optional[int],
+                             config: RunConfig) -> Dict[str, Any]:
+    """按 config.agents / 进程数选择分布式、多进程或单进程执行；多路执行时由本进程统一分配起始 nonce 并写日志。
+
+    DEPOSIT_WATCH=1 时整个运行期间轮询 XBlock 充值记录（按 config 访问接口），结果附带 "deposits"（发现/入账时延与每秒积压）。
+    """
+    get_w3(config)
+    _fund_senders_if_needed()
+    watcher = _start_deposit_watcher(lock_time, chain_name, wallet_id, config)
+    try:
+        sched = _run_recharge_stages_dispatch(stages, target, amt, workers, watcher, config)
+    except Exception:
+        if watcher is not None:
+            watcher.stop()
+        raise
+    if watcher is not None:
+        sched['deposits'] = watcher.drain()
+    return sched
+
+
+def _run_recharge_stages_dispatch(stages: List[Tuple[int, int]], target: str, amt: float,
+                                  workers: Optional[int], watcher: Optional[DepositWatcher],
+                                  config: RunConfig) -> Dict[str, Any]:
+    agents = resolve_agents(config=config)
+    procs = resolve_workers(workers, config)
+    if not agents and procs <= 1:
+        on_sent = (lambda rec: watcher.add(rec.get('tx_hash'), time.time())) if watcher is not None else None
+        return run_recharge_stages(stages, target, amt, on_sent=on_sent, config=config)
+    params = {'target': target, 'amount_btt': amt, 'base_nonce': get_next_nonce()}
+    if agents:
+        merged = run_distributed(agents, 'recharge', stages, params)
+    else:
+        merged = run_multiprocess('recharge', stages, params, procs, config)
+    records = merged.pop('records', {"successful": [], "failed": []})
+    append_transfer_log(records['successful'], records['failed'])
+    if receipt_tracking_enabled():
+        # 分片各自发送，回执由协调方按合并后的记录统一查询（提交时间精度为秒）
+        tracker = ReceiptTracker(BTT_RPC_URL, RPC_REQUEST_KWARGS)
+        tracker.add_records(records['successful'])
+        merged['confirmations'] = tracker.drain()
+    if watcher is not None:
+        watcher.add_records(records['successful'])
+    merged.pop('samples', None)
+    return merged
+
+
 def run_recharge_stress_fixed(tps: int,
                               duration_sec: int,
                               amount_btt: Optional[float] = None,
                               lock_time: Optional[int] = None,
                               chain_name: Optional[str] = None,
-                              wallet_id: Optional[int] = None) -> Dict[str, Any]:
-    """固定 TPS 充值压测。返回结构化统计结果。"""
+                              wallet_id: Optional[int] = None,
+                              workers: Optional[int] = None,
+                              config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """固定 TPS 充值压测（开环恒定到达率）。workers > 1 时多进程分片发出；config 为访问 XBlock 接口与链节点用的运行配置。返回结构化统计结果。"""
     if tps <= 0 or duration_sec <= 0:
         raise ValueError('tps 和 duration_sec 必须为正整数')
 
+    cfg = config or get_config()
     amt = amount_btt if amount_btt is not None else float(os.getenv('RECHARGE_AMOUNT_BTT', '0.007'))
-    target = _resolve_target_address(lock_time=lock_time, chain_name=chain_name, wallet_id=wallet_id)
+    target = _resolve_target_address(lock_time=lock_time, chain_name=chain_name, wallet_id=wallet_id, config=cfg)
     if not target:
         raise RuntimeError('无法解析到充值地址，请检查接口或设置 RECHARGE_TARGET_ADDRESS')
 
     print(f'🚀 固定速率压测开始：TPS={tps}，持续 {duration_sec} 秒，每笔 {amt} BTT')
     print(f'🎯 目标充值地址: {target}')
 
-    current_nonce = None
-    total_success = 0
-    total_failed = 0
-    per_sec: List[Dict[str, Any]] = []
-
-    ensure_log_file()
-    for sec in range(duration_sec):
-        print(f'\n⏱️ 第 {sec+1}/{duration_sec} 秒 - 目标 {tps} tx/s')
-        recipients = [target] * tps
-        t0 = time.time()
-        successful, failed, current_nonce = batch_transfer_btt(recipients, amt, start_nonce=current_nonce)
-        append_transfer_log(successful, failed)
-        dt = time.time() - t0
-        s_cnt = len(successful)
-        f_cnt = len(failed)
-        total_success += s_cnt
-        total_failed += f_cnt
-        print(f'📊 本秒完成 成功 {s_cnt} / 失败 {f_cnt}，耗时 {dt:.2f}s  日志: {LOG_PATH}')
-        per_sec.append({"sec_index": sec + 1, "success": s_cnt, "failed": f_cnt, "elapsed_sec": round(dt, 3)})
-        if dt < 1.0:
-            time.sleep(1.0 - dt)
+    sched = _run_recharge_stages_any([(tps, duration_sec)], target, amt, workers, lock_time, chain_name, wallet_id, cfg)
+    per_sec: List[Dict[str, Any]] = sched['stages'][0]['seconds']
+    total_success = sum(r['success'] for r in per_sec)
+    total_failed = sum(r['failed'] for r in per_sec)
+    for r in per_sec:
+        print(f"📊 第 {r['sec_index']} 秒 成功 {r['success']} / 失败 {r['failed']}，耗时 {r['elapsed_sec']:.2f}s")
+    _print_senders(sched.get('senders'))
+    _print_confirmations(sched.get('confirmations'))
+    _print_deposits(sched.get('deposits'))
 
-    print('\n✅ 固定速率压测完成。记录已写入 log/transfer_log.json')
+    print('\n✅ 固定速率压测完成。记录已写入 log/transfer_log/（python recharge/transfer_log.py 可导出旧版 JSON）')
     return {
         "mode": "fixed",
         "tps": tps,
@@ -105,6 +341,10 @@ def run_recharge_stress_fixed(tps: int,
         "total_success": total_success,
         "total_failed": total_failed,
         "per_sec": per_sec,
+        "schedule": sched['schedule'],
+        "senders": sched.get('senders'),
+        "confirmations": sched.get('confirmations'),
+        "deposits": sched.get('deposits'),
         "log_path": LOG_PATH,
     }
 
@@ -115,13 +355,16 @@ def run_recharge_stress_staircase(start_tps: int,
                                   amount_btt: Optional[float] = None,
                                   lock_time: Optional[int] = None,
                                   chain_name: Optional[str] = None,
-                                  wallet_id: Optional[int] = None) -> Dict[str, Any]:
-    """阶梯 TPS 充值压测。返回结构化统计结果。"""
+                                  wallet_id: Optional[int] = None,
+                                  workers: Optional[int] = None,
+                                  config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """阶梯 TPS 充值压测（开环，各阶段无缝衔接）。workers > 1 时多进程分片发出；config 为访问 XBlock 接口与链节点用的运行配置。返回结构化统计结果。"""
     if start_tps <= 0 or end_tps <= 0 or step_duration_sec <= 0:
         raise ValueError('start_tps、end_tps、step_duration_sec 必须为正整数')
 
+    cfg = config or get_config()
     amt = amount_btt if amount_btt is not None else float(os.getenv('RECHARGE_AMOUNT_BTT', '0.007'))
-    target = _resolve_target_address(lock_time=lock_time, chain_name=chain_name, wallet_id=wallet_id)
+    target = _resolve_target_address(lock_time=lock_time, chain_name=chain_name, wallet_id=wallet_id, config=cfg)
     if not target:
         raise RuntimeError('无法解析到充值地址，请检查接口或设置 RECHARGE_TARGET_ADDRESS')
 
@@ -129,33 +372,26 @@ def run_recharge_stress_staircase(start_tps: int,
     print(f'🎯 目标充值地址: {target}')
 
     tps_list = list(range(start_tps, end_tps + 1)) if end_tps >= start_tps else list(range(start_tps, end_tps - 1, -1))
-    current_nonce = None
+
+    sched = _run_recharge_stages_any([(t, step_duration_sec) for t in tps_list], target, amt, workers,
+                                     lock_time, chain_name, wallet_id, cfg)
+
     total_success = 0
     total_failed = 0
     per_stage: List[Dict[str, Any]] = []
+    for tps, stage in zip(tps_list, sched['stages']):
+        seconds = stage['seconds']
+        s_cnt = sum(r['success'] for r in seconds)
+        f_cnt = sum(r['failed'] for r in seconds)
+        total_success += s_cnt
+        total_failed += f_cnt
+        print(f'📊 阶段 {tps} tx/s 完成 成功 {s_cnt} / 失败 {f_cnt}')
+        per_stage.append({"tps": tps, "seconds": seconds, "latency_ms": stage.get('latency_ms')})
+    _print_senders(sched.get('senders'))
+    _print_confirmations(sched.get('confirmations'))
+    _print_deposits(sched.get('deposits'))
 
-    ensure_log_file()
-    for tps in tps_list:
-        print(f'\n🚩 阶段开始：目标 {tps} tx/s')
-        stage_rec = {"tps": tps, "seconds": []}  # type: ignore[dict-item]
-        for sec in range(step_duration_sec):
-            print(f'⏱️ 阶段 {tps} tx/s - 第 {sec+1}/{step_duration_sec} 秒')
-            recipients = [target] * tps
-            t0 = time.time()
-            successful, failed, current_nonce = batch_transfer_btt(recipients, amt, start_nonce=current_nonce)
-            append_transfer_log(successful, failed)
-            dt = time.time() - t0
-            s_cnt = len(successful)
-            f_cnt = len(failed)
-            total_success += s_cnt
-            total_failed += f_cnt
-            print(f'📊 本秒完成 成功 {s_cnt} / 失败 {f_cnt}，耗时 {dt:.2f}s')
-            stage_rec["seconds"].append({"sec_index": sec + 1, "success": s_cnt, "failed": f_cnt, "elapsed_sec": round(dt, 3)})
-            if dt < 1.0:
-                time.sleep(1.0 - dt)
-        per_stage.append(stage_rec)
-
-    print('\n✅ 阶梯速率压测完成。记录已写入 log/transfer_log.json')
+    print('\n✅ 阶梯速率压测完成。记录已写入 log/transfer_log/（python recharge/transfer_log.py 可导出旧版 JSON）')
     return {
         "mode": "staircase",
         "start_tps": start_tps,
@@ -165,5 +401,9 @@ def run_recharge_stress_staircase(start_tps: int,
         "total_success": total_success,
         "total_failed": total_failed,
         "per_stage": per_stage,
+        "schedule": sched['schedule'],
+        "senders": sched.get('senders'),
+        "confirmations": sched.get('confirmations'),
+        "deposits": sched.get('deposits'),
         "log_path": LOG_PATH,
-    }
\ No newline at end of file
+    }
@@ -1,88 +1,43 @@
 import os
-import json
-from web3 import Web3
-from dotenv import load_dotenv
-from typing import Optional, Dict, List, Tuple
+import threading
+from typing import TYPE_CHECKING, Any, Optional, Dict, List, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 from requests.adapters import HTTPAdapter
 import time
 
-# 加载环境变量（显式指定 key.env）
-load_dotenv('key.env')
+if TYPE_CHECKING:
+    from web3 import Web3
+
+# 以脚本方式运行（python recharge/sendTx.py）时补上项目根目录
+try:
+    from recharge.transfer_log import SEGMENT_DIR, append_transfer_log
+except ModuleNotFoundError:
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from recharge.transfer_log import SEGMENT_DIR, append_transfer_log
+from common.histogram import timed
+from common.config import RunConfig, get_config, load_key_env
+from common.proxy_manager import is_egress_error
+
+# 加载环境变量（项目根目录或当前目录下的 key.env）
+load_key_env()
 
 # 配置BTT测试网
 BTT_RPC_URL = os.getenv('BTT_RPC_URL')
 PRIVATE_KEY = os.getenv('PRIVATE_KEY')
 SENDER_ADDRESS = ''  # 替换为你的发送地址
 
-# 先校验环境变量是否读取成功
-if not BTT_RPC_URL:
-    print("未在 key.env 中读取到 BTT_RPC_URL，请确认文件存在且变量名正确")
-    exit(1)
-
-
-def normalize_url(u: Optional[str]) -> Optional[str]:
-    if not u:
-        return u
-    u = u.strip()
-    if not u:
-        return None
-    # 未写 scheme 则默认为 http
-    if not (u.startswith('http://') or u.startswith('https://')):
-        u = 'http://' + u
-    return u
-
-
-def build_proxies_from_env() -> Optional[Dict[str, str]]:
-    """从 HTTP_PROXY/HTTPS_PROXY/ALL_PROXY 构造 proxies 字典；若都为空返回 None。"""
-    http_env = normalize_url(os.environ.get('HTTP_PROXY') or os.environ.get('http_proxy'))
-    https_env = normalize_url(os.environ.get('HTTPS_PROXY') or os.environ.get('https_proxy'))
-    all_env = normalize_url(os.environ.get('ALL_PROXY') or os.environ.get('all_proxy'))
-
-    proxies: Dict[str, str] = {}
-    if all_env:
-        proxies = {'http': all_env, 'https': all_env}
-    else:
-        if http_env:
-            proxies['http'] = http_env
-        if https_env:
-            proxies['https'] = https_env
 
-    return proxies if proxies else None
+RPC_REQUEST_KWARGS: Dict = {}
 
 
-def get_verify_option():
-    """决定 requests 的 verify：
-    - 若 PROXY_CA_BUNDLE/REQUESTS_CA_BUNDLE/SSL_CERT_FILE/CURL_CA_BUNDLE 指向存在的证书文件，则返回该路径
-    - 若 DISABLE_TLS_VERIFY=1，则返回 False（仅调试用）并抑制 InsecureRequestWarning
-    - 否则返回 True
-    """
-    custom_ca = os.getenv('PROXY_CA_BUNDLE')
-    env_cas = [
-        custom_ca,
-        os.getenv('REQUESTS_CA_BUNDLE'),
-        os.getenv('SSL_CERT_FILE'),
-        os.getenv('CURL_CA_BUNDLE'),
-    ]
-    for p in env_cas:
-        if p and os.path.isfile(p):
-            print(f"[INFO] 使用证书文件进行 TLS 校验: {p}")
-            return p
-    if os.getenv('DISABLE_TLS_VERIFY') == '1':
-        print('[WARN] 已暂时关闭 TLS 证书校验')
-        try:
-            import urllib3  # type: ignore
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        except Exception:
-            pass
-        return False
-    return True
+def init_web3(config: RunConfig) -> 'Web3':
+    """按运行配置的证书（config.verify）与代理（config.proxies）创建 Web3 客户端。"""
+    from web3 import Web3
 
-
-def init_web3() -> Web3:
-    verify_opt = get_verify_option()
-    proxies = build_proxies_from_env()
+    verify_opt = config.verify
+    proxies = config.proxies
     # 打印模式，便于定位“开代理不通”的问题
     print(f"[INFO] TLS verify 模式: {verify_opt}")
     print(f"[INFO] 使用代理: {proxies if proxies else '无'}")
@@ -96,6 +51,8 @@ def init_web3() -> Web3:
         request_kwargs['proxies'] = proxies
 
     w3 = Web3(Web3.HTTPProvider(BTT_RPC_URL, request_kwargs=request_kwargs))
+    # JSON-RPC 批量提交直接走 requests，复用同样的代理与证书配置
+    RPC_REQUEST_KWARGS.update(request_kwargs)
 
     # 调整 HTTP 连接池大小，提升高并发吞吐
     try:
@@ -118,93 +75,402 @@ def init_web3() -> Web3:
     return w3
 
 
-# 初始化Web3（带代理与证书设置）
-w3 = init_web3()
+# 链上客户端在首次使用时才创建（web3 导入与连接检查都较重），
+# 只压测地址生成 / 提币时导入本模块不会连接节点，也不要求配置 BTT_RPC_URL / PRIVATE_KEY
+_CHAIN_LOCK = threading.Lock()
+_w3: Optional['Web3'] = None
+_account: Any = None
 
-# 检查连接
-if not w3.is_connected():
-    print(f"无法连接到BTT测试网，当前RPC: {BTT_RPC_URL}")
-    exit(1)
 
-print(f"已连接到BTT测试网，当前区块: {w3.eth.block_number}")
+def _connect_chain(config: RunConfig) -> Tuple['Web3', Any]:
+    """创建 Web3 客户端并做一次连接检查，返回 (w3, 发送账户)；配置缺失或连不上时抛 RuntimeError。"""
+    if not BTT_RPC_URL:
+        raise RuntimeError("未在 key.env 中读取到 BTT_RPC_URL，请确认文件存在且变量名正确")
+    if not PRIVATE_KEY:
+        raise RuntimeError("未在 key.env 中读取到 PRIVATE_KEY，请配置后再试")
 
-# 新增: 检查 PRIVATE_KEY
-if not PRIVATE_KEY:
-    print("未在 key.env 中读取到 PRIVATE_KEY，请配置后再试")
-    exit(1)
+    # 初始化Web3（带代理与证书设置）
+    w3 = init_web3(config)
 
-# 可选: 打印链ID并校验是否为 1029
-try:
-    chain_id = w3.eth.chain_id
-    print(f"Chain ID: {chain_id}")
-    if chain_id != 1029:
-        print("警告: 当前连接的链 ID 不是 1029（BTTC Donau）")
-except Exception:
-    pass
-
-# 设置发送账户
-account = w3.eth.account.from_key(PRIVATE_KEY)
-print(f"使用账户: {account.address}")
-
-# 可选: 校验 SENDER_ADDRESS 一致性
-if SENDER_ADDRESS and SENDER_ADDRESS.lower() != account.address.lower():
-    print(f"警告: SENDER_ADDRESS 与私钥推导地址不一致。SENDER_ADDRESS={SENDER_ADDRESS}, 私钥地址={account.address}")
-
-# 检查余额
-balance = w3.eth.get_balance(account.address)
-print(f"账户余额: {w3.from_wei(balance, 'ether')} BTT")
-
-# 统一日志路径（基于项目根目录）
-PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-LOG_DIR = os.path.join(PROJECT_ROOT, 'log')
-LOG_PATH = os.path.join(LOG_DIR, 'transfer_log.json')
+    # 检查连接
+    if not w3.is_connected():
+        raise RuntimeError(f"无法连接到BTT测试网，当前RPC: {BTT_RPC_URL}")
+
+    print(f"已连接到BTT测试网，当前区块: {w3.eth.block_number}")
+
+    # 可选: 打印链ID并校验是否为 1029
+    try:
+        chain_id = w3.eth.chain_id
+        print(f"Chain ID: {chain_id}")
+        if chain_id != 1029:
+            print("警告: 当前连接的链 ID 不是 1029（BTTC Donau）")
+    except Exception:
+        pass
+
+    # 设置发送账户
+    account = w3.eth.account.from_key(PRIVATE_KEY)
+    print(f"使用账户: {account.address}")
+
+    # 可选: 校验 SENDER_ADDRESS 一致性
+    if SENDER_ADDRESS and SENDER_ADDRESS.lower() != account.address.lower():
+        print(f"警告: SENDER_ADDRESS 与私钥推导地址不一致。SENDER_ADDRESS={SENDER_ADDRESS}, 私钥地址={account.address}")
+
+    # 检查余额
+    balance = w3.eth.get_balance(account.address)
+    print(f"账户余额: {w3.from_wei(balance, 'ether')} BTT")
+    return w3, account
+
+
+def get_w3(config: Optional[RunConfig] = None) -> 'Web3':
+    """返回共享的 Web3 客户端，首次调用时按 config（默认 get_config()）连接节点（线程安全，只初始化一次）。"""
+    global _w3, _account
+    if _w3 is None:
+        with _CHAIN_LOCK:
+            if _w3 is None:
+                w3, account = _connect_chain(config or get_config())
+                _account = account
+                _w3 = w3
+    return _w3
+
+
+def get_account():
+    """返回 PRIVATE_KEY 对应的发送账户（必要时先连接节点）。"""
+    get_w3()
+    return _account
+
+
+def __getattr__(name: str):
+    # 兼容旧写法 `from recharge.sendTx import w3, account`：访问时才连接节点
+    if name == 'w3':
+        return get_w3()
+    if name == 'account':
+        return get_account()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 转账日志：按段追加写 JSONL（写线程见 recharge/transfer_log.py），旧版整文件视图可用该模块按需导出
+LOG_PATH = SEGMENT_DIR
 
 # 生成接收地址列表 (这里示例生成5个地址，实际使用时可以替换为你自己的地址列表)
 recipients = ["0x1f6642e250e7e15865c54963ce65e8635c564eae"]
 
-# 替换原先的临时日志目录创建逻辑，改为提供统一的日志工具函数
 
-def ensure_log_file():
-    if not os.path.exists(LOG_DIR):
-        os.makedirs(LOG_DIR, exist_ok=True)
-    if not os.path.exists(LOG_PATH):
-        with open(LOG_PATH, 'w', encoding='utf-8') as f:
-            json.dump({"successful": [], "failed": []}, f, ensure_ascii=False, indent=2)
+def get_next_nonce() -> int:
+    """读取发送账户当前 nonce（开环调度从这里开始按序号预分配）。"""
+    return get_w3().eth.get_transaction_count(get_account().address)
 
 
-def append_transfer_log(successful, failed):
-    ensure_log_file()
+def prepare_transfer_context(amount_btt) -> Dict:
+    """准备一轮转账共用的参数（gasPrice、金额 wei、是否估算 gas），避免在每笔交易里重复计算。"""
+    # GasPrice 策略：可通过 FIXED_GAS_PRICE_GWEI 固定，否则取链上建议
+    w3 = get_w3()
+    fixed_gas_gwei_env = os.getenv('FIXED_GAS_PRICE_GWEI')
     try:
-        with open(LOG_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        fixed_gas_price = w3.to_wei(fixed_gas_gwei_env, 'gwei') if fixed_gas_gwei_env else None
     except Exception:
-        data = {"successful": [], "failed": []}
-    data.setdefault('successful', [])
-    data.setdefault('failed', [])
-    data['successful'].extend(successful)
-    data['failed'].extend(failed)
-    with open(LOG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        fixed_gas_price = None
+
+    if fixed_gas_price is not None:
+        gas_price_value = fixed_gas_price
+    else:
+        try:
+            gas_price_value = w3.eth.gas_price
+        except Exception:
+            gas_price_value = w3.to_wei('50', 'gwei')
+
+    return {
+        'amount_btt': amount_btt,
+        # 预先转换金额以减少循环内开销
+        'value_wei': w3.to_wei(amount_btt, 'ether'),
+        'gas_price': gas_price_value,
+        'gas_price_gwei': float(w3.from_wei(gas_price_value, 'gwei')),
+        # 是否进行 estimate_gas（默认关闭以提升并发速度）
+        'estimate_gas': os.getenv('ESTIMATE_GAS', '0') == '1',
+    }
+
+
+def send_outcome_unknown(exc: BaseException) -> bool:
+    """发送时的传输层异常是否让交易去向不明：读超时、连接中途断开等请求可能已送达节点的错误。
+
+    建连前就失败的错误（见 common.proxy_manager.is_egress_error）不算，此时交易一定没有发出。
+    """
+    if is_egress_error(exc):
+        return False
+    return isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                            requests.exceptions.ChunkedEncodingError, TimeoutError, ConnectionError))
 
 
-def batch_transfer_btt(recipients, amount_btt, start_nonce=None):
+def _error_record(index, from_addr, to_addr, exc: BaseException) -> Dict[str, Any]:
+    rec: Dict[str, Any] = {'index': index, 'from': from_addr, 'to': to_addr, 'error': str(exc)}
+    if send_outcome_unknown(exc):
+        # 交易可能已进入交易池，发送账户需重新查询 pending nonce 后才能决定是否回收
+        rec['outcome_unknown'] = True
+    return rec
+
+
+def build_and_send_transfer(ctx: Dict, recipient, nonce_assigned, index, total=None, sender=None):
+    """按上下文构造、签名并发送一笔转账，返回 ('ok', 记录) 或 ('err', 记录)。
+
+    sender 为发送账户池中的账户（需有 key / address 属性），为空时使用 PRIVATE_KEY 主账户。
+    """
+    w3 = get_w3()
+    tag = f"{index}/{total}" if total else str(index)
+    to_addr = recipient
+    from_addr = sender.address if sender is not None else get_account().address
+    from_key = sender.key if sender is not None else PRIVATE_KEY
+    try:
+        # 兼容字符串或 {'address': '0x...'} 的输入格式，并做地址规范化
+        to_raw = recipient.get('address') if isinstance(recipient, dict) else recipient
+        if not to_raw:
+            raise ValueError("空的接收地址")
+        to_addr = w3.to_checksum_address(to_raw.strip())
+
+        # 基础交易（包含 from / nonce / chainId）
+        base_tx = {
+            'from': from_addr,
+            'to': to_addr,
+            'value': ctx['value_wei'],
+            'nonce': nonce_assigned,
+            'chainId': 1029  # BTT测试网的链ID
+        }
+
+        # Gas：默认固定 21000，除非显式开启估算
+        if ctx['estimate_gas']:
+            try:
+                gas = w3.eth.estimate_gas(base_tx)
+            except Exception:
+                gas = 21000
+        else:
+            gas = 21000
+
+        tx = {**base_tx, 'gas': gas, 'gasPrice': ctx['gas_price']}
+
+        # 签名并发送
+        signed_tx = w3.eth.account.sign_transaction(tx, from_key)
+        with timed('send_raw'):
+            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        tx_hash_hex = w3.to_hex(tx_hash)
+        print(f"✅ 成功发送 {tag}: {tx_hash_hex} -> {to_addr} (gas={gas}, gasPrice={ctx['gas_price_gwei']} gwei)")
+
+        result = {
+            'index': index,
+            'from': from_addr,
+            'to': to_addr,
+            'tx_hash': tx_hash_hex,
+            'gas': gas,
+            'gas_price_gwei': ctx['gas_price_gwei'],
+            'value_btt': float(ctx['amount_btt']),
+            'nonce': nonce_assigned,
+            'timestamp': int(time.time()),
+        }
+        return ('ok', result)
+    except Exception as e:
+        target_disp = to_addr if isinstance(to_addr, str) else str(to_addr)
+        print(f"❌ 发送失败 {tag} -> {target_disp}: {e}")
+        return ('err', _error_record(index, from_addr, target_disp, e))
+
+
+def presign_base_tx(ctx: Dict, recipient) -> Dict:
+    """预签名用的交易模板（不含 from / nonce）：目标地址只做一次 checksum 转换，gas 固定 21000。"""
+    if ctx['estimate_gas']:
+        print('[WARN] 预签名模式下不做 estimate_gas，gas 固定为 21000')
+    to_raw = recipient.get('address') if isinstance(recipient, dict) else recipient
+    return {
+        'to': get_w3().to_checksum_address(str(to_raw).strip()),
+        'value': ctx['value_wei'],
+        'gas': 21000,
+        'gasPrice': ctx['gas_price'],
+        'chainId': 1029,
+    }
+
+
+def send_presigned_transfer(ctx: Dict, base_tx: Dict, raw_tx: bytes, tx_hash_hex: str, from_addr, nonce, index, total=None):
+    """只推送已签名的原始交易，返回结构与 build_and_send_transfer 一致。"""
+    tag = f"{index}/{total}" if total else str(index)
+    to_addr = base_tx['to']
+    try:
+        with timed('send_raw'):
+            get_w3().eth.send_raw_transaction(raw_tx)
+        print(f"✅ 成功发送 {tag}: {tx_hash_hex} -> {to_addr} (预签名, nonce={nonce})")
+        return ('ok', {
+            'index': index,
+            'from': from_addr,
+            'to': to_addr,
+            'tx_hash': tx_hash_hex,
+            'gas': base_tx['gas'],
+            'gas_price_gwei': ctx['gas_price_gwei'],
+            'value_btt': float(ctx['amount_btt']),
+            'nonce': nonce,
+            'timestamp': int(time.time()),
+        })
+    except Exception as e:
+        print(f"❌ 发送失败 {tag} -> {to_addr}: {e}")
+        return ('err', _error_record(index, from_addr, to_addr, e))
+
+
+class BatchUnsupported(Exception):
+    """节点不接受 JSON-RPC 批量请求（返回非数组或 HTTP 错误）。"""
+
+
+_batch_session: Optional[requests.Session] = None
+_batch_disabled = False
+
+
+def _get_batch_session() -> requests.Session:
+    global _batch_session
+    if _batch_session is None:
+        try:
+            pool_size = int(os.getenv('SENDTX_POOL_MAXSIZE', '64'))
+        except Exception:
+            pool_size = 64
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _batch_session = session
+    return _batch_session
+
+
+def rpc_send_raw_batch(raw_txs: List[bytes]) -> List[Tuple[bool, str]]:
+    """把多笔已签名交易打包成一个 JSON-RPC 批量请求发送，按 id 对回每一笔的结果。
+
+    Returns:
+        与 raw_txs 等长的 [(是否成功, tx_hash 或错误信息)]
+    Raises:
+        BatchUnsupported: 节点拒绝批量请求（调用方应回退为逐笔发送）
+    """
+    payload = [
+        {"jsonrpc": "2.0", "id": i, "method": "eth_sendRawTransaction", "params": ['0x' + bytes(raw).hex()]}
+        for i, raw in enumerate(raw_txs)
+    ]
+    with timed('send_raw_batch'):
+        resp = _get_batch_session().post(BTT_RPC_URL, json=payload, **RPC_REQUEST_KWARGS)
+    if resp.status_code in (400, 404, 405, 413, 415, 501):
+        raise BatchUnsupported(f'HTTP {resp.status_code}: {resp.text[:200]}')
+    resp.raise_for_status()
+    try:
+        data = resp.json()
+    except Exception:
+        raise BatchUnsupported(f'响应非 JSON: {resp.text[:200]}')
+    if not isinstance(data, list):
+        err = data.get('error') if isinstance(data, dict) else data
+        raise BatchUnsupported(f'节点未返回批量结果: {err}')
+
+    results: List[Tuple[bool, str]] = [(False, '批量响应中缺少该笔结果')] * len(raw_txs)
+    for item in data:
+        idx = item.get('id')
+        if not isinstance(idx, int) or not (0 <= idx < len(raw_txs)):
+            continue
+        if 'error' in item and item['error'] is not None:
+            err = item['error']
+            results[idx] = (False, err.get('message', str(err)) if isinstance(err, dict) else str(err))
+        else:
+            results[idx] = (True, item.get('result'))
+    return results
+
+
+def sign_transfer(base_tx: Dict, key, from_addr, nonce) -> Tuple[bytes, str]:
+    """按模板签名一笔转账，返回 (原始交易字节, tx_hash)。"""
+    w3 = get_w3()
+    signed = w3.eth.account.sign_transaction({**base_tx, 'from': from_addr, 'nonce': nonce}, key)
+    return bytes(signed.raw_transaction), w3.to_hex(signed.hash)
+
+
+def send_transfer_batch(ctx: Dict, items: List[Tuple[int, Dict, object, int]], total=None):
+    """批量发送一组转账：items 为 [(index, 交易模板, sender 或 None, nonce)]，先本地签名，再一次 JSON-RPC 批量提交。
+
+    节点拒绝批量请求时自动回退为逐笔 send_raw_transaction，并在本进程内不再尝试批量。
+    返回 [('ok'/'err', 记录)]，记录结构与 build_and_send_transfer 一致。
+    """
+    global _batch_disabled
+    signed: List[Tuple[int, Dict, str, int, bytes, str]] = []
+    out: List[Tuple[str, Dict]] = []
+    for index, base_tx, sender, nonce in items:
+        from_addr = sender.address if sender is not None else get_account().address
+        try:
+            raw, tx_hash = sign_transfer(base_tx, sender.key if sender is not None else PRIVATE_KEY, from_addr, nonce)
+            signed.append((index, base_tx, from_addr, nonce, raw, tx_hash))
+        except Exception as e:
+            out.append(('err', {'index': index, 'from': from_addr, 'to': base_tx['to'], 'error': f'签名失败: {e}'}))
+    if not signed:
+        return out
+
+    if not _batch_disabled:
+        try:
+            results = rpc_send_raw_batch([row[4] for row in signed])
+        except BatchUnsupported as e:
+            _batch_disabled = True
+            print(f'[WARN] 节点不支持 JSON-RPC 批量提交，回退为逐笔发送: {e}')
+        except Exception as e:
+            rows = []
+            for row in signed:
+                rec = _error_record(row[0], row[2], row[1]['to'], e)
+                rec['error'] = f'批量请求失败: {e}'
+                rows.append(('err', rec))
+            return out + rows
+        else:
+            ts = int(time.time())
+            for (index, base_tx, from_addr, nonce, _, tx_hash), (ok, res) in zip(signed, results):
+                if ok:
+                    out.append(('ok', {
+                        'index': index,
+                        'from': from_addr,
+                        'to': base_tx['to'],
+                        'tx_hash': res or tx_hash,
+                        'gas': base_tx['gas'],
+                        'gas_price_gwei': ctx['gas_price_gwei'],
+                        'value_btt': float(ctx['amount_btt']),
+                        'nonce': nonce,
+                        'timestamp': ts,
+                    }))
+                else:
+                    out.append(('err', {'index': index, 'from': from_addr, 'to': base_tx['to'], 'error': res}))
+            ok_cnt = sum(1 for ok, _ in results if ok)
+            print(f"✅ 批量提交 {len(signed)} 笔（{signed[0][0]}..{signed[-1][0]}/{total or '-'}）：成功 {ok_cnt} / 失败 {len(signed) - ok_cnt}")
+            return out
+
+    for index, base_tx, from_addr, nonce, raw, tx_hash in signed:
+        out.append(send_presigned_transfer(ctx, base_tx, raw, tx_hash, from_addr, nonce, index, total))
+    return out
+
+
+def resolve_batch_size(batch_size: Optional[int] = None) -> int:
+    """JSON-RPC 批量大小：参数优先，其次 SENDTX_BATCH_SIZE，默认 0（不批量，逐笔发送）。"""
+    if batch_size is not None:
+        return max(0, int(batch_size))
+    try:
+        return max(0, int(os.getenv('SENDTX_BATCH_SIZE', '0')))
+    except Exception:
+        return 0
+
+
+def batch_transfer_btt(recipients, amount_btt, start_nonce=None, sender_pool=None, batch_size=None,
+                       config: Optional[RunConfig] = None):
     """向多个地址发送BTT
     
     Args:
         recipients: 接收地址列表
         amount_btt: 每笔转账金额
-        start_nonce: 起始nonce，如果为None则自动获取
+        start_nonce: 起始nonce，如果为None则自动获取（使用 sender_pool 时忽略）
+        sender_pool: 发送账户池（recharge.wallet_pool.SenderPool），转账按轮询分摊到各账户，各自维护 nonce
+        batch_size: 每个 JSON-RPC 批量请求打包的交易数（默认读 SENDTX_BATCH_SIZE，<=1 表示逐笔发送）；
+            批量模式下 gas 固定 21000，节点不支持批量时自动回退逐笔发送
+        config: 运行配置快照（节点连接使用其中的证书与代理），默认 get_config()
     
     Returns:
-        (successful_txs, failed_txs, next_nonce)
+        (successful_txs, failed_txs, next_nonce)；使用 sender_pool 时 next_nonce 为 None，
+        各账户 nonce 状态见 sender_pool.report()
     """
+    get_w3(config)
     successful_txs: List[Dict] = []
     failed_txs: List[Dict] = []
 
     # 计算总数并设置并发度（默认使用 total 实现“满并发”）
     total = len(recipients)
+    if total == 0 and sender_pool is not None:
+        return successful_txs, failed_txs, None
     if total == 0:
-        next_nonce = start_nonce if start_nonce is not None else w3.eth.get_transaction_count(account.address)
+        next_nonce = start_nonce if start_nonce is not None else get_next_nonce()
         return successful_txs, failed_txs, next_nonce
 
     max_workers_env_raw = os.getenv('SENDTX_MAX_WORKERS', '').strip()
@@ -218,94 +484,63 @@ def batch_transfer_btt(recipients, amount_btt, start_nonce=None):
     concurrent_mode = max_workers >= 2
 
     # 获取当前nonce（支持外部传入以避免并发冲突）
-    if start_nonce is not None:
+    if sender_pool is not None:
+        base_nonce = None
+        print(f"[DEBUG] 使用发送账户池：{len(sender_pool)} 个账户")
+    elif start_nonce is not None:
         base_nonce = start_nonce
         print(f"[DEBUG] 使用传入 nonce: {base_nonce}")
     else:
-        base_nonce = w3.eth.get_transaction_count(account.address)
+        base_nonce = get_next_nonce()
         print(f"[DEBUG] 自动获取 nonce: {base_nonce}")
 
-    # GasPrice 策略：可通过 FIXED_GAS_PRICE_GWEI 固定，否则取链上建议
-    fixed_gas_gwei_env = os.getenv('FIXED_GAS_PRICE_GWEI')
-    try:
-        fixed_gas_price = w3.to_wei(fixed_gas_gwei_env, 'gwei') if fixed_gas_gwei_env else None
-    except Exception:
-        fixed_gas_price = None
-
-    if fixed_gas_price is not None:
-        gas_price_value = fixed_gas_price
-    else:
-        try:
-            gas_price_value = w3.eth.gas_price
-        except Exception:
-            gas_price_value = w3.to_wei('50', 'gwei')
-
-    # 是否进行 estimate_gas（默认关闭以提升并发速度）
-    estimate_gas = os.getenv('ESTIMATE_GAS', '0') == '1'
-
-    # 预先转换金额以减少循环内开销
-    value_wei = w3.to_wei(amount_btt, 'ether')
+    ctx = prepare_transfer_context(amount_btt)
 
     def build_and_send(recipient, nonce_assigned, index, total):
-        try:
-            # 兼容字符串或 {'address': '0x...'} 的输入格式，并做地址规范化
+        if sender_pool is None:
+            return build_and_send_transfer(ctx, recipient, nonce_assigned, index, total)
+        # 账户池模式：nonce 由所选账户自己的跟踪器分配，失败且未占用的 nonce 会被回收复用
+        sender = sender_pool.next_account()
+        nonce = sender.allocate()
+        status, payload = build_and_send_transfer(ctx, recipient, nonce, index, total, sender=sender)
+        sender.record(status, nonce, payload)
+        return status, payload
+
+    batch = resolve_batch_size(batch_size)
+    if batch > 1:
+        # 批量模式：nonce 在提交前按顺序确定，每 batch 笔打包成一个 JSON-RPC 请求，各批次并发提交
+        templates: Dict[str, Dict] = {}
+        items = []
+        for i, recipient in enumerate(recipients, start=1):
             to_raw = recipient.get('address') if isinstance(recipient, dict) else recipient
-            if not to_raw:
-                raise ValueError("空的接收地址")
-            to_addr = Web3.to_checksum_address(to_raw.strip())
-
-            # 基础交易（包含 from / nonce / chainId）
-            base_tx = {
-                'from': account.address,
-                'to': to_addr,
-                'value': value_wei,
-                'nonce': nonce_assigned,
-                'chainId': 1029  # BTT测试网的链ID
-            }
-
-            # Gas：默认固定 21000，除非显式开启估算
-            if estimate_gas:
-                try:
-                    gas = w3.eth.estimate_gas(base_tx)
-                except Exception:
-                    gas = 21000
+            key = str(to_raw or '').strip().lower()
+            try:
+                if key not in templates:
+                    templates[key] = presign_base_tx(ctx, recipient)
+            except Exception as e:
+                failed_txs.append({'index': i, 'to': str(to_raw), 'error': str(e)})
+                continue
+            if sender_pool is not None:
+                sender = sender_pool.next_account()
+                items.append((i, templates[key], sender, sender.allocate()))
             else:
-                gas = 21000
-
-            tx = {**base_tx, 'gas': gas, 'gasPrice': gas_price_value}
-
-            # 签名并发送
-            signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            tx_hash_hex = Web3.to_hex(tx_hash)
-            print(f"✅ 成功发送 {index}/{total}: {tx_hash_hex} -> {to_addr} (gas={gas}, gasPrice={w3.from_wei(gas_price_value,'gwei')} gwei)")
-
-            result = {
-                'index': index,
-                'to': to_addr,
-                'tx_hash': tx_hash_hex,
-                'gas': gas,
-                'gas_price_gwei': float(w3.from_wei(gas_price_value, 'gwei')),
-                'value_btt': float(amount_btt),
-                'nonce': nonce_assigned,
-                'timestamp': int(time.time()),
-            }
-            return ('ok', result)
-        except Exception as e:
-            target_disp = to_addr if isinstance(to_addr, str) else str(to_addr)
-            print(f"❌ 发送失败 {index}/{total} -> {target_disp}: {e}")
-            return ('err', {
-                'index': index,
-                'to': target_disp,
-                'error': str(e)
-            })
-
-    if concurrent_mode:
+                items.append((i, templates[key], None, base_nonce + (i - 1)))
+        chunks = [items[k:k + batch] for k in range(0, len(items), batch)]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks) or 1))) as executor:
+            futs = {executor.submit(send_transfer_batch, ctx, chunk, total): chunk for chunk in chunks}
+            for fut in as_completed(futs):
+                by_index = {it[0]: it for it in futs[fut]}
+                for status, payload in fut.result():
+                    if sender_pool is not None:
+                        _, _, sender, nonce = by_index[payload['index']]
+                        sender.record(status, nonce, payload)
+                    (successful_txs if status == 'ok' else failed_txs).append(payload)
+    elif concurrent_mode:
         tasks = []
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # 预分配 nonce，避免锁竞争与重复
             for i, recipient in enumerate(recipients, start=1):
-                assigned_nonce = base_nonce + (i - 1)
+                assigned_nonce = base_nonce + (i - 1) if base_nonce is not None else None
                 tasks.append(executor.submit(build_and_send, recipient, assigned_nonce, i, total))
 
             for fut in as_completed(tasks):
@@ -323,7 +558,12 @@ def batch_transfer_btt(recipients, amount_btt, start_nonce=None):
                 successful_txs.append(payload)
             else:
                 failed_txs.append(payload)
-            nonce += 1
+            if nonce is not None:
+                nonce += 1
+
+    if sender_pool is not None:
+        # 批量模式的 nonce 在提交前已全部分配，失败回收的 nonce 不会再被复用，结束前统一回填
+        sender_pool.fill_gaps(ctx)
 
     # 发送结束后按需记录日志（默认开启，可通过 SENDTX_SELF_LOG=0 关闭，避免与 main.py 的日志重复）
     if os.getenv('SENDTX_SELF_LOG', '1') == '1':
@@ -333,6 +573,8 @@ def batch_transfer_btt(recipients, amount_btt, start_nonce=None):
         except Exception as e:
             print(f"[WARN] 写入交易日志失败: {e}")
 
+    if sender_pool is not None:
+        return successful_txs, failed_txs, None
     next_nonce = base_nonce + total
     return successful_txs, failed_txs, next_nonce
 
@@ -341,7 +583,6 @@ def batch_transfer_btt(recipients, amount_btt, start_nonce=None):
 
 if __name__ == '__main__':
     import argparse
-    import time
 
     parser = argparse.ArgumentParser(description='Standalone sender for BTT recharge (batch_transfer_btt).')
     parser.add_argument('-r', '--recipient', help='目标充值地址，默认读取 RECHARGE_TARGET_ADDRESS 或内置示例地址')
@@ -351,9 +592,16 @@ if __name__ == '__main__':
     parser.add_argument('--fixed-gas-gwei', default=None, help='固定 gasPrice（单位 gwei）；不传则使用链上建议')
     parser.add_argument('--estimate-gas', action='store_true', help='开启 estimate_gas（默认关闭以提速）')
     parser.add_argument('--start-nonce', type=int, default=None, help='起始 nonce；不传则自动获取当前 nonce')
+    parser.add_argument('--batch-size', type=int, default=None, help='每个 JSON-RPC 批量请求打包的交易数（默认读 SENDTX_BATCH_SIZE，<=1 为逐笔发送）')
 
     args = parser.parse_args()
 
+    config = RunConfig.from_env()
+    try:
+        get_w3(config)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+
     # 环境变量设置（仅对当前进程生效）
     if args.max_workers is not None:
         os.environ['SENDTX_MAX_WORKERS'] = str(args.max_workers)
@@ -379,7 +627,8 @@ if __name__ == '__main__':
 
     batch = [target] * int(args.count)
     t0 = time.time()
-    ok, err, next_nonce = batch_transfer_btt(batch, amount_btt, start_nonce=args.start_nonce)
+    ok, err, next_nonce = batch_transfer_btt(batch, amount_btt, start_nonce=args.start_nonce, batch_size=args.batch_size,
+                                             config=config)
     dt = time.time() - t0
 
     print(f"\n✅ 完成。成功 {len(ok)} / 失败 {len(err)}，耗时 {dt:.3f}s，next_nonce={next_nonce}")
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 统一日志路径（基于项目根目录）
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_DIR = os.path.join(PROJECT_ROOT, 'log')
+# 旧版整文件 JSON 视图（按需由分段日志导出）
+LEGACY_LOG_PATH = os.path.join(LOG_DIR, 'transfer_log.json')
+# 追加写的分段 JSONL 日志目录：每行一条 {"kind": "ok"/"err", ...转账记录}
+SEGMENT_DIR = os.path.join(LOG_DIR, 'transfer_log')
+SEGMENT_PREFIX = 'transfer-'
+SEGMENT_SUFFIX = '.jsonl'
+
+
+def default_segment_bytes() -> int:
+    """单个分段文件的大小上限，TRANSFER_LOG_SEGMENT_MB 可覆盖，默认 64 MB。"""
+    try:
+        return max(1, int(float(os.getenv('TRANSFER_LOG_SEGMENT_MB', '64')) * 1024 * 1024))
+    except Exception:
+        return 64 * 1024 * 1024
+
+
+class TransferLogWriter:
+    """转账日志的专用写线程：调用方只把记录放进队列，写线程批量追加到当前分段并按大小滚动。
+
+    追加写的开销与已有日志量无关，不再像旧版那样每次读改写整个 transfer_log.json。
+    """
+
+    def __init__(self, segment_dir: str = SEGMENT_DIR, segment_bytes: Optional[int] = None):
+        self.segment_dir = segment_dir
+        self.segment_bytes = segment_bytes or default_segment_bytes()
+        self._queue: 'queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]' = queue.Queue()
+        self._fh = None
+        self._size = 0
+        self._seq = 0
+        self.written = 0
+        self.current_path: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, name='transfer-log-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, kind: str, record: Dict[str, Any]):
+        self._queue.put((kind, record))
+
+    def _open_segment(self):
+        if self._fh is not None:
+            self._fh.close()
+        os.makedirs(self.segment_dir, exist_ok=True)
+        self._seq += 1
+        name = f"{SEGMENT_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._seq:04d}{SEGMENT_SUFFIX}"
+        self.current_path = os.path.join(self.segment_dir, name)
+        self._fh = open(self.current_path, 'a', encoding='utf-8')
+        self._size = 0
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # 一次取空队列，合并成一次写入 + flush
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            lines: List[str] = []
+            for it in batch:
+                if it is None:
+                    stop = True
+                    continue
+                kind, rec = it
+                lines.append(json.dumps({"kind": kind, **rec}, ensure_ascii=False) + '\n')
+            if lines:
+                try:
+                    if self._fh is None or self._size >= self.segment_bytes:
+                        self._open_segment()
+                    data = ''.join(lines)
+                    self._fh.write(data)
+                    self._fh.flush()
+                    self._size += len(data.encode('utf-8'))
+                    self.written += len(lines)
+                except Exception as e:
+                    print(f'[WARN] 写入转账日志失败: {e}')
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                if self._fh is not None:
+                    self._fh.close()
+                    self._fh = None
+                return
+
+    def flush(self):
+        """阻塞直到队列中已有的记录全部写盘。"""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+_WRITER: Optional[TransferLogWriter] = None
+_WRITER_LOCK = threading.Lock()
+
+
+def get_writer() -> TransferLogWriter:
+    """进程内共享的写线程（首次使用时启动，进程退出时自动刷盘关闭）。"""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = TransferLogWriter()
+            atexit.register(_WRITER.close)
+        return _WRITER
+
+
+def log_transfer(kind: str, record: Dict[str, Any]):
+    """记录单笔转账结果（只入队，不阻塞调用方）。"""
+    get_writer().write(kind, record)
+
+
+def append_transfer_log(successful: List[Dict[str, Any]], failed: List[Dict[str, Any]]):
+    """兼容旧接口：把一批成功/失败记录追加到分段日志，并等待写盘完成。"""
+    w = get_writer()
+    for rec in successful:
+        w.write('ok', rec)
+    for rec in failed:
+        w.write('err', rec)
+    w.flush()
+
+
+def list_segments(segment_dir: str = SEGMENT_DIR) -> List[str]:
+    if not os.path.isdir(segment_dir):
+        return []
+    names = sorted(n for n in os.listdir(segment_dir) if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX))
+    return [os.path.join(segment_dir, n) for n in names]
+
+
+def iter_transfer_records(segment_dir: str = SEGMENT_DIR) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """按写入顺序遍历分段日志，产出 (kind, 记录)。损坏的行（如进程被杀时的半行）会被跳过。"""
+    for path in list_segments(segment_dir):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    continue
+                kind = rec.pop('kind', 'ok')
+                yield kind, rec
+
+
+def load_legacy_view(segment_dir: str = SEGMENT_DIR, legacy_path: Optional[str] = LEGACY_LOG_PATH) -> Dict[str, List[Dict[str, Any]]]:
+    """生成旧版 {"successful": [...], "failed": [...]} 视图：旧整文件日志中的历史记录在前，分段日志在后。"""
+    data: Dict[str, List[Dict[str, Any]]] = {"successful": [], "failed": []}
+    if legacy_path and os.path.exists(legacy_path):
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                old = json.load(f)
+            data['successful'].extend(old.get('successful') or [])
+            data['failed'].extend(old.get('failed') or [])
+        except Exception as e:
+            print(f'[WARN] 读取旧版转账日志失败: {e}')
+    for kind, rec in iter_transfer_records(segment_dir):
+        (data['successful'] if kind == 'ok' else data['failed']).append(rec)
+    return data
+
+
+def export_legacy(out_path: str, segment_dir: str = SEGMENT_DIR, legacy_path: Optional[str] = LEGACY_LOG_PATH) -> Dict[str, int]:
+    """把分段日志（连同旧整文件日志）导出为旧版格式文件，返回各类条数。"""
+    data = load_legacy_view(segment_dir, legacy_path)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return {"successful": len(data['successful']), "failed": len(data['failed'])}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='把分段 JSONL 转账日志导出为旧版 {"successful": [...], "failed": [...]} 格式。')
+    parser.add_argument('-o', '--out', default=os.path.join(LOG_DIR, 'transfer_log.export.json'),
+                        help='导出文件路径（默认 log/transfer_log.export.json）')
+    parser.add_argument('--no-legacy', action='store_true', help='不合并旧版 log/transfer_log.json 中的历史记录')
+    args = parser.parse_args()
+
+    counts = export_legacy(args.out, legacy_path=None if args.no_legacy else LEGACY_LOG_PATH)
+    print(f"🧾 已导出 {args.out}：成功 {counts['successful']} / 失败 {counts['failed']}")
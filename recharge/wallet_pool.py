@@ -0,0 +1,375 @@
+import os
+import sys
+import json
+import time
+import heapq
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# 允许从项目根导入
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from recharge.sendTx import PRIVATE_KEY, build_and_send_transfer, get_account, get_w3  # type: ignore
+
+# 这些错误说明该 nonce 已被链上/交易池占用，不能回收复用
+_NONCE_CONSUMED_MARKERS = ('nonce too low', 'already known', 'known transaction', 'replacement transaction underpriced')
+
+
+class NonceTracker:
+    """单个发送账户的 nonce 分配器。
+
+    - allocate(): 优先复用被回收的 nonce（最小者优先），否则顺序递增
+    - release(): 交易确定未进入交易池时回收 nonce，避免留下空洞卡住后续交易
+    """
+
+    def __init__(self, start_nonce: int):
+        self.start_nonce = start_nonce
+        self._next = start_nonce
+        self._released: List[int] = []
+        self._lock = threading.Lock()
+        self.reused = 0
+
+    def allocate(self) -> int:
+        with self._lock:
+            if self._released:
+                self.reused += 1
+                return heapq.heappop(self._released)
+            n = self._next
+            self._next += 1
+            return n
+
+    def reserve(self, count: int) -> int:
+        """一次性预留 count 个连续 nonce（预签名模式按确定性计划使用），返回起始值。"""
+        with self._lock:
+            start = self._next
+            self._next += max(0, int(count))
+            return start
+
+    def release(self, nonce: int):
+        with self._lock:
+            heapq.heappush(self._released, nonce)
+
+    def take_released(self) -> List[int]:
+        """取出全部已回收、尚未被复用的 nonce（升序），供发送结束后回填空洞。"""
+        with self._lock:
+            out = sorted(self._released)
+            self._released = []
+            return out
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "start_nonce": self.start_nonce,
+                "next_nonce": self._next,
+                "pending_gaps": sorted(self._released),
+                "reused": self.reused,
+            }
+
+
+class SenderAccount:
+    """发送账户：私钥、地址、独立的 nonce 跟踪器与成功/失败计数。"""
+
+    def __init__(self, key: str, address: str):
+        self.key = key
+        self.address = address
+        self.nonces: Optional[NonceTracker] = None
+        self.success = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        # 去向不明（超时/连接中途断开）的 nonce，确认未进入交易池前不回收
+        self.unknown: List[int] = []
+        self.unknown_outcomes = 0
+        self.gap_fills = 0
+        # 去向不明的 nonce 攒起来批量判定：allocate() 最多每 NONCE_RECHECK_SEC 秒查一次 pending nonce，且同一时刻只有一个线程在查
+        self.recheck_sec = float(os.getenv('NONCE_RECHECK_SEC', '1'))
+        self._recheck_at = 0.0
+        self._recheck_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def init_nonce(self, start_nonce: Optional[int] = None):
+        if start_nonce is None:
+            start_nonce = get_w3().eth.get_transaction_count(self.address, 'pending')
+        self.nonces = NonceTracker(start_nonce)
+
+    def allocate(self) -> int:
+        if self.nonces is None:
+            self.init_nonce()
+        if self.unknown and time.monotonic() >= self._recheck_at:
+            self._recheck_unknown()
+        return self.nonces.allocate()  # type: ignore[union-attr]
+
+    def _recheck_unknown(self):
+        # 其他线程正在查询时直接跳过，本次分配照常取新 nonce，不在发送线程上排队等 RPC
+        if not self._recheck_lock.acquire(blocking=False):
+            return
+        try:
+            self._recheck_at = time.monotonic() + self.recheck_sec
+            self.resolve_unknown()
+        finally:
+            self._recheck_lock.release()
+
+    def record(self, kind: str, nonce: int, payload: Dict[str, Any]):
+        """记录一次发送结果；发送失败且 nonce 未被占用时回收该 nonce，供后续 allocate() 复用，
+        按固定计划分配 nonce 的发送方式（预签名、批量）无法复用时由 fill_gaps() 在结束前回填。
+
+        超时、连接中途断开等去向不明的失败（payload 带 outcome_unknown）不直接回收，也不在此处查询节点：
+        先放入待判定队列，由之后的 allocate()（按 NONCE_RECHECK_SEC 限频）或 fill_gaps()/report() 一次查询 pending nonce
+        批量判定（见 resolve_unknown），确认未被占用后才回收。
+        """
+        with self._lock:
+            if kind == 'ok':
+                self.success += 1
+                return
+            self.failed += 1
+            self.last_error = str(payload.get('error', ''))[:200]
+        err = (self.last_error or '').lower()
+        if self.nonces is None or any(m in err for m in _NONCE_CONSUMED_MARKERS):
+            return
+        if payload.get('outcome_unknown'):
+            with self._lock:
+                self.unknown_outcomes += 1
+                self.unknown.append(nonce)
+            return
+        self.nonces.release(nonce)
+
+    def resolve_unknown(self):
+        """按链上 pending nonce 处理去向不明的 nonce：小于它的已被占用（交易已进池/上链），不回收；
+        恰好等于它的确定没有进入交易池，可以回收；大于它的无法区分（可能在 queued 中），继续保留等待下次查询。
+        """
+        with self._lock:
+            # 只判定查询前已登记的条目，查询期间新登记的留到下一次
+            held = list(self.unknown)
+        if not held:
+            return
+        try:
+            pending = get_w3().eth.get_transaction_count(self.address, 'pending')
+        except Exception as e:
+            print(f'[WARN] 查询 {self.address} pending nonce 失败，去向不明的 nonce 暂不回收: {e}')
+            return
+        with self._lock:
+            for n in held:
+                if n <= pending and n in self.unknown:
+                    self.unknown.remove(n)
+        if pending in held:
+            self.nonces.release(pending)  # type: ignore[union-attr]
+
+    def fill_gaps(self, ctx: Dict[str, Any]) -> int:
+        """发送结束、汇报之前回填空洞：对已回收但没有被复用的 nonce 各发一笔 0 金额的自转账，
+        否则后面已发出的交易会一直卡在交易池的 queued 中。ctx 为 prepare_transfer_context 的结果，返回成功回填的笔数。
+        """
+        if self.nonces is None:
+            return 0
+        self.resolve_unknown()
+        gaps = self.nonces.take_released()
+        if not gaps:
+            return 0
+        filler_ctx = {**ctx, 'value_wei': 0, 'amount_btt': 0, 'estimate_gas': False}
+        filled = 0
+        for nonce in gaps:
+            kind, payload = build_and_send_transfer(filler_ctx, self.address, nonce, f'空洞回填 nonce {nonce}', sender=self)
+            if kind == 'ok':
+                filled += 1
+                continue
+            err = str(payload.get('error', '')).lower()
+            if any(m in err for m in _NONCE_CONSUMED_MARKERS):
+                continue
+            with self._lock:
+                if payload.get('outcome_unknown'):
+                    self.unknown.append(nonce)
+                else:
+                    self.nonces.release(nonce)
+        with self._lock:
+            self.gap_fills += filled
+        return filled
+
+    def report(self) -> Dict[str, Any]:
+        # 汇报前再查一次，让仍去向不明的 nonce 得到最终判定；仍无法判定的计入空洞
+        self.resolve_unknown()
+        with self._lock:
+            rec: Dict[str, Any] = {
+                "address": self.address,
+                "success": self.success,
+                "failed": self.failed,
+                "last_error": self.last_error,
+                "unknown_outcomes": self.unknown_outcomes,
+                "gap_fills": self.gap_fills,
+            }
+            unknown = list(self.unknown)
+        rec.update(self.nonces.state() if self.nonces is not None else {})
+        if unknown:
+            rec['pending_gaps'] = sorted(rec.get('pending_gaps', []) + unknown)
+        return rec
+
+
+class SenderPool:
+    """多发送账户池：按轮询把转账分摊到各账户，每个账户独立维护 nonce。"""
+
+    def __init__(self, accounts: List[SenderAccount]):
+        if not accounts:
+            raise ValueError('发送账户池为空')
+        self.accounts = accounts
+        self._rr = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def next_account(self) -> SenderAccount:
+        with self._lock:
+            acct = self.accounts[self._rr % len(self.accounts)]
+            self._rr += 1
+        return acct
+
+    def for_shard(self, shard: Optional[Tuple[int, int]]) -> 'SenderPool':
+        """多进程/多节点时按账户序号取模分配账户归属，保证同一账户只由一个分片发送（nonce 不冲突）。"""
+        if shard is None:
+            return self
+        idx, cnt = shard
+        if len(self.accounts) < cnt:
+            raise ValueError(f'发送账户数 {len(self.accounts)} 少于分片数 {cnt}，无法保证各账户 nonce 不冲突')
+        return SenderPool([a for i, a in enumerate(self.accounts) if i % cnt == idx])
+
+    def init_nonces(self):
+        for a in self.accounts:
+            a.init_nonce()
+
+    def fill_gaps(self, ctx: Dict[str, Any]) -> int:
+        filled = sum(a.fill_gaps(ctx) for a in self.accounts)
+        if filled:
+            print(f'🩹 已用 0 金额自转账回填 {filled} 个 nonce 空洞')
+        return filled
+
+    def report(self) -> List[Dict[str, Any]]:
+        return [a.report() for a in self.accounts]
+
+
+def _accounts_from_keystore(path: str, password: Optional[str]) -> List[SenderAccount]:
+    """keystore 文件支持三种格式：私钥字符串数组、{"keys": [...]}、V3 keystore JSON 数组（需 SENDER_KEYSTORE_PASSWORD）。"""
+    # 解析私钥只需要 eth_account，不必为此连接节点
+    from eth_account import Account  # type: ignore
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('keys') or data.get('accounts') or [data]
+    out: List[SenderAccount] = []
+    for item in data:
+        if isinstance(item, str):
+            key = item.strip()
+        elif isinstance(item, dict) and 'crypto' in {k.lower() for k in item.keys()}:
+            if password is None:
+                raise RuntimeError('keystore 为加密格式，请设置 SENDER_KEYSTORE_PASSWORD')
+            key = '0x' + bytes(Account.decrypt(item, password)).hex()
+        elif isinstance(item, dict) and item.get('private_key'):
+            key = str(item['private_key']).strip()
+        else:
+            raise ValueError(f'无法识别的 keystore 条目: {str(item)[:60]}')
+        acct = Account.from_key(key)
+        out.append(SenderAccount(key, acct.address))
+    return out
+
+
+def _accounts_from_mnemonic(mnemonic: str, count: int, offset: int = 0) -> List[SenderAccount]:
+    """按 BIP44 路径 m/44'/60'/0'/0/i 派生 count 个账户。"""
+    from eth_account import Account  # type: ignore
+
+    Account.enable_unaudited_hdwallet_features()
+    out: List[SenderAccount] = []
+    for i in range(offset, offset + count):
+        acct = Account.from_mnemonic(mnemonic, account_path=f"m/44'/60'/0'/0/{i}")
+        out.append(SenderAccount('0x' + bytes(acct.key).hex(), acct.address))
+    return out
+
+
+def load_sender_pool() -> Optional[SenderPool]:
+    """按环境变量加载发送账户池；未配置时返回 None（沿用 PRIVATE_KEY 单账户）。
+
+    - SENDER_KEYSTORE: keystore 文件路径（相对路径基于项目根），可配 SENDER_KEYSTORE_PASSWORD
+    - SENDER_MNEMONIC + SENDER_COUNT（默认 10）+ SENDER_MNEMONIC_OFFSET（默认 0）: 由助记词派生
+    """
+    keystore = os.getenv('SENDER_KEYSTORE', '').strip()
+    mnemonic = os.getenv('SENDER_MNEMONIC', '').strip()
+    if keystore:
+        path = keystore if os.path.isabs(keystore) else os.path.join(PROJECT_ROOT, keystore)
+        accounts = _accounts_from_keystore(path, os.getenv('SENDER_KEYSTORE_PASSWORD'))
+    elif mnemonic:
+        accounts = _accounts_from_mnemonic(mnemonic,
+                                           int(os.getenv('SENDER_COUNT', '10')),
+                                           int(os.getenv('SENDER_MNEMONIC_OFFSET', '0')))
+    else:
+        return None
+    print(f'👛 已加载发送账户池：{len(accounts)} 个账户')
+    return SenderPool(accounts)
+
+
+def fund_sender_pool(pool: SenderPool, target_btt: float, wait_timeout: float = 120.0) -> List[Dict[str, Any]]:
+    """资金分发：用 PRIVATE_KEY 主账户把余额低于 target_btt 的子账户一次性补足到 target_btt。
+
+    所有补款交易按主账户连续 nonce 先全部签名发出，再统一等待回执，保证压测开始前子账户已到账。
+    返回每笔补款的记录。
+    """
+    w3 = get_w3()
+    funder_account = get_account()
+    target_wei = w3.to_wei(target_btt, 'ether')
+    fixed_gas_gwei = os.getenv('FIXED_GAS_PRICE_GWEI')
+    gas_price = w3.to_wei(fixed_gas_gwei, 'gwei') if fixed_gas_gwei else w3.eth.gas_price
+    nonce = w3.eth.get_transaction_count(funder_account.address, 'pending')
+
+    sent: List[Dict[str, Any]] = []
+    for acct in pool.accounts:
+        if acct.address.lower() == funder_account.address.lower():
+            continue
+        balance = w3.eth.get_balance(acct.address)
+        if balance >= target_wei:
+            continue
+        tx = {
+            'from': funder_account.address,
+            'to': acct.address,
+            'value': target_wei - balance,
+            'nonce': nonce,
+            'gas': 21000,
+            'gasPrice': gas_price,
+            'chainId': 1029,
+        }
+        rec: Dict[str, Any] = {"to": acct.address, "value_btt": float(w3.from_wei(target_wei - balance, 'ether')), "nonce": nonce}
+        try:
+            signed = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
+            rec['tx_hash'] = w3.to_hex(w3.eth.send_raw_transaction(signed.raw_transaction))
+            nonce += 1
+        except Exception as e:
+            rec['error'] = str(e)
+        sent.append(rec)
+
+    print(f'💸 资金分发：已发出 {sum(1 for r in sent if "tx_hash" in r)} 笔补款，等待上链...')
+    for rec in sent:
+        if 'tx_hash' not in rec:
+            continue
+        try:
+            receipt = w3.eth.wait_for_transaction_receipt(rec['tx_hash'], timeout=wait_timeout)
+            rec['status'] = int(receipt.get('status', 0))
+        except Exception as e:
+            rec['error'] = f'等待回执失败: {e}'
+    ok = sum(1 for r in sent if r.get('status') == 1)
+    print(f'💸 资金分发完成：成功 {ok} / 共 {len(sent)} 笔')
+    return sent
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='发送账户池工具：查看各账户 nonce/余额，或从主账户批量补款。')
+    parser.add_argument('--fund', type=float, default=None, help='把每个子账户余额补足到该 BTT 数额')
+    args = parser.parse_args()
+
+    sender_pool = load_sender_pool()
+    if sender_pool is None:
+        raise SystemExit('未配置 SENDER_KEYSTORE 或 SENDER_MNEMONIC')
+    if args.fund is not None:
+        print(json.dumps(fund_sender_pool(sender_pool, args.fund), ensure_ascii=False, indent=2))
+    sender_pool.init_nonces()
+    w3 = get_w3()
+    for a in sender_pool.accounts:
+        print(f"{a.address}  余额 {w3.from_wei(w3.eth.get_balance(a.address), 'ether')} BTT  nonce {a.nonces.start_nonce}")
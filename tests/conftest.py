@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 与各脚本一致：从项目根导入 common / recharge / withdrawal
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
@@ -0,0 +1,64 @@
+import random
+
+from common.histogram import LatencyHistogram, _bucket_index, _bucket_upper
+
+
+def _exact_percentile_us(values_us, pct):
+    ordered = sorted(values_us)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def test_bucket_upper_bounds_value_within_relative_error():
+    for us in list(range(0, 300)) + [1_000, 4_095, 4_096, 65_537, 1_234_567, 30_000_000]:
+        upper = _bucket_upper(_bucket_index(us))
+        assert upper >= us
+        assert upper - us <= max(0, us) * 0.016
+
+
+def test_percentiles_are_bucket_upper_bounds_of_exact_values():
+    rnd = random.Random(7)
+    values_us = [int(rnd.lognormvariate(9, 1.2)) for _ in range(20_000)]
+    h = LatencyHistogram()
+    for us in values_us:
+        h.record(us / 1_000_000)
+    assert h.total == len(values_us)
+    assert h.max_us == max(values_us)
+    assert h.min_us == min(values_us)
+    for pct in (50, 90, 99, 99.9):
+        exact = _exact_percentile_us(values_us, pct)
+        got = h.percentile_us(pct)
+        # 分位数按桶上界报告：不低于真实值，且相对误差 < 1.6%
+        assert exact <= got <= exact * 1.016 + 1
+
+
+def test_empty_histogram_summary_is_zero():
+    s = LatencyHistogram().summary()
+    assert s['count'] == 0
+    assert s['p99'] == 0.0
+
+
+def test_merge_equals_recording_everything_in_one():
+    rnd = random.Random(11)
+    a, b, whole = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i in range(5_000):
+        sec = rnd.expovariate(1 / 0.05)
+        (a if i % 3 else b).record(sec)
+        whole.record(sec)
+    merged = LatencyHistogram().merge(a).merge(b)
+    assert merged.counts == whole.counts
+    assert (merged.total, merged.sum_us, merged.min_us, merged.max_us) == \
+        (whole.total, whole.sum_us, whole.min_us, whole.max_us)
+    assert merged.summary() == whole.summary()
+
+
+def test_dict_round_trip_merges_across_processes():
+    h = LatencyHistogram()
+    for ms in (1, 2, 3, 250, 900):
+        h.record(ms / 1000)
+    restored = LatencyHistogram.from_dict(h.to_dict())
+    assert restored.counts == h.counts
+    assert restored.summary() == h.summary()
+    merged = LatencyHistogram.from_dict(h.to_dict()).merge(restored)
+    assert merged.total == 2 * h.total
+    assert merged.percentile_us(50) == h.percentile_us(50)
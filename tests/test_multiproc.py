@@ -0,0 +1,67 @@
+from common.histogram import LatencyHistogram
+from common.multiproc import merge_shard_results
+
+
+def _hist(*ms):
+    h = LatencyHistogram()
+    for x in ms:
+        h.record(x / 1000)
+    return h
+
+
+def _shard(success, failed, issued, lag_p99, latencies_ms, samples, nonces=None):
+    sec_hist = _hist(*latencies_ms).to_dict()
+    result = {
+        "stages": [{"rate": 10.0, "seconds": [{
+            "sec_index": 1, "success": success, "failed": failed, "rejected": 0, "elapsed_sec": 1.0 + failed / 10,
+            "scheduled": issued, "issued": issued,
+            "start_lag_ms": {"mean": 1.0, "p50": 1.0, "p99": lag_p99, "max": lag_p99},
+        }]}],
+        "schedule": {
+            "scheduled": issued, "issued": issued, "start_lag_ms": {"mean": 1.0, "p50": 1.0, "p99": lag_p99, "max": lag_p99},
+            "max_in_flight": 3, "max_workers": 8, "engine": "thread",
+        },
+        "latency_hist": {"run": {"address": sec_hist}, "stages": {"0": {"address": sec_hist}},
+                         "seconds": {"0:1": {"address": sec_hist}}},
+        "samples": samples,
+    }
+    if nonces is not None:
+        result['schedule'].update(start_nonce=nonces[0], next_nonce=nonces[1])
+        result['records'] = {"successful": [{"nonce": n} for n in range(*nonces)], "failed": []}
+    return result
+
+
+def test_counts_sum_and_lag_is_conservative():
+    merged = merge_shard_results([
+        _shard(5, 0, 5, 2.0, [10, 20], ['a']),
+        _shard(4, 1, 5, 7.5, [30], ['b', 'c']),
+    ])
+    sec = merged['stages'][0]['seconds'][0]
+    assert (sec['success'], sec['failed'], sec['scheduled'], sec['issued']) == (9, 1, 10, 10)
+    assert sec['elapsed_sec'] == 1.1
+    assert sec['start_lag_ms']['p99'] == 7.5
+    assert merged['schedule']['shards'] == 2
+    assert merged['schedule']['max_workers'] == 16
+    assert merged['samples'] == ['a', 'b', 'c']
+    assert 'records' not in merged
+
+
+def test_latency_histograms_merge_across_shards():
+    merged = merge_shard_results([
+        _shard(2, 0, 2, 1.0, [10, 20], []),
+        _shard(1, 0, 1, 1.0, [30], []),
+    ])
+    expected = _hist(10, 20, 30).summary()
+    assert merged['schedule']['latency_ms']['address'] == expected
+    assert merged['stages'][0]['latency_ms']['address'] == expected
+    assert merged['stages'][0]['seconds'][0]['latency_ms']['address'] == expected
+
+
+def test_recharge_records_and_nonce_range_merge():
+    merged = merge_shard_results([
+        _shard(2, 0, 2, 1.0, [5], [], nonces=(100, 102)),
+        _shard(2, 0, 2, 1.0, [5], [], nonces=(102, 104)),
+    ])
+    assert [r['nonce'] for r in merged['records']['successful']] == [100, 101, 102, 103]
+    assert merged['schedule']['start_nonce'] == 100
+    assert merged['schedule']['next_nonce'] == 104
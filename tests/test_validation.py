@@ -0,0 +1,56 @@
+from common.config import RunConfig
+from common.validation import ResponseClassifier, chain, envelope_check, unique_field
+
+
+def _config(validate=True, codes=('200',)):
+    return RunConfig(business_validate=validate, business_ok_codes=codes)
+
+
+def _classifier(config):
+    cfg_codes = config.business_ok_codes
+    validator = chain(envelope_check(cfg_codes), unique_field(lambda d: (d.get('data') or {}).get('address'), 'address'))
+    return ResponseClassifier('address', config, validator if config.business_validate else None)
+
+
+def _buckets(clf):
+    return {(b['status'], b['code'], b['error_type']): b['count'] for b in clf.report()['buckets']}
+
+
+def test_ok_envelope_passes_and_business_failures_become_bad():
+    clf = _classifier(_config())
+    assert clf.classify('ok', {"code": 200, "data": {"address": "0xa"}})[0] == 'ok'
+    assert clf.classify('ok', {"code": 500, "data": {"address": "0xb"}})[0] == 'bad'
+    assert clf.classify('ok', {"code": 200, "data": {"address": "0xa"}})[0] == 'bad'
+    assert clf.classify('ok', ['not', 'a', 'dict'])[0] == 'bad'
+    counts = _buckets(clf)
+    assert counts[('2xx', '200', '-')] == 1
+    assert counts[('2xx', '500', 'code=500')] == 1
+    assert counts[('2xx', '200', 'duplicate-address')] == 1
+    assert counts[('2xx', '-', 'not-envelope')] == 1
+    assert clf.report()['rejected'] == 3
+
+
+def test_errors_are_bucketed_by_status_and_exception():
+    clf = _classifier(_config())
+    payload = {"status": 503, "error": "busy"}
+    assert clf.classify('err', payload) == ('err', payload)
+    clf.classify('err', {"exc": "ReadTimeout"})
+    clf.classify('err', "boom")
+    counts = _buckets(clf)
+    assert counts[('503', '-', 'http')] == 1
+    assert counts[('-', '-', 'ReadTimeout')] == 1
+    assert counts[('-', '-', 'error')] == 1
+    assert clf.report()['rejected'] == 0
+
+
+def test_validation_disabled_counts_any_2xx_as_ok():
+    clf = _classifier(_config(validate=False))
+    assert clf.validator is None
+    assert clf.classify('ok', {"code": 500})[0] == 'ok'
+    assert clf.report()['validated'] is False
+
+
+def test_custom_ok_codes_and_wrap():
+    clf = _classifier(_config(codes=('0', '200')))
+    task = clf.wrap(lambda i: ('ok', {"code": 0, "data": {"address": f"0x{i}"}}))
+    assert [task(i)[0] for i in range(3)] == ['ok', 'ok', 'ok']
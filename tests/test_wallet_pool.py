@@ -0,0 +1,123 @@
+import pytest
+
+import recharge.wallet_pool as wp
+from recharge.wallet_pool import NonceTracker, SenderAccount
+
+ADDR = '0x' + '11' * 20
+UNKNOWN = {'error': 'ReadTimeout', 'outcome_unknown': True}
+
+
+class _FakeEth:
+    def __init__(self, pending):
+        self.pending = pending
+        self.calls = 0
+
+    def get_transaction_count(self, address, block):
+        assert block == 'pending'
+        self.calls += 1
+        if isinstance(self.pending, Exception):
+            raise self.pending
+        return self.pending
+
+
+class _FakeW3:
+    def __init__(self, pending):
+        self.eth = _FakeEth(pending)
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    """把 wallet_pool 查询 pending nonce 的节点换成可控的假节点。"""
+    w3 = _FakeW3(0)
+    monkeypatch.setattr(wp, 'get_w3', lambda config=None: w3)
+    return w3.eth
+
+
+def test_nonce_tracker_allocates_sequentially_and_reuses_smallest_released():
+    t = NonceTracker(5)
+    assert [t.allocate() for _ in range(4)] == [5, 6, 7, 8]
+    t.release(7)
+    t.release(6)
+    assert t.allocate() == 6
+    assert t.allocate() == 7
+    assert t.allocate() == 9
+    assert t.reused == 2
+
+
+def test_nonce_tracker_reserve_and_take_released():
+    t = NonceTracker(0)
+    assert t.reserve(10) == 0
+    assert t.allocate() == 10
+    t.release(3)
+    t.release(1)
+    assert t.state()['pending_gaps'] == [1, 3]
+    assert t.take_released() == [1, 3]
+    assert t.take_released() == []
+    assert t.allocate() == 11
+
+
+def test_record_releases_plain_failures_but_not_consumed_nonces():
+    s = SenderAccount('k', ADDR)
+    s.init_nonce(0)
+    n0, n1, n2 = s.allocate(), s.allocate(), s.allocate()
+    s.record('ok', n0, {})
+    s.record('err', n1, {'error': 'insufficient funds for gas'})
+    s.record('err', n2, {'error': 'nonce too low'})
+    assert (s.success, s.failed) == (1, 2)
+    assert s.nonces.take_released() == [n1]
+
+
+def test_unknown_outcomes_are_queued_without_querying_the_node(chain):
+    s = SenderAccount('k', ADDR)
+    s.init_nonce(10)
+    for _ in range(4):
+        s.allocate()
+    for n in (11, 12, 13):
+        s.record('err', n, UNKNOWN)
+    assert chain.calls == 0
+    assert s.unknown == [11, 12, 13]
+    assert s.unknown_outcomes == 3
+
+
+def test_resolve_unknown_splits_by_pending_nonce(chain):
+    s = SenderAccount('k', ADDR)
+    s.init_nonce(10)
+    for _ in range(4):
+        s.allocate()
+    for n in (11, 12, 13):
+        s.record('err', n, UNKNOWN)
+    chain.pending = 12
+    s.resolve_unknown()
+    assert chain.calls == 1
+    # 11 已被占用、12 确定未进池可回收、13 仍无法判定
+    assert s.unknown == [13]
+    assert s.nonces.take_released() == [12]
+
+
+def test_resolve_unknown_keeps_everything_when_the_query_fails(chain):
+    s = SenderAccount('k', ADDR)
+    s.init_nonce(0)
+    s.allocate()
+    s.record('err', 0, UNKNOWN)
+    chain.pending = ConnectionError('node down')
+    s.resolve_unknown()
+    assert s.unknown == [0]
+    assert s.nonces.take_released() == []
+
+
+def test_allocate_rechecks_unknown_at_most_once_per_interval(chain, monkeypatch):
+    monkeypatch.setenv('NONCE_RECHECK_SEC', '3600')
+    s = SenderAccount('k', ADDR)
+    s.init_nonce(0)
+    s.allocate()
+    s.allocate()
+    s.record('err', 1, UNKNOWN)
+    chain.pending = 1
+    # 第一次分配触发批量判定，回收的 1 立即被复用
+    assert s.allocate() == 1
+    assert chain.calls == 1
+    assert s.allocate() == 2
+    s.record('err', 2, UNKNOWN)
+    assert s.allocate() == 3
+    assert chain.calls == 1
+    assert s.unknown == [2]
@@ -7,13 +7,21 @@ import time
 
 # 确保从子目录运行时也能导入到项目根下的 common.getToken
 try:
-    from common.getToken import get_token_with_auto_refresh
+    from common.getToken import get_token_pool, get_token_with_auto_refresh, reset_token_stats, token_stats
 except ModuleNotFoundError:
     CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
     PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
     if PROJECT_ROOT not in sys.path:
         sys.path.insert(0, PROJECT_ROOT)
-    from common.getToken import get_token_with_auto_refresh
+    from common.getToken import get_token_pool, get_token_with_auto_refresh, reset_token_stats, token_stats
+from common.config import RunConfig, get_config
+from common.transport import current_session, run_transport, xblock_url
+from common.proxy_manager import get_proxy_manager, proxy_label
+from common.histogram import timed
+from common.aggregator import ResultAggregator
+from common.validation import ResponseClassifier, chain, envelope_check, goodput_summary, register_validator, unique_field
+from common.multiproc import resolve_workers, run_multiprocess
+from common.distributed import resolve_agents, run_distributed
 
 # 与其他模块保持一致的通用头部（尽量贴近浏览器/你之前提供的 curl）
 BASE_HEADERS = {
@@ -35,13 +43,6 @@ BASE_HEADERS = {
 
 SEND_URL = 'https://xblock-test.charprotocol.com/api/asset/member/wallet/send/tx'
 
-# 探测 SOCKS 支持
-try:
-    import socks  # type: ignore
-    HAS_SOCKS = True
-except Exception:
-    HAS_SOCKS = False
-
 
 def normalize_url(u: Optional[str]) -> Optional[str]:
     if not u:
@@ -64,75 +65,41 @@ def normalize_proxies(p: Dict[str, str]) -> Dict[str, str]:
     return out
 
 
-def build_proxy_candidates() -> list[Dict[str, str]]:
-    candidates: list[Dict[str, str]] = []
-
-    http_env = normalize_url(os.environ.get('HTTP_PROXY') or os.environ.get('http_proxy'))
-    https_env = normalize_url(os.environ.get('HTTPS_PROXY') or os.environ.get('https_proxy'))
-    all_env = normalize_url(os.environ.get('ALL_PROXY') or os.environ.get('all_proxy'))
-    if any([http_env, https_env, all_env]):
-        proxies_env: Dict[str, str] = {}
-        if all_env:
-            proxies_env = {'http': all_env, 'https': all_env}
-        else:
-            if http_env:
-                proxies_env['http'] = http_env
-            if https_env:
-                proxies_env['https'] = https_env
-        if proxies_env:
-            candidates.append(proxies_env)
-
-    # 本地常见代理端口（如 Clash）
-    candidates.append({'http': 'http://127.0.0.1:7890', 'https': 'http://127.0.0.1:7890'})
-
-    # SOCKS5h（若可用）
-    if HAS_SOCKS:
-        candidates.append({'http': 'socks5h://127.0.0.1:7891', 'https': 'socks5h://127.0.0.1:7891'})
-
-    return candidates
+def build_proxy_candidates(config: RunConfig) -> list[Dict[str, str]]:
+    """代理候选列表（运行配置快照中确定，见 common.config），返回副本。"""
+    return [dict(p) for p in config.proxy_candidates]
 
 
-def get_verify_option() -> object:
+def get_verify_option(config: RunConfig) -> object:
     """决定 requests 的 verify 参数：
     优先使用可用证书文件（REQUESTS_CA_BUNDLE/SSL_CERT_FILE/CURL_CA_BUNDLE/PROXY_CA_BUNDLE），
     若设置 DISABLE_TLS_VERIFY=1 则关闭校验（仅调试用）。
-    默认 True。
+    默认 True。结果在运行配置快照生成时确定一次。
     """
-    custom_ca = os.getenv('PROXY_CA_BUNDLE')
-    env_cas = [
-        custom_ca,
-        os.getenv('REQUESTS_CA_BUNDLE'),
-        os.getenv('SSL_CERT_FILE'),
-        os.getenv('CURL_CA_BUNDLE'),
-    ]
-    for p in env_cas:
-        if p and os.path.isfile(p):
-            return p
-    if os.getenv('DISABLE_TLS_VERIFY') == '1':
-        try:
-            import urllib3  # type: ignore
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        except Exception:
-            pass
-        return False
-    return True
-
+    return config.verify
 
-def get_token_for_auth() -> str:
-    # 允许通过环境变量 TOKEN_REFRESH_INTERVAL_SEC 控制刷新间隔（秒），默认 300
-    interval_env = os.getenv('TOKEN_REFRESH_INTERVAL_SEC')
-    try:
-        interval = int(interval_env) if interval_env is not None else None
-    except Exception:
-        interval = None
 
-    token = get_token_with_auto_refresh(interval)
+def get_token_for_auth(config: Optional[RunConfig] = None) -> str:
+    # 由 common.getToken.TokenRefresher 按 expires_in 在后台续期，请求路径通常直接拿到缓存的 token
+    token = get_token_with_auto_refresh(config=config)
     if not token:
         raise RuntimeError('get_token_with_auto_refresh() 返回空 token')
     return token
 
 
-def send_withdraw_tx(session: requests.Session, proxies: Dict[str, str], verify_opt: object, token: str, payload: Dict) -> requests.Response:
+def build_withdraw_headers(token: str, jsessionid: Optional[str] = None) -> Dict[str, str]:
+    """构造提币接口请求头（线程/异步两种引擎共用）。jsessionid 取自运行配置，为空时不带 Cookie。"""
+    headers = dict(BASE_HEADERS)
+    # 注意：按你之前要求使用小写 header 名和小写 scheme
+    headers['authorization'] = f'bearer {token}'
+
+    if jsessionid:
+        headers['Cookie'] = f'JSESSIONID={jsessionid}'
+    return headers
+
+
+def send_withdraw_tx(session: requests.Session, proxies: Dict[str, str], verify_opt: object, token: str, payload: Dict,
+                     config: Optional[RunConfig] = None) -> requests.Response:
     """调用发送提币交易接口。
 
     Args:
@@ -141,69 +108,63 @@ def send_withdraw_tx(session: requests.Session, proxies: Dict[str, str], verify_
         verify_opt: TLS 校验选项（True | False | CA 文件路径字符串）
         token: Bearer token（自动小写 bearer）
         payload: POST 的 JSON 负载
+        config: 运行配置快照（站点地址、JSESSIONID、超时），默认 get_config()
     """
-    headers = dict(BASE_HEADERS)
-    # 注意：按你之前要求使用小写 header 名和小写 scheme
-    headers['authorization'] = f'bearer {token}'
+    cfg = config or get_config()
+    headers = build_withdraw_headers(token, cfg.jsessionid)
+
+    with timed('withdraw'):
+        resp = session.post(
+            xblock_url(SEND_URL, cfg.base_url),
+            headers=headers,
+            json=payload,
+            proxies=normalize_proxies(proxies),
+            timeout=cfg.sendtx_timeout,
+            allow_redirects=True,
+            verify=verify_opt,
+        )
+    return resp
 
-    jsessionid = os.getenv('JSESSIONID')
-    if jsessionid:
-        headers['Cookie'] = f'JSESSIONID={jsessionid}'
 
-    timeout_s = float(os.getenv('SENDTX_TIMEOUT', '30'))
-
-    resp = session.post(
-        SEND_URL,
-        headers=headers,
-        json=payload,
-        proxies=normalize_proxies(proxies),
-        timeout=timeout_s,
-        allow_redirects=True,
-        verify=verify_opt,
-    )
-    return resp
+def send_tx_json(payload: Dict, config: Optional[RunConfig] = None, vu: Optional[int] = None) -> dict:
+    """以与项目统一的代理/证书/认证机制调用发送交易接口，返回 JSON，失败抛异常。
 
+    证书与凭据取自运行配置快照（默认 get_config()），请求路径上不读 key.env 或环境变量。
+    出口由 common.proxy_manager 选择：只有请求发出之前就失败（连不上代理、建连失败/超时、TLS 握手失败）时才换下一个候选；
+    HTTP 错误、读超时与发出后连接断开都不换代理重发，避免同一笔提币被多个出口重复提交。
+    多账号（TOKEN_ACCOUNTS_FILE）时由 token 池分配账号，vu 为虚拟用户 ID（TOKEN_ACCOUNT_ASSIGN=vu 时生效）。
+    """
+    cfg = config or get_config()
+    pool = get_token_pool(cfg)
+    acct, token = pool.acquire(vu)
+    # 压测运行中复用共享连接池（见 common.transport），否则退化为一次性会话
+    session = current_session() or requests.Session()
+    verify_opt = cfg.verify
 
-def send_tx_json(payload: Dict) -> dict:
-    """以与项目统一的代理/证书/认证机制调用发送交易接口，返回 JSON，失败抛异常。"""
-    # 读取 key.env（如果存在）
     try:
-        from dotenv import load_dotenv  # type: ignore
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        env_path = os.path.join(base_dir, 'key.env')
-        if os.path.exists(env_path):
-            load_dotenv(env_path)
-        elif os.path.exists('key.env'):
-            load_dotenv('key.env')
+        resp = get_proxy_manager(cfg).call(lambda proxies: send_withdraw_tx(session, proxies, verify_opt, token, payload, cfg))
     except Exception:
-        pass
-
-    token = get_token_for_auth()
-    session = requests.Session()
-    verify_opt = get_verify_option()
-    proxies_list = build_proxy_candidates()
-
-    last_error: Optional[Exception] = None
-    for proxies in proxies_list:
-        try:
-            resp = send_withdraw_tx(session, proxies, verify_opt, token, payload)
-            if resp.ok:
-                return resp.json()
-            else:
-                # 401 等直接透出内容帮助定位
-                _ = resp.text[:800]
-        except Exception as e:
-            last_error = e
-            continue
-
-    if last_error:
-        raise last_error
-    raise RuntimeError('发送提币交易失败：所有代理候选均尝试失败')
+        pool.record(acct, error=True)
+        raise
+    pool.record(acct, status=resp.status_code)
+    if resp.ok:
+        return resp.json()
+    if resp.status_code == 401:
+        # token 失效：触发一次合并的强制刷新，下一笔换用新 token（本笔不自动重发，避免重复提币）
+        pool.invalidate(token, acct)
+    # 401 等直接透出内容帮助定位
+    err = RuntimeError(f'发送提币交易失败（HTTP {resp.status_code}）：{resp.text[:300]}')
+    err.status = resp.status_code  # type: ignore[attr-defined]
+    raise err
 
 
 # 新增：并发批量发送与压测模式
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, List, Tuple
+from typing import Any, Callable, List, Tuple
+
+from common.scheduler import default_max_workers, run_open_loop, print_tick
+from common.async_engine import ENGINE_ASYNC, AsyncHttpClient, default_max_in_flight, resolve_engine, run_async_open_loop
 
 
 def _extract_asset_send_id(resp: dict):
@@ -216,13 +177,36 @@ def _extract_asset_send_id(resp: dict):
     return None
 
 
-def batch_send_withdraw_json(total: int, payload: Dict, max_workers: Optional[int] = None) -> Tuple[List[dict], List[dict]]:
+# 提币业务成功：code 为成功码，且 data.assetSendId 存在并在本轮内不重复
+register_validator('withdraw', lambda config: chain(envelope_check(config.business_ok_codes),
+                                                     unique_field(_extract_asset_send_id, 'assetSendId')))
+
+
+def _send_txlog_path() -> str:
+    # 日志文件路径：SEND_TXLOG_PATH 可覆盖（如自测基准写到临时文件），默认项目根/log/send_txlog.json
+    custom = os.getenv('SEND_TXLOG_PATH')
+    if custom:
+        os.makedirs(os.path.dirname(os.path.abspath(custom)), exist_ok=True)
+        return custom
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    log_dir = os.path.join(project_root, 'log')
+    os.makedirs(log_dir, exist_ok=True)
+    return os.path.join(log_dir, 'send_txlog.json')
+
+
+def batch_send_withdraw_json(total: int, payload: Dict, max_workers: Optional[int] = None,
+                             aggregator: Optional[ResultAggregator] = None,
+                             classifier: Optional[ResponseClassifier] = None,
+                             config: Optional[RunConfig] = None) -> Tuple[List[dict], List[dict]]:
     """并发批量调用提币发送接口。
 
     Args:
         total: 本轮请求总数
         payload: 提币参数（每次相同，或可在调用层改变）
-        max_workers: 线程池并发度；默认等于 total，或读取 WD_MAX_WORKERS 环境变量
+        max_workers: 线程池并发度；默认等于 total，或取运行配置的 WD_MAX_WORKERS
+        aggregator: 传入时结果推入该汇总器（计数、业务 code、耗时与抽样响应），不再保留完整响应列表，返回的两个列表为空
+        classifier: 传入时按业务校验判定成功（见 common.validation），2xx 但校验失败的响应归入失败
+        config: 运行配置快照，默认 get_config()
 
     Returns:
         (success_list, fail_list)
@@ -230,28 +214,56 @@ def batch_send_withdraw_json(total: int, payload: Dict, max_workers: Optional[in
     if total <= 0:
         return [], []
 
+    cfg = config or get_config()
     if max_workers is None:
-        try:
-            max_workers_env = int(os.getenv('WD_MAX_WORKERS', str(total)))
-        except Exception:
-            max_workers_env = total
-        max_workers = max(1, min(max_workers_env, total))
+        max_workers = max(1, min(cfg.wd_max_workers or total, total))
 
     success_list: List[dict] = []
     fail_list: List[dict] = []
 
     def worker(idx: int) -> Tuple[bool, dict]:
         try:
-            data = send_tx_json(payload)
-            return True, data
+            data = send_tx_json(payload, cfg, idx)
+            kind = 'ok'
         except Exception as e:
-            return False, {"error": str(e)}
+            kind, data = 'err', {"error": str(e), "status": getattr(e, 'status', None), "exc": type(e).__name__}
+        if classifier is not None:
+            kind, data = classifier.classify(kind, data)
+        return kind == 'ok', data
+
+    def print_asset(data: dict):
+        asset_id = _extract_asset_send_id(data)
+        if asset_id is not None:
+            print(f'✅ 成功提币 assetSendId: {asset_id}')
+        else:
+            print('✅ assetSendId: -')
 
-    # 日志文件路径：项目根/log/send_txlog.json
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    log_dir = os.path.join(project_root, 'log')
-    os.makedirs(log_dir, exist_ok=True)
-    log_path = os.path.join(log_dir, 'send_txlog.json')
+    log_path = _send_txlog_path()
+
+    if aggregator is not None:
+        log_lock = threading.Lock()
+
+        # 工作线程自己写日志并推入汇总器，Future 不携带响应体，整批结束前也不会堆积完整结果
+        with open(log_path, 'a', encoding='utf-8') as fh:
+            def push_one(idx: int):
+                t0 = time.perf_counter()
+                ok, data = worker(idx)
+                latency = time.perf_counter() - t0
+                try:
+                    line = json.dumps(data, ensure_ascii=False) + '\n'
+                    with log_lock:
+                        fh.write(line)
+                        fh.flush()
+                except Exception:
+                    pass
+                if ok:
+                    print_asset(data)
+                aggregator.push(ok, status=data.get('status'), code=data.get('code'), latency=latency, body=data)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for fut in as_completed([executor.submit(push_one, i) for i in range(total)]):
+                    fut.result()
+        return success_list, fail_list
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = [executor.submit(worker, i) for i in range(total)]
@@ -266,11 +278,7 @@ def batch_send_withdraw_json(total: int, payload: Dict, max_workers: Optional[in
                     pass
 
                 if ok:
-                    asset_id = _extract_asset_send_id(data)
-                    if asset_id is not None:
-                        print(f'✅ 成功提币 assetSendId: {asset_id}')
-                    else:
-                        print('✅ assetSendId: -')
+                    print_asset(data)
                     success_list.append(data)
                 else:
                     fail_list.append(data)
@@ -278,30 +286,136 @@ def batch_send_withdraw_json(total: int, payload: Dict, max_workers: Optional[in
     return success_list, fail_list
 
 
-def run_withdraw_stress_fixed(qps: int, duration_sec: int, payload: Dict) -> Dict[str, Any]:
-    """固定并发(近似固定QPS)的提币发送压测，按秒循环执行。"""
-    if qps <= 0 or duration_sec <= 0:
-        raise ValueError('qps 和 duration_sec 必须为正整数')
-
-    total_success = 0
-    total_failed = 0
-    per_sec: List[Dict[str, Any]] = []  # type: ignore[name-defined]
+def withdraw_one_call(payload: Dict, config: Optional[RunConfig] = None, vu: Optional[int] = None) -> Tuple[str, dict]:
+    """发起一次提币请求，返回 ('ok', 响应 JSON) 或 ('err', {"error", "status", "exc"})。vu 为虚拟用户 ID（分配账号用）。"""
+    try:
+        data = send_tx_json(payload, config, vu)
+    except Exception as e:
+        status = getattr(e, 'status', None)
+        return 'err', {"error": str(e), "status": status, "exc": 'http' if status else type(e).__name__}
+    asset_id = _extract_asset_send_id(data)
+    if asset_id is not None:
+        print(f'✅ 成功提币 assetSendId: {asset_id}')
+    else:
+        print('✅ assetSendId: -')
+    return 'ok', data
+
+
+async def withdraw_one_call_async(client, payload: Dict, idx: int, config: Optional[RunConfig] = None) -> Tuple[str, dict]:
+    """withdraw_one_call 的异步版本，client 为 common.async_engine.AsyncHttpClient。"""
+    cfg = config or get_config()
+    acct, token = client.auth(idx)
+    with timed('withdraw'):
+        kind, data = await client.request_json('POST', xblock_url(SEND_URL, cfg.base_url), str(idx), account=acct,
+                                               headers=build_withdraw_headers(token, cfg.jsessionid), json=payload)
+    if kind == 'ok':
+        asset_id = _extract_asset_send_id(data)
+        print(f'✅ 成功提币 assetSendId: {asset_id}' if asset_id is not None else '✅ assetSendId: -')
+    return kind, data
+
+
+def _new_async_client(cfg: RunConfig) -> AsyncHttpClient:
+    """异步引擎按代理管理器选择出口（分流模式下每个出口一个会话），出口失败时只降级不重发。"""
+    pm = get_proxy_manager(cfg)
+    proxies = pm.select()[1]
+    print(f'[INFO] 异步引擎使用代理: {proxy_label(proxies)}（分流模式 {pm.mode}）')
+    return AsyncHttpClient(proxies, cfg.verify, default_max_in_flight(),
+                           cfg.sendtx_timeout, token_pool=get_token_pool(cfg), proxy_manager=pm)
+
+
+def run_withdraw_stages(stages: List[Tuple[int, int]], payload: Dict, sample_cap: int = 20,
+                        engine: Optional[str] = None,
+                        start_at: Optional[float] = None,
+                        shard: Optional[Tuple[int, int]] = None,
+                        on_tick: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                        config: Optional[RunConfig] = None) -> Tuple[Dict[str, Any], List[dict]]:
+    """以开环调度器执行提币压测（线程或 asyncio 引擎），完整返回逐条追加写入 send_txlog.json。
+
+    start_at/shard/on_tick 供多进程/多节点模式使用，含义同 common.scheduler.run_open_loop；
+    config 为本轮运行配置，贯穿 token、代理、传输层与业务校验（默认 get_config()）。
+    """
+    cfg = config or get_config()
+    pm = get_proxy_manager(cfg)
+    # 先为每个账号取一次 token（之后由后台线程在过期前续期）；代理与 token 统计只算本轮
+    get_token_pool(cfg).prefetch()
+    pm.reset_stats()
+    reset_token_stats(cfg)
     sample_results: List[dict] = []
+    log_lock = threading.Lock()
 
-    for sec in range(duration_sec):
-        print(f'\n⏱️ 第 {sec+1}/{duration_sec} 秒 - 目标并发 {qps}')
-        t0 = time.time()
-        success_list, fail_list = batch_send_withdraw_json(total=qps, payload=payload, max_workers=qps)
-        dt = time.time() - t0
-        s_cnt = len(success_list)
-        f_cnt = len(fail_list)
-        total_success += s_cnt
-        total_failed += f_cnt
-        sample_results.extend(success_list[:3])
-        print(f'📊 本秒完成 成功 {s_cnt} / 失败 {f_cnt}，耗时 {dt:.2f}s')
-        per_sec.append({"sec_index": sec + 1, "success": s_cnt, "failed": f_cnt, "elapsed_sec": round(dt, 3)})
-        if dt < 1.0:
-            time.sleep(1.0 - dt)
+    with open(_send_txlog_path(), 'a', encoding='utf-8') as fh:
+        def on_result(kind: str, data: Any):
+            try:
+                line = json.dumps(data, ensure_ascii=False) + '\n'
+                with log_lock:
+                    fh.write(line)
+            except Exception:
+                pass
+            if kind == 'ok' and len(sample_results) < sample_cap:
+                sample_results.append(data)
+
+        classifier = ResponseClassifier('withdraw', cfg)
+        if resolve_engine(engine, cfg) == ENGINE_ASYNC:
+            sched = run_async_open_loop(
+                stages,
+                classifier.wrap_async(lambda cli, seq: withdraw_one_call_async(cli, payload, seq + 1, cfg)),
+                _new_async_client(cfg),
+                on_result=on_result,
+                on_tick=on_tick or print_tick('提币'),
+                start_at=start_at,
+                shard=shard,
+                scenario='withdraw',
+            )
+        else:
+            with run_transport(default_max_workers(stages), pm.active_proxies(), cfg.verify, base_url=cfg.base_url) as transport:
+                sched = run_open_loop(
+                    stages,
+                    classifier.wrap(lambda seq: withdraw_one_call(payload, cfg, seq + 1)),
+                    on_result=on_result,
+                    on_tick=on_tick or print_tick('提币'),
+                    start_at=start_at,
+                    shard=shard,
+                    scenario='withdraw',
+                )
+            sched['transport'] = transport.stats()
+        sched['outcomes'] = classifier.report()
+        sched['proxy'] = pm.stats()
+        sched['token'] = token_stats(cfg)
+    return sched, sample_results
+
+
+def _run_withdraw_stages_any(stages: List[Tuple[int, int]], payload: Dict, sample_cap: int,
+                             engine: Optional[str], workers: Optional[int],
+                             config: RunConfig) -> Tuple[Dict[str, Any], List[dict]]:
+    """按 config.agents / 进程数选择分布式、多进程或单进程执行。"""
+    params = {'payload': payload, 'sample_cap': sample_cap, 'engine': engine}
+    agents = resolve_agents(config=config)
+    procs = resolve_workers(workers, config)
+    if agents:
+        merged = run_distributed(agents, 'withdraw', stages, params)
+    elif procs > 1:
+        merged = run_multiprocess('withdraw', stages, params, procs, config)
+    else:
+        return run_withdraw_stages(stages, payload, sample_cap=sample_cap, engine=engine, config=config)
+    return merged, merged.pop('samples', [])
+
+
+def run_withdraw_stress_fixed(qps: int, duration_sec: int, payload: Dict, engine: Optional[str] = None,
+                              workers: Optional[int] = None, config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """固定 QPS 的提币发送压测（开环恒定到达率，不随服务端延迟降速）。engine 取 thread/async，workers 为进程数，config 为运行配置。"""
+    if qps <= 0 or duration_sec <= 0:
+        raise ValueError('qps 和 duration_sec 必须为正整数')
+    cfg = config or get_config()
+
+    print(f'🚀 提币压测开始（开环）：QPS={qps}，持续 {duration_sec} 秒')
+    sched, sample_results = _run_withdraw_stages_any([(qps, duration_sec)], payload, 10, engine, workers, cfg)
+    per_sec: List[Dict[str, Any]] = sched['stages'][0]['seconds']
+    total_success = sum(r['success'] for r in per_sec)
+    total_failed = sum(r['failed'] for r in per_sec)
+    for r in per_sec:
+        print(f"📊 第 {r['sec_index']} 秒 成功 {r['success']} / 失败 {r['failed']}，耗时 {r['elapsed_sec']:.2f}s")
+    goodput = goodput_summary(per_sec)
+    print(f"🎯 吞吐 {goodput['throughput_rps']} req/s，goodput {goodput['goodput_rps']} req/s（业务校验失败 {goodput['rejected']}）")
 
     return {
         "mode": "fixed",
@@ -309,41 +423,44 @@ def run_withdraw_stress_fixed(qps: int, duration_sec: int, payload: Dict) -> Dic
         "duration_sec": duration_sec,
         "total_success": total_success,
         "total_failed": total_failed,
+        "goodput": goodput,
+        "outcomes": sched.get('outcomes'),
         "per_sec": per_sec,
+        "schedule": sched['schedule'],
+        "transport": sched.get('transport'),
+        "proxy": sched.get('proxy'),
+        "token": sched.get('token'),
         "sample_results": sample_results[:10],
     }
 
 
-def run_withdraw_stress_staircase(start_concurrency: int, end_concurrency: int, step_duration_sec: int, payload: Dict) -> Dict[str, Any]:
-    """阶梯并发的提币发送压测：从 start_concurrency 到 end_concurrency，每阶段持续 step_duration_sec 秒。"""
+def run_withdraw_stress_staircase(start_concurrency: int, end_concurrency: int, step_duration_sec: int, payload: Dict,
+                                  engine: Optional[str] = None, workers: Optional[int] = None,
+                                  config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """阶梯 QPS 的提币发送压测：从 start_concurrency 到 end_concurrency，每阶段持续 step_duration_sec 秒（开环）。engine 取 thread/async，workers 为进程数，config 为运行配置。"""
     if start_concurrency <= 0 or end_concurrency <= 0 or step_duration_sec <= 0:
         raise ValueError('start_concurrency、end_concurrency、step_duration_sec 必须为正整数')
+    cfg = config or get_config()
 
     conc_list = list(range(start_concurrency, end_concurrency + 1)) if end_concurrency >= start_concurrency else list(range(start_concurrency, end_concurrency - 1, -1))
 
+    print(f'🚀 提币阶梯压测开始（开环）：{start_concurrency} -> {end_concurrency} QPS，每阶段 {step_duration_sec} 秒')
+    sched, sample_results = _run_withdraw_stages_any([(c, step_duration_sec) for c in conc_list], payload, 20, engine, workers, cfg)
+
     total_success = 0
     total_failed = 0
-    per_stage: List[Dict[str, Any]] = []  # type: ignore[name-defined]
-    sample_results: List[dict] = []
-
-    for conc in conc_list:
-        print(f'\n🚩 阶段开始：目标并发 {conc}')
-        stage_rec = {"concurrency": conc, "seconds": []}
-        for sec in range(step_duration_sec):
-            print(f'⏱️ 阶段 {conc} 并发 - 第 {sec+1}/{step_duration_sec} 秒')
-            t0 = time.time()
-            success_list, fail_list = batch_send_withdraw_json(total=conc, payload=payload, max_workers=conc)
-            dt = time.time() - t0
-            s_cnt = len(success_list)
-            f_cnt = len(fail_list)
-            total_success += s_cnt
-            total_failed += f_cnt
-            sample_results.extend(success_list[:2])
-            print(f'📊 本秒完成 成功 {s_cnt} / 失败 {f_cnt}，耗时 {dt:.2f}s')
-            stage_rec["seconds"].append({"sec_index": sec + 1, "success": s_cnt, "failed": f_cnt, "elapsed_sec": round(dt, 3)})
-            if dt < 1.0:
-                time.sleep(1.0 - dt)
-        per_stage.append(stage_rec)
+    per_stage: List[Dict[str, Any]] = []
+    for conc, stage in zip(conc_list, sched['stages']):
+        seconds = stage['seconds']
+        s_cnt = sum(r['success'] for r in seconds)
+        f_cnt = sum(r['failed'] for r in seconds)
+        total_success += s_cnt
+        total_failed += f_cnt
+        print(f'📊 阶段 {conc} QPS 完成 成功 {s_cnt} / 失败 {f_cnt}')
+        per_stage.append({"concurrency": conc, "seconds": seconds, "latency_ms": stage.get('latency_ms'),
+                          "goodput": goodput_summary(seconds)})
+    goodput = goodput_summary([r for stage in sched['stages'] for r in stage['seconds']])
+    print(f"🎯 吞吐 {goodput['throughput_rps']} req/s，goodput {goodput['goodput_rps']} req/s（业务校验失败 {goodput['rejected']}）")
 
     return {
         "mode": "staircase",
@@ -352,19 +469,20 @@ def run_withdraw_stress_staircase(start_concurrency: int, end_concurrency: int,
         "step_duration_sec": step_duration_sec,
         "total_success": total_success,
         "total_failed": total_failed,
+        "goodput": goodput,
+        "outcomes": sched.get('outcomes'),
         "per_stage": per_stage,
+        "schedule": sched['schedule'],
+        "transport": sched.get('transport'),
+        "proxy": sched.get('proxy'),
+        "token": sched.get('token'),
         "sample_results": sample_results[:20],
     }
 
 
 def main():
-    # 读取 key.env（参数与证书、代理设置）
-    try:
-        from dotenv import load_dotenv  # type: ignore
-        if os.path.exists('key.env'):
-            load_dotenv('key.env')
-    except Exception:
-        pass
+    # 本次运行的配置快照（读取 key.env：参数与证书、代理设置）
+    cfg = RunConfig.from_env()
 
     # 从环境变量读取参数，便于命令行快速测试
     wallet_id = os.getenv('WD_WALLET_ID')
@@ -414,16 +532,16 @@ def main():
 
     # 执行发送
     try:
-        token = get_token_for_auth()
+        token = get_token_for_auth(cfg)
         print('[INFO] 已获取 token（前 30 字符预览）:', token[:30] + '...')
         session = requests.Session()
-        verify_opt = get_verify_option()
-        proxies_list = build_proxy_candidates()
+        verify_opt = cfg.verify
+        proxies_list = build_proxy_candidates(cfg)
         last_error = None
         for idx, proxies in enumerate(proxies_list, start=1):
             try:
                 print(f"[INFO] 尝试使用代理 #{idx}: {proxies}")
-                resp = send_withdraw_tx(session, proxies, verify_opt, token, payload)
+                resp = send_withdraw_tx(session, proxies, verify_opt, token, payload, cfg)
                 content_type = resp.headers.get('Content-Type', '')
                 print(f"[INFO] HTTP {resp.status_code}, Content-Type: {content_type}")
                 if resp.ok: